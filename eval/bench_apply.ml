@@ -1,9 +1,11 @@
 (* 
    output CSV:
-     graph_size,rule,trial,latency_us,matched,
+     graph_size,rule,trial,workload,latency_us,matched,
      load_bg_us,load_redex_us,load_react_us,load_meta_us,create_rule_us,
      bg_bytes,redex_bytes,react_bytes,meta_bytes,
-     read_bg_us,decode_bg_us,read_redex_us,decode_redex_us,read_react_us,decode_react_us
+     read_bg_us,decode_bg_us,read_redex_us,decode_redex_us,read_react_us,decode_react_us,
+     bg_heap_words,index_heap_words,match_all_heap_words,match_all_alloc_words,
+     top_heap_words                      (heap columns only filled with --mem)
 *)
 
 module J = Yojson.Safe
@@ -78,102 +80,52 @@ let read_file_bytes (path : string) : string * int64 =
   let t1 = now_us () in
   (buf, Int64.sub t1 t0)
 
-(* --------- deserialization API --------- *)
+(* --------- heap accounting (--mem) --------- *)
 
-module Api = Bigraph_capnp.Make (Capnp.BytesMessage)
+(* live words after a full major GC; only called outside timed regions *)
+let live_words () =
+  Gc.full_major ();
+  (Gc.stat ()).Gc.live_words
 
-let propvalue_of_capnp (pv : Api.Reader.PropertyValue.t) : property_value =
-  match Api.Reader.PropertyValue.get pv with
-  | Api.Reader.PropertyValue.BoolVal b -> Bool b
-  | Api.Reader.PropertyValue.IntVal i -> Int (Int32.to_int i)
-  | Api.Reader.PropertyValue.FloatVal f -> Float f
-  | Api.Reader.PropertyValue.StringVal s -> String s
-  | Api.Reader.PropertyValue.ColorVal c ->
-      let r = Api.Reader.PropertyValue.ColorVal.r_get c in
-      let g = Api.Reader.PropertyValue.ColorVal.g_get c in
-      let b = Api.Reader.PropertyValue.ColorVal.b_get c in
-      Color (r, g, b)
-  | Api.Reader.PropertyValue.Undefined _ -> String ""
+let allocated_words () =
+  let minor, promoted, major = Gc.counters () in
+  minor +. major -. promoted
 
-let build_bigraph_with_interface (b : Api.Reader.Bigraph.t) :
-    bigraph_with_interface =
-  let nodes = Api.Reader.Bigraph.nodes_get_list b in
-  let sig_tbl : (string, control) Hashtbl.t =
-    Hashtbl.create (List.length nodes)
-  in
-  List.iter
-    (fun n ->
-      let cname = Api.Reader.Node.control_get n in
-      let arity = Api.Reader.Node.arity_get n |> Int32.to_int in
-      if not (Hashtbl.mem sig_tbl cname) then
-        Hashtbl.add sig_tbl cname (create_control cname arity))
-    nodes;
-  let signature = Hashtbl.to_seq_values sig_tbl |> List.of_seq in
-
-  let node_tbl : (int, node) Hashtbl.t = Hashtbl.create (List.length nodes) in
-  List.iter
-    (fun n ->
-      let id = Api.Reader.Node.id_get n |> Int32.to_int in
-      if Hashtbl.mem node_tbl id then
-        failwith (Printf.sprintf "Duplicate node ID: %d" id);
-      let cname = Api.Reader.Node.control_get n in
-      let control =
-        match Hashtbl.find_opt sig_tbl cname with
-        | Some c -> c
-        | None ->
-            create_control cname (Api.Reader.Node.arity_get n |> Int32.to_int)
-      in
-      let name = Api.Reader.Node.name_get n in
-      let node_typ = Api.Reader.Node.type_get n in
-      let ports = Api.Reader.Node.ports_get_list n |> List.map Int32.to_int in
-      let props_list =
-        let pls = Api.Reader.Node.properties_get_list n in
-        if pls = [] then None
-        else
-          Some
-            (List.map
-               (fun p ->
-                 let k = Api.Reader.Property.key_get p in
-                 let v = propvalue_of_capnp (Api.Reader.Property.value_get p) in
-                 (k, v))
-               pls)
-      in
-      Hashtbl.add node_tbl id
-        {
-          id;
-          name;
-          node_type = node_typ;
-          control;
-          ports;
-          properties = props_list;
-        })
-    nodes;
-
-  let bg_ref = ref (empty_bigraph signature) in
-  List.iter
-    (fun n ->
-      let id = Api.Reader.Node.id_get n |> Int32.to_int in
-      let parent = Api.Reader.Node.parent_get n |> Int32.to_int in
-      let nd = Hashtbl.find node_tbl id in
-      if parent = -1 then bg_ref := add_node_to_root !bg_ref nd
-      else bg_ref := add_node_as_child !bg_ref parent nd)
-    nodes;
-
-  let site_count = Api.Reader.Bigraph.site_count_get b |> Int32.to_int in
-  let names = Api.Reader.Bigraph.names_get_list b in
-  {
-    bigraph = !bg_ref;
-    inner = { sites = site_count; names };
-    outer = { sites = 0; names = [] };
-  }
+type heap_cols = {
+  bg_words : int;
+  index_words : int;
+  match_all_words : int;
+  match_all_alloc : float;
+  top_words : int;
+}
 
-let bytes_to_gwi (bytes : string) : bigraph_with_interface =
-  let stream = Capnp.Codecs.FramedStream.of_string ~compression:`None bytes in
-  match Capnp.Codecs.FramedStream.get_next_frame stream with
-  | Ok msg ->
-      let r = Api.Reader.Bigraph.of_message msg in
-      build_bigraph_with_interface r
-  | Error _ -> failwith "Cap'n Proto decode failed"
+let heap_cols_csv = function
+  | None -> [ ""; ""; ""; ""; "" ]
+  | Some h ->
+      [
+        string_of_int h.bg_words;
+        string_of_int h.index_words;
+        string_of_int h.match_all_words;
+        Printf.sprintf "%.0f" h.match_all_alloc;
+        string_of_int h.top_words;
+      ]
+
+(* words retained by the matcher indexes and by a fully materialised
+   match_all enumeration over [bg] *)
+let measure_matcher_heap (redex_bg : bigraph) (bg : bigraph) =
+  let w0 = live_words () in
+  let ctrl_idx = Matching.build_control_index bg in
+  let name_idx = Matching.build_name_index bg in
+  let child_idx = Matching.build_child_index bg in
+  let w1 = live_words () in
+  ignore (Sys.opaque_identity (ctrl_idx, name_idx, child_idx));
+  let w2 = live_words () in
+  let a0 = allocated_words () in
+  let all = Matching.find_structural_matches redex_bg bg in
+  let a1 = allocated_words () in
+  let w3 = live_words () in
+  ignore (Sys.opaque_identity all);
+  (w1 - w0, w3 - w2, a1 -. a0)
 
 let wrap_state (bg : bigraph) : bigraph_with_interface =
   {
@@ -229,12 +181,112 @@ let read_lines (path : string) : string list =
   in
   loop []
 
+(* --------- decode throughput (--decode-iters) --------- *)
+
+(* The per-node decoder Bigraph_codec replaced (one add_node_as_child per
+   node, no interning), kept as the baseline column *)
+let decode_by_add (raw : string) : bigraph =
+  let module R = Bigraph_codec.Api.Reader in
+  let b = R.Bigraph.of_message (Bigraph_codec.message_of_string raw) in
+  let nodes = R.Bigraph.nodes_get_list b in
+  let sig_tbl : (string, control) Hashtbl.t = Hashtbl.create 16 in
+  let node_of n =
+    let cname = R.Node.control_get n in
+    let control =
+      match Hashtbl.find_opt sig_tbl cname with
+      | Some c -> c
+      | None ->
+          let c = create_control cname (R.Node.arity_get_int_exn n) in
+          Hashtbl.add sig_tbl cname c;
+          c
+    in
+    let properties =
+      match R.Node.properties_get_list n with
+      | [] -> None
+      | pls ->
+          Some
+            (List.map
+               (fun p ->
+                 ( R.Property.key_get p,
+                   Bigraph_codec.propvalue_of_capnp (R.Property.value_get p) ))
+               pls)
+    in
+    {
+      id = R.Node.id_get_int_exn n;
+      name = R.Node.name_get n;
+      node_type = R.Node.type_get n;
+      control;
+      ports = List.map Int32.to_int (R.Node.ports_get_list n);
+      properties;
+    }
+  in
+  List.fold_left
+    (fun bg n ->
+      match R.Node.parent_get_int_exn n with
+      | -1 -> add_node_to_root bg (node_of n)
+      | parent -> add_node_as_child bg parent (node_of n))
+    (empty_bigraph []) nodes
+
+(* Decode and re-encode every distinct target graph in the manifest [iters]
+   times, then decode it re-encoded in each bigraph_rpc layout. output CSV:
+     graph_size,bytes,nodes,iters,decode_us,by_add_us,encode_us,nodes_per_s,mb_per_s,
+     v1_bytes,v2_bytes,decode_v1_us,decode_v2_us *)
+let decode_throughput (rows : row list) (iters : int) =
+  printf_csv
+    [ "graph_size"; "bytes"; "nodes"; "iters"; "decode_us"; "by_add_us";
+      "encode_us"; "nodes_per_s"; "mb_per_s"; "v1_bytes"; "v2_bytes";
+      "decode_v1_us"; "decode_v2_us" ];
+  let seen = Hashtbl.create 16 in
+  List.iter
+    (fun r ->
+      if not (Hashtbl.mem seen r.bg_path) then (
+        Hashtbl.add seen r.bg_path ();
+        let raw, _ = read_file_bytes r.bg_path in
+        let gwi = Bigraph_codec.of_string raw in
+        let nodes = NodeMap.cardinal gwi.bigraph.place.nodes in
+        let time f =
+          let t0 = Unix.gettimeofday () in
+          for _ = 1 to iters do
+            ignore (Sys.opaque_identity (f ()))
+          done;
+          (Unix.gettimeofday () -. t0) *. 1e6 /. float iters
+        in
+        let v1 = Bigraph_codec.to_string ~version:1 gwi in
+        let v2 = Bigraph_codec.to_string ~version:2 gwi in
+        let decode_us = time (fun () -> Bigraph_codec.of_string raw) in
+        (* the old decoder only knows the v1 layout *)
+        let by_add_us = time (fun () -> decode_by_add v1) in
+        let encode_us = time (fun () -> Bigraph_codec.to_string gwi) in
+        let per_s us = if us <= 0.0 then 0.0 else 1e6 /. us in
+        let decode_v1_us = time (fun () -> Bigraph_codec.of_string v1) in
+        let decode_v2_us = time (fun () -> Bigraph_codec.of_string v2) in
+        printf_csv
+          [
+            string_of_int r.graph_size;
+            string_of_int (String.length raw);
+            string_of_int nodes;
+            string_of_int iters;
+            Printf.sprintf "%.2f" decode_us;
+            Printf.sprintf "%.2f" by_add_us;
+            Printf.sprintf "%.2f" encode_us;
+            Printf.sprintf "%.0f" (float nodes *. per_s decode_us);
+            Printf.sprintf "%.2f"
+              (float (String.length raw) *. per_s decode_us /. 1e6);
+            string_of_int (String.length v1);
+            string_of_int (String.length v2);
+            Printf.sprintf "%.2f" decode_v1_us;
+            Printf.sprintf "%.2f" decode_v2_us;
+          ]))
+    rows
+
 (* --------- main --------- *)
 
 let () =
   let manifest = ref "artifacts/manifest.csv" in
   let general = ref true in
   let progress_enabled_flag = ref true in
+  let mem = ref false in
+  let decode_iters = ref 0 in
 
   let speclist =
     [
@@ -243,16 +295,31 @@ let () =
       ("--fast", Arg.Clear general, "single-apply (no full enumeration)");
       ("--no-progress", Arg.Clear progress_enabled_flag, "disable prog bar");
       ("--progress", Arg.Set progress_enabled_flag, "enable prog bar");
+      ( "--mem",
+        Arg.Set mem,
+        "record OCaml heap words (Gc.stat) for graph, indexes and match_all" );
+      ( "--decode-iters",
+        Arg.Set_int decode_iters,
+        "N: only time capnp decode/encode of each target graph, N times" );
     ]
   in
   Arg.parse speclist (fun _ -> ()) "bench_apply: load, time, and apply rules";
   progress_enabled := !progress_enabled_flag;
+  let workload = if !general then "general" else "fast" in
+  if !decode_iters > 0 then (
+    (match read_lines !manifest with
+    | [] -> ()
+    | _hdr :: rows ->
+        decode_throughput (List.filter_map parse_manifest_line rows)
+          !decode_iters);
+    exit 0);
 
   printf_csv
     [
       "graph_size";
       "rule";
       "trial";
+      "workload";
       "latency_us";
       "matched";
       "search_us";
@@ -272,6 +339,11 @@ let () =
       "decode_redex_us";
       "read_react_us";
       "decode_react_us";
+      "bg_heap_words";
+      "index_heap_words";
+      "match_all_heap_words";
+      "match_all_alloc_words";
+      "top_heap_words";
     ];
 
   let lines = read_lines !manifest in
@@ -294,16 +366,18 @@ let () =
           let meta_bytes = file_bytes r.meta_path in
 
           let bg_raw, read_bg_us = read_file_bytes r.bg_path in
+          let bg_w0 = if !mem then live_words () else 0 in
           let t0 = now_us () in
-          let bg_gwi = bytes_to_gwi bg_raw in
+          let bg_gwi = Bigraph_codec.of_string bg_raw in
           let t1 = now_us () in
+          let bg_words = if !mem then live_words () - bg_w0 else 0 in
           let decode_bg_us = Int64.sub t1 t0 in
           let load_bg_us = Int64.add read_bg_us decode_bg_us in
           let bg = bg_gwi.bigraph in
 
           let rx_raw, read_redex_us = read_file_bytes r.redex_path in
           let t2 = now_us () in
-          let rx_gwi = bytes_to_gwi rx_raw in
+          let rx_gwi = Bigraph_codec.of_string rx_raw in
           let t3 = now_us () in
           let decode_redex_us = Int64.sub t3 t2 in
           let load_redex_us = Int64.add read_redex_us decode_redex_us in
@@ -311,7 +385,7 @@ let () =
 
           let rt_raw, read_react_us = read_file_bytes r.react_path in
           let t4 = now_us () in
-          let rt_gwi = bytes_to_gwi rt_raw in
+          let rt_gwi = Bigraph_codec.of_string rt_raw in
           let t5 = now_us () in
           let decode_react_us = Int64.sub t5 t4 in
           let load_react_us = Int64.add read_react_us decode_react_us in
@@ -380,31 +454,49 @@ let () =
           in
           let latency_us = Int64.add search_us apply_us in
 
+          let heap =
+            if !mem then
+              let index_words, match_all_words, match_all_alloc =
+                measure_matcher_heap redex.bigraph bg
+              in
+              Some
+                {
+                  bg_words;
+                  index_words;
+                  match_all_words;
+                  match_all_alloc;
+                  top_words = (Gc.quick_stat ()).Gc.top_heap_words;
+                }
+            else None
+          in
+
           printf_csv
-            [
-              string_of_int r.graph_size;
-              rule_name;
-              string_of_int r.trial;
-              Int64.to_string latency_us;
-              string_of_int matched;
-              Int64.to_string search_us;
-              Int64.to_string apply_us;
-              Int64.to_string load_bg_us;
-              Int64.to_string load_redex_us;
-              Int64.to_string load_react_us;
-              Int64.to_string load_meta_us;
-              Int64.to_string create_rule_us;
-              string_of_int bg_bytes;
-              string_of_int redex_bytes;
-              string_of_int react_bytes;
-              string_of_int meta_bytes;
-              Int64.to_string read_bg_us;
-              Int64.to_string decode_bg_us;
-              Int64.to_string read_redex_us;
-              Int64.to_string decode_redex_us;
-              Int64.to_string read_react_us;
-              Int64.to_string decode_react_us;
-            ];
+            ([
+               string_of_int r.graph_size;
+               rule_name;
+               string_of_int r.trial;
+               workload;
+               Int64.to_string latency_us;
+               string_of_int matched;
+               Int64.to_string search_us;
+               Int64.to_string apply_us;
+               Int64.to_string load_bg_us;
+               Int64.to_string load_redex_us;
+               Int64.to_string load_react_us;
+               Int64.to_string load_meta_us;
+               Int64.to_string create_rule_us;
+               string_of_int bg_bytes;
+               string_of_int redex_bytes;
+               string_of_int react_bytes;
+               string_of_int meta_bytes;
+               Int64.to_string read_bg_us;
+               Int64.to_string decode_bg_us;
+               Int64.to_string read_redex_us;
+               Int64.to_string decode_redex_us;
+               Int64.to_string read_react_us;
+               Int64.to_string decode_react_us;
+             ]
+            @ heap_cols_csv heap);
 
           incr processed;
           let label =
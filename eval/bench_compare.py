@@ -0,0 +1,214 @@
+import argparse, csv, math, sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Compare two bench_apply result files (baseline vs candidate) and fail when
+# the candidate is significantly slower.
+#
+#   python eval/bench_make.py --preset quick --outdir artifacts
+#   dune exec eval/bench_apply.exe -- --manifest artifacts/manifest.csv > cand.csv
+#   python eval/bench_compare.py baseline.csv cand.csv --max-slowdown 0.10
+
+Key = Tuple[int, str, str]  # (graph_size, rule, workload)
+
+# bench_make.py corpus presets (kept here, free of capnp, so the gate and its
+# tests can read them); explicit flags still override individual values
+PRESETS = {
+    # small corpus for the regression gate, ~1 min end to end
+    "quick": dict(max_nodes=2000, step=500, trials=5, seed=0),
+}
+
+# ---------- args ----------
+
+def parse_args():
+    ap = argparse.ArgumentParser("Regression gate for bench_apply results")
+    ap.add_argument("baseline", help="baseline results CSV")
+    ap.add_argument("candidate", help="candidate results CSV")
+    ap.add_argument("--metric", default="latency_us", help="column to compare (default latency_us)")
+    ap.add_argument("--alpha", type=float, default=0.01,
+                    help="significance level for the Mann-Whitney U test")
+    ap.add_argument("--max-slowdown", type=float, default=0.10,
+                    help="fail if a series is significantly slower by more than this fraction")
+    ap.add_argument("--max-exponent-delta", type=float, default=0.15,
+                    help="fail if a rule's fitted scaling exponent grows by more than this")
+    ap.add_argument("--min-samples", type=int, default=3,
+                    help="series with fewer samples on either side (or too few for any p "
+                         "below --alpha) are reported but not gated")
+    ap.add_argument("--default-workload", default="general",
+                    help="workload label for files without a workload column")
+    ap.add_argument("--report", default=None, help="optional CSV with the per-series table")
+    return ap.parse_args()
+
+# ---------- loading ----------
+
+def load_series(path: str, metric: str, default_workload: str) -> Dict[Key, List[float]]:
+    series: Dict[Key, List[float]] = defaultdict(list)
+    with open(path, newline="") as f:
+        rd = csv.DictReader(f)
+        if rd.fieldnames is None or metric not in rd.fieldnames:
+            raise SystemExit(f"{path}: missing column {metric!r}")
+        for row in rd:
+            try:
+                v = float(row[metric])
+                n = int(float(row["graph_size"]))
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(v):
+                key = (n, row.get("rule", ""), row.get("workload") or default_workload)
+                series[key].append(v)
+    return series
+
+# ---------- statistics ----------
+
+def median(xs: List[float]) -> float:
+    s = sorted(xs)
+    m = len(s) // 2
+    return s[m] if len(s) % 2 else 0.5 * (s[m - 1] + s[m])
+
+# below this many samples per side the exact null distribution of U is used;
+# the normal approximation cannot reach small p there (5 vs 5: p >= 0.012)
+EXACT_MAX = 20
+
+def u_distribution(n1: int, n2: int) -> List[int]:
+    """Number of orderings of n1 + n2 distinct values giving each U, 0..n1*n2."""
+    # f[j][u] for j values on the second side, built up one first-side value at a time
+    f = [[1] for _ in range(n2 + 1)]
+    for _ in range(n1):
+        g = [[1]]
+        for j in range(1, n2 + 1):
+            # the largest value is on the first side (adds j to U) or the second
+            a, b = f[j], g[j - 1]
+            row = [0] * max(len(a) + j, len(b))
+            for u, c in enumerate(a):
+                row[u + j] += c
+            for u, c in enumerate(b):
+                row[u] += c
+            g.append(row)
+        f = g
+    return f[n2]
+
+def min_p_value(n1: int, n2: int) -> float:
+    """Smallest two-sided p-value mann_whitney_u can return for these sizes."""
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    if n1 <= EXACT_MAX and n2 <= EXACT_MAX:
+        return min(1.0, 2.0 / math.comb(n1 + n2, n1))
+    return 0.0
+
+def mann_whitney_u(a: List[float], b: List[float]) -> float:
+    """Two-sided p-value: exact for small samples without ties, otherwise the
+    normal approximation with tie correction."""
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return float("nan")
+    pooled = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        r = 0.5 * (i + j) + 1.0
+        for k in range(i, j + 1):
+            ranks[k] = r
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    r1 = sum(r for r, (_, side) in zip(ranks, pooled) if side == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2.0
+    if ties == 0 and n1 <= EXACT_MAX and n2 <= EXACT_MAX:
+        dist = u_distribution(n1, n2)
+        u = int(round(u1))
+        tail = min(sum(dist[:u + 1]), sum(dist[u:]))
+        return min(1.0, 2.0 * tail / math.comb(n1 + n2, n1))
+    n = n1 + n2
+    mu = n1 * n2 / 2.0
+    var = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if var <= 0:
+        return 1.0
+    z = (abs(u1 - mu) - 0.5) / math.sqrt(var)
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2.0)))
+
+def loglog_exponent(points: List[Tuple[float, float]]) -> float:
+    pts = [(math.log10(x), math.log10(y)) for x, y in points if x > 0 and y > 0]
+    if len(pts) < 2:
+        return float("nan")
+    mx = sum(x for x, _ in pts) / len(pts)
+    my = sum(y for _, y in pts) / len(pts)
+    sxx = sum((x - mx) ** 2 for x, _ in pts)
+    if sxx == 0:
+        return float("nan")
+    return sum((x - mx) * (y - my) for x, y in pts) / sxx
+
+# ---------- main ----------
+
+def main() -> int:
+    args = parse_args()
+    base = load_series(args.baseline, args.metric, args.default_workload)
+    cand = load_series(args.candidate, args.metric, args.default_workload)
+
+    rows = []
+    failures = []
+    for key in sorted(set(base) | set(cand)):
+        b, c = base.get(key, []), cand.get(key, [])
+        if not b or not c:
+            rows.append([*key, len(b), len(c), "", "", "", "", "missing"])
+            continue
+        mb, mc = median(b), median(c)
+        speedup = mb / mc if mc > 0 else float("inf")
+        p = mann_whitney_u(b, c)
+        # a series that cannot reach alpha at its sample counts is not gated
+        gated = (len(b) >= args.min_samples and len(c) >= args.min_samples
+                 and min_p_value(len(b), len(c)) < args.alpha)
+        significant = gated and p < args.alpha
+        if significant and mc > mb * (1.0 + args.max_slowdown):
+            verdict = "SLOWER"
+            failures.append(f"{key}: {mc:.1f} vs {mb:.1f} ({1 / speedup:.2f}x, p={p:.2g})")
+        elif significant and mc < mb:
+            verdict = "faster"
+        elif significant:
+            verdict = "slower (within threshold)"
+        else:
+            verdict = "same" if gated else "too few samples"
+        rows.append([*key, len(b), len(c), f"{mb:.1f}", f"{mc:.1f}", f"{speedup:.3f}", f"{p:.3g}", verdict])
+
+    # scaling exponents per (rule, workload) over graph_size, using per-size medians
+    exps = []
+    groups = defaultdict(lambda: ([], []))
+    for (n, rule, wl), xs in base.items():
+        groups[(rule, wl)][0].append((n, median(xs)))
+    for (n, rule, wl), xs in cand.items():
+        groups[(rule, wl)][1].append((n, median(xs)))
+    for (rule, wl), (bp, cp) in sorted(groups.items()):
+        kb, kc = loglog_exponent(bp), loglog_exponent(cp)
+        exps.append((rule, wl, kb, kc))
+        if math.isfinite(kb) and math.isfinite(kc) and kc - kb > args.max_exponent_delta:
+            failures.append(f"({rule}, {wl}): scaling exponent {kb:.2f} -> {kc:.2f}")
+
+    hdr = ["graph_size", "rule", "workload", "n_base", "n_cand",
+           f"median_base_{args.metric}", f"median_cand_{args.metric}", "speedup", "p_value", "verdict"]
+    wr = csv.writer(sys.stdout)
+    wr.writerow(hdr)
+    wr.writerows(rows)
+    print()
+    print("rule,workload,exponent_base,exponent_cand")
+    for rule, wl, kb, kc in exps:
+        print(f"{rule},{wl},{kb:.3f},{kc:.3f}")
+
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w", newline="") as f:
+            csv.writer(f).writerows([hdr] + rows)
+
+    if failures:
+        print(f"\n[gate] FAIL: {len(failures)} regression(s)", file=sys.stderr)
+        for msg in failures:
+            print(f"  - {msg}", file=sys.stderr)
+        return 1
+    print("\n[gate] ok", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+(*
+   Cost of diffing two states that differ in a few nodes.
+
+   A synthetic place graph of --nodes nodes (random tree, every node with two
+   properties) is changed in --changes random places: property updates, plus
+   one move, one removal and one addition. The changed state shares every
+   untouched record with the original, as states produced by Matching do.
+
+     journal_us  Bigraph_diff.diff ~ids with the ids the change touched, as
+                 State_store passes from its journal
+     merge_us    Bigraph_diff.diff without ids (one pass over both maps)
+     full_us     comparing every node id with map lookups
+     copy_us     Bigraph_diff.diff against an unshared copy of the changed
+                 state (as if decoded from a file)
+
+   output CSV:
+     nodes,changes,events,journal_us,merge_us,full_us,copy_us,speedup,same
+*)
+
+open Bifrost
+open Bifrost.Bigraph
+
+let now_s () = Unix.gettimeofday ()
+let printf_csv cols = Printf.printf "%s\n%!" (String.concat "," cols)
+let device = create_control "Device" 0
+
+let device_node id =
+  create_node ~name:(Printf.sprintf "dev_%d" id) ~node_type:"Device"
+    ~props:[ ("power", Bool false); ("level", Int 0) ]
+    id device
+
+let graph n : bigraph =
+  List.fold_left
+    (fun bg id ->
+      if id = 0 then add_node_to_root bg (device_node id)
+      else add_node_as_child bg (Random.int id) (device_node id))
+    (empty_bigraph [ device ])
+    (List.init n Fun.id)
+
+let with_place (bg : bigraph) nodes parent_map =
+  { bg with place = { bg.place with nodes; parent_map } }
+
+(* [k] property updates on random nodes, then a move, a removal of the
+   highest id (a leaf: children always have higher ids) and an addition;
+   also returns the ids touched, as a journal would record them *)
+let change (bg : bigraph) n k =
+  let ids = List.init k (fun _ -> 1 + Random.int (n - 2)) in
+  let nodes =
+    List.fold_left
+      (fun m id ->
+        let nd = NodeMap.find id m in
+        NodeMap.add id (set_node_property nd "level" (Int (Random.int 1000))) m)
+      bg.place.nodes ids
+  in
+  let moved = 1 + Random.int (n - 2) in
+  let nodes = NodeMap.remove (n - 1) nodes |> NodeMap.add n (device_node n) in
+  let parent_map =
+    NodeMap.remove (n - 1) bg.place.parent_map
+    |> NodeMap.add moved 0 |> NodeMap.add n (Random.int (n - 1))
+  in
+  (with_place bg nodes parent_map, NodeSet.of_list (moved :: (n - 1) :: n :: ids))
+
+(* the same bindings in freshly built maps and records *)
+let copy (bg : bigraph) =
+  let rebuild f m = NodeMap.fold (fun id v acc -> NodeMap.add id (f v) acc) m NodeMap.empty in
+  with_place bg
+    (rebuild (fun nd -> { nd with id = nd.id }) bg.place.nodes)
+    (rebuild Fun.id bg.place.parent_map)
+
+let keys m acc = NodeMap.fold (fun id _ acc -> NodeSet.add id acc) m acc
+
+let () =
+  let sizes = ref "10000,100000,1000000" in
+  let changes = ref 8 in
+  let speclist =
+    [
+      ("--nodes", Arg.Set_string sizes, "comma-separated graph sizes");
+      ("--changes", Arg.Set_int changes, "property updates per diff (default 8)");
+    ]
+  in
+  Arg.parse speclist (fun _ -> ()) "bench_diff: diff of nearly equal states";
+  let ints s =
+    String.split_on_char ',' s |> List.filter (( <> ) "") |> List.map int_of_string
+  in
+  Random.init 42;
+
+  printf_csv
+    [ "nodes"; "changes"; "events"; "journal_us"; "merge_us"; "full_us"; "copy_us";
+      "speedup"; "same" ];
+  List.iter
+    (fun n ->
+      let a = graph n in
+      let b, touched = change a n !changes in
+      let b' = copy b in
+      let time reps f =
+        let t0 = now_s () in
+        for _ = 1 to reps do
+          ignore (Sys.opaque_identity (f ()))
+        done;
+        (now_s () -. t0) *. 1e6 /. float reps
+      in
+      let all = keys a.place.nodes (keys b.place.nodes NodeSet.empty) in
+      let journal = Bigraph_diff.diff ~ids:touched a b in
+      let full = Bigraph_diff.diff ~ids:all a b in
+      let journal_us = time 1000 (fun () -> Bigraph_diff.diff ~ids:touched a b) in
+      let merge_us = time 3 (fun () -> Bigraph_diff.diff a b) in
+      let full_us = time 3 (fun () -> Bigraph_diff.diff ~ids:all a b) in
+      let copy_us = time 3 (fun () -> Bigraph_diff.diff a b') in
+      printf_csv
+        [
+          string_of_int n;
+          string_of_int !changes;
+          string_of_int (List.length journal);
+          Printf.sprintf "%.2f" journal_us;
+          Printf.sprintf "%.2f" merge_us;
+          Printf.sprintf "%.2f" full_us;
+          Printf.sprintf "%.2f" copy_us;
+          Printf.sprintf "%.1f" (if journal_us > 0.0 then full_us /. journal_us else 0.0);
+          (if journal = full && Bigraph_diff.diff a b = full && Bigraph_diff.diff a b' = full
+           then "1" else "0");
+        ])
+    (ints !sizes)
@@ -1,14 +1,17 @@
-import argparse, random, os, json, csv, pathlib, sys, time
+import argparse, random, os, json, csv, pathlib, sys, time, tracemalloc, resource
+import multiprocessing
 from typing import List, Optional
 from pathlib import Path
 
 sys.path.append(str(pathlib.Path(__file__).parent.parent / "lib"))
 from bigraph_dsl import Bigraph, Node  
+from bench_compare import PRESETS
 
 # ---------- args ----------
 
 def parse_args():
     ap = argparse.ArgumentParser("Export bigraph + rules (CapNP) for OCaml timing (with IO metrics)")
+    ap.add_argument("--preset",    choices=sorted(PRESETS), default=None)
     ap.add_argument("--max-nodes", type=int, default=10000)
     ap.add_argument("--step",      type=int, default=500)
     ap.add_argument("--trials",    type=int, default=30)
@@ -16,15 +19,28 @@ def parse_args():
     ap.add_argument("--outdir",    type=str, default="artifacts")
     ap.add_argument("--manifest",  type=str, default="artifacts/manifest.csv")
     ap.add_argument("--verbose",   action="store_true")
+    ap.add_argument("--mem",       action="store_true",
+                    help="also record Python memory per node (tracemalloc, and peak RSS of a fresh "
+                         "process per graph) to mem_metrics.csv")
+    ap.add_argument("--format",    type=int, choices=(1, 2), default=2,
+                    help="bigraph_rpc layout version for the corpus (default 2)")
+    ap.add_argument("--compare-formats", action="store_true",
+                    help="also save each graph as v1 and v2 and record size and load time to format_metrics.csv")
+    ap.add_argument("--compare-json", action="store_true",
+                    help="also export each graph as nested to_dict JSON and as the streamed flat document "
+                         "and record size, time and peak memory to json_metrics.csv")
+    pre, _ = ap.parse_known_args()
+    if pre.preset:
+        ap.set_defaults(**PRESETS[pre.preset])
     return ap.parse_args()
 
 # ---------- timers / IO ----------
 
 def _us(ns: int) -> float: return ns / 1_000.0
 
-def timed_save_bigraph(path: str, bg: Bigraph) -> tuple[float, int]:
+def timed_save_bigraph(path: str, bg: Bigraph, version: int = 2) -> tuple[float, int]:
     t0 = time.perf_counter_ns()
-    bg.save(path)
+    bg.save(path, version)
     t1 = time.perf_counter_ns()
     sz = Path(path).stat().st_size
     return _us(t1 - t0), sz
@@ -37,6 +53,99 @@ def timed_write_json(path: str, obj: dict) -> tuple[float, int]:
     sz = Path(path).stat().st_size
     return _us(t1 - t0), sz
 
+def compare_formats(n: int, t: int, bg: Bigraph, outdir: str) -> list:
+    """Save bg in both layouts, time a Bigraph.load of each, then delete them."""
+    row = [n, t, sum(count_subtree(r) for r in bg.nodes)]
+    cols = []
+    for version in (1, 2):
+        path = os.path.join(outdir, f"fmt_v{version}_n{n}_t{t}.capnp")
+        save_us, size = timed_save_bigraph(path, bg, version)
+        t0 = time.perf_counter_ns()
+        Bigraph.load(path)
+        cols.append((size, save_us, _us(time.perf_counter_ns() - t0)))
+        os.remove(path)
+    (b1, s1, l1), (b2, s2, l2) = cols
+    return row + [b1, b2, f"{s1:.1f}", f"{s2:.1f}", f"{l1:.1f}", f"{l2:.1f}"]
+
+def compare_json(n: int, t: int, bg: Bigraph, outdir: str) -> list:
+    """Export bg with json.dump(bg.to_dict()) and with Bigraph.write_json;
+    record size, time and tracemalloc peak of each (timed untraced)."""
+    row = [n, t, sum(count_subtree(r) for r in bg.nodes)]
+    cols = []
+    for kind in ("dict", "stream"):
+        path = os.path.join(outdir, f"json_{kind}_n{n}_t{t}.json")
+        def export():
+            if kind == "dict":
+                with open(path, "w") as f:
+                    json.dump(bg.to_dict(), f)
+            else:
+                bg.write_json(path)
+        t0 = time.perf_counter_ns()
+        export()
+        us = _us(time.perf_counter_ns() - t0)
+        _, _, peak = traced(export)
+        cols.append((Path(path).stat().st_size, us, peak))
+        os.remove(path)
+    (db, dus, dpk), (sb, sus, spk) = cols
+    return row + [db, f"{dus:.1f}", dpk, sb, f"{sus:.1f}", spk]
+
+# ---------- memory ----------
+
+def peak_rss_kb() -> int:
+    # VmHWM belongs to the current address space; ru_maxrss survives exec,
+    # so a spawned child would report its parent's peak at fork
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r // 1024 if sys.platform == "darwin" else r
+
+def traced(fn):
+    """Run fn under tracemalloc; return (result, retained_bytes, peak_bytes)."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        out = fn()
+        cur, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return out, cur - base, peak - base
+
+def rss_probe(n: int, t: int, bg_path: str, seed) -> tuple[int, int]:
+    """Generate and load one graph untraced; return (rss_kb before, peak rss_kb).
+    ru_maxrss is a high-water mark for the whole process, so this is only
+    meaningful in a fresh process (see measure_memory)."""
+    base = peak_rss_kb()
+    rng = random.Random(f"{seed}-mem-{n}-{t}")
+    bg, *_ = gen_random_hierarchy(n, "bench_focus", rng)
+    del bg
+    loaded = Bigraph.load(bg_path)
+    del loaded
+    return base, peak_rss_kb()
+
+def measure_memory(n: int, t: int, bg_path: str, seed) -> list:
+    # separate rng so the timed corpus is identical with or without --mem
+    rng = random.Random(f"{seed}-mem-{n}-{t}")
+    (bg, *_), gen_b, gen_peak = traced(lambda: gen_random_hierarchy(n, "bench_focus", rng))
+    nodes = sum(count_subtree(r) for r in bg.nodes)
+    del bg
+    loaded, load_b, load_peak = traced(lambda: Bigraph.load(bg_path))
+    del loaded
+    # RSS from a freshly spawned interpreter per graph, without tracemalloc,
+    # so it is not the running maximum over every size measured so far
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        base_rss, peak_rss = pool.apply(rss_probe, (n, t, bg_path, seed))
+    return [n, t, nodes,
+            gen_b, gen_peak, f"{gen_b / max(1, nodes):.1f}",
+            load_b, load_peak, f"{load_b / max(1, nodes):.1f}",
+            peak_rss, base_rss]
+
 # ---------- constructors ----------
 
 _gid = 10_000_000
@@ -208,14 +317,15 @@ def pp_rule(meta: dict, redex: Bigraph, react: Bigraph, n: int, t: int, prefix:
 
 # ---------- serialization ----------
 
-def save_rule_bundle_timed(outdir: str, n: int, t: int, meta: dict, redex: Bigraph, react: Bigraph, verbose=False):
+def save_rule_bundle_timed(outdir: str, n: int, t: int, meta: dict, redex: Bigraph, react: Bigraph,
+                           verbose=False, version=2):
     rule = meta["name"]
     redex_path = os.path.join(outdir, f"rule_{rule}_n{n}_t{t}_redex.capnp")
     react_path = os.path.join(outdir, f"rule_{rule}_n{n}_t{t}_react.capnp")
     meta_path  = os.path.join(outdir, f"rule_{rule}_n{n}_t{t}.json")
 
-    redex_us, redex_bytes = timed_save_bigraph(redex_path, redex)
-    react_us, react_bytes = timed_save_bigraph(react_path, react)
+    redex_us, redex_bytes = timed_save_bigraph(redex_path, redex, version)
+    react_us, react_bytes = timed_save_bigraph(react_path, react, version)
     meta_us,  meta_bytes  = timed_write_json(meta_path, meta)
 
     if verbose:
@@ -251,6 +361,45 @@ def main():
             "bg_path","rule_redex_path","rule_react_path","rule_meta_path"
         ])
 
+    mem_wr = None
+    if args.mem:
+        mem_metrics_path = Path(args.outdir) / "mem_metrics.csv"
+        new_mem = not mem_metrics_path.exists()
+        memf = open(mem_metrics_path, "a", newline="")
+        mem_wr = csv.writer(memf)
+        if new_mem:
+            mem_wr.writerow([
+                "graph_size","trial","nodes",
+                "gen_bytes","gen_peak_bytes","gen_bytes_per_node",
+                "load_bytes","load_peak_bytes","load_bytes_per_node",
+                "peak_rss_kb","base_rss_kb"
+            ])
+
+    fmt_wr = None
+    if args.compare_formats:
+        fmt_metrics_path = Path(args.outdir) / "format_metrics.csv"
+        new_fmt = not fmt_metrics_path.exists()
+        fmtf = open(fmt_metrics_path, "a", newline="")
+        fmt_wr = csv.writer(fmtf)
+        if new_fmt:
+            fmt_wr.writerow([
+                "graph_size","trial","nodes",
+                "v1_bytes","v2_bytes","v1_save_us","v2_save_us","v1_load_us","v2_load_us"
+            ])
+
+    json_wr = None
+    if args.compare_json:
+        json_metrics_path = Path(args.outdir) / "json_metrics.csv"
+        new_json = not json_metrics_path.exists()
+        jsonf = open(json_metrics_path, "a", newline="")
+        json_wr = csv.writer(jsonf)
+        if new_json:
+            json_wr.writerow([
+                "graph_size","trial","nodes",
+                "dict_bytes","dict_us","dict_peak_bytes",
+                "stream_bytes","stream_us","stream_peak_bytes"
+            ])
+
     with open(manifest_path, "w", newline="") as mf:
         wr = csv.writer(mf)
         wr.writerow(["graph_size","rule","trial","bg_path","rule_redex_path","rule_react_path","rule_meta_path"])
@@ -280,9 +429,15 @@ def main():
                 assert focus_node is not None, "focus not found"
 
                 bg_path = os.path.join(args.outdir, f"bg_n{n}_t{t}.capnp")
-                bg_save_us, bg_bytes = timed_save_bigraph(bg_path, bg)
+                bg_save_us, bg_bytes = timed_save_bigraph(bg_path, bg, args.format)
                 if args.verbose:
                     print(f"Saved bigraph → {bg_path} ({bg_bytes} B in {bg_save_us:.1f} µs)")
+                if mem_wr is not None:
+                    mem_wr.writerow(measure_memory(n, t, bg_path, args.seed))
+                if fmt_wr is not None:
+                    fmt_wr.writerow(compare_formats(n, t, bg, args.outdir))
+                if json_wr is not None:
+                    json_wr.writerow(compare_json(n, t, bg, args.outdir))
 
                 for build in (
                     lambda: build_prop_toggle_rule(root, (r0 if cur_region == 0 else r1), focus_node, focus_power),
@@ -296,7 +451,8 @@ def main():
 
                     (rdx, rct, mta,
                      rdx_us, rct_us, mta_us,
-                     rdx_b,  rct_b,  mta_b) = save_rule_bundle_timed(args.outdir, n, t, meta, redex, react, args.verbose)
+                     rdx_b,  rct_b,  mta_b) = save_rule_bundle_timed(args.outdir, n, t, meta, redex, react,
+                                                     args.verbose, args.format)
 
                     wr.writerow([n, meta["name"], t, bg_path, rdx, rct, mta])
                     io_wr.writerow([n, meta["name"], t,
@@ -310,6 +466,15 @@ def main():
     iof.close()
     print(f"Wrote manifest: {manifest_path}")
     print(f"Wrote IO metrics: {io_metrics_path}")
+    if mem_wr is not None:
+        memf.close()
+        print(f"Wrote memory metrics: {mem_metrics_path}")
+    if fmt_wr is not None:
+        fmtf.close()
+        print(f"Wrote format metrics: {fmt_metrics_path}")
+    if json_wr is not None:
+        jsonf.close()
+        print(f"Wrote JSON metrics: {json_metrics_path}")
 
 if __name__ == "__main__":
     main()
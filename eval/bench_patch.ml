@@ -0,0 +1,114 @@
+(*
+   Bytes and CPU per update: JSON Patch from graph events against a full
+   re-export of the flat JSON document (Bigraph_json).
+
+   A synthetic place graph of --nodes nodes (random tree of Devices with two
+   properties) takes --updates rule applications, each rewriting --touched
+   random devices through Matching.apply_with_mapping. Per update, full_*
+   is Bigraph_json.to_string of the new state and patch_* is
+   Bigraph_json.patch of the application's events, printed with Yojson.
+
+   output CSV:
+     nodes,updates,touched,full_bytes,full_us,patch_bytes,patch_us,
+     bytes_ratio,cpu_ratio
+*)
+
+open Bifrost
+open Bifrost.Bigraph
+
+let now_s () = Unix.gettimeofday ()
+let printf_csv cols = Printf.printf "%s\n%!" (String.concat "," cols)
+let device = create_control "Device" 0
+
+let dev ?(power = false) ?(level = 0) id =
+  create_node ~name:(Printf.sprintf "dev_%d" id) ~node_type:"Device"
+    ~props:[ ("power", Bool power); ("level", Int level) ]
+    id device
+
+let wrap bg =
+  { bigraph = bg; inner = { sites = 0; names = [] }; outer = { sites = 0; names = [] } }
+
+let graph n =
+  wrap
+    (List.fold_left
+       (fun bg id ->
+         if id = 0 then add_node_to_root bg (dev id)
+         else add_node_as_child bg (Random.int id) (dev id))
+       (empty_bigraph [ device ])
+       (List.init n Fun.id))
+
+(* one rule touching [k] devices, pattern nodes 0..k-1, mapped at random *)
+let update (s : bigraph_with_interface) n k step_no =
+  let pattern f =
+    wrap (List.fold_left (fun bg i -> add_node_to_root bg (f i)) (empty_bigraph [ device ])
+            (List.init k Fun.id))
+  in
+  let rule =
+    Matching.create_rule "touch"
+      (pattern (fun i -> { (dev i) with properties = None }))
+      (pattern (fun i -> dev ~power:(step_no mod 2 = 0) ~level:step_no i))
+  in
+  let ids = ref [] in
+  while List.length !ids < k do
+    let id = Random.int n in
+    if not (List.mem id !ids) then ids := id :: !ids
+  done;
+  Matching.apply_with_mapping rule s (List.mapi (fun i id -> (i, id)) !ids)
+
+let () =
+  let sizes = ref "1000,10000,100000" in
+  let updates = ref 200 in
+  let touched = ref 4 in
+  let speclist =
+    [
+      ("--nodes", Arg.Set_string sizes, "comma-separated graph sizes");
+      ("--updates", Arg.Set_int updates, "updates per size (default 200)");
+      ("--touched", Arg.Set_int touched, "devices rewritten per update (default 4)");
+    ]
+  in
+  Arg.parse speclist (fun _ -> ()) "bench_patch: JSON Patch against full export";
+  let ints s =
+    String.split_on_char ',' s |> List.filter (( <> ) "") |> List.map int_of_string
+  in
+  Random.init 42;
+
+  printf_csv
+    [ "nodes"; "updates"; "touched"; "full_bytes"; "full_us"; "patch_bytes";
+      "patch_us"; "bytes_ratio"; "cpu_ratio" ];
+  List.iter
+    (fun n ->
+      let s = ref (graph n) in
+      let full_b = ref 0 and full_s = ref 0.0 in
+      let patch_b = ref 0 and patch_s = ref 0.0 in
+      for i = 1 to !updates do
+        match update !s n !touched i with
+        | None -> ()
+        | Some (s', events) ->
+            let t0 = now_s () in
+            let doc = Bigraph_json.to_string s' in
+            let t1 = now_s () in
+            let ops =
+              Bigraph_json.patch ~before:!s.bigraph ~after:s'.bigraph events
+            in
+            let p = Yojson.Safe.to_string (`List ops) in
+            let t2 = now_s () in
+            full_b := !full_b + String.length doc;
+            full_s := !full_s +. (t1 -. t0);
+            patch_b := !patch_b + String.length p;
+            patch_s := !patch_s +. (t2 -. t1);
+            s := s'
+      done;
+      let per x = x /. float !updates in
+      printf_csv
+        [
+          string_of_int n;
+          string_of_int !updates;
+          string_of_int !touched;
+          Printf.sprintf "%.0f" (per (float !full_b));
+          Printf.sprintf "%.2f" (per !full_s *. 1e6);
+          Printf.sprintf "%.0f" (per (float !patch_b));
+          Printf.sprintf "%.2f" (per !patch_s *. 1e6);
+          Printf.sprintf "%.6f" (float !patch_b /. float (max 1 !full_b));
+          Printf.sprintf "%.6f" (!patch_s /. max 1e-9 !full_s);
+        ])
+    (ints !sizes)
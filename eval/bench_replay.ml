@@ -0,0 +1,165 @@
+(*
+   Sustained-throughput replay of a trace from paper/trace_gen.py.
+
+   All rules are decoded up front; the events are then applied back to back
+   to a single evolving state, so the numbers reflect steady-state matching
+   and rewriting rather than per-rule file I/O.
+
+   output CSV (one row per window, then a "total" row):
+     window,events,applied,skipped,wall_s,apps_per_s,p50_us,p90_us,p99_us,max_us
+*)
+
+open Bifrost
+open Bifrost.Bigraph
+
+let now_s () = Unix.gettimeofday ()
+
+let printf_csv cols = Printf.printf "%s\n%!" (String.concat "," cols)
+
+(* --------- trace --------- *)
+
+type event = { kind : string; rule_path : string }
+
+let read_trace (path : string) : event list =
+  let ic = open_in path in
+  let rec loop acc =
+    match input_line ic with
+    | line -> (
+        match String.split_on_char ',' (String.trim line) with
+        | [ seq; _t_ms; kind; rule_path ] when seq <> "seq" ->
+            loop ({ kind; rule_path } :: acc)
+        | _ -> loop acc)
+    | exception End_of_file ->
+        close_in ic;
+        List.rev acc
+  in
+  loop []
+
+(* --------- apply --------- *)
+
+let apply (rule : Matching.reaction_rule) (state : bigraph_with_interface) =
+  Matching.apply_rule rule state
+
+(* --------- stats --------- *)
+
+let percentile (sorted : float array) (p : float) =
+  let n = Array.length sorted in
+  if n = 0 then 0.0
+  else
+    let k = int_of_float (ceil (p *. float n)) - 1 in
+    sorted.(max 0 (min (n - 1) k))
+
+let window_row label ~events ~applied ~wall (lat : float array) =
+  let sorted = Array.copy lat in
+  Array.sort compare sorted;
+  let us x = Printf.sprintf "%.1f" (x *. 1e6) in
+  printf_csv
+    [
+      label;
+      string_of_int events;
+      string_of_int applied;
+      string_of_int (events - applied);
+      Printf.sprintf "%.6f" wall;
+      Printf.sprintf "%.1f" (if wall > 0.0 then float applied /. wall else 0.0);
+      us (percentile sorted 0.50);
+      us (percentile sorted 0.90);
+      us (percentile sorted 0.99);
+      us (percentile sorted 1.0);
+    ]
+
+(* --------- main --------- *)
+
+let () =
+  let trace = ref "traces/wgb/trace.csv" in
+  let target = ref "" in
+  let window = ref 1000 in
+  let limit = ref 0 in
+
+  let speclist =
+    [
+      ("--trace", Arg.Set_string trace, "path to trace.csv from trace_gen.py");
+      ( "--target",
+        Arg.Set_string target,
+        "initial state (default: target.capnp next to the trace)" );
+      ("--window", Arg.Set_int window, "events per reported window (default 1000)");
+      ("--limit", Arg.Set_int limit, "replay at most this many events");
+    ]
+  in
+  Arg.parse speclist (fun _ -> ()) "bench_replay: sustained rule application";
+
+  let dir = Filename.dirname !trace in
+  let target_path =
+    if !target = "" then Filename.concat dir "target.capnp" else !target
+  in
+  let events = read_trace !trace in
+  let events =
+    if !limit > 0 then List.filteri (fun i _ -> i < !limit) events else events
+  in
+
+  let rules : (string, Matching.reaction_rule) Hashtbl.t = Hashtbl.create 256 in
+  let t_load = now_s () in
+  List.iter
+    (fun e ->
+      if not (Hashtbl.mem rules e.rule_path) then
+        Hashtbl.add rules e.rule_path
+          (Bigraph_codec.load_rule (Filename.concat dir e.rule_path)))
+    events;
+  let state = ref (Bigraph_codec.load_bigraph target_path) in
+  Printf.eprintf "[replay] %d events, %d distinct rules, %d nodes, loaded in %.3fs\n%!"
+    (List.length events) (Hashtbl.length rules)
+    (NodeMap.cardinal !state.bigraph.place.nodes)
+    (now_s () -. t_load);
+
+  printf_csv
+    [
+      "window"; "events"; "applied"; "skipped"; "wall_s"; "apps_per_s";
+      "p50_us"; "p90_us"; "p99_us"; "max_us";
+    ];
+
+  let w = max 1 !window in
+  let lat = Array.make w 0.0 in
+  let all_lat = Array.make (List.length events) 0.0 in
+  let n_win = ref 0 and applied_win = ref 0 and wall_win = ref 0.0 in
+  let applied_total = ref 0 and wall_total = ref 0.0 in
+  let win_idx = ref 0 in
+  let skipped_kinds : (string, int) Hashtbl.t = Hashtbl.create 8 in
+
+  let flush_window () =
+    if !n_win > 0 then (
+      window_row (string_of_int !win_idx) ~events:!n_win ~applied:!applied_win
+        ~wall:!wall_win (Array.sub lat 0 !n_win);
+      incr win_idx;
+      n_win := 0;
+      applied_win := 0;
+      wall_win := 0.0)
+  in
+
+  List.iteri
+    (fun i e ->
+      let rule = Hashtbl.find rules e.rule_path in
+      let t0 = now_s () in
+      let res = apply rule !state in
+      let dt = now_s () -. t0 in
+      (match res with
+      | Some s ->
+          state := s;
+          incr applied_win;
+          incr applied_total
+      | None ->
+          let c = Option.value ~default:0 (Hashtbl.find_opt skipped_kinds e.kind) in
+          Hashtbl.replace skipped_kinds e.kind (c + 1));
+      lat.(!n_win) <- dt;
+      all_lat.(i) <- dt;
+      incr n_win;
+      wall_win := !wall_win +. dt;
+      wall_total := !wall_total +. dt;
+      if !n_win = w then flush_window ())
+    events;
+  flush_window ();
+
+  window_row "total" ~events:(Array.length all_lat) ~applied:!applied_total
+    ~wall:!wall_total all_lat;
+
+  Hashtbl.iter
+    (fun kind c -> Printf.eprintf "[replay] skipped %d %s event(s)\n%!" c kind)
+    skipped_kinds
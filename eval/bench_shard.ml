@@ -0,0 +1,163 @@
+(*
+   Multi-building replay through Shard, against the number of workers.
+
+   The trace is one from paper/trace_gen.py run on a campus from
+   paper/campus.py, so most events are local to one building:
+
+     python paper/campus.py --buildings 16 --floors 4 --out traces/campus/campus.capnp
+     python paper/trace_gen.py --target traces/campus/campus.capnp \
+       --outdir traces/campus --events 20000
+     dune exec eval/bench_shard.exe -- --trace traces/campus/trace.csv
+
+   Rules are decoded up front. workers=0 is the sequential baseline
+   (Matching.apply_rule on one state); its final state is compared with the
+   state merged back from the workers (same = 1 when nodes and parents match).
+
+   output CSV:
+     workers,depth,events,applied,local,spanning,reloads,wall_s,apps_per_s,
+     speedup,same
+*)
+
+open Bifrost
+open Bifrost.Bigraph
+
+let now_s () = Unix.gettimeofday ()
+let printf_csv cols = Printf.printf "%s\n%!" (String.concat "," cols)
+
+let read_trace (path : string) : string list =
+  let ic = open_in path in
+  let rec loop acc =
+    match input_line ic with
+    | line -> (
+        match String.split_on_char ',' (String.trim line) with
+        | [ seq; _t_ms; _kind; rule_path ] when seq <> "seq" ->
+            loop (rule_path :: acc)
+        | _ -> loop acc)
+    | exception End_of_file ->
+        close_in ic;
+        List.rev acc
+  in
+  loop []
+
+let same_place (a : bigraph_with_interface) (b : bigraph_with_interface) =
+  NodeMap.equal ( = ) a.bigraph.place.nodes b.bigraph.place.nodes
+  && NodeMap.equal ( = ) a.bigraph.place.parent_map b.bigraph.place.parent_map
+
+let () =
+  let trace = ref "traces/campus/trace.csv" in
+  let target = ref "" in
+  let workers = ref "0,1,2,4,8" in
+  let depth = ref (-1) in
+  let window = ref 32 in
+  let limit = ref 0 in
+  let speclist =
+    [
+      ("--trace", Arg.Set_string trace, "path to trace.csv from trace_gen.py");
+      ( "--target",
+        Arg.Set_string target,
+        "initial state (default: target.capnp next to the trace)" );
+      ("--workers", Arg.Set_string workers, "comma-separated worker counts (0 = sequential)");
+      ("--depth", Arg.Set_int depth, "cut depth: 0 buildings, 1 levels (default: auto)");
+      ("--window", Arg.Set_int window, "rules in flight per worker (default 32)");
+      ("--limit", Arg.Set_int limit, "replay at most this many events");
+    ]
+  in
+  Arg.parse speclist (fun _ -> ()) "bench_shard: sharded replay throughput";
+
+  let dir = Filename.dirname !trace in
+  let target_path =
+    if !target = "" then Filename.concat dir "target.capnp" else !target
+  in
+  let paths = read_trace !trace in
+  let paths =
+    if !limit > 0 then List.filteri (fun i _ -> i < !limit) paths else paths
+  in
+  let cache = Hashtbl.create 256 in
+  let rules =
+    List.map
+      (fun p ->
+        match Hashtbl.find_opt cache p with
+        | Some r -> r
+        | None ->
+            let r = Bigraph_codec.load_rule (Filename.concat dir p) in
+            Hashtbl.add cache p r;
+            r)
+      paths
+  in
+  let initial = Bigraph_codec.load_bigraph target_path in
+  let n_events = List.length rules in
+  Printf.eprintf "[shard] %d events, %d distinct rules, %d nodes\n%!" n_events
+    (Hashtbl.length cache)
+    (NodeMap.cardinal initial.bigraph.place.nodes);
+
+  let ints s =
+    String.split_on_char ',' s |> List.filter (( <> ) "") |> List.map int_of_string
+  in
+  let counts = ints !workers in
+  let counts = List.sort_uniq compare (0 :: counts) in
+
+  printf_csv
+    [
+      "workers"; "depth"; "events"; "applied"; "local"; "spanning"; "reloads";
+      "wall_s"; "apps_per_s"; "speedup"; "same";
+    ];
+  let baseline = ref None in
+  List.iter
+    (fun k ->
+      let applied = ref 0 in
+      let t0 = now_s () in
+      let final, wall, depth, local, spanning, reloads =
+        if k = 0 then (
+          let state =
+            List.fold_left
+              (fun st rule ->
+                match Matching.apply_rule rule st with
+                | Some s ->
+                    incr applied;
+                    s
+                | None -> st)
+              initial rules
+          in
+          (state, now_s () -. t0, 0, 0, 0, 0))
+        else
+          let depth = if !depth < 0 then None else Some !depth in
+          let sh =
+            Shard.create ~workers:k ?depth ~window:!window
+              ~on_result:(fun _ res -> if Option.is_some res then incr applied)
+              initial
+          in
+          List.iter (fun rule -> ignore (Shard.submit sh rule)) rules;
+          Shard.sync sh;
+          let wall = now_s () -. t0 in
+          let state = Shard.state sh in
+          Shard.close sh;
+          ( state,
+            wall,
+            Shard.depth sh,
+            Array.fold_left ( + ) 0 (Shard.local_counts sh),
+            Shard.spanning sh,
+            Shard.reloads sh )
+      in
+      let rate = if wall > 0.0 then float !applied /. wall else 0.0 in
+      let base_rate, same =
+        match !baseline with
+        | None ->
+            baseline := Some (rate, final);
+            (rate, true)
+        | Some (r, s) -> (r, same_place s final)
+      in
+      printf_csv
+        [
+          string_of_int k;
+          string_of_int depth;
+          string_of_int n_events;
+          string_of_int !applied;
+          string_of_int local;
+          string_of_int spanning;
+          string_of_int reloads;
+          Printf.sprintf "%.6f" wall;
+          Printf.sprintf "%.1f" rate;
+          Printf.sprintf "%.2f" (if base_rate > 0.0 then rate /. base_rate else 0.0);
+          (if same then "1" else "0");
+        ])
+    counts
@@ -0,0 +1,147 @@
+(*
+   Reverse-geocoding cost with Spatial_index, on synthetic coordinates.
+
+   --buildings square footprints (~20 m) are laid out on a jittered grid
+   around Cambridge, plus one "area" polygon per 100 buildings covering a
+   block of them. --queries random points in the same extent are then
+   resolved with:
+     contains  Spatial_index.containing ~kind:"building"
+     nearest   Spatial_index.nearest ~kind:"building"
+     scan      distance to every footprint (what find_nearest_building
+               would need without an index), skipped above --scan-max
+   add_us is an incremental insert of one more building after bulk loading.
+
+   output CSV:
+     buildings,queries,cell,build_ms,add_us,contains_us,nearest_us,scan_us,hits
+*)
+
+open Bifrost
+
+let now_s () = Unix.gettimeofday ()
+let printf_csv cols = Printf.printf "%s\n%!" (String.concat "," cols)
+let lat0 = 52.18
+let lon0 = 0.08
+
+(* 1 m of latitude in degrees *)
+let m = 1.0 /. Spatial_index.m_per_deg
+
+let square ~osm_id ~kind ~lat ~lon ~side =
+  let dlat = side *. m in
+  let dlon = side *. m /. Float.cos (lat *. Float.pi /. 180.0) in
+  let p la lo = { Spatial_index.lat = la; lon = lo } in
+  Spatial_index.footprint ~osm_id ~kind
+    [
+      [|
+        p lat lon;
+        p lat (lon +. dlon);
+        p (lat +. dlat) (lon +. dlon);
+        p (lat +. dlat) lon;
+      |];
+    ]
+
+(* buildings on a sqrt(n) x sqrt(n) grid with 40 m pitch; returns the
+   footprints and the extent's top-right corner *)
+let city n =
+  let side = int_of_float (Float.ceil (Float.sqrt (float n))) in
+  let pitch = 40.0 *. m in
+  let building i =
+    let jitter () = Random.float (10.0 *. m) in
+    let lat = lat0 +. (float (i / side) *. pitch) +. jitter () in
+    let lon = lon0 +. (float (i mod side) *. pitch *. 1.6) +. jitter () in
+    square ~osm_id:(Printf.sprintf "way %d" i) ~kind:"building" ~lat ~lon
+      ~side:(15.0 +. Random.float 10.0)
+  in
+  let areas =
+    List.init (n / 100) (fun a ->
+        let i = a * 100 in
+        square ~osm_id:(Printf.sprintf "relation %d" a) ~kind:"area"
+          ~lat:(lat0 +. (float (i / side) *. pitch))
+          ~lon:(lon0 +. (float (i mod side) *. pitch *. 1.6))
+          ~side:200.0)
+  in
+  ( List.init n building @ areas,
+    (lat0 +. (float side *. pitch), lon0 +. (float side *. pitch *. 1.6)) )
+
+let scan fps ~lat ~lon =
+  let p = { Spatial_index.lat; lon } in
+  List.fold_left
+    (fun best (fp : Spatial_index.footprint) ->
+      if fp.Spatial_index.kind <> "building" then best
+      else
+        let d = Spatial_index.distance_m fp p in
+        match best with Some (_, bd) when bd <= d -> best | _ -> Some (fp, d))
+    None fps
+
+let () =
+  let sizes = ref "1000,10000,100000" in
+  let queries = ref 10000 in
+  let cell = ref 0.001 in
+  let scan_max = ref 10000 in
+  let speclist =
+    [
+      ("--buildings", Arg.Set_string sizes, "comma-separated building counts");
+      ("--queries", Arg.Set_int queries, "lookups per size (default 10000)");
+      ("--cell", Arg.Set_float cell, "grid cell in degrees (default 0.001)");
+      ("--scan-max", Arg.Set_int scan_max, "largest map to run the linear scan on");
+    ]
+  in
+  Arg.parse speclist (fun _ -> ()) "bench_spatial: reverse geocoding cost";
+  let ints s =
+    String.split_on_char ',' s |> List.filter (( <> ) "") |> List.map int_of_string
+  in
+  Random.init 42;
+
+  printf_csv
+    [ "buildings"; "queries"; "cell"; "build_ms"; "add_us"; "contains_us";
+      "nearest_us"; "scan_us"; "hits" ];
+  List.iter
+    (fun n ->
+      let fps, (lat1, lon1) = city n in
+      let t0 = now_s () in
+      let idx = Spatial_index.of_list ~cell:!cell fps in
+      let build = now_s () -. t0 in
+      let t0 = now_s () in
+      Spatial_index.add idx
+        (square ~osm_id:"way new" ~kind:"building" ~lat:lat0 ~lon:lon0
+           ~side:20.0);
+      let add = now_s () -. t0 in
+      let pts =
+        Array.init !queries (fun _ ->
+            ( lat0 +. Random.float (lat1 -. lat0),
+              lon0 +. Random.float (lon1 -. lon0) ))
+      in
+      let time f =
+        let t0 = now_s () in
+        Array.iter f pts;
+        (now_s () -. t0) *. 1e6 /. float !queries
+      in
+      let hits = ref 0 in
+      let contains_us =
+        time (fun (lat, lon) ->
+            match Spatial_index.containing ~kind:"building" idx ~lat ~lon with
+            | Some _ -> incr hits
+            | None -> ())
+      in
+      let nearest_us =
+        time (fun (lat, lon) ->
+            ignore (Spatial_index.nearest ~kind:"building" idx ~lat ~lon))
+      in
+      let scan_us =
+        if n <= !scan_max then
+          Printf.sprintf "%.2f"
+            (time (fun (lat, lon) -> ignore (scan fps ~lat ~lon)))
+        else ""
+      in
+      printf_csv
+        [
+          string_of_int n;
+          string_of_int !queries;
+          Printf.sprintf "%g" !cell;
+          Printf.sprintf "%.2f" (build *. 1e3);
+          Printf.sprintf "%.2f" (add *. 1e6);
+          Printf.sprintf "%.2f" contains_us;
+          Printf.sprintf "%.2f" nearest_us;
+          scan_us;
+          string_of_int !hits;
+        ])
+    (ints !sizes)
@@ -0,0 +1,127 @@
+(*
+   Cost of retaining engine states in State_store.
+
+   A synthetic place graph of --nodes nodes (random tree, every node with two
+   properties) is stepped --versions times; each step rewrites --touched
+   random nodes the way Matching.rewrite does (NodeMap.add of a new record)
+   and is committed with its events. words_per_version is the live heap
+   growth per retained version, against graph_words for a full copy.
+
+   output CSV:
+     nodes,versions,touched,graph_words,words_per_version,copy_ratio,
+     commit_us,diff_journal_us,diff_full_us,revert_us
+*)
+
+open Bifrost
+open Bifrost.Bigraph
+open Bifrost.Bigraph_events
+
+let now_s () = Unix.gettimeofday ()
+let printf_csv cols = Printf.printf "%s\n%!" (String.concat "," cols)
+
+let live_words () =
+  Gc.full_major ();
+  (Gc.stat ()).Gc.live_words
+
+let device = create_control "Device" 0
+
+let graph n : bigraph_with_interface =
+  let bg =
+    List.fold_left
+      (fun bg id ->
+        let nd =
+          create_node ~name:(Printf.sprintf "dev_%d" id) ~node_type:"Device"
+            ~props:[ ("power", Bool false); ("level", Int 0) ]
+            id device
+        in
+        if id = 0 then add_node_to_root bg nd
+        else add_node_as_child bg (Random.int id) nd)
+      (empty_bigraph [ device ])
+      (List.init n Fun.id)
+  in
+  { bigraph = bg; inner = { sites = 0; names = [] }; outer = { sites = 0; names = [] } }
+
+(* one rewrite of [k] random nodes, with the events Matching would emit *)
+let step (s : bigraph_with_interface) n k step_no =
+  let ids = List.init k (fun _ -> Random.int n) in
+  let nodes =
+    List.fold_left
+      (fun m id ->
+        let nd = NodeMap.find id m in
+        NodeMap.add id (set_node_property nd "level" (Int step_no)) m)
+      s.bigraph.place.nodes ids
+  in
+  let events =
+    RuleApplied ("touch", List.map (fun id -> (id, id)) ids)
+    :: List.map (fun id -> PropertyChanged (id, "level", Int step_no)) ids
+  in
+  ( { s with bigraph = { s.bigraph with place = { s.bigraph.place with nodes } } },
+    events )
+
+let () =
+  let sizes = ref "1000,10000,100000" in
+  let versions = ref 1000 in
+  let touched = ref 4 in
+  let speclist =
+    [
+      ("--nodes", Arg.Set_string sizes, "comma-separated graph sizes");
+      ("--versions", Arg.Set_int versions, "versions committed and retained (default 1000)");
+      ("--touched", Arg.Set_int touched, "nodes rewritten per version (default 4)");
+    ]
+  in
+  Arg.parse speclist (fun _ -> ()) "bench_state: cost per retained version";
+  let ints s =
+    String.split_on_char ',' s |> List.filter (( <> ) "") |> List.map int_of_string
+  in
+  Random.init 42;
+
+  printf_csv
+    [ "nodes"; "versions"; "touched"; "graph_words"; "words_per_version";
+      "copy_ratio"; "commit_us"; "diff_journal_us"; "diff_full_us"; "revert_us" ];
+  List.iter
+    (fun n ->
+      let g = graph n in
+      let graph_words = Obj.reachable_words (Obj.repr g) in
+      let store = State_store.create ~keep:!versions g in
+      let w0 = live_words () in
+      let commit_s = ref 0.0 in
+      let s = ref g in
+      for i = 1 to !versions do
+        let s', events = step !s n !touched i in
+        let t0 = now_s () in
+        ignore (State_store.commit ~events store s');
+        commit_s := !commit_s +. (now_s () -. t0);
+        s := s'
+      done;
+      let words = live_words () - w0 in
+      let head = State_store.head store in
+      let back = max 0 (head - 10) in
+      let time reps f =
+        let t0 = now_s () in
+        for _ = 1 to reps do
+          ignore (Sys.opaque_identity (f ()))
+        done;
+        (now_s () -. t0) *. 1e6 /. float reps
+      in
+      let diff_journal_us = time 100 (fun () -> State_store.diff store back head) in
+      let diff_full_us =
+        let a = Option.get (State_store.find store back) in
+        time 10 (fun () -> State_store.diff_states a.bigraph (!s).bigraph)
+      in
+      let revert_us = time 100 (fun () -> State_store.revert store back) in
+      let per_version = float words /. float !versions in
+      printf_csv
+        [
+          string_of_int n;
+          string_of_int !versions;
+          string_of_int !touched;
+          string_of_int graph_words;
+          Printf.sprintf "%.1f" per_version;
+          Printf.sprintf "%.5f" (per_version /. float graph_words);
+          Printf.sprintf "%.2f" (!commit_s *. 1e6 /. float !versions);
+          Printf.sprintf "%.2f" diff_journal_us;
+          Printf.sprintf "%.2f" diff_full_us;
+          Printf.sprintf "%.2f" revert_us;
+        ];
+      ignore (Sys.opaque_identity store))
+    (ints !sizes)
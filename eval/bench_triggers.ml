@@ -0,0 +1,171 @@
+(*
+   Cost of evaluating effect triggers after one rule application, against
+   graph size and number of registered effects.
+
+   The graph is one Building with --rooms Rooms, each holding an STT
+   (active=false) and a Light. Every iteration flips one STT with a rule
+   applied at a known mapping, then evaluates:
+     triggers  Triggers.fire on the application's graph events
+     scan      the previous engine check: index every node before and after
+               (nodes_by_id) and compare STT.active, skipped above
+               --scan-max nodes because it is quadratic
+
+   --effects registers that many triggers in total: one on STT.active, the
+   rest on other (type, property) pairs that never fire.
+
+   output CSV:
+     nodes,effects,iters,fired,triggers_us,scan_us
+*)
+
+open Bifrost
+open Bifrost.Bigraph
+open Bifrost.Utils
+
+let now_s () = Unix.gettimeofday ()
+let printf_csv cols = Printf.printf "%s\n%!" (String.concat "," cols)
+
+let gwi bigraph =
+  {
+    bigraph;
+    inner = { sites = 0; names = [] };
+    outer = { sites = 0; names = [] };
+  }
+
+let building_ctrl = create_control "Building" 0
+let room_ctrl = create_control "Room" 0
+let stt_ctrl = create_control "STT" 0
+let light_ctrl = create_control "Light" 0
+
+(* room i has id 10+3i, its STT 11+3i, its Light 12+3i *)
+let stt_id i = 11 + (3 * i)
+
+let build_graph rooms =
+  let bg = ref (empty_bigraph [ building_ctrl; room_ctrl; stt_ctrl; light_ctrl ]) in
+  bg :=
+    add_node_to_root !bg
+      (create_node ~name:"Building" ~node_type:"Building" 1 building_ctrl);
+  for i = 0 to rooms - 1 do
+    let rid = 10 + (3 * i) in
+    bg :=
+      add_node_as_child !bg 1
+        (create_node ~name:(Printf.sprintf "R%d" i) ~node_type:"Room" rid
+           room_ctrl);
+    bg :=
+      add_node_as_child !bg rid
+        (create_node
+           ~props:[ ("active", Bool false) ]
+           ~name:(Printf.sprintf "STT_%d" i) ~node_type:"STT" (stt_id i)
+           stt_ctrl);
+    bg :=
+      add_node_as_child !bg rid
+        (create_node
+           ~props:[ ("on", Bool false) ]
+           ~name:(Printf.sprintf "Light_%d" i) ~node_type:"Light" (rid + 2)
+           light_ctrl)
+  done;
+  gwi !bg
+
+let flip_rule value : Matching.reaction_rule =
+  let one props =
+    gwi
+      (add_node_to_root (empty_bigraph [ stt_ctrl ])
+         (create_node ~props ~name:"" ~node_type:"STT" 1 stt_ctrl))
+  in
+  {
+    Matching.name = "stt_flip";
+    redex = one [ ("active", Bool (not value)) ];
+    reactum = one [ ("active", Bool value) ];
+  }
+
+(* --------- the previous check (paper/engine.ml maybe_start_stt) --------- *)
+
+let nodes_by_id (bg : bigraph) : (int, node) Hashtbl.t =
+  let tbl = Hashtbl.create 256 in
+  let rec dfs nid =
+    match get_node bg nid with
+    | None -> ()
+    | Some nd ->
+        Hashtbl.replace tbl nid nd;
+        NodeSet.iter dfs (get_children bg nid)
+  in
+  NodeSet.iter dfs (get_root_nodes bg);
+  tbl
+
+let scan_activated ~before ~after =
+  let b = nodes_by_id before in
+  let a = nodes_by_id after in
+  let active nd = get_node_property nd "active" = Some (Bool true) in
+  Hashtbl.fold
+    (fun id nd acc ->
+      acc
+      || nd.node_type = "STT"
+         && active nd
+         && not (match Hashtbl.find_opt b id with Some o -> active o | None -> false))
+    a false
+
+(* --------- main --------- *)
+
+let () =
+  let sizes = ref "100,1000,10000,100000" in
+  let effects = ref "1,100,10000" in
+  let iters = ref 200 in
+  let scan_max = ref 20000 in
+  let speclist =
+    [
+      ("--rooms", Arg.Set_string sizes, "comma-separated room counts (3 nodes each)");
+      ("--effects", Arg.Set_string effects, "comma-separated registered trigger counts");
+      ("--iters", Arg.Set_int iters, "rule applications per configuration (default 200)");
+      ("--scan-max", Arg.Set_int scan_max, "largest graph to run the full scan on");
+    ]
+  in
+  Arg.parse speclist (fun _ -> ()) "bench_triggers: trigger evaluation cost";
+  let ints s = String.split_on_char ',' s |> List.filter (( <> ) "") |> List.map int_of_string in
+
+  printf_csv [ "nodes"; "effects"; "iters"; "fired"; "triggers_us"; "scan_us" ];
+  List.iter
+    (fun rooms ->
+      let g0 = build_graph rooms in
+      let nodes = NodeMap.cardinal g0.bigraph.place.nodes in
+      let on = flip_rule true and off = flip_rule false in
+      List.iter
+        (fun n_effects ->
+          let fired = ref 0 in
+          let reg = Triggers.create () in
+          Triggers.register reg ~name:"stt" ~node_type:"STT" ~property:"active"
+            (Triggers.Became (Bool true)) (fun _ -> incr fired);
+          for k = 1 to n_effects - 1 do
+            Triggers.register reg ~name:(Printf.sprintf "e%d" k)
+              ~node_type:(Printf.sprintf "Type%d" (k mod 97))
+              ~property:(Printf.sprintf "p%d" k) Triggers.Changed ignore
+          done;
+          let state = ref g0 in
+          let t_trig = ref 0.0 and t_scan = ref 0.0 in
+          let scanned = nodes <= !scan_max in
+          for it = 0 to !iters - 1 do
+            let i = it mod rooms in
+            let rule = if it / rooms mod 2 = 0 then on else off in
+            match Matching.apply_with_mapping rule !state [ (1, stt_id i) ] with
+            | None -> failwith "flip rule did not apply"
+            | Some (s, events) ->
+                let t0 = now_s () in
+                ignore
+                  (Triggers.fire reg ~before:!state.bigraph ~after:s.bigraph events);
+                t_trig := !t_trig +. (now_s () -. t0);
+                if scanned then (
+                  let t0 = now_s () in
+                  ignore (scan_activated ~before:!state.bigraph ~after:s.bigraph);
+                  t_scan := !t_scan +. (now_s () -. t0));
+                state := s
+          done;
+          let per t = Printf.sprintf "%.2f" (t *. 1e6 /. float !iters) in
+          printf_csv
+            [
+              string_of_int nodes;
+              string_of_int (Triggers.size reg);
+              string_of_int !iters;
+              string_of_int !fired;
+              per !t_trig;
+              (if scanned then per !t_scan else "");
+            ])
+        (ints !effects))
+    (ints !sizes)
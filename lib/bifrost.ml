@@ -3,5 +3,15 @@ module Matching = Matching
 module Operations = Operations
 module Utils = Utils
 module Bigraph_capnp = Bigraph_capnp
+module Bigraph_codec = Bigraph_codec
+module Osm_index = Osm_index
 module Osm_parser = Osm_parser
 module Osm_entity = Osm_entity
+module Spatial_index = Spatial_index
+module Bigraph_events = Bigraph_events
+module Triggers = Triggers
+module State_store = State_store
+module Shard = Shard
+module Scheduler = Scheduler
+module Bigraph_json = Bigraph_json
+module Bigraph_diff = Bigraph_diff
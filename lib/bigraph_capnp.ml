@@ -104,6 +104,14 @@ module type S = sig
       val names_get : t -> (ro, string, array_t) Capnp.Array.t
       val names_get_list : t -> string list
       val names_get_array : t -> string array
+      val has_osm_ids : t -> bool
+      val osm_ids_get : t -> (ro, string, array_t) Capnp.Array.t
+      val osm_ids_get_list : t -> string list
+      val osm_ids_get_array : t -> string array
+      val has_osm_nodes : t -> bool
+      val osm_nodes_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val osm_nodes_get_list : t -> int32 list
+      val osm_nodes_get_array : t -> int32 array
       val of_message : 'cap message_t -> t
       val of_builder : struct_t builder_t -> t
     end
@@ -310,6 +318,38 @@ module type S = sig
         t -> string array -> (rw, string, array_t) Capnp.Array.t
 
       val names_init : t -> int -> (rw, string, array_t) Capnp.Array.t
+      val has_osm_ids : t -> bool
+      val osm_ids_get : t -> (rw, string, array_t) Capnp.Array.t
+      val osm_ids_get_list : t -> string list
+      val osm_ids_get_array : t -> string array
+
+      val osm_ids_set :
+        t ->
+        (rw, string, array_t) Capnp.Array.t ->
+        (rw, string, array_t) Capnp.Array.t
+
+      val osm_ids_set_list :
+        t -> string list -> (rw, string, array_t) Capnp.Array.t
+
+      val osm_ids_set_array :
+        t -> string array -> (rw, string, array_t) Capnp.Array.t
+
+      val osm_ids_init : t -> int -> (rw, string, array_t) Capnp.Array.t
+      val has_osm_nodes : t -> bool
+      val osm_nodes_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val osm_nodes_get_list : t -> int32 list
+      val osm_nodes_get_array : t -> int32 array
+
+      val osm_nodes_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val osm_nodes_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val osm_nodes_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val osm_nodes_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
       val of_message : rw message_t -> t
       val to_message : t -> rw message_t
       val to_reader : t -> struct_t reader_t
@@ -486,6 +526,87 @@ module MakeRPC (MessageWrapper : Capnp.RPC.S) = struct
       let names_get x = RA_.get_text_list x 1
       let names_get_list x = Capnp.Array.to_list (names_get x)
       let names_get_array x = Capnp.Array.to_array (names_get x)
+      let has_osm_ids x = RA_.has_field x 2
+      let osm_ids_get x = RA_.get_text_list x 2
+      let osm_ids_get_list x = Capnp.Array.to_list (osm_ids_get x)
+      let osm_ids_get_array x = Capnp.Array.to_array (osm_ids_get x)
+      let has_osm_nodes x = RA_.has_field x 3
+      let osm_nodes_get x = RA_.get_int32_list x 3
+      let osm_nodes_get_list x = Capnp.Array.to_list (osm_nodes_get x)
+      let osm_nodes_get_array x = Capnp.Array.to_array (osm_nodes_get x)
+      let version_get x = RA_.get_uint16 ~default:0 x 4
+      let has_strings x = RA_.has_field x 4
+      let strings_get x = RA_.get_text_list x 4
+      let strings_get_list x = Capnp.Array.to_list (strings_get x)
+      let strings_get_array x = Capnp.Array.to_array (strings_get x)
+      let has_node_ids x = RA_.has_field x 5
+      let node_ids_get x = RA_.get_int32_list x 5
+      let node_ids_get_list x = Capnp.Array.to_list (node_ids_get x)
+      let node_ids_get_array x = Capnp.Array.to_array (node_ids_get x)
+      let has_node_controls x = RA_.has_field x 6
+      let node_controls_get x = RA_.get_int32_list x 6
+      let node_controls_get_list x = Capnp.Array.to_list (node_controls_get x)
+      let node_controls_get_array x = Capnp.Array.to_array (node_controls_get x)
+      let has_node_arities x = RA_.has_field x 7
+      let node_arities_get x = RA_.get_int32_list x 7
+      let node_arities_get_list x = Capnp.Array.to_list (node_arities_get x)
+      let node_arities_get_array x = Capnp.Array.to_array (node_arities_get x)
+      let has_node_names x = RA_.has_field x 8
+      let node_names_get x = RA_.get_int32_list x 8
+      let node_names_get_list x = Capnp.Array.to_list (node_names_get x)
+      let node_names_get_array x = Capnp.Array.to_array (node_names_get x)
+      let has_node_types x = RA_.has_field x 9
+      let node_types_get x = RA_.get_int32_list x 9
+      let node_types_get_list x = Capnp.Array.to_list (node_types_get x)
+      let node_types_get_array x = Capnp.Array.to_array (node_types_get x)
+      let has_child_start x = RA_.has_field x 10
+      let child_start_get x = RA_.get_int32_list x 10
+      let child_start_get_list x = Capnp.Array.to_list (child_start_get x)
+      let child_start_get_array x = Capnp.Array.to_array (child_start_get x)
+      let has_port_start x = RA_.has_field x 11
+      let port_start_get x = RA_.get_int32_list x 11
+      let port_start_get_list x = Capnp.Array.to_list (port_start_get x)
+      let port_start_get_array x = Capnp.Array.to_array (port_start_get x)
+      let has_ports x = RA_.has_field x 12
+      let ports_get x = RA_.get_int32_list x 12
+      let ports_get_list x = Capnp.Array.to_list (ports_get x)
+      let ports_get_array x = Capnp.Array.to_array (ports_get x)
+      let has_prop_start x = RA_.has_field x 13
+      let prop_start_get x = RA_.get_int32_list x 13
+      let prop_start_get_list x = Capnp.Array.to_list (prop_start_get x)
+      let prop_start_get_array x = Capnp.Array.to_array (prop_start_get x)
+      let has_prop_keys x = RA_.has_field x 14
+      let prop_keys_get x = RA_.get_int32_list x 14
+      let prop_keys_get_list x = Capnp.Array.to_list (prop_keys_get x)
+      let prop_keys_get_array x = Capnp.Array.to_array (prop_keys_get x)
+      let has_prop_values x = RA_.has_field x 15
+      let prop_values_get x = RA_.get_struct_list x 15
+      let prop_values_get_list x = Capnp.Array.to_list (prop_values_get x)
+      let prop_values_get_array x = Capnp.Array.to_array (prop_values_get x)
+      let has_by_control_start x = RA_.has_field x 16
+      let by_control_start_get x = RA_.get_int32_list x 16
+      let by_control_start_get_list x = Capnp.Array.to_list (by_control_start_get x)
+      let by_control_start_get_array x = Capnp.Array.to_array (by_control_start_get x)
+      let has_by_control x = RA_.has_field x 17
+      let by_control_get x = RA_.get_int32_list x 17
+      let by_control_get_list x = Capnp.Array.to_list (by_control_get x)
+      let by_control_get_array x = Capnp.Array.to_array (by_control_get x)
+      let has_by_name_start x = RA_.has_field x 18
+      let by_name_start_get x = RA_.get_int32_list x 18
+      let by_name_start_get_list x = Capnp.Array.to_list (by_name_start_get x)
+      let by_name_start_get_array x = Capnp.Array.to_array (by_name_start_get x)
+      let has_by_name x = RA_.has_field x 19
+      let by_name_get x = RA_.get_int32_list x 19
+      let by_name_get_list x = Capnp.Array.to_list (by_name_get x)
+      let by_name_get_array x = Capnp.Array.to_array (by_name_get x)
+      let has_by_type_start x = RA_.has_field x 20
+      let by_type_start_get x = RA_.get_int32_list x 20
+      let by_type_start_get_list x = Capnp.Array.to_list (by_type_start_get x)
+      let by_type_start_get_array x = Capnp.Array.to_array (by_type_start_get x)
+      let has_by_type x = RA_.has_field x 21
+      let by_type_get x = RA_.get_int32_list x 21
+      let by_type_get_list x = Capnp.Array.to_list (by_type_get x)
+      let by_type_get_array x = Capnp.Array.to_array (by_type_get x)
       let of_message x = RA_.get_root_struct (RA_.Message.readonly x)
       let of_builder x = Some (RA_.StructStorage.readonly x)
     end
@@ -785,15 +906,357 @@ module MakeRPC (MessageWrapper : Capnp.RPC.S) = struct
         let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
         builder
 
-      let of_message x = BA_.get_root_struct ~data_words:1 ~pointer_words:2 x
+      let has_osm_ids x = BA_.has_field x 2
+      let osm_ids_get x = BA_.get_text_list x 2
+      let osm_ids_get_list x = Capnp.Array.to_list (osm_ids_get x)
+      let osm_ids_get_array x = Capnp.Array.to_array (osm_ids_get x)
+      let osm_ids_set x v = BA_.set_text_list x 2 v
+      let osm_ids_init x n = BA_.init_text_list x 2 n
+
+      let osm_ids_set_list x v =
+        let builder = osm_ids_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let osm_ids_set_array x v =
+        let builder = osm_ids_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_osm_nodes x = BA_.has_field x 3
+      let osm_nodes_get x = BA_.get_int32_list x 3
+      let osm_nodes_get_list x = Capnp.Array.to_list (osm_nodes_get x)
+      let osm_nodes_get_array x = Capnp.Array.to_array (osm_nodes_get x)
+      let osm_nodes_set x v = BA_.set_int32_list x 3 v
+      let osm_nodes_init x n = BA_.init_int32_list x 3 n
+
+      let osm_nodes_set_list x v =
+        let builder = osm_nodes_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let osm_nodes_set_array x v =
+        let builder = osm_nodes_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let version_get x = BA_.get_uint16 ~default:0 x 4
+      let version_set_exn x v = BA_.set_uint16 ~default:0 x 4 v
+      let has_strings x = BA_.has_field x 4
+      let strings_get x = BA_.get_text_list x 4
+      let strings_get_list x = Capnp.Array.to_list (strings_get x)
+      let strings_get_array x = Capnp.Array.to_array (strings_get x)
+      let strings_set x v = BA_.set_text_list x 4 v
+      let strings_init x n = BA_.init_text_list x 4 n
+
+      let strings_set_list x v =
+        let builder = strings_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let strings_set_array x v =
+        let builder = strings_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_node_ids x = BA_.has_field x 5
+      let node_ids_get x = BA_.get_int32_list x 5
+      let node_ids_get_list x = Capnp.Array.to_list (node_ids_get x)
+      let node_ids_get_array x = Capnp.Array.to_array (node_ids_get x)
+      let node_ids_set x v = BA_.set_int32_list x 5 v
+      let node_ids_init x n = BA_.init_int32_list x 5 n
+
+      let node_ids_set_list x v =
+        let builder = node_ids_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let node_ids_set_array x v =
+        let builder = node_ids_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_node_controls x = BA_.has_field x 6
+      let node_controls_get x = BA_.get_int32_list x 6
+      let node_controls_get_list x = Capnp.Array.to_list (node_controls_get x)
+      let node_controls_get_array x = Capnp.Array.to_array (node_controls_get x)
+      let node_controls_set x v = BA_.set_int32_list x 6 v
+      let node_controls_init x n = BA_.init_int32_list x 6 n
+
+      let node_controls_set_list x v =
+        let builder = node_controls_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let node_controls_set_array x v =
+        let builder = node_controls_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_node_arities x = BA_.has_field x 7
+      let node_arities_get x = BA_.get_int32_list x 7
+      let node_arities_get_list x = Capnp.Array.to_list (node_arities_get x)
+      let node_arities_get_array x = Capnp.Array.to_array (node_arities_get x)
+      let node_arities_set x v = BA_.set_int32_list x 7 v
+      let node_arities_init x n = BA_.init_int32_list x 7 n
+
+      let node_arities_set_list x v =
+        let builder = node_arities_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let node_arities_set_array x v =
+        let builder = node_arities_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_node_names x = BA_.has_field x 8
+      let node_names_get x = BA_.get_int32_list x 8
+      let node_names_get_list x = Capnp.Array.to_list (node_names_get x)
+      let node_names_get_array x = Capnp.Array.to_array (node_names_get x)
+      let node_names_set x v = BA_.set_int32_list x 8 v
+      let node_names_init x n = BA_.init_int32_list x 8 n
+
+      let node_names_set_list x v =
+        let builder = node_names_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let node_names_set_array x v =
+        let builder = node_names_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_node_types x = BA_.has_field x 9
+      let node_types_get x = BA_.get_int32_list x 9
+      let node_types_get_list x = Capnp.Array.to_list (node_types_get x)
+      let node_types_get_array x = Capnp.Array.to_array (node_types_get x)
+      let node_types_set x v = BA_.set_int32_list x 9 v
+      let node_types_init x n = BA_.init_int32_list x 9 n
+
+      let node_types_set_list x v =
+        let builder = node_types_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let node_types_set_array x v =
+        let builder = node_types_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_child_start x = BA_.has_field x 10
+      let child_start_get x = BA_.get_int32_list x 10
+      let child_start_get_list x = Capnp.Array.to_list (child_start_get x)
+      let child_start_get_array x = Capnp.Array.to_array (child_start_get x)
+      let child_start_set x v = BA_.set_int32_list x 10 v
+      let child_start_init x n = BA_.init_int32_list x 10 n
+
+      let child_start_set_list x v =
+        let builder = child_start_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let child_start_set_array x v =
+        let builder = child_start_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_port_start x = BA_.has_field x 11
+      let port_start_get x = BA_.get_int32_list x 11
+      let port_start_get_list x = Capnp.Array.to_list (port_start_get x)
+      let port_start_get_array x = Capnp.Array.to_array (port_start_get x)
+      let port_start_set x v = BA_.set_int32_list x 11 v
+      let port_start_init x n = BA_.init_int32_list x 11 n
+
+      let port_start_set_list x v =
+        let builder = port_start_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let port_start_set_array x v =
+        let builder = port_start_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_ports x = BA_.has_field x 12
+      let ports_get x = BA_.get_int32_list x 12
+      let ports_get_list x = Capnp.Array.to_list (ports_get x)
+      let ports_get_array x = Capnp.Array.to_array (ports_get x)
+      let ports_set x v = BA_.set_int32_list x 12 v
+      let ports_init x n = BA_.init_int32_list x 12 n
+
+      let ports_set_list x v =
+        let builder = ports_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let ports_set_array x v =
+        let builder = ports_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_prop_start x = BA_.has_field x 13
+      let prop_start_get x = BA_.get_int32_list x 13
+      let prop_start_get_list x = Capnp.Array.to_list (prop_start_get x)
+      let prop_start_get_array x = Capnp.Array.to_array (prop_start_get x)
+      let prop_start_set x v = BA_.set_int32_list x 13 v
+      let prop_start_init x n = BA_.init_int32_list x 13 n
+
+      let prop_start_set_list x v =
+        let builder = prop_start_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let prop_start_set_array x v =
+        let builder = prop_start_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_prop_keys x = BA_.has_field x 14
+      let prop_keys_get x = BA_.get_int32_list x 14
+      let prop_keys_get_list x = Capnp.Array.to_list (prop_keys_get x)
+      let prop_keys_get_array x = Capnp.Array.to_array (prop_keys_get x)
+      let prop_keys_set x v = BA_.set_int32_list x 14 v
+      let prop_keys_init x n = BA_.init_int32_list x 14 n
+
+      let prop_keys_set_list x v =
+        let builder = prop_keys_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let prop_keys_set_array x v =
+        let builder = prop_keys_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_prop_values x = BA_.has_field x 15
+      let prop_values_get x = BA_.get_struct_list ~data_words:1 ~pointer_words:1 x 15
+      let prop_values_get_list x = Capnp.Array.to_list (prop_values_get x)
+      let prop_values_get_array x = Capnp.Array.to_array (prop_values_get x)
+      let prop_values_set x v = BA_.set_struct_list ~data_words:1 ~pointer_words:1 x 15 v
+      let prop_values_init x n = BA_.init_struct_list ~data_words:1 ~pointer_words:1 x 15 n
+
+      let prop_values_set_list x v =
+        let builder = prop_values_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let prop_values_set_array x v =
+        let builder = prop_values_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_by_control_start x = BA_.has_field x 16
+      let by_control_start_get x = BA_.get_int32_list x 16
+      let by_control_start_get_list x = Capnp.Array.to_list (by_control_start_get x)
+      let by_control_start_get_array x = Capnp.Array.to_array (by_control_start_get x)
+      let by_control_start_set x v = BA_.set_int32_list x 16 v
+      let by_control_start_init x n = BA_.init_int32_list x 16 n
+
+      let by_control_start_set_list x v =
+        let builder = by_control_start_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let by_control_start_set_array x v =
+        let builder = by_control_start_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_by_control x = BA_.has_field x 17
+      let by_control_get x = BA_.get_int32_list x 17
+      let by_control_get_list x = Capnp.Array.to_list (by_control_get x)
+      let by_control_get_array x = Capnp.Array.to_array (by_control_get x)
+      let by_control_set x v = BA_.set_int32_list x 17 v
+      let by_control_init x n = BA_.init_int32_list x 17 n
+
+      let by_control_set_list x v =
+        let builder = by_control_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let by_control_set_array x v =
+        let builder = by_control_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_by_name_start x = BA_.has_field x 18
+      let by_name_start_get x = BA_.get_int32_list x 18
+      let by_name_start_get_list x = Capnp.Array.to_list (by_name_start_get x)
+      let by_name_start_get_array x = Capnp.Array.to_array (by_name_start_get x)
+      let by_name_start_set x v = BA_.set_int32_list x 18 v
+      let by_name_start_init x n = BA_.init_int32_list x 18 n
+
+      let by_name_start_set_list x v =
+        let builder = by_name_start_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let by_name_start_set_array x v =
+        let builder = by_name_start_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_by_name x = BA_.has_field x 19
+      let by_name_get x = BA_.get_int32_list x 19
+      let by_name_get_list x = Capnp.Array.to_list (by_name_get x)
+      let by_name_get_array x = Capnp.Array.to_array (by_name_get x)
+      let by_name_set x v = BA_.set_int32_list x 19 v
+      let by_name_init x n = BA_.init_int32_list x 19 n
+
+      let by_name_set_list x v =
+        let builder = by_name_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let by_name_set_array x v =
+        let builder = by_name_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_by_type_start x = BA_.has_field x 20
+      let by_type_start_get x = BA_.get_int32_list x 20
+      let by_type_start_get_list x = Capnp.Array.to_list (by_type_start_get x)
+      let by_type_start_get_array x = Capnp.Array.to_array (by_type_start_get x)
+      let by_type_start_set x v = BA_.set_int32_list x 20 v
+      let by_type_start_init x n = BA_.init_int32_list x 20 n
+
+      let by_type_start_set_list x v =
+        let builder = by_type_start_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let by_type_start_set_array x v =
+        let builder = by_type_start_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let has_by_type x = BA_.has_field x 21
+      let by_type_get x = BA_.get_int32_list x 21
+      let by_type_get_list x = Capnp.Array.to_list (by_type_get x)
+      let by_type_get_array x = Capnp.Array.to_array (by_type_get x)
+      let by_type_set x v = BA_.set_int32_list x 21 v
+      let by_type_init x n = BA_.init_int32_list x 21 n
+
+      let by_type_set_list x v =
+        let builder = by_type_init x (List.length v) in
+        let () = List.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let by_type_set_array x v =
+        let builder = by_type_init x (Array.length v) in
+        let () = Array.iteri (fun i a -> Capnp.Array.set builder i a) v in
+        builder
+
+      let of_message x = BA_.get_root_struct ~data_words:1 ~pointer_words:22 x
       let to_message x = x.BA_.NM.StructStorage.data.MessageWrapper.Slice.msg
       let to_reader x = Some (RA_.StructStorage.readonly x)
 
       let init_root ?message_size () =
-        BA_.alloc_root_struct ?message_size ~data_words:1 ~pointer_words:2 ()
+        BA_.alloc_root_struct ?message_size ~data_words:1 ~pointer_words:22 ()
 
       let init_pointer ptr =
-        BA_.init_struct_pointer ptr ~data_words:1 ~pointer_words:2
+        BA_.init_struct_pointer ptr ~data_words:1 ~pointer_words:22
     end
 
     module Rule = struct
@@ -804,25 +1267,25 @@ module MakeRPC (MessageWrapper : Capnp.RPC.S) = struct
       let name_get x = BA_.get_text ~default:"" x 0
       let name_set x v = BA_.set_text x 0 v
       let has_redex x = BA_.has_field x 1
-      let redex_get x = BA_.get_struct ~data_words:1 ~pointer_words:2 x 1
+      let redex_get x = BA_.get_struct ~data_words:1 ~pointer_words:22 x 1
 
       let redex_set_reader x v =
-        BA_.set_struct ~data_words:1 ~pointer_words:2 x 1 v
+        BA_.set_struct ~data_words:1 ~pointer_words:22 x 1 v
 
       let redex_set_builder x v =
-        BA_.set_struct ~data_words:1 ~pointer_words:2 x 1 (Some v)
+        BA_.set_struct ~data_words:1 ~pointer_words:22 x 1 (Some v)
 
-      let redex_init x = BA_.init_struct ~data_words:1 ~pointer_words:2 x 1
+      let redex_init x = BA_.init_struct ~data_words:1 ~pointer_words:22 x 1
       let has_reactum x = BA_.has_field x 2
-      let reactum_get x = BA_.get_struct ~data_words:1 ~pointer_words:2 x 2
+      let reactum_get x = BA_.get_struct ~data_words:1 ~pointer_words:22 x 2
 
       let reactum_set_reader x v =
-        BA_.set_struct ~data_words:1 ~pointer_words:2 x 2 v
+        BA_.set_struct ~data_words:1 ~pointer_words:22 x 2 v
 
       let reactum_set_builder x v =
-        BA_.set_struct ~data_words:1 ~pointer_words:2 x 2 (Some v)
+        BA_.set_struct ~data_words:1 ~pointer_words:22 x 2 (Some v)
 
-      let reactum_init x = BA_.init_struct ~data_words:1 ~pointer_words:2 x 2
+      let reactum_init x = BA_.init_struct ~data_words:1 ~pointer_words:22 x 2
       let of_message x = BA_.get_root_struct ~data_words:0 ~pointer_words:3 x
       let to_message x = x.BA_.NM.StructStorage.data.MessageWrapper.Slice.msg
       let to_reader x = Some (RA_.StructStorage.readonly x)
@@ -104,6 +104,87 @@ module type S = sig
       val names_get : t -> (ro, string, array_t) Capnp.Array.t
       val names_get_list : t -> string list
       val names_get_array : t -> string array
+      val has_osm_ids : t -> bool
+      val osm_ids_get : t -> (ro, string, array_t) Capnp.Array.t
+      val osm_ids_get_list : t -> string list
+      val osm_ids_get_array : t -> string array
+      val has_osm_nodes : t -> bool
+      val osm_nodes_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val osm_nodes_get_list : t -> int32 list
+      val osm_nodes_get_array : t -> int32 array
+      val version_get : t -> int
+      val has_strings : t -> bool
+      val strings_get : t -> (ro, string, array_t) Capnp.Array.t
+      val strings_get_list : t -> string list
+      val strings_get_array : t -> string array
+      val has_node_ids : t -> bool
+      val node_ids_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val node_ids_get_list : t -> int32 list
+      val node_ids_get_array : t -> int32 array
+      val has_node_controls : t -> bool
+      val node_controls_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val node_controls_get_list : t -> int32 list
+      val node_controls_get_array : t -> int32 array
+      val has_node_arities : t -> bool
+      val node_arities_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val node_arities_get_list : t -> int32 list
+      val node_arities_get_array : t -> int32 array
+      val has_node_names : t -> bool
+      val node_names_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val node_names_get_list : t -> int32 list
+      val node_names_get_array : t -> int32 array
+      val has_node_types : t -> bool
+      val node_types_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val node_types_get_list : t -> int32 list
+      val node_types_get_array : t -> int32 array
+      val has_child_start : t -> bool
+      val child_start_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val child_start_get_list : t -> int32 list
+      val child_start_get_array : t -> int32 array
+      val has_port_start : t -> bool
+      val port_start_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val port_start_get_list : t -> int32 list
+      val port_start_get_array : t -> int32 array
+      val has_ports : t -> bool
+      val ports_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val ports_get_list : t -> int32 list
+      val ports_get_array : t -> int32 array
+      val has_prop_start : t -> bool
+      val prop_start_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val prop_start_get_list : t -> int32 list
+      val prop_start_get_array : t -> int32 array
+      val has_prop_keys : t -> bool
+      val prop_keys_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val prop_keys_get_list : t -> int32 list
+      val prop_keys_get_array : t -> int32 array
+      val has_prop_values : t -> bool
+      val prop_values_get : t -> (ro, PropertyValue.t, array_t) Capnp.Array.t
+      val prop_values_get_list : t -> PropertyValue.t list
+      val prop_values_get_array : t -> PropertyValue.t array
+      val has_by_control_start : t -> bool
+      val by_control_start_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val by_control_start_get_list : t -> int32 list
+      val by_control_start_get_array : t -> int32 array
+      val has_by_control : t -> bool
+      val by_control_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val by_control_get_list : t -> int32 list
+      val by_control_get_array : t -> int32 array
+      val has_by_name_start : t -> bool
+      val by_name_start_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val by_name_start_get_list : t -> int32 list
+      val by_name_start_get_array : t -> int32 array
+      val has_by_name : t -> bool
+      val by_name_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val by_name_get_list : t -> int32 list
+      val by_name_get_array : t -> int32 array
+      val has_by_type_start : t -> bool
+      val by_type_start_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val by_type_start_get_list : t -> int32 list
+      val by_type_start_get_array : t -> int32 array
+      val has_by_type : t -> bool
+      val by_type_get : t -> (ro, int32, array_t) Capnp.Array.t
+      val by_type_get_list : t -> int32 list
+      val by_type_get_array : t -> int32 array
       val of_message : 'cap message_t -> t
       val of_builder : struct_t builder_t -> t
     end
@@ -310,6 +391,310 @@ module type S = sig
         t -> string array -> (rw, string, array_t) Capnp.Array.t
 
       val names_init : t -> int -> (rw, string, array_t) Capnp.Array.t
+      val has_osm_ids : t -> bool
+      val osm_ids_get : t -> (rw, string, array_t) Capnp.Array.t
+      val osm_ids_get_list : t -> string list
+      val osm_ids_get_array : t -> string array
+
+      val osm_ids_set :
+        t ->
+        (rw, string, array_t) Capnp.Array.t ->
+        (rw, string, array_t) Capnp.Array.t
+
+      val osm_ids_set_list :
+        t -> string list -> (rw, string, array_t) Capnp.Array.t
+
+      val osm_ids_set_array :
+        t -> string array -> (rw, string, array_t) Capnp.Array.t
+
+      val osm_ids_init : t -> int -> (rw, string, array_t) Capnp.Array.t
+      val has_osm_nodes : t -> bool
+      val osm_nodes_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val osm_nodes_get_list : t -> int32 list
+      val osm_nodes_get_array : t -> int32 array
+
+      val osm_nodes_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val osm_nodes_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val osm_nodes_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val osm_nodes_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val version_get : t -> int
+      val version_set_exn : t -> int -> unit
+      val has_strings : t -> bool
+      val strings_get : t -> (rw, string, array_t) Capnp.Array.t
+      val strings_get_list : t -> string list
+      val strings_get_array : t -> string array
+
+      val strings_set :
+        t -> (rw, string, array_t) Capnp.Array.t -> (rw, string, array_t) Capnp.Array.t
+
+      val strings_set_list :
+        t -> string list -> (rw, string, array_t) Capnp.Array.t
+
+      val strings_set_array :
+        t -> string array -> (rw, string, array_t) Capnp.Array.t
+
+      val strings_init : t -> int -> (rw, string, array_t) Capnp.Array.t
+      val has_node_ids : t -> bool
+      val node_ids_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val node_ids_get_list : t -> int32 list
+      val node_ids_get_array : t -> int32 array
+
+      val node_ids_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_ids_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_ids_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_ids_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_node_controls : t -> bool
+      val node_controls_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val node_controls_get_list : t -> int32 list
+      val node_controls_get_array : t -> int32 array
+
+      val node_controls_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_controls_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_controls_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_controls_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_node_arities : t -> bool
+      val node_arities_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val node_arities_get_list : t -> int32 list
+      val node_arities_get_array : t -> int32 array
+
+      val node_arities_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_arities_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_arities_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_arities_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_node_names : t -> bool
+      val node_names_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val node_names_get_list : t -> int32 list
+      val node_names_get_array : t -> int32 array
+
+      val node_names_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_names_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_names_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_names_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_node_types : t -> bool
+      val node_types_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val node_types_get_list : t -> int32 list
+      val node_types_get_array : t -> int32 array
+
+      val node_types_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_types_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_types_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val node_types_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_child_start : t -> bool
+      val child_start_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val child_start_get_list : t -> int32 list
+      val child_start_get_array : t -> int32 array
+
+      val child_start_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val child_start_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val child_start_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val child_start_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_port_start : t -> bool
+      val port_start_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val port_start_get_list : t -> int32 list
+      val port_start_get_array : t -> int32 array
+
+      val port_start_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val port_start_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val port_start_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val port_start_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_ports : t -> bool
+      val ports_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val ports_get_list : t -> int32 list
+      val ports_get_array : t -> int32 array
+
+      val ports_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val ports_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val ports_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val ports_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_prop_start : t -> bool
+      val prop_start_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val prop_start_get_list : t -> int32 list
+      val prop_start_get_array : t -> int32 array
+
+      val prop_start_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val prop_start_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val prop_start_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val prop_start_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_prop_keys : t -> bool
+      val prop_keys_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val prop_keys_get_list : t -> int32 list
+      val prop_keys_get_array : t -> int32 array
+
+      val prop_keys_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val prop_keys_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val prop_keys_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val prop_keys_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_prop_values : t -> bool
+      val prop_values_get : t -> (rw, PropertyValue.t, array_t) Capnp.Array.t
+      val prop_values_get_list : t -> PropertyValue.t list
+      val prop_values_get_array : t -> PropertyValue.t array
+
+      val prop_values_set :
+        t -> (rw, PropertyValue.t, array_t) Capnp.Array.t -> (rw, PropertyValue.t, array_t) Capnp.Array.t
+
+      val prop_values_set_list :
+        t -> PropertyValue.t list -> (rw, PropertyValue.t, array_t) Capnp.Array.t
+
+      val prop_values_set_array :
+        t -> PropertyValue.t array -> (rw, PropertyValue.t, array_t) Capnp.Array.t
+
+      val prop_values_init : t -> int -> (rw, PropertyValue.t, array_t) Capnp.Array.t
+      val has_by_control_start : t -> bool
+      val by_control_start_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val by_control_start_get_list : t -> int32 list
+      val by_control_start_get_array : t -> int32 array
+
+      val by_control_start_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_control_start_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_control_start_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_control_start_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_by_control : t -> bool
+      val by_control_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val by_control_get_list : t -> int32 list
+      val by_control_get_array : t -> int32 array
+
+      val by_control_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_control_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_control_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_control_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_by_name_start : t -> bool
+      val by_name_start_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val by_name_start_get_list : t -> int32 list
+      val by_name_start_get_array : t -> int32 array
+
+      val by_name_start_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_name_start_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_name_start_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_name_start_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_by_name : t -> bool
+      val by_name_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val by_name_get_list : t -> int32 list
+      val by_name_get_array : t -> int32 array
+
+      val by_name_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_name_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_name_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_name_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_by_type_start : t -> bool
+      val by_type_start_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val by_type_start_get_list : t -> int32 list
+      val by_type_start_get_array : t -> int32 array
+
+      val by_type_start_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_type_start_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_type_start_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_type_start_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
+      val has_by_type : t -> bool
+      val by_type_get : t -> (rw, int32, array_t) Capnp.Array.t
+      val by_type_get_list : t -> int32 list
+      val by_type_get_array : t -> int32 array
+
+      val by_type_set :
+        t -> (rw, int32, array_t) Capnp.Array.t -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_type_set_list :
+        t -> int32 list -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_type_set_array :
+        t -> int32 array -> (rw, int32, array_t) Capnp.Array.t
+
+      val by_type_init : t -> int -> (rw, int32, array_t) Capnp.Array.t
       val of_message : rw message_t -> t
       val to_message : t -> rw message_t
       val to_reader : t -> struct_t reader_t
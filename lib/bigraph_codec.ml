@@ -0,0 +1,408 @@
+(** Cap'n Proto <-> Bigraph, shared by the bridge, the engine and the eval
+    drivers.
+
+    Decoding reads the nodes once into arrays, sorts them by id and builds
+    [nodes] and [parent_map] bottom-up from the sorted runs, instead of one
+    [add_node_as_child] (two lookups, two O(log n) path copies and a bigraph
+    record copy) per node. Strings are shared per message, so a graph of
+    thousands of "Room" nodes holds one "Room" string: v2 files carry them as
+    a string table, v1 strings are interned as they are read.
+
+    Both layouts of bigraph_rpc.capnp load; v2 (columnar, breadth first,
+    see the schema) is written unless [~version:1] is asked for.
+
+    Properties are decoded eagerly: [node.properties] is a plain
+    [properties option] in Bigraph's public type, matched on and compared
+    structurally by Matching and Triggers, so it cannot hold a suspension. *)
+
+open Bigraph
+module Api = Bigraph_capnp.Make (Capnp.BytesMessage)
+
+(* --------- decoding --------- *)
+
+let propvalue_of_capnp (pv : Api.Reader.PropertyValue.t) : property_value =
+  match Api.Reader.PropertyValue.get pv with
+  | Api.Reader.PropertyValue.BoolVal b -> Bool b
+  | Api.Reader.PropertyValue.IntVal i -> Int (Int32.to_int i)
+  | Api.Reader.PropertyValue.FloatVal f -> Float f
+  | Api.Reader.PropertyValue.StringVal s -> String s
+  | Api.Reader.PropertyValue.ColorVal c ->
+      let r = Api.Reader.PropertyValue.ColorVal.r_get c in
+      let g = Api.Reader.PropertyValue.ColorVal.g_get c in
+      let b = Api.Reader.PropertyValue.ColorVal.b_get c in
+      Color (r, g, b)
+  | Api.Reader.PropertyValue.Undefined _ -> String ""
+
+let intern (tbl : (string, string) Hashtbl.t) s =
+  match Hashtbl.find_opt tbl s with
+  | Some s' -> s'
+  | None ->
+      Hashtbl.add tbl s s;
+      s
+
+(* A balanced map over keys.(lo..hi-1), sorted ascending and distinct. The
+   halves are built first and joined with one union over disjoint ranges,
+   which touches O(log^2) nodes per join and O(n) in total, rather than an
+   O(log n) path copy for every key. *)
+let map_of_sorted (keys : int array) (vals : 'a array) lo hi : 'a NodeMap.t =
+  let rec build lo hi =
+    match hi - lo with
+    | 0 -> NodeMap.empty
+    | 1 -> NodeMap.singleton keys.(lo) vals.(lo)
+    | _ ->
+        let mid = (lo + hi) / 2 in
+        let left = NodeMap.add keys.(mid) vals.(mid) (build lo mid) in
+        NodeMap.union (fun _ a _ -> Some a) left (build (mid + 1) hi)
+  in
+  build lo hi
+
+let control_of sig_tbl name arity =
+  match Hashtbl.find_opt sig_tbl name with
+  | Some c -> c
+  | None ->
+      let c = create_control name arity in
+      Hashtbl.add sig_tbl name c;
+      c
+
+(* v1: one Node struct per node, strings inline *)
+let nodes_v1 sig_tbl (b : Api.Reader.Bigraph.t) : (node * node_id) array =
+  let strings = Hashtbl.create 64 in
+  Array.map
+    (fun cn ->
+      let cname = intern strings (Api.Reader.Node.control_get cn) in
+      let properties =
+        match Api.Reader.Node.properties_get_list cn with
+        | [] -> None
+        | pls ->
+            Some
+              (List.map
+                 (fun p ->
+                   ( intern strings (Api.Reader.Property.key_get p),
+                     propvalue_of_capnp (Api.Reader.Property.value_get p) ))
+                 pls)
+      in
+      ( {
+          id = Api.Reader.Node.id_get_int_exn cn;
+          name = Api.Reader.Node.name_get cn;
+          node_type = intern strings (Api.Reader.Node.type_get cn);
+          control =
+            control_of sig_tbl cname (Api.Reader.Node.arity_get_int_exn cn);
+          ports = List.map Int32.to_int (Api.Reader.Node.ports_get_list cn);
+          properties;
+        },
+        Api.Reader.Node.parent_get_int_exn cn ))
+    (Api.Reader.Bigraph.nodes_get_array b)
+
+(* v2: breadth-first columns over a shared string table; parents come from
+   the childStart ranges *)
+let nodes_v2 sig_tbl (b : Api.Reader.Bigraph.t) : (node * node_id) array =
+  let module R = Api.Reader.Bigraph in
+  let ints a = Array.map Int32.to_int a in
+  let strings = R.strings_get_array b in
+  let ids = ints (R.node_ids_get_array b) in
+  let controls = ints (R.node_controls_get_array b) in
+  let arities = ints (R.node_arities_get_array b) in
+  let names = ints (R.node_names_get_array b) in
+  let types = ints (R.node_types_get_array b) in
+  let child_start = ints (R.child_start_get_array b) in
+  let port_start = ints (R.port_start_get_array b) in
+  let ports = ints (R.ports_get_array b) in
+  let prop_start = ints (R.prop_start_get_array b) in
+  let prop_keys = ints (R.prop_keys_get_array b) in
+  let prop_values = R.prop_values_get_array b in
+  let n = Array.length ids in
+  if
+    Array.length child_start <> n + 1
+    || Array.length port_start <> n + 1
+    || Array.length prop_start <> n + 1
+  then failwith "Malformed v2 bigraph: offset sections do not match nodes";
+  let parents = Array.make n (-1) in
+  for i = 0 to n - 1 do
+    for c = child_start.(i) to child_start.(i + 1) - 1 do
+      parents.(c) <- ids.(i)
+    done
+  done;
+  Array.init n (fun i ->
+      let p0 = prop_start.(i) and p1 = prop_start.(i + 1) in
+      let properties =
+        if p0 = p1 then None
+        else
+          Some
+            (List.init (p1 - p0) (fun j ->
+                 ( strings.(prop_keys.(p0 + j)),
+                   propvalue_of_capnp prop_values.(p0 + j) )))
+      in
+      ( {
+          id = ids.(i);
+          name = strings.(names.(i));
+          node_type = strings.(types.(i));
+          control = control_of sig_tbl strings.(controls.(i)) arities.(i);
+          ports =
+            List.init
+              (port_start.(i + 1) - port_start.(i))
+              (fun j -> ports.(port_start.(i) + j));
+          properties;
+        },
+        parents.(i) ))
+
+(** Reads either layout; the v2 lookup sections are not needed here since
+    Bigraph keeps no indexes of its own *)
+let decode_bigraph (b : Api.Reader.Bigraph.t) : bigraph_with_interface =
+  let sig_tbl : (string, control) Hashtbl.t = Hashtbl.create 16 in
+  let decoded =
+    match Api.Reader.Bigraph.version_get b with
+    | 0 | 1 -> nodes_v1 sig_tbl b
+    | 2 -> nodes_v2 sig_tbl b
+    | v -> failwith (Printf.sprintf "Unsupported bigraph layout version %d" v)
+  in
+  let n = Array.length decoded in
+  Array.stable_sort
+    (fun ((x : node), _) ((y : node), _) -> Int.compare x.id y.id)
+    decoded;
+  let ids = Array.map (fun ((nd : node), _) -> nd.id) decoded in
+  for i = 1 to n - 1 do
+    if ids.(i) = ids.(i - 1) then
+      failwith (Printf.sprintf "Duplicate node id %d" ids.(i))
+  done;
+  let nodes = map_of_sorted ids (Array.map fst decoded) 0 n in
+  (* children of a parent, in id order, so parent_map is sorted too *)
+  let child_ids = Array.make n 0 and parents = Array.make n 0 in
+  let k = ref 0 in
+  Array.iter
+    (fun ((nd : node), parent) ->
+      if parent <> -1 then (
+        if not (NodeMap.mem parent nodes) then
+          failwith ("Parent node " ^ string_of_int parent ^ " does not exist");
+        child_ids.(!k) <- nd.id;
+        parents.(!k) <- parent;
+        incr k))
+    decoded;
+  let parent_map = map_of_sorted child_ids parents 0 !k in
+  let signature = Hashtbl.to_seq_values sig_tbl |> List.of_seq in
+  let empty = empty_bigraph signature in
+  {
+    bigraph = { empty with place = { empty.place with nodes; parent_map } };
+    inner =
+      {
+        sites = Api.Reader.Bigraph.site_count_get_int_exn b;
+        names = Api.Reader.Bigraph.names_get_list b;
+      };
+    outer = { sites = 0; names = [] };
+  }
+
+(** The osm_id index saved with an OSM graph; empty for other graphs *)
+let decode_osm_index (b : Api.Reader.Bigraph.t) : Osm_index.t =
+  Osm_index.of_arrays
+    (Api.Reader.Bigraph.osm_ids_get_array b)
+    (Array.map Int32.to_int (Api.Reader.Bigraph.osm_nodes_get_array b))
+
+let decode_rule (rr : Api.Reader.Rule.t) : Matching.reaction_rule =
+  Matching.create_rule
+    (Api.Reader.Rule.name_get rr)
+    (decode_bigraph (Api.Reader.Rule.redex_get rr))
+    (decode_bigraph (Api.Reader.Rule.reactum_get rr))
+
+let message_of_string ?(what = "message") (raw : string) =
+  let stream = Capnp.Codecs.FramedStream.of_string ~compression:`None raw in
+  match Capnp.Codecs.FramedStream.get_next_frame stream with
+  | Ok msg -> msg
+  | Error _ -> failwith ("Failed to decode Cap'n Proto from " ^ what)
+
+let read_message (path : string) =
+  message_of_string ~what:path (In_channel.with_open_bin path In_channel.input_all)
+
+let of_string (raw : string) : bigraph_with_interface =
+  decode_bigraph (Api.Reader.Bigraph.of_message (message_of_string raw))
+
+let load_bigraph_indexed (path : string) : bigraph_with_interface * Osm_index.t =
+  let r = Api.Reader.Bigraph.of_message (read_message path) in
+  (decode_bigraph r, decode_osm_index r)
+
+let load_bigraph (path : string) : bigraph_with_interface =
+  decode_bigraph (Api.Reader.Bigraph.of_message (read_message path))
+
+let load_rule (path : string) : Matching.reaction_rule =
+  decode_rule (Api.Reader.Rule.of_message (read_message path))
+
+(* --------- encoding --------- *)
+
+(* Children of each parent in id order, from one pass over parent_map rather
+   than a parent_map scan per node; and the roots in id order *)
+let children_of (bg : bigraph) : node_id -> node_id list =
+  let children = Hashtbl.create (NodeMap.cardinal bg.place.parent_map) in
+  NodeMap.fold
+    (fun child parent () ->
+      Hashtbl.replace children parent
+        (child :: Option.value (Hashtbl.find_opt children parent) ~default:[]))
+    bg.place.parent_map ();
+  fun nid -> List.rev (Option.value (Hashtbl.find_opt children nid) ~default:[])
+
+let roots_of (bg : bigraph) : node_id list =
+  NodeMap.fold
+    (fun nid _ acc -> if NodeMap.mem nid bg.place.parent_map then acc else nid :: acc)
+    bg.place.nodes []
+  |> List.rev
+
+(* v1 order, parents first: each root, then its subtree depth first *)
+let flatten_nodes_with_parents (bg : bigraph) : (node_id * node_id * node) list =
+  let kids = children_of bg in
+  let rec dfs acc parent nid =
+    match NodeMap.find_opt nid bg.place.nodes with
+    | None -> acc
+    | Some nd -> List.fold_left (fun a c -> dfs a nid c) ((nid, parent, nd) :: acc) (kids nid)
+  in
+  List.fold_left (fun acc r -> dfs acc (-1) r) [] (roots_of bg) |> List.rev
+
+(* v2 order, breadth first, with the childStart offsets: the children of
+   order.(i) are order.(start.(i)) .. order.(start.(i+1) - 1) *)
+let breadth_first (bg : bigraph) : node array * int array =
+  let kids = children_of bg in
+  let order = Array.make (NodeMap.cardinal bg.place.nodes) 0 in
+  let len = ref 0 in
+  let push nid =
+    if NodeMap.mem nid bg.place.nodes then (
+      order.(!len) <- nid;
+      incr len)
+  in
+  List.iter push (roots_of bg);
+  let start = ref [] in
+  let i = ref 0 in
+  while !i < !len do
+    start := !len :: !start;
+    List.iter push (kids order.(!i));
+    incr i
+  done;
+  ( Array.init !len (fun i -> NodeMap.find order.(i) bg.place.nodes),
+    Array.of_list (List.rev (!len :: !start)) )
+
+let set_propvalue (pv : Api.Builder.PropertyValue.t) = function
+  | Bool b -> Api.Builder.PropertyValue.bool_val_set pv b
+  | Int n -> Api.Builder.PropertyValue.int_val_set_int_exn pv n
+  | Float f -> Api.Builder.PropertyValue.float_val_set pv f
+  | String s -> Api.Builder.PropertyValue.string_val_set pv s
+  | Color (r, g, b) ->
+      let c = Api.Builder.PropertyValue.color_val_init pv in
+      Api.Builder.PropertyValue.ColorVal.r_set_exn c r;
+      Api.Builder.PropertyValue.ColorVal.g_set_exn c g;
+      Api.Builder.PropertyValue.ColorVal.b_set_exn c b
+
+let encode_v1 (root : Api.Builder.Bigraph.t) (bg : bigraph) =
+  let flat = flatten_nodes_with_parents bg in
+  let nodes_arr = Api.Builder.Bigraph.nodes_init root (List.length flat) in
+  List.iteri
+    (fun i (id, parent, nd) ->
+      let cn = Capnp.Array.get nodes_arr i in
+      Api.Builder.Node.id_set_int_exn cn id;
+      Api.Builder.Node.control_set cn nd.control.name;
+      Api.Builder.Node.arity_set_int_exn cn nd.control.arity;
+      Api.Builder.Node.parent_set_int_exn cn parent;
+      Api.Builder.Node.name_set cn nd.name;
+      Api.Builder.Node.type_set cn nd.node_type;
+      ignore
+        (Api.Builder.Node.ports_set_list cn (List.map Int32.of_int nd.ports));
+      let props = match nd.properties with None -> [] | Some ps -> ps in
+      let props_arr = Api.Builder.Node.properties_init cn (List.length props) in
+      List.iteri
+        (fun j (k, v) ->
+          let p = Capnp.Array.get props_arr j in
+          Api.Builder.Property.key_set p k;
+          set_propvalue (Api.Builder.Property.value_init p) v)
+        props)
+    flat
+
+(* Node positions grouped by string index: a counting sort of [col] *)
+let lookup_section (col : int array) (nstrings : int) : int array * int array =
+  let start = Array.make (nstrings + 1) 0 in
+  Array.iter (fun s -> start.(s + 1) <- start.(s + 1) + 1) col;
+  for s = 0 to nstrings - 1 do
+    start.(s + 1) <- start.(s + 1) + start.(s)
+  done;
+  let next = Array.sub start 0 nstrings in
+  let nodes = Array.make (Array.length col) 0 in
+  Array.iteri
+    (fun i s ->
+      nodes.(next.(s)) <- i;
+      next.(s) <- next.(s) + 1)
+    col;
+  (start, nodes)
+
+let encode_v2 ~lookup (root : Api.Builder.Bigraph.t) (bg : bigraph) =
+  let module B = Api.Builder.Bigraph in
+  let set f a = ignore (f root (Array.map Int32.of_int a)) in
+  let nodes, child_start = breadth_first bg in
+  let n = Array.length nodes in
+  let table = Hashtbl.create 64 and strings = ref [] in
+  let intern s =
+    match Hashtbl.find_opt table s with
+    | Some i -> i
+    | None ->
+        let i = Hashtbl.length table in
+        Hashtbl.add table s i;
+        strings := s :: !strings;
+        i
+  in
+  let controls = Array.map (fun (nd : node) -> intern nd.control.name) nodes in
+  let names = Array.map (fun (nd : node) -> intern nd.name) nodes in
+  let types = Array.map (fun nd -> intern nd.node_type) nodes in
+  let offsets f =
+    let start = Array.make (n + 1) 0 in
+    Array.iteri (fun i nd -> start.(i + 1) <- start.(i) + f nd) nodes;
+    start
+  in
+  let props nd = Option.value nd.properties ~default:[] in
+  let port_start = offsets (fun nd -> List.length nd.ports) in
+  let prop_start = offsets (fun nd -> List.length (props nd)) in
+  let all_props = Array.of_list (List.concat_map props (Array.to_list nodes)) in
+  let prop_keys = Array.map (fun (k, _) -> intern k) all_props in
+  B.version_set_exn root 2;
+  ignore (B.strings_set_list root (List.rev !strings));
+  set B.node_ids_set_array (Array.map (fun nd -> nd.id) nodes);
+  set B.node_controls_set_array controls;
+  set B.node_arities_set_array (Array.map (fun nd -> nd.control.arity) nodes);
+  set B.node_names_set_array names;
+  set B.node_types_set_array types;
+  set B.child_start_set_array child_start;
+  set B.port_start_set_array port_start;
+  set B.ports_set_array
+    (Array.of_list (List.concat_map (fun nd -> nd.ports) (Array.to_list nodes)));
+  set B.prop_start_set_array prop_start;
+  set B.prop_keys_set_array prop_keys;
+  let values = B.prop_values_init root (Array.length all_props) in
+  Array.iteri (fun i (_, v) -> set_propvalue (Capnp.Array.get values i) v) all_props;
+  if lookup then (
+    let nstrings = Hashtbl.length table in
+    let section set_start set_nodes col =
+      let start, positions = lookup_section col nstrings in
+      set set_start start;
+      set set_nodes positions
+    in
+    section B.by_control_start_set_array B.by_control_set_array controls;
+    section B.by_name_start_set_array B.by_name_set_array names;
+    section B.by_type_start_set_array B.by_type_set_array types)
+
+(** Write [gwi] in the given layout (default 2); [lookup] adds the optional
+    v2 by-control/name/type sections *)
+let encode_bigraph ?(version = 2) ?(lookup = true) ?(osm_index = Osm_index.empty)
+    (root : Api.Builder.Bigraph.t) (gwi : bigraph_with_interface) : unit =
+  Api.Builder.Bigraph.site_count_set root (Int32.of_int gwi.inner.sites);
+  ignore (Api.Builder.Bigraph.names_set_list root gwi.inner.names);
+  if Osm_index.cardinal osm_index > 0 then (
+    let keys, ids = Osm_index.to_arrays osm_index in
+    ignore (Api.Builder.Bigraph.osm_ids_set_array root keys);
+    ignore
+      (Api.Builder.Bigraph.osm_nodes_set_array root (Array.map Int32.of_int ids)));
+  match version with
+  | 1 -> encode_v1 root gwi.bigraph
+  | 2 -> encode_v2 ~lookup root gwi.bigraph
+  | v -> invalid_arg (Printf.sprintf "Bigraph_codec: no layout version %d" v)
+
+let to_string ?version ?lookup ?osm_index (gwi : bigraph_with_interface) :
+    string =
+  let root = Api.Builder.Bigraph.init_root ~message_size:4096 () in
+  encode_bigraph ?version ?lookup ?osm_index root gwi;
+  Capnp.Codecs.serialize ~compression:`None (Api.Builder.Bigraph.to_message root)
+
+let write_bigraph ?version ?lookup ?osm_index (gwi : bigraph_with_interface)
+    (path : string) : unit =
+  let bytes = to_string ?version ?lookup ?osm_index gwi in
+  Out_channel.with_open_bin path (fun oc -> output_string oc bytes)
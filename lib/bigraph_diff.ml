@@ -0,0 +1,85 @@
+(** Graph diff between two states, by node id
+
+    Changes come out as graph events in node id order: NodeAdded,
+    NodeRemoved, NodeMoved for a new parent, PropertyChanged for values
+    that are new or differ and PropertyRemoved for keys that are gone.
+    Replaying them on [a] gives the nodes and parents of [b], except the
+    parents of added nodes. A node that changed name, type, control or
+    ports is removed and added again (then moved, if its parent changed).
+
+    A diff is as cheap as the set of ids it has to compare. States that
+    follow one another through Matching know theirs: the ids named in the
+    rule events (State_store.touched_of_events, or State_store's journal
+    across versions). Pass them as [ids] and the diff costs a few map
+    lookups per changed node. Without them both maps are compared in one
+    pass in key order. That is linear in the graph size but skips records
+    the two states share. *)
+
+open Bigraph
+open Bigraph_events
+
+(* --------- candidates --------- *)
+
+(* Add to [acc] the keys bound in only one of [a] and [b], or to physically
+   different values: one pass over both maps in key order, with no lookups.
+   Entries that Matching did not rewrite are still the same records, so
+   only the rewritten ones reach [node_changes]. *)
+let changed_keys (a : 'a NodeMap.t) (b : 'a NodeMap.t) acc =
+  let rec go na nb acc =
+    match (na, nb) with
+    | Seq.Nil, Seq.Nil -> acc
+    | Seq.Cons ((k, _), ta), Seq.Nil -> go (ta ()) Seq.Nil (NodeSet.add k acc)
+    | Seq.Nil, Seq.Cons ((k, _), tb) -> go Seq.Nil (tb ()) (NodeSet.add k acc)
+    | Seq.Cons ((ka, da), ta), Seq.Cons ((kb, db), tb) ->
+        if ka = kb then go (ta ()) (tb ()) (if da == db then acc else NodeSet.add ka acc)
+        else if ka < kb then go (ta ()) nb (NodeSet.add ka acc)
+        else go na (tb ()) (NodeSet.add kb acc)
+  in
+  if a == b then acc else go (NodeMap.to_seq a ()) (NodeMap.to_seq b ()) acc
+
+(** Ids whose node or parent may differ between [a] and [b] *)
+let candidates (a : bigraph) (b : bigraph) : NodeSet.t =
+  changed_keys a.place.nodes b.place.nodes NodeSet.empty
+  |> changed_keys a.place.parent_map b.place.parent_map
+
+(* --------- events --------- *)
+
+(* Events turning node [id] of [a] into node [id] of [b] *)
+let node_changes (a : bigraph) (b : bigraph) id acc =
+  match (NodeMap.find_opt id a.place.nodes, NodeMap.find_opt id b.place.nodes) with
+  | None, None -> acc
+  | Some _, None -> NodeRemoved id :: acc
+  | None, Some nb -> NodeAdded nb :: acc
+  | Some na, Some nb ->
+      let parent = NodeMap.find_opt id b.place.parent_map in
+      let moved = NodeMap.find_opt id a.place.parent_map <> parent in
+      let move acc = if moved then NodeMoved (id, parent) :: acc else acc in
+      let before = Option.value na.properties ~default:[] in
+      let after = Option.value nb.properties ~default:[] in
+      if na == nb then move acc
+      else if
+        na.name <> nb.name || na.node_type <> nb.node_type
+        || na.control <> nb.control || na.ports <> nb.ports
+      then move (NodeAdded nb :: NodeRemoved id :: acc)
+      else
+        let acc =
+          List.fold_left
+            (fun acc (k, v) ->
+              match List.assoc_opt k before with
+              | Some v' when v' = v -> acc
+              | _ -> PropertyChanged (id, k, v) :: acc)
+            (move acc) after
+        in
+        List.fold_left
+          (fun acc (k, _) ->
+            if List.mem_assoc k after then acc else PropertyRemoved (id, k) :: acc)
+          acc before
+
+(** Graph events that turn [a] into [b]. [ids], when given, must contain
+    every node that may differ (e.g. from a journal of the rules applied in
+    between); otherwise they are found by [candidates]. *)
+let diff ?ids (a : bigraph) (b : bigraph) : graph_event list =
+  if a == b then []
+  else
+    let ids = match ids with Some s -> s | None -> candidates a b in
+    NodeSet.fold (node_changes a b) ids [] |> List.rev
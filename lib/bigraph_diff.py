@@ -0,0 +1,133 @@
+"""Graph diff between two Bigraph states, by node id (mirrors lib/bigraph_diff.ml).
+
+Changes come out as graph events in node id order, as dicts shaped like
+Bigraph_events.serialize_graph_event: NodeAdded, NodeRemoved, NodeMoved for a
+new parent, PropertyChanged for property values that are new or differ and
+PropertyRemoved for keys that are gone. Replaying them on a gives b, except
+the parents of added nodes. A node that changed name, type, control or ports
+is removed and added again (then moved, if its parent changed).
+
+Both trees are walked together from the roots, pairing children by id. A
+pair of subtrees is skipped whole when it is the same Node object (states
+built from one another by copying only the changed path share the rest), or
+when the two subtrees hash equal. Hashing a tree is O(n), so pass the same
+`hashes` dict to every diff against one baseline: its hashes are kept (for
+the life of the process, as they use Python's hash) and each later diff pays
+only for the subtrees of the other state that it has not seen. Children that
+find no partner with their id are flattened, and an id found on both sides
+is a move.
+"""
+
+def _hash(node, hashes):
+    """Hash of the subtree at node: its fields and its children's hashes."""
+    hit = hashes.get(id(node))
+    if hit is not None and hit[0] is node:
+        return hit[1]
+    h = hash((node.id, node.control, node.arity, node.name, node.node_type,
+              tuple(node.ports),
+              tuple((k, type(v), v) for k, v in sorted(node.properties.items())),
+              tuple(_hash(c, hashes) for c in node.children)))
+    hashes[id(node)] = (node, h)   # keep node alive so id(node) is not reused
+    return h
+
+def _same_value(a, b):
+    return type(a) is type(b) and a == b
+
+def _value(v):
+    return list(v) if isinstance(v, tuple) else v
+
+def node_added(n):
+    return {"type": "NodeAdded", "node": n.id, "name": n.name, "node_type": n.node_type,
+            "control": n.control, "arity": n.arity,
+            "properties": {k: _value(v) for k, v in n.properties.items()},
+            "ports": list(n.ports)}
+
+def node_removed(nid):
+    return {"type": "NodeRemoved", "node_id": nid}
+
+def property_changed(nid, key, value):
+    return {"type": "PropertyChanged", "node_id": nid, "key": key, "value": _value(value)}
+
+def property_removed(nid, key):
+    return {"type": "PropertyRemoved", "node_id": nid, "key": key}
+
+def node_moved(nid, parent):
+    return {"type": "NodeMoved", "node_id": nid, "parent": None if parent < 0 else parent}
+
+def _node_changes(na, nb, parent, out):
+    """Events turning node na into nb (same id), appended to out as (id, event).
+    parent is nb's parent id (-1 for a root) if it moved, else None."""
+    nid = na.id
+    if (na.name != nb.name or na.node_type != nb.node_type
+            or na.control != nb.control or na.arity != nb.arity
+            or list(na.ports) != list(nb.ports)):
+        out.append((nid, node_removed(nid)))
+        out.append((nid, node_added(nb)))
+        if parent is not None:
+            out.append((nid, node_moved(nid, parent)))
+        return
+    if parent is not None:
+        out.append((nid, node_moved(nid, parent)))
+    if na is nb:
+        return
+    before, after = na.properties, nb.properties
+    for k, v in after.items():
+        if k not in before or not _same_value(before[k], v):
+            out.append((nid, property_changed(nid, k, v)))
+    out.extend((nid, property_removed(nid, k)) for k in before if k not in after)
+
+def _flatten(node, parent, into):
+    stack = [(node, parent)]
+    while stack:
+        n, p = stack.pop()
+        into[n.id] = (n, p)
+        stack.extend((c, n.id) for c in n.children)
+
+def diff(a, b, *, hashes=None):
+    """Graph events (dicts) that turn Bigraph a into Bigraph b. `hashes`, when
+    given, caches subtree hashes across calls (see the module docstring)."""
+    if a is b:
+        return []
+    out = []
+    gone, new = {}, {}      # unpaired nodes: id -> (node, parent id)
+    pairs = [(a.nodes, b.nodes, -1)]
+    while pairs:
+        xs, ys, parent = pairs.pop()
+        by_id = {x.id: x for x in xs}
+        for y in ys:
+            x = by_id.pop(y.id, None)
+            if x is None:
+                _flatten(y, parent, new)
+                continue
+            if x is y:
+                continue
+            if hashes is not None and _hash(x, hashes) == _hash(y, hashes):
+                continue
+            _node_changes(x, y, None, out)
+            if x.children or y.children:
+                pairs.append((x.children, y.children, x.id))
+        for x in by_id.values():
+            _flatten(x, parent, gone)
+    for nid, (x, px) in gone.items():
+        if nid in new:
+            y, py = new.pop(nid)
+            if x is not y or px != py:
+                _node_changes(x, y, py if px != py else None, out)
+        else:
+            out.append((nid, node_removed(nid)))
+    out.extend((nid, node_added(y)) for nid, (y, _) in new.items())
+    # stable: a node's events keep their order (NodeRemoved before NodeAdded)
+    out.sort(key=lambda e: e[0])
+    return [e for _, e in out]
+
+
+if __name__ == "__main__":
+    import argparse, json, sys
+    from bigraph_dsl import Bigraph
+
+    ap = argparse.ArgumentParser(description="Graph events turning one Bigraph file into another")
+    ap.add_argument("before")
+    ap.add_argument("after")
+    args = ap.parse_args()
+    for ev in diff(Bigraph.load(args.before), Bigraph.load(args.after)):
+        sys.stdout.write(json.dumps(ev) + "\n")
@@ -1,4 +1,4 @@
-import capnp, pathlib, json
+import capnp, pathlib, json, math
 capnp.remove_import_hook()
 bigraph_capnp = capnp.load(str(pathlib.Path(__file__).with_name("bigraph_rpc.capnp")))
 import pathlib
@@ -98,6 +98,7 @@ class Bigraph:
         self.nodes = nodes or []
         self.sites = sites
         self.names = names or []
+        self.index = None       # NodeIndex of the file as loaded (v2 only)
 
     # --- helpers ---------------------------------------------------- #
     def _flatten_nodes(self):
@@ -112,68 +113,37 @@ class Bigraph:
             visit(r, -1)
         return flat
 
+    def records(self):
+        """Flat (id, control, arity, parent, name, type, ports, properties) tuples, parents first."""
+        return [(n.id, n.control, n.arity, parent, n.name, n.node_type, n.ports, n.properties)
+                for n, parent in self._flatten_nodes()]
+
+    def iter_records(self):
+        """The records of `records`, in the same order, one at a time."""
+        stack = [(r, -1) for r in reversed(self.nodes)]
+        while stack:
+            n, parent = stack.pop()
+            yield (n.id, n.control, n.arity, parent, n.name, n.node_type, n.ports, n.properties)
+            stack.extend((c, n.id) for c in reversed(n.children))
+
     # ---------------------------------------------------------------- #
-    def to_capnp(self):
-        bg = bigraph_capnp.Bigraph.new_message()
-        flat_nodes = self._flatten_nodes()
-        nodes_msg = bg.init("nodes", len(flat_nodes))
-
-        for i, (node, parent) in enumerate(flat_nodes):
-            n = nodes_msg[i]
-            n.id      = node.id
-            n.control = node.control
-            n.arity   = node.arity
-            n.parent  = parent
-            n.name    = node.name
-            n.type    = node.node_type
-
-            # ports
-            ports = n.init("ports", len(node.ports))
-            for j,p in enumerate(node.ports): ports[j] = p
-
-            # properties
-            if node.properties:
-                props = n.init("properties", len(node.properties))
-                for j,(k,v) in enumerate(node.properties.items()):
-                    prop = props[j]
-                    prop.key = k
-                    if   isinstance(v,bool):   prop.value.boolVal   = v
-                    elif isinstance(v,int):    prop.value.intVal    = v
-                    elif isinstance(v,float):  prop.value.floatVal  = v
-                    elif isinstance(v,str):    prop.value.stringVal = v
-                    elif (isinstance(v,tuple) and len(v)==3):
-                        prop.value.colorVal.r, prop.value.colorVal.g, prop.value.colorVal.b = v
-
-        bg.siteCount = self.sites
-        names = bg.init("names", len(self.names))
-        for i,nm in enumerate(self.names): names[i] = nm
-        return bg
+    def to_capnp(self, version=2):
+        return records_to_capnp(self.records(), sites=self.sites, names=self.names,
+                                version=version)
 
     @classmethod
     def load(cls, path):
+        """Read a v1 or v2 Bigraph message. A v2 file with lookup sections also
+        sets `bg.index` (a NodeIndex); otherwise it is None."""
         with open(path, "rb") as f:
             msg = bigraph_capnp.Bigraph.read(f)
+        if msg.version == 2:
+            return cls._from_v2(msg)
         nodes_raw = msg.nodes
         id_to_node = {}
         children_map = {}
         for n in nodes_raw:
-            # Extract properties
-            props = {}
-            for p in n.properties:
-                key = p.key
-                value = p.value
-                which = value.which()
-                if which == 'boolVal':
-                    props[key] = value.boolVal
-                elif which == 'intVal':
-                    props[key] = value.intVal
-                elif which == 'floatVal':
-                    props[key] = value.floatVal
-                elif which == 'stringVal':
-                    props[key] = value.stringVal
-                elif which == 'colorVal':
-                    props[key] = (value.colorVal.r, value.colorVal.g, value.colorVal.b)
-                    
+            props = {p.key: _get_value(p.value) for p in n.properties}
             node = Node(
                 control=n.control,
                 id=n.id,
@@ -195,7 +165,35 @@ class Bigraph:
 
         root_nodes = [id_to_node[nid] for nid in children_map.get(-1, [])]
         return Bigraph(nodes=root_nodes, sites=msg.siteCount, names=[n for n in msg.names])
-    
+
+    @classmethod
+    def _from_v2(cls, msg):
+        # breadth-first columns: children are contiguous, so each children
+        # list is a slice of the node list and no id lookups are needed
+        strings = list(msg.strings)
+        cs, ps, qs = list(msg.childStart), list(msg.portStart), list(msg.propStart)
+        ports, keys = list(msg.ports), list(msg.propKeys)
+        values = [_get_value(v) for v in msg.propValues]
+        nodes = [
+            Node(strings[c], id=nid, arity=a,
+                 ports=ports[ps[i]:ps[i + 1]],
+                 properties={strings[keys[j]]: values[j] for j in range(qs[i], qs[i + 1])},
+                 name=strings[nm], node_type=strings[t])
+            for i, (nid, c, a, nm, t) in enumerate(zip(
+                msg.nodeIds, msg.nodeControls, msg.nodeArities, msg.nodeNames, msg.nodeTypes))
+        ]
+        for i, n in enumerate(nodes):
+            n.children = nodes[cs[i]:cs[i + 1]]
+        bg = Bigraph(nodes=nodes[:cs[0]] if cs else [],
+                     sites=msg.siteCount, names=list(msg.names))
+        if len(msg.byControlStart):
+            bg.index = NodeIndex(strings, nodes, {
+                "control": (list(msg.byControlStart), list(msg.byControl)),
+                "name":    (list(msg.byNameStart), list(msg.byName)),
+                "type":    (list(msg.byTypeStart), list(msg.byType)),
+            })
+        return bg
+
     def add_node(self, node, parent=None):
         """Add a node to the bigraph. If parent is None, it becomes a root."""
         if parent is None:
@@ -245,12 +243,211 @@ class Bigraph:
             "nodes": [node.to_dict() for node in self.nodes]
         }
     
+    def write_json(self, dest, chunk=256):
+        """Write the flat JSON document (see write_records_json) to a path or
+        text file straight from the node tree; to_dict builds the nested
+        form in memory instead."""
+        if hasattr(dest, "write"):
+            write_records_json(dest, self.iter_records(), sites=self.sites,
+                               names=self.names, chunk=chunk)
+            return
+        with open(dest, "w") as fp:
+            write_records_json(fp, self.iter_records(), sites=self.sites,
+                               names=self.names, chunk=chunk)
+
     # ---------------------------------------------------------------- #
-    def save(self, path):
+    def save(self, path, version=2):
         with open(path, "wb") as fp:
-            self.to_capnp().write(fp)
+            self.to_capnp(version).write(fp)
         print(f"Saved bigraph → {path}")
 
+# ------------------------------------------------------------------ #
+class NodeIndex:
+    """Lookups from a v2 file's by-control/name/type sections.
+
+    It describes the graph as loaded: nodes added or moved afterwards are
+    not reflected, so use it before editing the tree (or not at all).
+    """
+    def __init__(self, strings, nodes, sections):
+        self._sid = {s: i for i, s in enumerate(strings)}
+        self._nodes = nodes
+        self._sections = sections
+
+    def lookup(self, kind, value):
+        """Nodes whose `kind` ("control", "name" or "type") equals value."""
+        s = self._sid.get(value)
+        if s is None:
+            return []
+        start, positions = self._sections[kind]
+        return [self._nodes[p] for p in positions[start[s]:start[s + 1]]]
+
+# ------------------------------------------------------------------ #
+# Bulk encoding from flat node records
+#
+# Generators that produce hundreds of thousands of nodes can emit records
+# directly (see Bigraph.records for the tuple layout) instead of keeping a
+# Node tree alive; the message is sized once and filled in a single pass.
+
+def _get_value(value):
+    which = value.which()
+    if which == 'colorVal':
+        return (value.colorVal.r, value.colorVal.g, value.colorVal.b)
+    return getattr(value, which)
+
+def _set_value(value, v):
+    if   isinstance(v,bool):   value.boolVal   = v
+    elif isinstance(v,int):    value.intVal    = v
+    elif isinstance(v,float):  value.floatVal  = v
+    elif isinstance(v,str):    value.stringVal = v
+    elif (isinstance(v,tuple) and len(v)==3):
+        # a union struct member has to be initialised before its fields are set
+        c = value.init("colorVal")
+        c.r, c.g, c.b = v
+
+def records_to_capnp(records, *, sites=0, names=None, version=2, lookup=True):
+    """Encode a sequence of node records into a Bigraph message (layout v2 by
+    default; `lookup` adds its by-control/name/type sections)."""
+    names = names or []
+    bg = bigraph_capnp.Bigraph.new_message()
+    bg.siteCount = sites
+    nl = bg.init("names", len(names))
+    for i,nm in enumerate(names): nl[i] = nm
+    if version == 1:
+        _fill_v1(bg, records)
+    elif version == 2:
+        _fill_v2(bg, records, lookup)
+    else:
+        raise ValueError(f"no bigraph layout version {version}")
+    return bg
+
+def _fill_v1(bg, records):
+    records = records if isinstance(records, list) else list(records)
+    nodes_msg = bg.init("nodes", len(records))
+
+    for i, (nid, control, arity, parent, name, node_type, ports, props) in enumerate(records):
+        n = nodes_msg[i]
+        n.id      = nid
+        n.control = control
+        n.arity   = arity
+        n.parent  = parent
+        n.name    = name
+        n.type    = node_type
+
+        if ports:
+            pl = n.init("ports", len(ports))
+            for j,p in enumerate(ports): pl[j] = p
+
+        if props:
+            pl = n.init("properties", len(props))
+            for j,(k,v) in enumerate(props.items()):
+                pl[j].key = k
+                _set_value(pl[j].value, v)
+
+def _lookup_section(col, nstrings):
+    """Counting sort of node positions by string index -> (start, positions)."""
+    start = [0] * (nstrings + 1)
+    for s in col: start[s + 1] += 1
+    for s in range(nstrings): start[s + 1] += start[s]
+    nxt, positions = start[:-1], [0] * len(col)
+    for i, s in enumerate(col):
+        positions[nxt[s]] = i
+        nxt[s] += 1
+    return start, positions
+
+def _fill_v2(bg, records, lookup):
+    kids = {}
+    for r in records:
+        kids.setdefault(r[3], []).append(r)
+    # breadth first: node i's children land at order[child_start[i]:child_start[i+1]]
+    order, child_start = list(kids.get(-1, [])), []
+    i = 0
+    while i < len(order):
+        child_start.append(len(order))
+        order.extend(kids.get(order[i][0], ()))
+        i += 1
+    child_start.append(len(order))
+    if len(order) != sum(map(len, kids.values())):
+        raise ValueError("records have parents that are not in the graph")
+
+    table = {}
+    def sid(s): return table.setdefault(s, len(table))
+    controls = [sid(r[1]) for r in order]
+    names    = [sid(r[4]) for r in order]
+    types    = [sid(r[5]) for r in order]
+    port_start, prop_start, ports, keys, values = [0], [0], [], [], []
+    for r in order:
+        ports.extend(r[6] or ())
+        port_start.append(len(ports))
+        for k, v in (r[7] or {}).items():
+            keys.append(sid(k)); values.append(v)
+        prop_start.append(len(keys))
+
+    bg.version      = 2
+    bg.strings      = list(table)
+    bg.nodeIds      = [r[0] for r in order]
+    bg.nodeControls = controls
+    bg.nodeArities  = [r[2] for r in order]
+    bg.nodeNames    = names
+    bg.nodeTypes    = types
+    bg.childStart   = child_start
+    bg.portStart    = port_start
+    bg.ports        = ports
+    bg.propStart    = prop_start
+    bg.propKeys     = keys
+    pv = bg.init("propValues", len(values))
+    for j, v in enumerate(values): _set_value(pv[j], v)
+    if lookup:
+        for field, col in (("Control", controls), ("Name", names), ("Type", types)):
+            start, positions = _lookup_section(col, len(table))
+            setattr(bg, f"by{field}Start", start)
+            setattr(bg, f"by{field}", positions)
+
+def save_records(path, records, *, sites=0, names=None, version=2):
+    with open(path, "wb") as fp:
+        records_to_capnp(records, sites=sites, names=names, version=version).write(fp)
+
+# ------------------------------------------------------------------ #
+# Flat JSON export
+#
+# The document OCaml's Bigraph_json writes and patches:
+#   {"sites": n, "names": [...], "nodes": {"<id>": {"node": id, "name": ...,
+#    "node_type": ..., "control": ..., "arity": n, "properties": {...},
+#    "ports": [...], "parent": id | null}}}
+# Nodes are keyed by id so JSON Patch paths (/nodes/<id>/properties/<key>)
+# stay valid as the tree changes. Each node is rendered straight to text.
+
+_json_str = json.encoder.encode_basestring_ascii
+
+def _json_value(v):
+    if v is True:  return "true"
+    if v is False: return "false"
+    if isinstance(v, int):   return int.__repr__(v)
+    if isinstance(v, float): return float.__repr__(v) if math.isfinite(v) else "null"
+    if isinstance(v, str):   return _json_str(v)
+    if isinstance(v, tuple): return "[" + ",".join(map(str, v)) + "]"
+    return json.dumps(v)
+
+def _node_json(rec):
+    nid, control, arity, parent, name, ntype, ports, props = rec
+    ps = ",".join(_json_str(k) + ":" + _json_value(v) for k, v in props.items()) if props else ""
+    return (f'"{nid}":{{"node":{nid},"name":{_json_str(name)},"node_type":{_json_str(ntype)},'
+            f'"control":{_json_str(control)},"arity":{arity},"properties":{{{ps}}},'
+            f'"ports":[{",".join(map(str, ports))}],"parent":{"null" if parent < 0 else parent}}}')
+
+def write_records_json(fp, records, *, sites=0, names=None, chunk=256):
+    """Stream node records (see Bigraph.records) to the text file fp as the
+    flat JSON document, `chunk` nodes per write."""
+    fp.write('{"sites":%d,"names":[%s],"nodes":{' % (sites, ",".join(map(_json_str, names or []))))
+    sep, buf = "", []
+    for rec in records:
+        buf.append(_node_json(rec))
+        if len(buf) >= chunk:
+            fp.write(sep + ",".join(buf))
+            sep, buf = ",", []
+    if buf:
+        fp.write(sep + ",".join(buf))
+    fp.write("}}")
+
 # ------------------------------------------------------------------ #
 class Rule:
     def __init__(self, name, redex:Bigraph, reactum:Bigraph):
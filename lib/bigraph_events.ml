@@ -4,6 +4,8 @@ type graph_event =
   | NodeAdded of node
   | NodeRemoved of node_id
   | PropertyChanged of node_id * string * property_value
+  | PropertyRemoved of node_id * string
+  | NodeMoved of node_id * node_id option (* new parent, None for a root *)
   | RuleApplied of string * (node_id * node_id) list (* rule name + mapping *)
 
 let property_value_to_json (v : property_value) : Yojson.Safe.t =
@@ -77,6 +79,19 @@ let deserialize_graph_event (json : Yojson.Safe.t) : graph_event option =
           let key = get_str "key" in
           let value = property_value_of_json (List.assoc "value" fields) in
           Some (PropertyChanged (nid, key, value))
+      | "PropertyRemoved" ->
+          let nid = get_int "node_id" in
+          let key = get_str "key" in
+          Some (PropertyRemoved (nid, key))
+      | "NodeMoved" ->
+          let nid = get_int "node_id" in
+          let parent =
+            match List.assoc "parent" fields with
+            | `Int p -> Some p
+            | `Null -> None
+            | _ -> failwith "Expected int or null for key: parent"
+          in
+          Some (NodeMoved (nid, parent))
       | "RuleApplied" ->
           let name = get_str "name" in
           let mapping =
@@ -124,6 +139,20 @@ let serialize_graph_event (ev : graph_event) : Yojson.Safe.t =
           ("key", `String key);
           ("value", property_value_to_json value);
         ]
+  | PropertyRemoved (nid, key) ->
+      `Assoc
+        [
+          ("type", `String "PropertyRemoved");
+          ("node_id", `Int nid);
+          ("key", `String key);
+        ]
+  | NodeMoved (nid, parent) ->
+      `Assoc
+        [
+          ("type", `String "NodeMoved");
+          ("node_id", `Int nid);
+          ("parent", match parent with Some p -> `Int p | None -> `Null);
+        ]
   | RuleApplied (name, mapping) ->
       `Assoc
         [
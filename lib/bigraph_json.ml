@@ -0,0 +1,243 @@
+(** Flat JSON export and JSON Patch (RFC 6902) feeds for UIs
+
+    The document keys nodes by id, so every node keeps one JSON Pointer
+    however the tree changes:
+
+      {"sites": n, "names": [...],
+       "nodes": {"<id>": {"node": id, "name": ..., "node_type": ...,
+                          "control": ..., "arity": n,
+                          "properties": {...} | null, "ports": [...],
+                          "parent": id | null}}}
+
+    A node object is its NodeAdded event from
+    [Bigraph_events.serialize_graph_event] without "type", plus its parent.
+    [write] renders the document straight from the node map into a buffer;
+    [patch] turns the graph events of one change into the operations that
+    bring a client's copy of the document up to date. lib/bigraph_dsl.py
+    writes the same document. *)
+
+open Bigraph
+open Bigraph_events
+
+(* --------- streaming export --------- *)
+
+let add_string buf s =
+  Buffer.add_char buf '"';
+  String.iter
+    (function
+      | '"' -> Buffer.add_string buf "\\\""
+      | '\\' -> Buffer.add_string buf "\\\\"
+      | '\n' -> Buffer.add_string buf "\\n"
+      | '\r' -> Buffer.add_string buf "\\r"
+      | '\t' -> Buffer.add_string buf "\\t"
+      | c when Char.code c < 0x20 -> Printf.bprintf buf "\\u%04x" (Char.code c)
+      | c -> Buffer.add_char buf c)
+    s;
+  Buffer.add_char buf '"'
+
+(* shortest of %.15g/%.17g that reads back, always with a '.' or exponent *)
+let add_float buf f =
+  if not (Float.is_finite f) then Buffer.add_string buf "null"
+  else
+    let s = Printf.sprintf "%.15g" f in
+    let s = if float_of_string s = f then s else Printf.sprintf "%.17g" f in
+    Buffer.add_string buf s;
+    if not (String.exists (fun c -> c = '.' || c = 'e' || c = 'n') s) then
+      Buffer.add_string buf ".0"
+
+let add_value buf = function
+  | Bool b -> Buffer.add_string buf (if b then "true" else "false")
+  | Int i -> Buffer.add_string buf (string_of_int i)
+  | Float f -> add_float buf f
+  | String s -> add_string buf s
+  | Color (r, g, b) -> Printf.bprintf buf "[%d,%d,%d]" r g b
+
+let add_node buf (parent : node_id option) (n : node) =
+  Printf.bprintf buf "{\"node\":%d,\"name\":" n.id;
+  add_string buf n.name;
+  Buffer.add_string buf ",\"node_type\":";
+  add_string buf n.node_type;
+  Buffer.add_string buf ",\"control\":";
+  add_string buf n.control.name;
+  Printf.bprintf buf ",\"arity\":%d,\"properties\":" n.control.arity;
+  (match n.properties with
+  | None -> Buffer.add_string buf "null"
+  | Some ps ->
+      Buffer.add_char buf '{';
+      List.iteri
+        (fun i (k, v) ->
+          if i > 0 then Buffer.add_char buf ',';
+          add_string buf k;
+          Buffer.add_char buf ':';
+          add_value buf v)
+        ps;
+      Buffer.add_char buf '}');
+  Buffer.add_string buf ",\"ports\":[";
+  List.iteri
+    (fun i p ->
+      if i > 0 then Buffer.add_char buf ',';
+      Buffer.add_string buf (string_of_int p))
+    n.ports;
+  Buffer.add_string buf "],\"parent\":";
+  (match parent with
+  | Some p -> Buffer.add_string buf (string_of_int p)
+  | None -> Buffer.add_string buf "null");
+  Buffer.add_char buf '}'
+
+(** Render [s] into [buf], calling [flush buf] whenever it holds more than
+    [chunk] bytes (and not at the end) *)
+let write ?(chunk = 65536) ?(flush = fun _ -> ()) buf (s : bigraph_with_interface) =
+  Printf.bprintf buf "{\"sites\":%d,\"names\":[" s.inner.sites;
+  List.iteri
+    (fun i nm ->
+      if i > 0 then Buffer.add_char buf ',';
+      add_string buf nm)
+    s.inner.names;
+  Buffer.add_string buf "],\"nodes\":{";
+  let first = ref true in
+  NodeMap.iter
+    (fun id n ->
+      if !first then first := false else Buffer.add_char buf ',';
+      Printf.bprintf buf "\"%d\":" id;
+      add_node buf (NodeMap.find_opt id s.bigraph.place.parent_map) n;
+      if Buffer.length buf > chunk then flush buf)
+    s.bigraph.place.nodes;
+  Buffer.add_string buf "}}"
+
+let to_string s =
+  let buf = Buffer.create 65536 in
+  write ~chunk:max_int buf s;
+  Buffer.contents buf
+
+let to_channel oc s =
+  let buf = Buffer.create 65536 in
+  let flush b =
+    Buffer.output_buffer oc b;
+    Buffer.clear b
+  in
+  write ~flush buf s;
+  flush buf
+
+(* --------- JSON Patch --------- *)
+
+(* RFC 6901 reference token *)
+let token s =
+  if String.contains s '~' || String.contains s '/' then
+    String.concat "~1"
+      (List.map
+         (fun part -> String.concat "~0" (String.split_on_char '~' part))
+         (String.split_on_char '/' s))
+  else s
+
+let node_path id = Printf.sprintf "/nodes/%d" id
+
+let op ?value name path : Yojson.Safe.t =
+  let value = match value with Some v -> [ ("value", v) ] | None -> [] in
+  `Assoc (("op", `String name) :: ("path", `String path) :: value)
+
+let parent_json (bg : bigraph) id : Yojson.Safe.t =
+  match NodeMap.find_opt id bg.place.parent_map with
+  | Some p -> `Int p
+  | None -> `Null
+
+(** The JSON object of node [n] of [bg] *)
+let node_json (bg : bigraph) (n : node) : Yojson.Safe.t =
+  match serialize_graph_event (NodeAdded n) with
+  | `Assoc fields ->
+      `Assoc (List.remove_assoc "type" fields @ [ ("parent", parent_json bg n.id) ])
+  | j -> j
+
+let props_json = function
+  | None -> `Null
+  | Some ps -> `Assoc (List.map (fun (k, v) -> (k, property_value_to_json v)) ps)
+
+(* Operations for a node a rule matched: its properties and parent as they
+   are in [after] (the rewrite replaces a matched node's whole property
+   list, so keys it drops have no event of their own) *)
+let matched_ops (before : bigraph) (after : bigraph) id =
+  match (NodeMap.find_opt id before.place.nodes, NodeMap.find_opt id after.place.nodes) with
+  | Some a, Some b ->
+      let path = node_path id in
+      if a.control <> b.control || a.ports <> b.ports then
+        [ op "replace" path ~value:(node_json after b) ]
+      else
+        let props =
+          match (a.properties, b.properties) with
+          | pa, pb when pa = pb -> []
+          | Some pa, Some pb ->
+              List.filter_map
+                (fun (k, _) ->
+                  if List.mem_assoc k pb then None
+                  else Some (op "remove" (path ^ "/properties/" ^ token k)))
+                pa
+              @ List.filter_map
+                  (fun (k, v) ->
+                    if List.assoc_opt k pa = Some v then None
+                    else
+                      Some
+                        (op "add"
+                           (path ^ "/properties/" ^ token k)
+                           ~value:(property_value_to_json v)))
+                  pb
+          | _, pb -> [ op "replace" (path ^ "/properties") ~value:(props_json pb) ]
+        in
+        let parent =
+          if
+            NodeMap.find_opt id before.place.parent_map
+            = NodeMap.find_opt id after.place.parent_map
+          then []
+          else [ op "replace" (path ^ "/parent") ~value:(parent_json after id) ]
+        in
+        props @ parent
+  | _ -> []
+
+(** JSON Patch operations turning the document of [before] into that of
+    [after], from the graph events of the change between them. [after]
+    supplies what the events leave out: parents of added nodes, and the
+    parents and properties a rule rewrite changed. *)
+let patch ~(before : bigraph) ~(after : bigraph) (events : graph_event list) :
+    Yojson.Safe.t list =
+  let covered = Hashtbl.create 16 in
+  List.concat_map
+    (function
+      | RuleApplied (_, mapping) ->
+          List.concat_map
+            (fun (_, tid) ->
+              if Hashtbl.mem covered tid then []
+              else (
+                Hashtbl.replace covered tid ();
+                matched_ops before after tid))
+            mapping
+      | NodeAdded n -> [ op "add" (node_path n.id) ~value:(node_json after n) ]
+      | NodeRemoved id -> [ op "remove" (node_path id) ]
+      | PropertyChanged (id, _, _) when Hashtbl.mem covered id -> []
+      | PropertyChanged (id, k, v) -> (
+          match NodeMap.find_opt id before.place.nodes with
+          | Some { properties = Some _; _ } ->
+              [
+                op "add"
+                  (node_path id ^ "/properties/" ^ token k)
+                  ~value:(property_value_to_json v);
+              ]
+          | _ ->
+              [
+                op "replace"
+                  (node_path id ^ "/properties")
+                  ~value:
+                    (props_json
+                       (Option.bind (NodeMap.find_opt id after.place.nodes)
+                          (fun n -> n.properties)));
+              ])
+      | (PropertyRemoved (id, _) | NodeMoved (id, _)) when Hashtbl.mem covered id ->
+          []
+      | PropertyRemoved (id, k) -> (
+          match NodeMap.find_opt id after.place.nodes with
+          | Some { properties = None; _ } ->
+              [ op "replace" (node_path id ^ "/properties") ~value:`Null ]
+          | _ -> [ op "remove" (node_path id ^ "/properties/" ^ token k) ])
+      | NodeMoved (id, parent) ->
+          [
+            op "replace" (node_path id ^ "/parent")
+              ~value:(match parent with Some p -> `Int p | None -> `Null);
+          ])
+    events
@@ -364,140 +364,175 @@ let match_all (pattern : pattern) (target : bigraph_with_interface) :
 (* ------------------------------------------------------------------ *)
 (*  Rule app                                                          *)
 (* ------------------------------------------------------------------ *)
-let apply_rule_with_events rule target =
-  try
-    let match_result = match_pattern rule.redex target in
-    let redex_to_target = match_result.node_mapping in
-
-    let reactum_nodes_with_preserved_ids =
-      NodeMap.fold
-        (fun rid rnode acc ->
-          match List.assoc_opt rid redex_to_target with
-          | Some tid ->
-              let target_node = NodeMap.find tid target.bigraph.place.nodes in
-              NodeMap.add tid
-                {
-                  rnode with
-                  id = tid;
-                  name = target_node.name;
-                  node_type = target_node.node_type;
-                }
-                acc
-          | None -> NodeMap.add rid rnode acc)
-        rule.reactum.bigraph.place.nodes NodeMap.empty
-    in
-
-    let new_nodes =
-      NodeMap.union
-        (fun _ _ r -> Some r)
-        match_result.context.bigraph.place.nodes
-        reactum_nodes_with_preserved_ids
-    in
-
-    let reactum_parent_map_preserved =
-      NodeMap.fold
-        (fun child parent acc ->
-          match
-            ( List.assoc_opt child redex_to_target,
-              List.assoc_opt parent redex_to_target )
-          with
-          | Some new_child, Some new_parent ->
-              NodeMap.add new_child new_parent acc
-          | _ -> acc)
-        rule.reactum.bigraph.place.parent_map NodeMap.empty
-    in
-
-    let new_parent_map =
-      NodeMap.union
-        (fun _ _ r -> Some r)
-        match_result.context.bigraph.place.parent_map
-        reactum_parent_map_preserved
-    in
 
-    let new_place =
-      {
-        nodes = new_nodes;
-        parent_map = new_parent_map;
-        sites = match_result.context.bigraph.place.sites;
-        regions = match_result.context.bigraph.place.regions;
-        site_parent_map = match_result.context.bigraph.place.site_parent_map;
-        region_nodes = match_result.context.bigraph.place.region_nodes;
-      }
-    in
-
-    let new_bigraph =
-      {
-        place = new_place;
-        link = match_result.context.bigraph.link;
-        signature = target.bigraph.signature;
-      }
-    in
+(* Node-level changes made by applying [rule] at [redex_to_target]:
+   NodeRemoved for redex-only nodes, PropertyChanged for reactum values
+   that differ from the matched target node, NodeAdded for reactum-only
+   nodes under the id they were [placed] at. Only the rule's nodes are
+   visited, so the cost is independent of the target size. *)
+let rule_change_events (rule : reaction_rule) (target : bigraph)
+    (redex_to_target : (node_id * node_id) list)
+    (placed : (node_id, node_id) Hashtbl.t) : graph_event list =
+  let changed =
+    List.concat_map
+      (fun (rid, tid) ->
+        match NM.find_opt rid rule.reactum.bigraph.place.nodes with
+        | None -> [ NodeRemoved tid ]
+        | Some rnode -> (
+            let before =
+              match NM.find_opt tid target.place.nodes with
+              | Some { properties = Some ps; _ } -> ps
+              | _ -> []
+            in
+            match rnode.properties with
+            | None -> []
+            | Some ps ->
+                List.filter_map
+                  (fun (k, v) ->
+                    match List.assoc_opt k before with
+                    | Some v' when v' = v -> None
+                    | _ -> Some (PropertyChanged (tid, k, v)))
+                  ps))
+      redex_to_target
+  in
+  let added =
+    NM.fold
+      (fun rid rnode acc ->
+        if List.mem_assoc rid redex_to_target then acc
+        else NodeAdded { rnode with id = Hashtbl.find placed rid } :: acc)
+      rule.reactum.bigraph.place.nodes []
+  in
+  changed @ List.rev added
+
+(* Rewrite [target] with [rule] at [redex_to_target], touching only the
+   rule's nodes. Matched reactum nodes replace their images (keeping the
+   target's name and type); reactum-only nodes are placed under the image
+   of their reactum parent, keeping their id unless it is taken, in which
+   case the next free id is used; redex-only nodes leave both the node and
+   parent maps. Reactum roots that were matched keep their parent in the
+   target, new ones become roots. New controls are added to the signature.
+
+   The result goes into [place]/[signature] rather than a new bigraph, and
+   [taken]/[next_free] (ids in use by the batch) are shared, so that
+   several rules can be applied at disjoint matches of the same [target]
+   in one rebuild. *)
+let rewrite_into ~taken ~next_free (target : bigraph) (rule : reaction_rule)
+    (redex_to_target : (node_id * node_id) list) ((nodes, parent_map, signature))
+    =
+  let reactum = rule.reactum.bigraph.place in
+  let placed : (node_id, node_id) Hashtbl.t =
+    Hashtbl.create (NM.cardinal reactum.nodes)
+  in
+  let place rid tid =
+    Hashtbl.replace placed rid tid;
+    Hashtbl.replace taken tid ()
+  in
+  List.iter
+    (fun (rid, tid) -> if NM.mem rid reactum.nodes then place rid tid)
+    redex_to_target;
+  NM.iter
+    (fun rid _ ->
+      if not (Hashtbl.mem placed rid) then
+        if NM.mem rid target.place.nodes || Hashtbl.mem taken rid then (
+          while Hashtbl.mem taken !next_free do
+            incr next_free
+          done;
+          place rid !next_free)
+        else place rid rid)
+    reactum.nodes;
+
+  let removed =
+    List.filter_map
+      (fun (rid, tid) -> if NM.mem rid reactum.nodes then None else Some tid)
+      redex_to_target
+  in
+  let nodes = List.fold_left (fun m tid -> NM.remove tid m) nodes removed in
+  let parent_map =
+    List.fold_left (fun m tid -> NM.remove tid m) parent_map removed
+  in
+  let nodes, parent_map =
+    NM.fold
+      (fun rid (rnode : node) (nodes, pm) ->
+        let tid = Hashtbl.find placed rid in
+        let nd =
+          if List.mem_assoc rid redex_to_target then
+            let old = NM.find tid target.place.nodes in
+            { rnode with id = tid; name = old.name; node_type = old.node_type }
+          else { rnode with id = tid }
+        in
+        let pm =
+          match NM.find_opt rid reactum.parent_map with
+          | Some rp -> (
+              match Hashtbl.find_opt placed rp with
+              | Some tp -> NM.add tid tp pm
+              | None -> pm)
+          | None -> pm
+        in
+        (NM.add tid nd nodes, pm))
+      reactum.nodes (nodes, parent_map)
+  in
+  let signature =
+    NM.fold
+      (fun _ (rnode : node) (sg : control list) ->
+        if List.exists (fun (c : control) -> c.name = rnode.control.name) sg
+        then sg
+        else rnode.control :: sg)
+      reactum.nodes signature
+  in
+  let events =
+    RuleApplied (rule.name, redex_to_target)
+    :: rule_change_events rule target redex_to_target placed
+  in
+  ((nodes, parent_map, signature), events)
+
+let first_free (target : bigraph) =
+  ref
+    (match NM.max_binding_opt target.place.nodes with
+    | Some (k, _) -> k + 1
+    | None -> 0)
+
+let rewrite (rule : reaction_rule) (target : bigraph)
+    (redex_to_target : (node_id * node_id) list) : bigraph * graph_event list =
+  let (nodes, parent_map, signature), events =
+    rewrite_into ~taken:(Hashtbl.create 16) ~next_free:(first_free target)
+      target rule redex_to_target
+      (target.place.nodes, target.place.parent_map, target.signature)
+  in
+  ({ target with place = { target.place with nodes; parent_map }; signature }, events)
+
+(* Apply each (rule, match) of [batch] to [target] in one rebuild. The
+   matches must be pairwise disjoint in the target, as they are all taken
+   on [target] itself; the events are those of each rewrite in turn. *)
+let rewrite_batch (target : bigraph)
+    (batch : (reaction_rule * (node_id * node_id) list) list) :
+    bigraph * graph_event list =
+  let taken = Hashtbl.create 64 and next_free = first_free target in
+  let acc, events =
+    List.fold_left
+      (fun (acc, events) (rule, redex_to_target) ->
+        let acc, evs =
+          rewrite_into ~taken ~next_free target rule redex_to_target acc
+        in
+        (acc, List.rev_append evs events))
+      ((target.place.nodes, target.place.parent_map, target.signature), [])
+      batch
+  in
+  let nodes, parent_map, signature = acc in
+  ( { target with place = { target.place with nodes; parent_map }; signature },
+    List.rev events )
 
-    let events = [ RuleApplied (rule.name, redex_to_target) ] in
-    Some ({ target with bigraph = new_bigraph }, events)
-  with NoMatch _ -> None
+let apply_rule_with_events rule target =
+  match find_structural_match rule.redex.bigraph target.bigraph with
+  | None -> None
+  | Some redex_to_target ->
+      let bigraph, events = rewrite rule target.bigraph redex_to_target in
+      Some ({ target with bigraph }, events)
 
 let apply_with_mapping (rule : reaction_rule) (target : bigraph_with_interface)
     (redex_to_target : (node_id * node_id) list) =
   try
-    let reactum_nodes_with_preserved_ids =
-      NodeMap.fold
-        (fun rid rnode acc ->
-          match List.assoc_opt rid redex_to_target with
-          | Some tid ->
-              let target_node = NodeMap.find tid target.bigraph.place.nodes in
-              NodeMap.add tid
-                {
-                  rnode with
-                  id = tid;
-                  name = target_node.name;
-                  node_type = target_node.node_type;
-                }
-                acc
-          | None -> NodeMap.add rid rnode acc)
-        rule.reactum.bigraph.place.nodes NodeMap.empty
-    in
-    let new_nodes =
-      NodeMap.union
-        (fun _ _ r -> Some r)
-        target.bigraph.place.nodes reactum_nodes_with_preserved_ids
-    in
-    let reactum_parent_map_preserved =
-      NodeMap.fold
-        (fun child parent acc ->
-          match
-            ( List.assoc_opt child redex_to_target,
-              List.assoc_opt parent redex_to_target )
-          with
-          | Some new_child, Some new_parent ->
-              NodeMap.add new_child new_parent acc
-          | _ -> acc)
-        rule.reactum.bigraph.place.parent_map NodeMap.empty
-    in
-    let new_parent_map =
-      NodeMap.union
-        (fun _ _ r -> Some r)
-        target.bigraph.place.parent_map reactum_parent_map_preserved
-    in
-    let new_place =
-      {
-        nodes = new_nodes;
-        parent_map = new_parent_map;
-        sites = target.bigraph.place.sites;
-        regions = target.bigraph.place.regions;
-        site_parent_map = target.bigraph.place.site_parent_map;
-        region_nodes = target.bigraph.place.region_nodes;
-      }
-    in
-    let new_bigraph =
-      {
-        place = new_place;
-        link = target.bigraph.link;
-        signature = target.bigraph.signature;
-      }
-    in
-    let events = [ RuleApplied (rule.name, redex_to_target) ] in
-    Some ({ target with bigraph = new_bigraph }, events)
+    let bigraph, events = rewrite rule target.bigraph redex_to_target in
+    Some ({ target with bigraph }, events)
   with _ -> None
 
 let apply_rule_all (rule : reaction_rule) (target : bigraph_with_interface) :
@@ -512,12 +547,12 @@ let apply_rule_all (rule : reaction_rule) (target : bigraph_with_interface) :
     else false
   in
   let selected = List.filter choose embeddings in
-  List.fold_left
-    (fun st mapping ->
-      match apply_with_mapping rule st mapping with
-      | Some (st', _) -> st'
-      | None -> st)
-    target selected
+  try
+    let bigraph, _events =
+      rewrite_batch target.bigraph (List.map (fun m -> (rule, m)) selected)
+    in
+    { target with bigraph }
+  with _ -> target
 
 let apply_rule rule target =
   match apply_rule_with_events rule target with
@@ -3,31 +3,24 @@
 open Bigraph
 open Osm_parser
 
-(** Find a building or location by OSM ID and add an entity to it *)
-let add_entity_at_osm_location bigraph osm_type osm_id entity_node =
-  let osm_string = osm_type ^ " " ^ osm_id in
-  match find_by_osm_id bigraph osm_string with
-  | Some location_node ->
-      (* Add entity as a child of the location node *)
-      let updated_parent_map =
-        NodeMap.add entity_node.id location_node.id bigraph.place.parent_map
-      in
-
-      (* Add entity to nodes *)
-      let updated_nodes =
-        NodeMap.add entity_node.id entity_node bigraph.place.nodes
-      in
+(* Add [entity] as a child of [location] *)
+let place_entity bigraph (location : node) (entity : node) =
+  let updated_parent_map =
+    NodeMap.add entity.id location.id bigraph.place.parent_map
+  in
+  let updated_nodes = NodeMap.add entity.id entity bigraph.place.nodes in
+  let updated_place =
+    { bigraph.place with nodes = updated_nodes; parent_map = updated_parent_map }
+  in
+  { bigraph with place = updated_place }
 
-      (* Update the place graph *)
-      let updated_place =
-        {
-          bigraph.place with
-          nodes = updated_nodes;
-          parent_map = updated_parent_map;
-        }
-      in
-
-      Some { bigraph with place = updated_place }
+(** Find a building or location by OSM ID and add an entity to it. With the
+    graph's osm_id [index] (Osm_parser.parse_osm_json_indexed) the lookup is
+    O(log n); the entity itself is not indexed. *)
+let add_entity_at_osm_location ?index bigraph osm_type osm_id entity_node =
+  let osm_string = osm_type ^ " " ^ osm_id in
+  match find_by_osm_id ?index bigraph osm_string with
+  | Some location_node -> Some (place_entity bigraph location_node entity_node)
   | None -> None
 
 (** Create an agent/entity node *)
@@ -37,19 +30,26 @@ let create_entity ?(props = []) name entity_type =
   let control = create_control entity_type 0 in
   create_node ~props ~name ~node_type:entity_type id control
 
-(** Find the nearest building to given coordinates *)
-let find_nearest_building bigraph _lat _lon =
-  (* For now, we'll use the OSM ID directly since we know it from Nominatim *)
-  (* In a full implementation, you'd calculate distances to all buildings *)
-  find_by_osm_id bigraph "way 689397200"
+(** Find the building at or nearest to given coordinates. With a [spatial]
+    index over the map's footprints (Spatial_index.of_geojson_file) this is a
+    local grid lookup; without one it falls back to the building Nominatim
+    resolved for the Cambridge example. *)
+let find_nearest_building ?index ?spatial bigraph lat lon =
+  match spatial with
+  | Some sp -> (
+      match Spatial_index.locate ~kind:"building" sp ~lat ~lon with
+      | Some fp -> find_by_osm_id ?index bigraph fp.Spatial_index.osm_id
+      | None -> None)
+  | None -> find_by_osm_id ?index bigraph "way 689397200"
 
 (** Add an entity at specific GPS coordinates *)
-let add_entity_at_coordinates bigraph lat lon entity_name entity_type =
+let add_entity_at_coordinates ?index ?spatial bigraph lat lon entity_name
+    entity_type =
   (* First try to find the exact OSM location *)
-  match find_nearest_building bigraph lat lon with
-  | Some _location ->
+  match find_nearest_building ?index ?spatial bigraph lat lon with
+  | Some location ->
       let entity = create_entity entity_name entity_type in
-      add_entity_at_osm_location bigraph "way" "689397200" entity
+      Some (place_entity bigraph location entity)
   | None -> (
       (* Fall back to finding any building in the area *)
       let buildings = find_by_type bigraph "Building" in
@@ -57,23 +57,10 @@ let add_entity_at_coordinates bigraph lat lon entity_name entity_type =
       | [] -> None
       | hd :: _ ->
           let entity = create_entity entity_name entity_type in
-          let updated_parent_map =
-            NodeMap.add entity.id hd.id bigraph.place.parent_map
-          in
-          let updated_nodes =
-            NodeMap.add entity.id entity bigraph.place.nodes
-          in
-          let updated_place =
-            {
-              bigraph.place with
-              nodes = updated_nodes;
-              parent_map = updated_parent_map;
-            }
-          in
-          Some { bigraph with place = updated_place })
+          Some (place_entity bigraph hd entity))
 
 (** Example: Add an agent at the University of Cambridge location *)
-let add_agent_at_cambridge bigraph agent_name =
+let add_agent_at_cambridge ?index ?spatial bigraph agent_name =
   let lat = 52.21080001009945 in
   let lon = 0.09165142082655732 in
-  add_entity_at_coordinates bigraph lat lon agent_name "Agent"
+  add_entity_at_coordinates ?index ?spatial bigraph lat lon agent_name "Agent"
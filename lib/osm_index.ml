@@ -0,0 +1,60 @@
+(** osm_id -> node_id index for OSM bigraphs
+
+    A string map, so lookups are O(log n) instead of a scan over every node's
+    properties. It is built while an export is imported (see
+    Osm_parser.parse_osm_json_indexed) and saved next to the nodes of a
+    Bigraph message as the sorted osmIds/osmNodes lists, so a stored city
+    graph keeps its index. *)
+
+open Bigraph
+module StringMap = Map.Make (String)
+
+type t = node_id StringMap.t
+
+let empty : t = StringMap.empty
+let cardinal (idx : t) = StringMap.cardinal idx
+let find (idx : t) osm_id = StringMap.find_opt osm_id idx
+let add (idx : t) osm_id node_id : t = StringMap.add osm_id node_id idx
+let remove (idx : t) osm_id : t = StringMap.remove osm_id idx
+
+(** The "osm_id" string property of a node, if any *)
+let osm_id_of (node : node) =
+  match node.properties with
+  | Some props -> (
+      match List.assoc_opt "osm_id" props with
+      | Some (String id) -> Some id
+      | _ -> None)
+  | None -> None
+
+let add_node (idx : t) (node : node) : t =
+  match osm_id_of node with Some id -> add idx id node.id | None -> idx
+
+(** Index every node of [bigraph] that has an osm_id *)
+let of_bigraph (bigraph : bigraph) : t =
+  NodeMap.fold (fun _ node idx -> add_node idx node) bigraph.place.nodes empty
+
+(** The node with [osm_id] in [bigraph] *)
+let find_node (idx : t) (bigraph : bigraph) osm_id =
+  Option.bind (find idx osm_id) (fun id ->
+      NodeMap.find_opt id bigraph.place.nodes)
+
+(** Parallel arrays sorted by osm_id (StringMap.fold is in key order), the
+    serialized form *)
+let to_arrays (idx : t) : string array * node_id array =
+  let n = cardinal idx in
+  let keys = Array.make n "" and ids = Array.make n 0 in
+  ignore
+    (StringMap.fold
+       (fun k id i ->
+         keys.(i) <- k;
+         ids.(i) <- id;
+         i + 1)
+       idx 0);
+  (keys, ids)
+
+let of_arrays (keys : string array) (ids : node_id array) : t =
+  if Array.length keys <> Array.length ids then
+    invalid_arg "Osm_index.of_arrays: length mismatch";
+  let idx = ref empty in
+  Array.iteri (fun i k -> idx := add !idx k ids.(i)) keys;
+  !idx
@@ -1,14 +1,12 @@
 (** OSM JSON to Bigraph Parser
 
     This module parses the JSON output from bigraph-of-the-world (OpenStreetMap
-    data converted to bigraph format) into the OCaml bigraph data structure. *)
+    data converted to bigraph format) into the OCaml bigraph data structure,
+    in a single streaming pass over the file. *)
 
 open Bigraph
 open Yojson.Safe.Util
 
-(* Helper module for integer maps *)
-module IntMap = Map.Make (Int)
-
 (** Extract OSM ID string from control parameters if present *)
 let extract_osm_id params =
   try
@@ -17,195 +15,275 @@ let extract_osm_id params =
     | hd :: _ -> hd |> member "ctrl_string" |> to_string
   with _ -> ""
 
-(** Parse unique control definitions from the JSON *)
-let parse_controls json =
-  let ctrl_array = json |> member "nodes" |> member "ctrl" |> to_list in
+(* Streaming readers over Yojson's lexer. Values are consumed as they are
+   read, so no JSON tree of the export is ever built; each reader skips
+   leading whitespace itself. *)
 
-  (* Extract unique control types from the array *)
-  let ctrl_table = Hashtbl.create 10 in
-  List.iter
-    (fun ctrl_entry ->
-      match ctrl_entry |> to_list with
-      | _ :: def :: _ ->
-          let name = def |> member "ctrl_name" |> to_string in
-          let arity = def |> member "ctrl_arity" |> to_int in
-          if not (Hashtbl.mem ctrl_table name) then
-            Hashtbl.add ctrl_table name (create_control name arity)
-      | _ -> ())
-    ctrl_array;
-
-  Hashtbl.fold (fun _ ctrl acc -> ctrl :: acc) ctrl_table []
-
-(** Parse nodes from the JSON structure *)
-let parse_nodes json _controls =
-  let ctrl_array = json |> member "nodes" |> member "ctrl" |> to_list in
-  let sort_array = json |> member "nodes" |> member "sort" |> to_list in
-
-  (* Build map from node ID to (control, OSM ID) *)
-  let ctrl_map =
-    List.fold_left
-      (fun acc ctrl_entry ->
-        match ctrl_entry |> to_list with
-        | [ id_json; def_json ] ->
-            let id = id_json |> to_int in
-            let name = def_json |> member "ctrl_name" |> to_string in
-            let arity = def_json |> member "ctrl_arity" |> to_int in
-            let params = def_json |> member "ctrl_params" in
-            let osm_id = extract_osm_id params in
-            let control = create_control name arity in
-            IntMap.add id (control, osm_id) acc
-        | _ -> acc)
-      IntMap.empty ctrl_array
-  in
+module Y = Yojson.Safe
 
-  (* Create nodes grouped by type from the sorted structure *)
-  List.fold_left
-    (fun node_map sort_entry ->
-      match sort_entry |> to_list with
-      | [ type_json; ids_json ] ->
-          let node_type = type_json |> to_string in
-          let node_ids = ids_json |> to_list |> List.map to_int in
-          let control = create_control node_type 1 in
-
-          (* Create a node for each ID of this type *)
-          List.fold_left
-            (fun nm node_id ->
-              (* Get OSM ID for this specific node if it exists *)
-              let osm_id =
-                try
-                  let _, id = IntMap.find node_id ctrl_map in
-                  id
-                with Not_found -> ""
-              in
+let read_int v lb =
+  Y.read_space v lb;
+  Y.read_int v lb
+
+let read_string v lb =
+  Y.read_space v lb;
+  Y.read_string v lb
+
+let skip v lb =
+  Y.read_space v lb;
+  Y.skip_json v lb
+
+let fold_array f init v lb =
+  Y.read_space v lb;
+  Y.read_sequence f init v lb
+
+let fold_object f init v lb =
+  Y.read_space v lb;
+  Y.read_fields f init v lb
+
+(* [a, b, ...]: the first two elements, the rest skipped *)
+let read_pair read_a read_b v lb =
+  let a = ref None and b = ref None in
+  ignore
+    (fold_array
+       (fun i v lb ->
+         (match i with
+         | 0 -> a := Some (read_a v lb)
+         | 1 -> b := Some (read_b v lb)
+         | _ -> skip v lb);
+         i + 1)
+       0 v lb);
+  match (!a, !b) with Some a, Some b -> Some (a, b) | _ -> None
+
+let read_int_list v lb =
+  List.rev (fold_array (fun acc v lb -> read_int v lb :: acc) [] v lb)
+
+(* Rows of a sparse matrix's "r_major": [[row, [cols]], ...] *)
+let fold_r_major f init v lb =
+  fold_object
+    (fun acc k v lb ->
+      if k = "r_major" then
+        fold_array
+          (fun acc v lb ->
+            match read_pair read_int read_int_list v lb with
+            | Some (row, cols) -> f acc row cols
+            | None -> acc)
+          acc v lb
+      else (
+        skip v lb;
+        acc))
+    init v lb
+
+(* ctrl_string of the first control parameter, or "" *)
+let read_osm_param v lb =
+  fold_array
+    (fun (i, osm_id) v lb ->
+      if i = 0 then
+        ( 1,
+          fold_object
+            (fun acc k v lb ->
+              if k = "ctrl_string" then read_string v lb
+              else (
+                skip v lb;
+                acc))
+            "" v lb )
+      else (
+        skip v lb;
+        (i + 1, osm_id)))
+    (0, "") v lb
+  |> snd
+
+(* {ctrl_name, ctrl_arity, ctrl_params} as (name, arity, osm_id) *)
+let read_ctrl_def v lb =
+  fold_object
+    (fun (name, arity, osm_id) k v lb ->
+      match k with
+      | "ctrl_name" -> (read_string v lb, arity, osm_id)
+      | "ctrl_arity" -> (name, read_int v lb, osm_id)
+      | "ctrl_params" -> (name, arity, read_osm_param v lb)
+      | _ ->
+          skip v lb;
+          (name, arity, osm_id))
+    ("", 0, "") v lb
 
+(* What the single pass collects; sections may come in any order, so nodes
+   are only created once both nodes.ctrl and nodes.sort have been seen. *)
+type import = {
+  ctrl_table : (string, control) Hashtbl.t; (* unique controls by name *)
+  osm_ids : (node_id, string) Hashtbl.t;
+  mutable sorts : (string * node_id list) list; (* reversed *)
+  mutable num_regions : int;
+  mutable parents : node_id NodeMap.t;
+  mutable region_map : NodeSet.t RegionMap.t option;
+  mutable num_edges : int;
+  mutable port_links : link option PortMap.t;
+}
+
+let read_nodes st v lb =
+  fold_object
+    (fun () k v lb ->
+      match k with
+      | "ctrl" ->
+          fold_array
+            (fun () v lb ->
+              match read_pair read_int read_ctrl_def v lb with
+              | Some (id, (name, arity, osm_id)) ->
+                  if not (Hashtbl.mem st.ctrl_table name) then
+                    Hashtbl.add st.ctrl_table name (create_control name arity);
+                  if osm_id <> "" then Hashtbl.replace st.osm_ids id osm_id
+              | None -> ())
+            () v lb
+      | "sort" ->
+          fold_array
+            (fun () v lb ->
+              match read_pair read_string read_int_list v lb with
+              | Some entry -> st.sorts <- entry :: st.sorts
+              | None -> ())
+            () v lb
+      | _ -> skip v lb)
+    () v lb
+
+let read_place_graph st v lb =
+  fold_object
+    (fun () k v lb ->
+      match k with
+      | "num_regions" -> st.num_regions <- read_int v lb
+      | "nn" ->
+          (* parent-child relationships *)
+          st.parents <-
+            fold_r_major
+              (fun m parent children ->
+                List.fold_left (fun m c -> NodeMap.add c parent m) m children)
+              st.parents v lb
+      | "rn" ->
+          (* region-to-nodes mapping *)
+          st.region_map <-
+            Some
+              (fold_r_major
+                 (fun m region ids -> RegionMap.add region (NodeSet.of_list ids) m)
+                 RegionMap.empty v lb)
+      | _ -> skip v lb)
+    () v lb
+
+(* Each link object is one closed edge, numbered in order, over its ports *)
+let read_link_graph st v lb =
+  fold_array
+    (fun () v lb ->
+      let edge = st.num_edges in
+      st.num_edges <- edge + 1;
+      fold_object
+        (fun () k v lb ->
+          if k = "ports" then
+            fold_array
+              (fun () v lb ->
+                match read_pair read_int skip v lb with
+                | Some (port, ()) ->
+                    st.port_links <-
+                      PortMap.add port (Some (Closed edge)) st.port_links
+                | None -> ())
+              () v lb
+          else skip v lb)
+        () v lb)
+    () v lb
+
+(* Nodes grouped by type, with the osm_id index built alongside *)
+let build_nodes st =
+  List.fold_left
+    (fun acc (node_type, node_ids) ->
+      let control = create_control node_type 1 in
+      List.fold_left
+        (fun (nodes, index) node_id ->
+          let name = node_type ^ "_" ^ string_of_int node_id in
+          match Hashtbl.find_opt st.osm_ids node_id with
+          | Some osm_id ->
               let node =
-                if osm_id <> "" then
-                  create_node
-                    ~props:[ ("osm_id", String osm_id) ]
-                    ~name:(node_type ^ "_" ^ string_of_int node_id)
-                    ~node_type node_id control
-                else
-                  create_node
-                    ~name:(node_type ^ "_" ^ string_of_int node_id)
-                    ~node_type node_id control
+                create_node
+                  ~props:[ ("osm_id", String osm_id) ]
+                  ~name ~node_type node_id control
               in
-              NodeMap.add node_id node nm)
-            node_map node_ids
-      | _ -> node_map)
-    NodeMap.empty sort_array
-
-(** Parse place graph (hierarchical structure) from JSON *)
-let parse_place_graph json nodes =
-  let place = json |> member "place_graph" in
-  let num_regions = place |> member "num_regions" |> to_int in
-
-  (* Parse parent-child relationships from sparse matrix *)
-  let nn = place |> member "nn" in
-  let parent_map =
-    try
-      let r_major = nn |> member "r_major" |> to_list in
-      List.fold_left
-        (fun acc entry ->
-          match entry |> to_list with
-          | [ parent_json; children_json ] ->
-              let parent_id = parent_json |> to_int in
-              let children = children_json |> to_list |> List.map to_int in
-              List.fold_left
-                (fun m child_id -> NodeMap.add child_id parent_id m)
-                acc children
-          | _ -> acc)
-        NodeMap.empty r_major
-    with _ -> NodeMap.empty
+              (NodeMap.add node_id node nodes, Osm_index.add index osm_id node_id)
+          | None ->
+              let node = create_node ~name ~node_type node_id control in
+              (NodeMap.add node_id node nodes, index))
+        acc node_ids)
+    (NodeMap.empty, Osm_index.empty)
+    (List.rev st.sorts)
+
+(** Convert OSM JSON to a bigraph in a single streaming pass, returning the
+    osm_id index of its nodes too *)
+let parse_osm_json_indexed filename =
+  let st =
+    {
+      ctrl_table = Hashtbl.create 10;
+      osm_ids = Hashtbl.create 4096;
+      sorts = [];
+      num_regions = 0;
+      parents = NodeMap.empty;
+      region_map = None;
+      num_edges = 0;
+      port_links = PortMap.empty;
+    }
   in
+  In_channel.with_open_bin filename (fun ic ->
+      let lb = Lexing.from_channel ic in
+      let v = Y.init_lexer ~fname:filename () in
+      fold_object
+        (fun () k v lb ->
+          match k with
+          | "nodes" -> read_nodes st v lb
+          | "place_graph" -> read_place_graph st v lb
+          | "link_graph" -> read_link_graph st v lb
+          | _ -> skip v lb)
+        () v lb);
 
-  (* Parse region-to-nodes mapping *)
+  let nodes, index = build_nodes st in
   let region_nodes =
-    try
-      let rn = place |> member "rn" in
-      let r_major = rn |> member "r_major" |> to_list in
-      List.fold_left
-        (fun acc entry ->
-          match entry |> to_list with
-          | [ region_json; nodes_json ] ->
-              let region_id = region_json |> to_int in
-              let node_ids = nodes_json |> to_list |> List.map to_int in
-              RegionMap.add region_id (NodeSet.of_list node_ids) acc
-          | _ -> acc)
-        RegionMap.empty r_major
-    with _ ->
-      (* If no region mapping, put all nodes in region 0 *)
-      RegionMap.singleton 0
-        (NodeMap.fold (fun id _ acc -> NodeSet.add id acc) nodes NodeSet.empty)
+    match st.region_map with
+    | Some m -> m
+    | None ->
+        (* If no region mapping, put all nodes in region 0 *)
+        RegionMap.singleton 0
+          (NodeMap.fold (fun id _ acc -> NodeSet.add id acc) nodes NodeSet.empty)
   in
-
-  {
-    nodes;
-    parent_map;
-    sites = SiteSet.empty;
-    regions = RegionSet.of_list (List.init num_regions (fun i -> i));
-    site_parent_map = SiteMap.empty;
-    region_nodes;
-  }
-
-(** Parse link graph (connections between nodes) from JSON *)
-let parse_link_graph json _nodes =
-  let links = json |> member "link_graph" |> to_list in
-  let num_edges = List.length links in
-  let edges = EdgeSet.of_list (List.init num_edges (fun i -> i)) in
-
-  (* Build port-to-edge linking map *)
-  let link_map =
-    List.fold_left
-      (fun (acc, edge_idx) link_obj ->
-        let ports = link_obj |> member "ports" |> to_list in
-        let new_map =
-          List.fold_left
-            (fun m port_entry ->
-              match port_entry |> to_list with
-              | [ port_json; _ ] ->
-                  let port_id = port_json |> to_int in
-                  PortMap.add port_id (Some (Closed edge_idx)) m
-              | _ -> m)
-            acc ports
-        in
-        (new_map, edge_idx + 1))
-      (PortMap.empty, 0) links
-    |> fst
+  let place =
+    {
+      nodes;
+      parent_map = st.parents;
+      sites = SiteSet.empty;
+      regions = RegionSet.of_list (List.init st.num_regions (fun i -> i));
+      site_parent_map = SiteMap.empty;
+      region_nodes;
+    }
   in
-
+  let port_links = st.port_links in
   let linking port_id =
-    try PortMap.find port_id link_map with Not_found -> None
+    match PortMap.find_opt port_id port_links with Some l -> l | None -> None
   in
-
-  { edges; outer_names = []; inner_names = []; linking }
+  let link =
+    {
+      edges = EdgeSet.of_list (List.init st.num_edges (fun i -> i));
+      outer_names = [];
+      inner_names = [];
+      linking;
+    }
+  in
+  let signature = Hashtbl.fold (fun _ ctrl acc -> ctrl :: acc) st.ctrl_table [] in
+  ({ place; link; signature }, index)
 
 (** Main parser function - converts OSM JSON to bigraph *)
-let parse_osm_json filename =
-  let json = Yojson.Safe.from_file filename in
-
-  let signature = parse_controls json in
-  let nodes = parse_nodes json signature in
-  let place = parse_place_graph json nodes in
-  let link = parse_link_graph json nodes in
-
-  { place; link; signature }
+let parse_osm_json filename = fst (parse_osm_json_indexed filename)
 
 (* Search functions *)
 
-(** Find a node by its OSM ID (e.g., "way 123456789") *)
-let find_by_osm_id bigraph osm_id =
-  NodeMap.fold
-    (fun _node_id node acc ->
-      match acc with
-      | Some _ -> acc (* Already found *)
-      | None -> (
-          match node.properties with
-          | Some props -> (
-              match List.assoc_opt "osm_id" props with
-              | Some (String id) when id = osm_id -> Some node
-              | _ -> None)
-          | None -> None))
-    bigraph.place.nodes None
+(** Find a node by its OSM ID (e.g., "way 123456789"); O(log n) with the
+    graph's [index], otherwise a scan that stops at the first hit *)
+let find_by_osm_id ?index bigraph osm_id =
+  match index with
+  | Some idx -> Osm_index.find_node idx bigraph osm_id
+  | None ->
+      NodeMap.to_seq bigraph.place.nodes
+      |> Seq.find_map (fun (_, node) ->
+             if Osm_index.osm_id_of node = Some osm_id then Some node else None)
 
 (** Find all nodes of a given type (e.g., "Building", "Street") *)
 let find_by_type bigraph node_type =
@@ -0,0 +1,56 @@
+"""Build redex/reactum bigraphs from ancestor paths of a target bigraph.
+
+The matcher maps pattern roots onto target roots, so a rule that touches a
+node deep in a building has to spell out the whole chain from the root down
+to it. These helpers copy that chain (ids, names, types and properties) from
+a loaded target so generated rules match exactly one place and leave the
+properties of the nodes on the path untouched.
+"""
+from bigraph_dsl import Bigraph, Node
+
+def index_parents(bg: Bigraph) -> dict:
+    """Map node id -> parent Node (None for roots)."""
+    parents = {}
+    stack = [(r, None) for r in bg.nodes]
+    while stack:
+        node, parent = stack.pop()
+        parents[node.id] = parent
+        stack.extend((c, node) for c in node.children)
+    return parents
+
+def ancestor_path(parents: dict, node: Node) -> list:
+    """Nodes from the root down to (and including) node."""
+    path = [node]
+    while parents.get(path[-1].id) is not None:
+        path.append(parents[path[-1].id])
+    return path[::-1]
+
+def copy_node(n: Node, props=None) -> Node:
+    properties = dict(n.properties or {})
+    if props:
+        properties.update(props)
+    return Node(n.control, id=n.id, arity=n.arity, name=n.name,
+                node_type=n.node_type, properties=properties, children=[])
+
+def path_bigraph(paths, overrides=None) -> Bigraph:
+    """Merge root-to-node paths into one pattern tree.
+
+    `overrides` maps node id -> properties to set on that node's copy. Paths
+    sharing a prefix share the copied nodes, so sibling targets under the
+    same room or level produce a single subtree.
+    """
+    overrides = overrides or {}
+    copies = {}
+    roots = []
+    for path in paths:
+        parent = None
+        for n in path:
+            c = copies.get(n.id)
+            if c is None:
+                c = copies[n.id] = copy_node(n, overrides.get(n.id))
+                if parent is None:
+                    roots.append(c)
+                else:
+                    parent.children.append(c)
+            parent = c
+    return Bigraph(roots)
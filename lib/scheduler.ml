@@ -0,0 +1,100 @@
+(** Run a prioritised rule set to a fixpoint
+
+    Each step takes the highest priority level that can change the state.
+    All matches of that level's rules are found on the current state, and a
+    set of them with pairwise disjoint target nodes is picked greedily:
+    rules in the order given, each rule's matches in Matching's order. The
+    set is applied with [Matching.rewrite_batch], so the place graph is
+    rebuilt once per step rather than once per match. A level whose matches
+    change nothing (e.g. rules whose reactum equals their redex) is passed
+    over. The run has converged at the first step where no level changes
+    the state, and stops unconverged after [max_steps] steps. *)
+
+open Bigraph
+open Bigraph_events
+
+type step = {
+  index : int; (* 1-based *)
+  level : int; (* priority of the rules applied *)
+  applied : int; (* matches applied together *)
+  events : graph_event list;
+  step_s : float;
+}
+
+type report = {
+  final : bigraph_with_interface;
+  steps : int;
+  applications : int;
+  per_step : int list;
+  converged : bool;
+  elapsed_s : float;
+}
+
+(* Rules grouped by priority, highest first, keeping their order *)
+let levels (rules : (int * Matching.reaction_rule) list) =
+  List.sort_uniq (fun a b -> compare b a) (List.map fst rules)
+  |> List.map (fun p ->
+         (p, List.filter_map (fun (q, r) -> if q = p then Some r else None) rules))
+
+(** Matches of [rules] on [state] with pairwise disjoint target nodes *)
+let select (rules : Matching.reaction_rule list) (state : bigraph_with_interface)
+    : (Matching.reaction_rule * (node_id * node_id) list) list =
+  let used = Hashtbl.create 64 in
+  List.concat_map
+    (fun (rule : Matching.reaction_rule) ->
+      Matching.find_structural_matches_seq rule.redex.bigraph state.bigraph
+      |> Seq.filter (fun m ->
+             if List.exists (fun (_, tid) -> Hashtbl.mem used tid) m then false
+             else (
+               List.iter (fun (_, tid) -> Hashtbl.replace used tid ()) m;
+               true))
+      |> Seq.map (fun m -> (rule, m))
+      |> List.of_seq)
+    rules
+
+(* Apply one level's disjoint matches; None if that changes nothing *)
+let apply_level rules (state : bigraph_with_interface) =
+  match select rules state with
+  | [] -> None
+  | batch ->
+      let bigraph, events = Matching.rewrite_batch state.bigraph batch in
+      let ids = State_store.touched_of_events events in
+      if State_store.diff_states ~ids state.bigraph bigraph = [] then None
+      else Some ({ state with bigraph }, List.length batch, events)
+
+(** Run [rules] (priority, rule) on [state]; [on_step] sees every step with
+    the state it produced *)
+let run ?(max_steps = max_int) ?(on_step = fun _ _ -> ())
+    (rules : (int * Matching.reaction_rule) list) (state : bigraph_with_interface)
+    : report =
+  let levels = levels rules in
+  let t0 = Unix.gettimeofday () in
+  let finish final per_step converged =
+    {
+      final;
+      steps = List.length per_step;
+      applications = List.fold_left ( + ) 0 per_step;
+      per_step = List.rev per_step;
+      converged;
+      elapsed_s = Unix.gettimeofday () -. t0;
+    }
+  in
+  let rec first state = function
+    | [] -> None
+    | (level, rs) :: rest -> (
+        match apply_level rs state with
+        | Some r -> Some (level, r)
+        | None -> first state rest)
+  in
+  let rec loop state n per_step =
+    if n >= max_steps then finish state per_step false
+    else
+      let ts = Unix.gettimeofday () in
+      match first state levels with
+      | None -> finish state per_step true
+      | Some (level, (state', applied, events)) ->
+          let step_s = Unix.gettimeofday () -. ts in
+          on_step { index = n + 1; level; applied; events; step_s } state';
+          loop state' (n + 1) (applied :: per_step)
+  in
+  loop state 0 []
@@ -0,0 +1,468 @@
+(** Subtree-sharded rule application across worker processes
+
+    The place graph is cut at [depth]: every node at that depth (a unit: a
+    Building at depth 0, or a Level of a single building at depth 1) goes,
+    with its whole subtree, to one of [workers] forked processes, and the
+    nodes above the cut (the spine) are copied into every shard. A worker
+    holds only its part and applies the rules it is sent with Matching, so
+    each match scans one part and the shards run in parallel.
+
+    A rule is routed to a shard when every unit its redex can be anchored at
+    lives there, it leaves the spine and the units as they are, and the
+    nodes it adds take ids free in every shard (so no worker renumbers).
+    Anything else takes the slow path: the coordinator waits for all
+    workers, merges their parts, applies the rule itself and sends the
+    changed parts back.
+
+    Requests and replies are Marshal'd over pipes, with closures since link
+    graphs hold one and the workers run the same executable. *)
+
+open Bigraph
+open Bigraph_events
+
+type request =
+  | Apply of Matching.reaction_rule
+  | Fetch
+  | Load of bigraph_with_interface
+  | Stop
+
+type reply = Applied of graph_event list option | State of bigraph_with_interface
+
+type worker = {
+  pid : int;
+  to_w : out_channel;
+  of_w : in_channel;
+  inflight : (int * node_id list) Queue.t; (* seq, ids claimed by the rule *)
+}
+
+type t = {
+  depth : int;
+  window : int;
+  workers : worker array;
+  on_result : int -> graph_event list option -> unit;
+  (* the spine, with the link graph, interfaces and signature *)
+  mutable base : bigraph_with_interface;
+  (* shard of every node and of every id claimed by an in-flight rule;
+     spine nodes map to [spine] *)
+  mutable owner : int NodeMap.t;
+  (* unit nodes by name, with their shard *)
+  mutable units : (string, node * int) Hashtbl.t;
+  mutable next_seq : int;
+  local : int array;
+  mutable spanning : int;
+  mutable reloads : int;
+}
+
+let spine = -1
+
+let send oc v =
+  Marshal.to_channel oc v [ Marshal.Closures ];
+  flush oc
+
+let recv (w : worker) : reply =
+  try Marshal.from_channel w.of_w
+  with End_of_file -> failwith (Printf.sprintf "Shard: worker %d exited" w.pid)
+
+(* --------- partition --------- *)
+
+(* The depth-[depth] ancestor of every node at or below the cut *)
+let units_of depth (bg : bigraph) : node_id NodeMap.t =
+  let children = Hashtbl.create (NodeMap.cardinal bg.place.nodes) in
+  NodeMap.iter (fun c p -> Hashtbl.add children p c) bg.place.parent_map;
+  let rec go d unit_id id acc =
+    let unit_id = if d = depth then Some id else unit_id in
+    let acc =
+      match unit_id with Some u -> NodeMap.add id u acc | None -> acc
+    in
+    List.fold_left
+      (fun acc c -> go (d + 1) unit_id c acc)
+      acc
+      (Hashtbl.find_all children id)
+  in
+  NodeMap.fold
+    (fun id _ acc ->
+      if NodeMap.mem id bg.place.parent_map then acc else go 0 None id acc)
+    bg.place.nodes NodeMap.empty
+
+(* Shard of every unit: units in [prev] keep theirs, the others go largest
+   first to the least loaded shard *)
+let assign ?(prev = NodeMap.empty) workers (unit_of : node_id NodeMap.t) =
+  let size = Hashtbl.create 64 in
+  NodeMap.iter
+    (fun _ u ->
+      Hashtbl.replace size u (1 + Option.value (Hashtbl.find_opt size u) ~default:0))
+    unit_of;
+  let load = Array.make workers 0 in
+  let kept, fresh =
+    Hashtbl.fold
+      (fun u n (kept, fresh) ->
+        match NodeMap.find_opt u prev with
+        | Some s ->
+            load.(s) <- load.(s) + n;
+            (NodeMap.add u s kept, fresh)
+        | None -> (kept, (u, n) :: fresh))
+      size (NodeMap.empty, [])
+  in
+  List.sort (fun (u1, a) (u2, b) -> compare (b, u1) (a, u2)) fresh
+  |> List.fold_left
+       (fun acc (u, n) ->
+         let s = ref 0 in
+         Array.iteri (fun i l -> if l < load.(!s) then s := i) load;
+         load.(!s) <- load.(!s) + n;
+         NodeMap.add u !s acc)
+       kept
+
+(* Node -> shard, and unit -> shard *)
+let layout ?prev workers depth (s : bigraph_with_interface) =
+  let unit_of = units_of depth s.bigraph in
+  let shard_of = assign ?prev workers unit_of in
+  let owner =
+    NodeMap.mapi
+      (fun id _ ->
+        match NodeMap.find_opt id unit_of with
+        | Some u -> NodeMap.find u shard_of
+        | None -> spine)
+      s.bigraph.place.nodes
+  in
+  (owner, shard_of)
+
+let unit_table (bg : bigraph) shard_of =
+  let tbl = Hashtbl.create 64 in
+  NodeMap.iter
+    (fun u s ->
+      let n = NodeMap.find u bg.place.nodes in
+      Hashtbl.add tbl n.name (n, s))
+    shard_of;
+  tbl
+
+let restrict (s : bigraph_with_interface) keep =
+  let place = s.bigraph.place in
+  let nodes = NodeMap.filter (fun id _ -> keep id) place.nodes in
+  let parent_map = NodeMap.filter (fun id _ -> keep id) place.parent_map in
+  { s with bigraph = { s.bigraph with place = { place with nodes; parent_map } } }
+
+let part s owner i =
+  restrict s (fun id ->
+      let o = NodeMap.find id owner in
+      o = i || o = spine)
+
+(* --------- workers --------- *)
+
+let serve (state : bigraph_with_interface) ic oc =
+  let rec loop state =
+    match (Marshal.from_channel ic : request) with
+    | Apply rule -> (
+        match Matching.apply_rule_with_events rule state with
+        | Some (s, events) ->
+            send oc (Applied (Some events));
+            loop s
+        | None ->
+            send oc (Applied None);
+            loop state)
+    | Fetch ->
+        send oc (State state);
+        loop state
+    | Load s -> loop s
+    | Stop -> ()
+    | exception End_of_file -> ()
+  in
+  loop state
+
+let spawn (parts : bigraph_with_interface array) : worker array =
+  flush_all ();
+  let workers = ref [] in
+  Array.iter
+    (fun part ->
+      let req_r, req_w = Unix.pipe ~cloexec:true () in
+      let rep_r, rep_w = Unix.pipe ~cloexec:true () in
+      match Unix.fork () with
+      | 0 ->
+          List.iter
+            (fun w ->
+              close_out_noerr w.to_w;
+              close_in_noerr w.of_w)
+            !workers;
+          Unix.close req_w;
+          Unix.close rep_r;
+          (try
+             serve part
+               (Unix.in_channel_of_descr req_r)
+               (Unix.out_channel_of_descr rep_w)
+           with _ -> ());
+          Unix._exit 0
+      | pid ->
+          Unix.close req_r;
+          Unix.close rep_w;
+          workers :=
+            {
+              pid;
+              to_w = Unix.out_channel_of_descr req_w;
+              of_w = Unix.in_channel_of_descr rep_r;
+              inflight = Queue.create ();
+            }
+            :: !workers)
+    parts;
+  Array.of_list (List.rev !workers)
+
+(** Fork [workers] processes (default 2) holding the parts of [state] cut at
+    [depth] (default: 0 if there are at least as many roots as workers,
+    else 1). At most [window] rules are in flight per worker. [on_result]
+    receives each rule's sequence number (as returned by [submit]) and its
+    graph events, or None if it did not apply; results of rules routed to
+    the same shard arrive in submission order. *)
+let create ?(workers = 2) ?depth ?(window = 32) ?(on_result = fun _ _ -> ())
+    (state : bigraph_with_interface) =
+  if workers < 1 then invalid_arg "Shard.create: workers must be positive";
+  let depth =
+    match depth with
+    | Some d -> d
+    | None ->
+        let place = state.bigraph.place in
+        let roots =
+          NodeMap.fold
+            (fun id _ n -> if NodeMap.mem id place.parent_map then n else n + 1)
+            place.nodes 0
+        in
+        if roots >= workers then 0 else 1
+  in
+  let owner, shard_of = layout workers depth state in
+  let parts = Array.init workers (part state owner) in
+  {
+    depth;
+    window = max 1 window;
+    workers = spawn parts;
+    on_result;
+    base = restrict state (fun id -> NodeMap.find id owner = spine);
+    owner;
+    units = unit_table state.bigraph shard_of;
+    next_seq = 0;
+    local = Array.make workers 0;
+    spanning = 0;
+    reloads = 0;
+  }
+
+(* Take the oldest in-flight result of worker [i] *)
+let collect t i =
+  let w = t.workers.(i) in
+  let seq, claimed = Queue.pop w.inflight in
+  match recv w with
+  | Applied res ->
+      (t.owner <-
+         match res with
+         | None -> List.fold_left (fun m id -> NodeMap.remove id m) t.owner claimed
+         | Some events ->
+             List.fold_left
+               (fun m -> function
+                 | NodeRemoved id -> NodeMap.remove id m
+                 | NodeAdded n -> NodeMap.add n.id i m
+                 | PropertyChanged _ | PropertyRemoved _ | NodeMoved _
+                 | RuleApplied _ ->
+                     m)
+               t.owner events);
+      t.on_result seq res
+  | State _ -> failwith "Shard: unexpected state reply"
+
+(** Wait until every submitted rule has been applied *)
+let sync t =
+  Array.iteri
+    (fun i w ->
+      while not (Queue.is_empty w.inflight) do
+        collect t i
+      done)
+    t.workers
+
+(** The whole current state, merged from the workers' parts *)
+let state t : bigraph_with_interface =
+  sync t;
+  Array.iter (fun w -> send w.to_w Fetch) t.workers;
+  let union a b = NodeMap.union (fun _ x _ -> Some x) a b in
+  Array.fold_left
+    (fun (acc : bigraph_with_interface) w ->
+      match recv w with
+      | State s ->
+          let place = acc.bigraph.place and sp = s.bigraph.place in
+          let signature =
+            List.fold_left
+              (fun sg (c : control) ->
+                if List.exists (fun (c' : control) -> c'.name = c.name) sg then sg
+                else sg @ [ c ])
+              acc.bigraph.signature s.bigraph.signature
+          in
+          {
+            acc with
+            bigraph =
+              {
+                acc.bigraph with
+                place =
+                  {
+                    place with
+                    nodes = union place.nodes sp.nodes;
+                    parent_map = union place.parent_map sp.parent_map;
+                  };
+                signature;
+              };
+          }
+      | Applied _ -> failwith "Shard: unexpected result reply")
+    t.base t.workers
+
+(* --------- routing --------- *)
+
+type route = Local of int * node_id list | Spanning
+
+(* Shards holding a unit the anchor [pn] may match; properties are ignored
+   since workers change them without telling the coordinator *)
+let anchor_shards t (pn : node) =
+  let cands =
+    if pn.name <> "" then Hashtbl.find_all t.units pn.name
+    else Hashtbl.fold (fun _ c acc -> c :: acc) t.units []
+  in
+  let pn = { pn with properties = None } in
+  List.fold_left
+    (fun acc ((un : node), s) ->
+      if
+        Matching.nodes_compatible ~check_name:(pn.name <> "")
+          ~check_type:(pn.node_type <> "") pn un
+      then NodeSet.add s acc
+      else acc)
+    NodeSet.empty cands
+
+(* Whether rewriting any spine node [pn] may match with [rn] leaves it as is *)
+let spine_kept t (pn : node) (rn : node) =
+  let check_name = pn.name <> "" and check_type = pn.node_type <> "" in
+  NodeMap.for_all
+    (fun _ (tn : node) ->
+      (not (Matching.nodes_compatible ~check_name ~check_type pn tn))
+      || (rn.properties = tn.properties && rn.ports = tn.ports))
+    t.base.bigraph.place.nodes
+
+let route t (rule : Matching.reaction_rule) : route =
+  let redex = rule.redex.bigraph.place and reactum = rule.reactum.bigraph.place in
+  let rdepth = Matching.compute_depths rule.redex.bigraph in
+  let adepth = Matching.compute_depths rule.reactum.bigraph in
+  let d = t.depth in
+  (* nothing at or above the cut is added, removed, moved or (above the
+     cut) changed *)
+  let layer_kept =
+    NodeMap.for_all
+      (fun id (pn : node) ->
+        let dr = Hashtbl.find rdepth id in
+        match NodeMap.find_opt id reactum.nodes with
+        | None -> dr > d
+        | Some _ when dr > d -> Hashtbl.find adepth id > d
+        | Some rn ->
+            Hashtbl.find adepth id = dr
+            && rn.control = pn.control
+            && (dr = d
+               || NodeMap.find_opt id reactum.parent_map
+                  = NodeMap.find_opt id redex.parent_map
+                  && spine_kept t pn rn))
+      redex.nodes
+    && NodeMap.for_all
+         (fun id _ -> NodeMap.mem id redex.nodes || Hashtbl.find adepth id > d)
+         reactum.nodes
+  in
+  let added =
+    NodeMap.fold
+      (fun id _ acc -> if NodeMap.mem id redex.nodes then acc else id :: acc)
+      reactum.nodes []
+  in
+  if (not layer_kept) || List.exists (fun id -> NodeMap.mem id t.owner) added
+  then Spanning
+  else
+    let anchors =
+      NodeMap.fold
+        (fun id pn acc ->
+          if Hashtbl.find rdepth id = d then anchor_shards t pn :: acc else acc)
+        redex.nodes []
+    in
+    if List.exists NodeSet.is_empty anchors then
+      (* cannot match anywhere; any worker will say so in order *)
+      Local (0, [])
+    else
+      match NodeSet.elements (List.fold_left NodeSet.union NodeSet.empty anchors) with
+      | [] -> Local (0, [])
+      | [ s ] -> Local (s, added)
+      | _ -> Spanning
+
+(* --------- apply --------- *)
+
+let changed (a : bigraph) (b : bigraph) id =
+  NodeMap.find_opt id a.place.nodes <> NodeMap.find_opt id b.place.nodes
+  || NodeMap.find_opt id a.place.parent_map <> NodeMap.find_opt id b.place.parent_map
+
+let apply_spanning t seq rule =
+  let before = state t in
+  let res = Matching.apply_rule_with_events rule before in
+  (match res with
+  | None -> ()
+  | Some (after, events) ->
+      let n = Array.length t.workers in
+      let prev =
+        Hashtbl.fold (fun _ ((un : node), s) m -> NodeMap.add un.id s m) t.units
+          NodeMap.empty
+      in
+      let owner, shard_of = layout ~prev n t.depth after in
+      let dirty = Array.make n false in
+      NodeSet.iter
+        (fun id ->
+          if changed before.bigraph after.bigraph id then
+            List.iter
+              (fun m ->
+                match NodeMap.find_opt id m with
+                | Some o when o = spine -> Array.fill dirty 0 n true
+                | Some o -> dirty.(o) <- true
+                | None -> ())
+              [ t.owner; owner ])
+        (State_store.touched_of_events events);
+      Array.iteri
+        (fun i w ->
+          if dirty.(i) then (
+            send w.to_w (Load (part after owner i));
+            t.reloads <- t.reloads + 1))
+        t.workers;
+      t.owner <- owner;
+      t.units <- unit_table after.bigraph shard_of;
+      t.base <- restrict after (fun id -> NodeMap.find id owner = spine));
+  t.on_result seq (Option.map snd res)
+
+(** Queue [rule] for application and return its sequence number. Rules
+    local to one shard return at once unless that worker's window is full;
+    spanning rules are applied before returning. *)
+let submit t (rule : Matching.reaction_rule) : int =
+  let seq = t.next_seq in
+  t.next_seq <- seq + 1;
+  (match route t rule with
+  | Local (i, claimed) ->
+      let w = t.workers.(i) in
+      if Queue.length w.inflight >= t.window then collect t i;
+      t.owner <- List.fold_left (fun m id -> NodeMap.add id i m) t.owner claimed;
+      send w.to_w (Apply rule);
+      Queue.push (seq, claimed) w.inflight;
+      t.local.(i) <- t.local.(i) + 1
+  | Spanning ->
+      t.spanning <- t.spanning + 1;
+      apply_spanning t seq rule);
+  seq
+
+(** Stop the workers, after the rules in flight *)
+let close t =
+  sync t;
+  Array.iter
+    (fun w ->
+      send w.to_w Stop;
+      close_out_noerr w.to_w;
+      close_in_noerr w.of_w;
+      ignore (Unix.waitpid [] w.pid))
+    t.workers
+
+let depth t = t.depth
+let workers t = Array.length t.workers
+
+(** Rules sent to each worker so far *)
+let local_counts t = Array.copy t.local
+
+(** Rules applied through the slow path so far *)
+let spanning t = t.spanning
+
+(** Parts sent back to workers by the slow path *)
+let reloads t = t.reloads
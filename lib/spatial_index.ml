@@ -0,0 +1,297 @@
+(** Grid index over OSM building and area footprints
+
+    Footprints (outer rings in lat/lon degrees) are bucketed by bounding box
+    into a uniform grid of [cell]-degree squares. A point-in-polygon query
+    looks at a single cell; a nearest query scans rings of cells outward from
+    the query point and stops once no unseen footprint can be closer. This is
+    the in-process replacement for a Nominatim reverse-geocode round trip. *)
+
+type point = { lat : float; lon : float }
+
+type footprint = {
+  osm_id : string; (* "way 123", as in the bigraph's osm_id property *)
+  kind : string; (* "building", "amenity", "landuse" or "area" *)
+  rings : point array list; (* outer rings *)
+  min_lat : float;
+  min_lon : float;
+  max_lat : float;
+  max_lon : float;
+}
+
+type t = {
+  cell : float;
+  footprints : (string, footprint) Hashtbl.t;
+  grid : (int * int, footprint list) Hashtbl.t;
+  (* occupied cell range, only ever grown; bounds nearest searches *)
+  mutable lo_x : int;
+  mutable hi_x : int;
+  mutable lo_y : int;
+  mutable hi_y : int;
+}
+
+let footprint ~osm_id ~kind rings =
+  let pts = List.concat_map Array.to_list rings in
+  if pts = [] then invalid_arg "Spatial_index.footprint: no points";
+  let fold f init = List.fold_left f init pts in
+  {
+    osm_id;
+    kind;
+    rings;
+    min_lat = fold (fun a p -> Float.min a p.lat) infinity;
+    min_lon = fold (fun a p -> Float.min a p.lon) infinity;
+    max_lat = fold (fun a p -> Float.max a p.lat) neg_infinity;
+    max_lon = fold (fun a p -> Float.max a p.lon) neg_infinity;
+  }
+
+(* ~0.001 degrees is 111 m of latitude, a few buildings per cell *)
+let create ?(cell = 0.001) ?(size = 1024) () =
+  {
+    cell;
+    footprints = Hashtbl.create size;
+    grid = Hashtbl.create size;
+    lo_x = max_int;
+    hi_x = min_int;
+    lo_y = max_int;
+    hi_y = min_int;
+  }
+
+let size t = Hashtbl.length t.footprints
+let find t osm_id = Hashtbl.find_opt t.footprints osm_id
+let cell_x t lon = int_of_float (Float.floor (lon /. t.cell))
+let cell_y t lat = int_of_float (Float.floor (lat /. t.cell))
+
+let iter_cells t fp f =
+  for x = cell_x t fp.min_lon to cell_x t fp.max_lon do
+    for y = cell_y t fp.min_lat to cell_y t fp.max_lat do
+      f (x, y)
+    done
+  done
+
+let remove t osm_id =
+  match find t osm_id with
+  | None -> ()
+  | Some fp ->
+      Hashtbl.remove t.footprints osm_id;
+      iter_cells t fp (fun c ->
+          match Hashtbl.find_opt t.grid c with
+          | None -> ()
+          | Some fps -> (
+              match List.filter (fun f -> f.osm_id <> osm_id) fps with
+              | [] -> Hashtbl.remove t.grid c
+              | rest -> Hashtbl.replace t.grid c rest))
+
+(** Insert or replace a footprint *)
+let add t fp =
+  remove t fp.osm_id;
+  Hashtbl.replace t.footprints fp.osm_id fp;
+  iter_cells t fp (fun ((x, y) as c) ->
+      let prev = Option.value (Hashtbl.find_opt t.grid c) ~default:[] in
+      Hashtbl.replace t.grid c (fp :: prev);
+      t.lo_x <- min t.lo_x x;
+      t.hi_x <- max t.hi_x x;
+      t.lo_y <- min t.lo_y y;
+      t.hi_y <- max t.hi_y y)
+
+(** Bulk load, sizing the tables for [fps] up front *)
+let of_list ?cell fps =
+  let t = create ?cell ~size:(2 * List.length fps) () in
+  List.iter (add t) fps;
+  t
+
+(* --------- geometry --------- *)
+
+(* Even-odd ray casting *)
+let in_ring (p : point) (ring : point array) =
+  let n = Array.length ring in
+  let inside = ref false in
+  let j = ref (n - 1) in
+  for i = 0 to n - 1 do
+    let a = ring.(i) and b = ring.(!j) in
+    if
+      a.lat > p.lat <> (b.lat > p.lat)
+      && p.lon
+         < ((b.lon -. a.lon) *. (p.lat -. a.lat) /. (b.lat -. a.lat)) +. a.lon
+    then inside := not !inside;
+    j := i
+  done;
+  !inside
+
+let contains fp p =
+  p.lat >= fp.min_lat && p.lat <= fp.max_lat && p.lon >= fp.min_lon
+  && p.lon <= fp.max_lon
+  && List.exists (in_ring p) fp.rings
+
+let m_per_deg = 111_320.0
+
+(* Metres from [p] to the footprint's boundary (0 inside), on a local
+   equirectangular projection around [p] *)
+let distance_m fp p =
+  if contains fp p then 0.0
+  else
+    let kx = m_per_deg *. Float.cos (p.lat *. Float.pi /. 180.0) in
+    let xy q = ((q.lon -. p.lon) *. kx, (q.lat -. p.lat) *. m_per_deg) in
+    let seg (ax, ay) (bx, by) =
+      let dx = bx -. ax and dy = by -. ay in
+      let len2 = (dx *. dx) +. (dy *. dy) in
+      let s =
+        if len2 = 0.0 then 0.0
+        else
+          Float.max 0.0 (Float.min 1.0 (-.((ax *. dx) +. (ay *. dy)) /. len2))
+      in
+      Float.hypot (ax +. (s *. dx)) (ay +. (s *. dy))
+    in
+    List.fold_left
+      (fun best ring ->
+        let n = Array.length ring in
+        let best = ref best in
+        for i = 0 to n - 1 do
+          best := Float.min !best (seg (xy ring.(i)) (xy ring.((i + 1) mod n)))
+        done;
+        !best)
+      infinity fp.rings
+
+let area fp = (fp.max_lat -. fp.min_lat) *. (fp.max_lon -. fp.min_lon)
+let matches kind fp = match kind with None -> true | Some k -> fp.kind = k
+
+(* --------- queries --------- *)
+
+(** The smallest footprint containing the point, e.g. the building rather
+    than the campus around it *)
+let containing ?kind t ~lat ~lon =
+  let p = { lat; lon } in
+  match Hashtbl.find_opt t.grid (cell_x t lon, cell_y t lat) with
+  | None -> None
+  | Some fps ->
+      List.fold_left
+        (fun best fp ->
+          if matches kind fp && contains fp p then
+            match best with
+            | Some b when area b <= area fp -> best
+            | _ -> Some fp
+          else best)
+        None fps
+
+(** The closest footprint and its distance in metres, searching at most
+    [max_m] away *)
+let nearest ?kind ?(max_m = infinity) t ~lat ~lon =
+  let p = { lat; lon } in
+  let cx = cell_x t lon and cy = cell_y t lat in
+  (* every unseen footprint lies outside the (2r+1)^2 block around the
+     query cell, so at least r cells away along some axis *)
+  let cell_m =
+    t.cell *. m_per_deg
+    *. Float.min 1.0 (Float.cos (lat *. Float.pi /. 180.0))
+  in
+  let max_r =
+    if size t = 0 then -1
+    else
+      List.fold_left max 0
+        [ t.hi_x - cx; cx - t.lo_x; t.hi_y - cy; cy - t.lo_y ]
+  in
+  let seen = Hashtbl.create 16 in
+  let best = ref None in
+  let consider fp =
+    if matches kind fp && not (Hashtbl.mem seen fp.osm_id) then (
+      Hashtbl.replace seen fp.osm_id ();
+      let d = distance_m fp p in
+      match !best with
+      | Some (_, bd) when bd <= d -> ()
+      | _ -> if d <= max_m then best := Some (fp, d))
+  in
+  let visit x y =
+    match Hashtbl.find_opt t.grid (x, y) with
+    | Some fps -> List.iter consider fps
+    | None -> ()
+  in
+  let rec ring r =
+    let bound = float (r - 1) *. cell_m in
+    let done_ =
+      r > max_r || bound > max_m
+      || (match !best with Some (_, d) -> d <= bound | None -> false)
+    in
+    if not done_ then (
+      if r = 0 then visit cx cy
+      else (
+        for x = cx - r to cx + r do
+          visit x (cy - r);
+          visit x (cy + r)
+        done;
+        for y = cy - r + 1 to cy + r - 1 do
+          visit (cx - r) y;
+          visit (cx + r) y
+        done);
+      ring (r + 1))
+  in
+  ring 0;
+  !best
+
+(** Reverse geocode: the containing footprint, else the nearest one *)
+let locate ?kind ?max_m t ~lat ~lon =
+  match containing ?kind t ~lat ~lon with
+  | Some fp -> Some fp
+  | None -> Option.map fst (nearest ?kind ?max_m t ~lat ~lon)
+
+(* --------- GeoJSON --------- *)
+
+open Yojson.Safe.Util
+
+let properties feature =
+  match member "properties" feature with `Assoc _ as p -> p | _ -> `Assoc []
+
+(* "way/123" (osmtogeojson, Overpass) -> "way 123" *)
+let osm_id_of_feature feature =
+  let props = properties feature in
+  let raw =
+    match member "id" feature with
+    | `String s -> Some s
+    | _ -> ( match member "@id" props with `String s -> Some s | _ -> None)
+  in
+  Option.map (String.map (fun c -> if c = '/' then ' ' else c)) raw
+
+let kind_of_feature feature =
+  let props = properties feature in
+  match
+    List.find_opt
+      (fun k -> member k props <> `Null)
+      [ "building"; "amenity"; "landuse" ]
+  with
+  | Some k -> k
+  | None -> "area"
+
+let outer_rings geometry =
+  let ring coords =
+    to_list coords
+    |> List.map (fun c ->
+           match to_list c with
+           | lon :: lat :: _ -> { lat = to_number lat; lon = to_number lon }
+           | _ -> failwith "Spatial_index: bad coordinate")
+    |> Array.of_list
+  in
+  let first_ring poly =
+    match to_list poly with r :: _ -> [ ring r ] | [] -> []
+  in
+  match member "type" geometry with
+  | `String "Polygon" -> first_ring (member "coordinates" geometry)
+  | `String "MultiPolygon" ->
+      List.concat_map first_ring (to_list (member "coordinates" geometry))
+  | _ -> []
+
+(** Polygon and MultiPolygon features of a GeoJSON FeatureCollection that
+    carry an OSM id; [kinds] keeps only those kinds *)
+let footprints_of_geojson ?kinds json =
+  member "features" json |> to_list
+  |> List.filter_map (fun feature ->
+         match osm_id_of_feature feature with
+         | None -> None
+         | Some osm_id -> (
+             let kind = kind_of_feature feature in
+             let keep =
+               match kinds with None -> true | Some ks -> List.mem kind ks
+             in
+             match outer_rings (member "geometry" feature) with
+             | rings when keep && rings <> [] ->
+                 Some (footprint ~osm_id ~kind rings)
+             | _ -> None))
+
+let of_geojson_file ?cell ?kinds filename =
+  of_list ?cell (footprints_of_geojson ?kinds (Yojson.Safe.from_file filename))
@@ -0,0 +1,161 @@
+"""Grid index over OSM building and area footprints (mirrors lib/spatial_index.ml).
+
+Footprints are outer rings of (lat, lon) points bucketed by bounding box into
+uniform cells of `cell` degrees. `containing` is a point-in-polygon test over
+one cell; `nearest` searches rings of cells outward and stops once no unseen
+footprint can be closer. Footprints load from a GeoJSON FeatureCollection
+whose features carry OSM ids ("way/123" -> "way 123").
+"""
+import json, math
+
+M_PER_DEG = 111_320.0
+
+class Footprint:
+    __slots__ = ("osm_id", "kind", "rings", "min_lat", "min_lon", "max_lat", "max_lon")
+
+    def __init__(self, osm_id, kind, rings):
+        pts = [p for r in rings for p in r]
+        if not pts:
+            raise ValueError(f"footprint {osm_id} has no points")
+        self.osm_id, self.kind, self.rings = osm_id, kind, rings
+        self.min_lat = min(p[0] for p in pts)
+        self.max_lat = max(p[0] for p in pts)
+        self.min_lon = min(p[1] for p in pts)
+        self.max_lon = max(p[1] for p in pts)
+
+    @property
+    def area(self):
+        return (self.max_lat - self.min_lat) * (self.max_lon - self.min_lon)
+
+    def contains(self, lat, lon):
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon):
+            return False
+        return any(_in_ring(lat, lon, r) for r in self.rings)
+
+    def distance_m(self, lat, lon):
+        """Metres to the boundary (0 inside), on a local equirectangular projection."""
+        if self.contains(lat, lon):
+            return 0.0
+        kx = M_PER_DEG * math.cos(math.radians(lat))
+        best = math.inf
+        for ring in self.rings:
+            pts = [((q[1] - lon) * kx, (q[0] - lat) * M_PER_DEG) for q in ring]
+            for (ax, ay), (bx, by) in zip(pts, pts[1:] + pts[:1]):
+                dx, dy = bx - ax, by - ay
+                len2 = dx * dx + dy * dy
+                s = 0.0 if len2 == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / len2))
+                best = min(best, math.hypot(ax + s * dx, ay + s * dy))
+        return best
+
+def _in_ring(lat, lon, ring):
+    """Even-odd ray casting."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        (alat, alon), (blat, blon) = ring[i], ring[j]
+        if (alat > lat) != (blat > lat) and \
+           lon < (blon - alon) * (lat - alat) / (blat - alat) + alon:
+            inside = not inside
+        j = i
+    return inside
+
+class SpatialIndex:
+    def __init__(self, cell=0.001):
+        self.cell = cell
+        self.footprints = {}   # osm_id -> Footprint
+        self.grid = {}         # (x, y) -> [Footprint]
+        self.bounds = None     # occupied cell range (lo_x, hi_x, lo_y, hi_y), only grown
+
+    def __len__(self):
+        return len(self.footprints)
+
+    def _cells(self, fp):
+        for x in range(math.floor(fp.min_lon / self.cell), math.floor(fp.max_lon / self.cell) + 1):
+            for y in range(math.floor(fp.min_lat / self.cell), math.floor(fp.max_lat / self.cell) + 1):
+                yield x, y
+
+    def remove(self, osm_id):
+        fp = self.footprints.pop(osm_id, None)
+        if fp is None:
+            return
+        for c in self._cells(fp):
+            rest = [f for f in self.grid.get(c, ()) if f.osm_id != osm_id]
+            if rest:
+                self.grid[c] = rest
+            else:
+                self.grid.pop(c, None)
+
+    def add(self, fp):
+        """Insert or replace a footprint."""
+        self.remove(fp.osm_id)
+        self.footprints[fp.osm_id] = fp
+        for x, y in self._cells(fp):
+            self.grid.setdefault((x, y), []).append(fp)
+            b = self.bounds or (x, x, y, y)
+            self.bounds = (min(b[0], x), max(b[1], x), min(b[2], y), max(b[3], y))
+
+    def containing(self, lat, lon, kind=None):
+        """Smallest footprint containing the point, e.g. the building inside a campus."""
+        key = (math.floor(lon / self.cell), math.floor(lat / self.cell))
+        hits = [fp for fp in self.grid.get(key, ())
+                if (kind is None or fp.kind == kind) and fp.contains(lat, lon)]
+        return min(hits, key=lambda fp: fp.area, default=None)
+
+    def nearest(self, lat, lon, kind=None, max_m=math.inf):
+        """(footprint, metres) of the closest footprint within max_m, or None."""
+        if self.bounds is None:
+            return None
+        cx, cy = math.floor(lon / self.cell), math.floor(lat / self.cell)
+        lo_x, hi_x, lo_y, hi_y = self.bounds
+        max_r = max(0, hi_x - cx, cx - lo_x, hi_y - cy, cy - lo_y)
+        # unseen footprints lie outside the (2r+1)^2 block, >= r-1 cells away
+        cell_m = self.cell * M_PER_DEG * min(1.0, math.cos(math.radians(lat)))
+        seen, best = set(), None
+        for r in range(max_r + 1):
+            bound = (r - 1) * cell_m
+            if bound > max_m or (best is not None and best[1] <= bound):
+                break
+            if r == 0:
+                cells = [(cx, cy)]
+            else:
+                cells = [(x, y) for x in range(cx - r, cx + r + 1) for y in (cy - r, cy + r)]
+                cells += [(x, y) for y in range(cy - r + 1, cy + r) for x in (cx - r, cx + r)]
+            for c in cells:
+                for fp in self.grid.get(c, ()):
+                    if fp.osm_id in seen or (kind is not None and fp.kind != kind):
+                        continue
+                    seen.add(fp.osm_id)
+                    d = fp.distance_m(lat, lon)
+                    if d <= max_m and (best is None or d < best[1]):
+                        best = (fp, d)
+        return best
+
+    def locate(self, lat, lon, kind=None, max_m=math.inf):
+        """Reverse geocode: the containing footprint, else the nearest one."""
+        fp = self.containing(lat, lon, kind)
+        if fp is not None:
+            return fp
+        hit = self.nearest(lat, lon, kind, max_m)
+        return hit[0] if hit else None
+
+    # --- GeoJSON ------------------------------------------------------ #
+    @classmethod
+    def from_geojson(cls, path, cell=0.001, kinds=None):
+        with open(path) as f:
+            features = json.load(f).get("features", [])
+        idx = cls(cell)
+        for feat in features:
+            props = feat.get("properties") or {}
+            raw = feat.get("id") if isinstance(feat.get("id"), str) else props.get("@id")
+            if not isinstance(raw, str):
+                continue
+            kind = next((k for k in ("building", "amenity", "landuse") if k in props), "area")
+            if kinds is not None and kind not in kinds:
+                continue
+            geom = feat.get("geometry") or {}
+            polys = {"Polygon": [geom.get("coordinates")],
+                     "MultiPolygon": geom.get("coordinates")}.get(geom.get("type"), [])
+            rings = [[(c[1], c[0]) for c in p[0]] for p in polys if p]
+            if rings:
+                idx.add(Footprint(raw.replace("/", " "), kind, rings))
+        return idx
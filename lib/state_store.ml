@@ -0,0 +1,162 @@
+(** Versioned engine states
+
+    Every committed state is kept by reference: a bigraph is persistent
+    (NodeMaps), so a version costs only the map paths its rule rewrote and
+    committing is O(1) in the graph size. The last [keep] versions are
+    retained, plus any tagged version until it is untagged.
+
+    Commits made with the rule's graph events record which nodes they
+    touched, so a diff across consecutive retained versions compares only
+    those nodes; otherwise Bigraph_diff compares the two graphs in one pass
+    over their node maps. *)
+
+open Bigraph
+open Bigraph_events
+
+type version = int
+
+type entry = {
+  version : version;
+  state : bigraph_with_interface;
+  time : float;
+  (* nodes that may differ from version - 1; None when unknown *)
+  touched : NodeSet.t option;
+}
+
+type t = {
+  keep : int;
+  versions : (version, entry) Hashtbl.t;
+  recent : version Queue.t; (* committed versions, oldest first *)
+  tags : (string, version) Hashtbl.t;
+  mutable head : version;
+}
+
+let create ?(keep = 64) (state : bigraph_with_interface) =
+  if keep < 1 then invalid_arg "State_store.create: keep must be positive";
+  let t =
+    {
+      keep;
+      versions = Hashtbl.create (2 * keep);
+      recent = Queue.create ();
+      tags = Hashtbl.create 8;
+      head = 0;
+    }
+  in
+  Hashtbl.replace t.versions 0
+    { version = 0; state; time = Unix.gettimeofday (); touched = None };
+  Queue.push 0 t.recent;
+  t
+
+let head t = t.head
+let current t = (Hashtbl.find t.versions t.head).state
+let find t v = Option.map (fun e -> e.state) (Hashtbl.find_opt t.versions v)
+let is_tagged t v = Hashtbl.fold (fun _ v' acc -> acc || v' = v) t.tags false
+
+(** Retained versions, oldest first *)
+let versions t =
+  Hashtbl.fold (fun v _ acc -> v :: acc) t.versions [] |> List.sort compare
+
+let touched_of_events events =
+  List.fold_left
+    (fun acc -> function
+      | NodeAdded n -> NodeSet.add n.id acc
+      | NodeRemoved id
+      | PropertyChanged (id, _, _)
+      | PropertyRemoved (id, _)
+      | NodeMoved (id, _) ->
+          NodeSet.add id acc
+      | RuleApplied (_, mapping) ->
+          List.fold_left (fun acc (_, tid) -> NodeSet.add tid acc) acc mapping)
+    NodeSet.empty events
+
+let evict t =
+  while Queue.length t.recent > t.keep do
+    let v = Queue.pop t.recent in
+    if v <> t.head && not (is_tagged t v) then Hashtbl.remove t.versions v
+  done
+
+(** Record [state] as the new head and return its version. [events] are the
+    graph events that produced it from the current head (as returned by
+    [Matching.apply_rule_with_events]); without them later diffs across this
+    version compare whole graphs. *)
+let commit ?events ?time t (state : bigraph_with_interface) : version =
+  let v = t.head + 1 in
+  Hashtbl.replace t.versions v
+    {
+      version = v;
+      state;
+      time = Option.value time ~default:(Unix.gettimeofday ());
+      touched = Option.map touched_of_events events;
+    };
+  t.head <- v;
+  Queue.push v t.recent;
+  evict t;
+  v
+
+(** Pin [version] (default: head) under [name] so it outlives [keep] *)
+let tag ?version t name =
+  let v = Option.value version ~default:t.head in
+  if not (Hashtbl.mem t.versions v) then
+    invalid_arg (Printf.sprintf "State_store.tag: version %d not retained" v);
+  Hashtbl.replace t.tags name v
+
+let untag t name =
+  match Hashtbl.find_opt t.tags name with
+  | None -> ()
+  | Some v ->
+      Hashtbl.remove t.tags name;
+      (* evicted from [recent] already: drop it unless another tag holds it *)
+      if
+        (not (is_tagged t v))
+        && v <> t.head
+        && not (Queue.fold (fun acc v' -> acc || v' = v) false t.recent)
+      then Hashtbl.remove t.versions v
+
+let resolve t name = Hashtbl.find_opt t.tags name
+
+(** The newest retained version committed at or before [time] *)
+let at_time t time =
+  Hashtbl.fold
+    (fun v e best ->
+      if e.time > time then best
+      else match best with Some b when b >= v -> best | _ -> Some v)
+    t.versions None
+
+(* --------- diff --------- *)
+
+(* Nodes touched between [lo] and [hi], if every version in between is
+   retained and was committed with its events *)
+let journal t lo hi =
+  let rec go v acc =
+    if v > hi then Some acc
+    else
+      match Hashtbl.find_opt t.versions v with
+      | Some { touched = Some s; _ } -> go (v + 1) (NodeSet.union s acc)
+      | _ -> None
+  in
+  go (lo + 1) NodeSet.empty
+
+let diff_states = Bigraph_diff.diff
+
+(** Graph events that turn version [from_] into version [to_] (either may be
+    the older one); None if either is no longer retained *)
+let diff t from_ to_ : graph_event list option =
+  match (find t from_, find t to_) with
+  | Some a, Some b ->
+      let ids = journal t (min from_ to_) (max from_ to_) in
+      Some (diff_states ?ids a.bigraph b.bigraph)
+  | _ -> None
+
+(** Make version [v]'s state the head again, as a new version, and return it;
+    the versions after [v] stay in the history *)
+let revert t v : bigraph_with_interface option =
+  match find t v with
+  | None -> None
+  | Some state ->
+      let events =
+        Option.map
+          (fun ids -> diff_states ~ids (current t).bigraph state.bigraph)
+          (journal t (min v t.head) (max v t.head))
+      in
+      ignore (commit ?events t state);
+      Some state
@@ -0,0 +1,119 @@
+(* Declarative effect triggers.
+
+   A trigger names a node type, a property and a transition; the registry
+   is indexed by (node_type, property) so evaluating a rule application
+   only looks at the nodes named in its graph events (see
+   Matching.rule_change_events) and costs nothing per untouched node. *)
+
+open Bigraph
+open Bigraph_events
+
+type transition =
+  | Changed  (** any new value *)
+  | Became of property_value  (** set to this value, from anything else *)
+  | From_to of property_value * property_value
+  | Added  (** node of this type created *)
+  | Removed  (** node of this type deleted *)
+
+type firing = {
+  trigger : string;
+  node : node_id;
+  node_kind : string; (* node_type of [node] *)
+  property : string option;
+  before : property_value option;
+  after : property_value option;
+}
+
+type trigger = {
+  tname : string;
+  transition : transition;
+  action : firing -> unit;
+}
+
+type t = (string * string, trigger list) Hashtbl.t
+
+let create () : t = Hashtbl.create 16
+
+(* Node-level transitions are stored under property "" *)
+let key ~node_type ?property transition =
+  match transition with
+  | Added | Removed -> (node_type, "")
+  | Changed | Became _ | From_to _ -> (
+      match property with
+      | Some p -> (node_type, p)
+      | None ->
+          invalid_arg "Triggers.register: property transition needs ~property")
+
+let register (reg : t) ~name ~node_type ?property transition action =
+  let k = key ~node_type ?property transition in
+  let prev = Option.value (Hashtbl.find_opt reg k) ~default:[] in
+  Hashtbl.replace reg k (prev @ [ { tname = name; transition; action } ])
+
+let size (reg : t) = Hashtbl.fold (fun _ ts n -> n + List.length ts) reg 0
+
+let property_fires transition ~before ~after =
+  match transition with
+  | Changed -> before <> Some after
+  | Became v -> after = v && before <> Some v
+  | From_to (a, b) -> before = Some a && after = b
+  | Added | Removed -> false
+
+let props_of (nd : node) = Option.value nd.properties ~default:[]
+
+(* Triggers that fire for [events], which took [before] to [after]. A new
+   node counts as every one of its properties changing from unset. *)
+let evaluate (reg : t) ~(before : bigraph) ~(after : bigraph)
+    (events : graph_event list) : (trigger * firing) list =
+  let out = ref [] in
+  let lookup k = Option.value (Hashtbl.find_opt reg k) ~default:[] in
+  let emit t node node_kind property b a =
+    out :=
+      ( t,
+        { trigger = t.tname; node; node_kind; property; before = b; after = a }
+      )
+      :: !out
+  in
+  let node_level transition node_type nid =
+    List.iter
+      (fun t ->
+        if t.transition = transition then emit t nid node_type None None None)
+      (lookup (node_type, ""))
+  in
+  let property_level node_type nid k b a =
+    List.iter
+      (fun t ->
+        if property_fires t.transition ~before:b ~after:a then
+          emit t nid node_type (Some k) b (Some a))
+      (lookup (node_type, k))
+  in
+  if Hashtbl.length reg > 0 then
+    List.iter
+      (function
+        | NodeAdded nd ->
+            node_level Added nd.node_type nd.id;
+            List.iter
+              (fun (k, v) -> property_level nd.node_type nd.id k None v)
+              (props_of nd)
+        | NodeRemoved nid -> (
+            match NodeMap.find_opt nid before.place.nodes with
+            | Some nd -> node_level Removed nd.node_type nid
+            | None -> ())
+        | PropertyChanged (nid, k, v) -> (
+            match NodeMap.find_opt nid after.place.nodes with
+            | None -> ()
+            | Some nd ->
+                let b =
+                  match NodeMap.find_opt nid before.place.nodes with
+                  | Some old -> List.assoc_opt k (props_of old)
+                  | None -> None
+                in
+                property_level nd.node_type nid k b v)
+        | PropertyRemoved _ | NodeMoved _ | RuleApplied _ -> ())
+      events;
+  List.rev !out
+
+(* Run the actions of every trigger that fires; returns how many ran. *)
+let fire (reg : t) ~before ~after events : int =
+  let fs = evaluate reg ~before ~after events in
+  List.iter (fun (t, f) -> t.action f) fs;
+  List.length fs
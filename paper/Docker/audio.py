@@ -0,0 +1,208 @@
+"""Audio input and allocation-free buffering for the STT service.
+
+SlotRing is a fixed pool of chunk-sized float32 slots. The sounddevice
+callback copies each block into the next free slot and queues only the
+slot index. UtteranceBuffer is a linear float32 buffer sized for
+MAX_SPEECH_SECS plus lookback; it hands contiguous views to VAD and the
+model, so the hot path does not allocate per chunk.
+
+Sources (MicSource, FileSource) feed a SlotRing: the live microphone, or
+WAV / raw PCM files and directories of clips, paced at real time or as
+fast as the pipeline accepts them.
+"""
+import os
+import threading
+import time
+import wave
+from queue import SimpleQueue
+
+import numpy as np
+
+class SlotRing:
+    def __init__(self, slots: int, chunk: int):
+        self.slots = slots
+        self.data = np.zeros((slots, chunk), dtype=np.float32)
+        self.lengths = [0] * slots
+        self.status = [None] * slots
+        self.ready = SimpleQueue()
+        self.written = 0        # producer side (audio callback)
+        self.consumed = 0       # consumer side, advanced by release()
+        self.overruns = 0
+
+    def put(self, data: np.ndarray, status=None, wait=False) -> bool:
+        """Copy one block into a free slot.
+
+        If the consumer is a full ring behind the block is dropped, or with
+        wait=True (file input) the producer sleeps until a slot frees up.
+        """
+        while self.written - self.consumed >= self.slots:
+            if not wait:
+                self.overruns += 1
+                return False
+            time.sleep(0.001)
+        i = self.written % self.slots
+        src = data[:, 0] if data.ndim == 2 else data
+        n = min(len(src), self.data.shape[1])
+        np.copyto(self.data[i, :n], src[:n])
+        self.lengths[i] = n
+        self.status[i] = status
+        self.written += 1
+        self.ready.put(i)
+        return True
+
+    def get(self, timeout=None) -> int:
+        return self.ready.get(timeout=timeout)
+
+    def view(self, i: int) -> np.ndarray:
+        return self.data[i, :self.lengths[i]]
+
+    def release(self):
+        """Hand the oldest slot back to the producer once its view is no longer used."""
+        self.consumed += 1
+
+class UtteranceBuffer:
+    def __init__(self, capacity: int):
+        self.buf = np.zeros(capacity, dtype=np.float32)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def view(self) -> np.ndarray:
+        return self.buf[self.start:self.end]
+
+    def append(self, chunk: np.ndarray):
+        n = len(chunk)
+        if self.end + n > len(self.buf):
+            if len(self) + n > len(self.buf):
+                self.start = self.end - (len(self.buf) - n)
+            self._compact()
+        self.buf[self.end:self.end + n] = chunk
+        self.end += n
+
+    def keep_last(self, n: int):
+        self.start = max(self.start, self.end - n)
+
+    def clear(self):
+        self.start = self.end = 0
+
+    def rebase(self):
+        """Move the live region to the front. Until the buffer is full, later
+        appends then only write past `end` and never move what is there."""
+        if self.start:
+            self._compact()
+
+    def _compact(self):
+        # reached on rebase and once the write position hits capacity; while
+        # idle the live region is just the lookback, so this is a short move
+        live = len(self)
+        self.buf[:live] = self.buf[self.start:self.end]
+        self.start, self.end = 0, live
+
+# ---------- sources ----------
+
+AUDIO_EXTS = (".wav", ".raw", ".pcm", ".f32")
+
+def read_audio(path: str, rate: int) -> np.ndarray:
+    """Mono float32 samples at `rate` from a WAV (PCM), .raw/.pcm (int16 LE) or .f32 file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".wav":
+        with wave.open(path, "rb") as w:
+            width, channels, src_rate = w.getsampwidth(), w.getnchannels(), w.getframerate()
+            frames = w.readframes(w.getnframes())
+        if width == 1:
+            x = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+        else:
+            dtype = {2: np.int16, 4: np.int32}[width]
+            x = np.frombuffer(frames, dtype=dtype).astype(np.float32) / float(np.iinfo(dtype).max)
+        x = x.reshape(-1, channels).mean(axis=1)
+    elif ext == ".f32":
+        x, src_rate = np.fromfile(path, dtype=np.float32), rate
+    else:
+        x, src_rate = np.fromfile(path, dtype="<i2").astype(np.float32) / 32767.0, rate
+    if src_rate != rate:
+        n = int(round(len(x) * rate / src_rate))
+        x = np.interp(np.linspace(0, len(x) - 1, n), np.arange(len(x)), x)
+    return np.ascontiguousarray(x, dtype=np.float32)
+
+def list_audio(path: str) -> list:
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, f) for f in os.listdir(path)
+                      if f.lower().endswith(AUDIO_EXTS))
+    return [path]
+
+class MicSource:
+    def __init__(self, rate: int, chunk: int):
+        self.rate, self.chunk = rate, chunk
+        self.finished = threading.Event()   # never set: live input
+        self.stream = None
+
+    def start(self, ring: SlotRing):
+        from sounddevice import InputStream
+
+        self.stream = InputStream(
+            samplerate=self.rate,
+            channels=1,
+            blocksize=self.chunk,
+            dtype=np.float32,
+            callback=lambda data, frames, time_info, status: ring.put(data, status))
+        self.stream.start()
+
+    def stop(self):
+        if self.stream:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            except Exception:
+                pass
+
+class FileSource:
+    """Plays clips into the ring, separated and followed by `gap_secs` of silence.
+
+    paced=True sleeps to keep real time; otherwise blocks are pushed as fast
+    as the ring drains (never dropped).
+    """
+
+    def __init__(self, path: str, rate: int, chunk: int, paced=True, gap_secs=1.0):
+        self.files = list_audio(path)
+        if not self.files:
+            raise ValueError(f"no audio files under {path}")
+        self.rate, self.chunk = rate, chunk
+        self.paced = paced
+        self.gap = np.zeros(int(gap_secs * rate), dtype=np.float32)
+        self.finished = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    def start(self, ring: SlotRing):
+        self._thread = threading.Thread(target=self._play, args=(ring,), name="stt-file", daemon=True)
+        self._thread.start()
+
+    def _play(self, ring: SlotRing):
+        t0 = time.perf_counter()
+        sent = 0
+        for path in self.files:
+            for x in (read_audio(path, self.rate), self.gap):
+                for i in range(0, len(x) - self.chunk + 1, self.chunk):
+                    if self._stop:
+                        self.finished.set()
+                        return
+                    if self.paced:
+                        delay = t0 + sent / self.rate - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    ring.put(x[i:i + self.chunk], wait=not self.paced)
+                    sent += self.chunk
+        self.finished.set()
+
+    def stop(self):
+        self._stop = True
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+def open_source(spec: str, rate: int, chunk: int, pace="realtime", gap_secs=1.0):
+    """`mic` for the sound card, otherwise a file or directory of clips."""
+    if spec in ("", "mic"):
+        return MicSource(rate, chunk)
+    return FileSource(spec, rate, chunk, paced=(pace == "realtime"), gap_secs=gap_secs)
@@ -0,0 +1,319 @@
+"""Micro-benchmarks for the STT service hot paths.
+
+  python bench_stt.py ring --secs 120
+  python bench_stt.py decode --wav sample.wav --repeat 10 --batch 4
+  python bench_stt.py rtf --input clips/ --models moonshine/tiny,moonshine/base \
+      --precisions float,quantized --streaming 0,1 --pace fast
+  python bench_stt.py quant --input clips/ --model moonshine/base \
+      --precisions float,fp16,quantized,int8
+
+quant transcribes each clip with every precision; WER is against the float
+transcript and, where clips/NAME.txt exists, against that reference.
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from audio import SlotRing, UtteranceBuffer
+
+RATE = 16000
+CHUNK_SIZE = 512
+LOOKBACK_CHUNKS = 5
+MAX_SPEECH_SECS = 15
+
+# ---------- ring ----------
+
+def _blocks(secs: float, seed: int):
+    rng = np.random.default_rng(seed)
+    n = int(secs * RATE) // CHUNK_SIZE
+    return [rng.standard_normal((CHUNK_SIZE, 1)).astype(np.float32) * 0.1 for _ in range(n)]
+
+def _speaking(i: int, speech_chunks: int, silence_chunks: int) -> bool:
+    return i % (speech_chunks + silence_chunks) < speech_chunks
+
+def run_concat(blocks, speech_chunks, silence_chunks, stats):
+    """The previous path: copy+flatten per block, concatenate, slice for lookback."""
+    lookback = LOOKBACK_CHUNKS * CHUNK_SIZE
+    speech = np.empty(0, dtype=np.float32)
+    recording = False
+    for i, data in enumerate(blocks):
+        t0 = stats.begin()
+        chunk = data.copy().flatten()
+        speech = np.concatenate((speech, chunk))
+        if not recording:
+            speech = speech[-lookback:]
+        talking = _speaking(i, speech_chunks, silence_chunks)
+        if talking and not recording:
+            recording = True
+        elif recording and (not talking or len(speech) / RATE > MAX_SPEECH_SECS):
+            recording = False
+            speech *= 0.0
+        stats.end(t0, speech)
+
+def run_ring(blocks, speech_chunks, silence_chunks, stats):
+    lookback = LOOKBACK_CHUNKS * CHUNK_SIZE
+    ring = SlotRing(256, CHUNK_SIZE)
+    buf = UtteranceBuffer(int(MAX_SPEECH_SECS * RATE) + (LOOKBACK_CHUNKS + 1) * CHUNK_SIZE)
+    recording = False
+    for i, data in enumerate(blocks):
+        t0 = stats.begin()
+        ring.put(data)
+        slot = ring.get()
+        buf.append(ring.view(slot))
+        ring.release()
+        if not recording:
+            buf.keep_last(lookback)
+        talking = _speaking(i, speech_chunks, silence_chunks)
+        if talking and not recording:
+            recording = True
+        elif recording and (not talking or len(buf) / RATE > MAX_SPEECH_SECS):
+            recording = False
+            buf.clear()
+        stats.end(t0, buf.view())
+
+class Stats:
+    def __init__(self, trace: bool):
+        self.trace = trace
+        self.times = []
+        self.peaks = []
+
+    def begin(self):
+        if self.trace:
+            tracemalloc.reset_peak()
+            self.base = tracemalloc.get_traced_memory()[0]
+        return time.perf_counter_ns()
+
+    def end(self, t0, view):
+        self.times.append(time.perf_counter_ns() - t0)
+        if self.trace:
+            self.peaks.append(tracemalloc.get_traced_memory()[1] - self.base)
+
+def cmd_ring(args):
+    blocks = _blocks(args.secs, args.seed)
+    sc = int(args.speech_secs * RATE) // CHUNK_SIZE
+    qc = int(args.silence_secs * RATE) // CHUNK_SIZE
+    print("impl,chunks,mean_us,p99_us,max_us,mean_alloc_bytes,max_alloc_bytes")
+    for name, fn in (("concat", run_concat), ("ring", run_ring)):
+        timed = Stats(trace=False)
+        fn(blocks, sc, qc, timed)
+        tracemalloc.start()
+        traced = Stats(trace=True)
+        fn(blocks, sc, qc, traced)
+        tracemalloc.stop()
+        t = np.array(timed.times) / 1e3
+        a = np.array(traced.peaks)
+        print(f"{name},{len(t)},{t.mean():.2f},{np.percentile(t, 99):.2f},{t.max():.2f},"
+              f"{a.mean():.0f},{a.max()}")
+
+# ---------- decode ----------
+
+def load_audio(path, secs, seed):
+    if path:
+        import librosa
+        audio, _ = librosa.load(path, sr=RATE, mono=True)
+        return audio.astype(np.float32)
+    print("[bench] no --wav given, decoding noise (token counts will be small)")
+    return (np.random.default_rng(seed).standard_normal(int(secs * RATE)) * 0.05).astype(np.float32)
+
+def _decode_row(name, lat, ntok, batch=1):
+    lat = np.array(lat)
+    tok_s = sum(ntok) / lat.sum() if lat.sum() > 0 else 0.0
+    print(f"{name},{batch},{len(lat)},{np.mean(lat) * 1e3:.1f},{np.percentile(lat, 50) * 1e3:.1f},"
+          f"{np.percentile(lat, 90) * 1e3:.1f},{np.mean(ntok):.1f},{tok_s:.1f}")
+
+def cmd_decode(args):
+    import stt
+
+    model = stt.MoonshineOnnxModel(model_name=args.model)
+    audio = load_audio(args.wav, args.secs, args.seed)
+    x = audio[np.newaxis, :]
+    max_len = int((len(audio) / RATE) * 6)
+    hidden = model.encode(x)
+    model.decode_loop(hidden, max_len)      # warm both paths
+    model.decode_bound(hidden, max_len)
+
+    print("impl,batch,runs,mean_ms,p50_ms,p90_ms,tokens,tokens_per_s")
+    for name, fn in (("loop", model.decode_loop), ("iobinding", model.decode_bound)):
+        lat, ntok = [], []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            tokens = fn(model.encode(x), max_len)[0]
+            lat.append(time.perf_counter() - t0)
+            ntok.append(len(tokens) - 1)
+        _decode_row(name, lat, ntok)
+
+    if args.batch > 1:
+        segs = [audio] * args.batch
+        lat, ntok = [], []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            rows = model.generate_batch(segs)
+            # per-utterance latency: every segment waits for the whole batch
+            lat.append(time.perf_counter() - t0)
+            ntok.append(sum(len(r) - 1 for r in rows))
+        _decode_row("iobinding_batch", lat, ntok, args.batch)
+
+# ---------- rtf ----------
+
+RTF_COLS = ["model", "precision", "streaming", "pace", "audio_secs", "speech_secs",
+            "inference_secs", "rtf", "inference_per_speech_sec", "finals", "partials",
+            "first_partial_p50_ms", "final_p50_ms", "final_p95_ms", "overruns"]
+
+def run_config(args, model, precision, streaming):
+    """One stt.py run over the input clips; returns its STT_METRICS_JSON summary."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        out = f.name
+    env = dict(os.environ,
+               MODEL_NAME=model, STT_PRECISION=precision, STT_STREAMING=streaming,
+               STT_INPUT=args.input, STT_INPUT_PACE=args.pace, STT_METRICS_JSON=out)
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, os.path.join(here, "stt.py")], env=env, cwd=here,
+                          stdout=subprocess.DEVNULL if not args.verbose else None)
+    try:
+        with open(out) as f:
+            return json.load(f) if proc.returncode == 0 else None
+    except (OSError, ValueError):
+        return None
+    finally:
+        os.unlink(out)
+
+def cmd_rtf(args):
+    split = lambda v: [x for x in v.split(",") if x]
+    print(",".join(RTF_COLS))
+    for model, precision, streaming in itertools.product(
+            split(args.models), split(args.precisions), split(args.streaming)):
+        m = run_config(args, model, precision, streaming)
+        if m is None:
+            print(f"[bench] {model} {precision} streaming={streaming}: run failed", file=sys.stderr)
+            continue
+        m.update(model=model, precision=precision, streaming=streaming, pace=args.pace)
+        print(",".join(f"{m[c]:.3f}" if isinstance(m.get(c), float) else str(m.get(c, ""))
+                       for c in RTF_COLS), flush=True)
+
+# ---------- quant ----------
+
+QUANT_COLS = ["precision", "clips", "audio_secs", "load_secs", "size_mb", "mean_ms", "p90_ms",
+              "rtf", "wer_vs_float", "wer_vs_ref"]
+
+def words(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def edit_distance(a: list, b: list) -> int:
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, y in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (x != y))
+    return row[-1]
+
+def wer(refs: list, hyps: list) -> float:
+    """Corpus word error rate: total edits over total reference words."""
+    pairs = [(words(r), words(h)) for r, h in zip(refs, hyps) if r is not None]
+    n = sum(len(r) for r, _ in pairs)
+    return sum(edit_distance(r, h) for r, h in pairs) / n if n else float("nan")
+
+def reference(path: str):
+    txt = os.path.splitext(path)[0] + ".txt"
+    if not os.path.exists(txt):
+        return None
+    with open(txt) as f:
+        return f.read().strip()
+
+def cmd_quant(args):
+    import stt
+    from audio import list_audio, read_audio
+
+    clips = list_audio(args.input)
+    audio = [read_audio(p, RATE) for p in clips]
+    refs = [reference(p) for p in clips]
+    split = [x for x in args.precisions.split(",") if x]
+    if "float" in split:     # the baseline goes first
+        split.remove("float")
+    split.insert(0, "float")
+
+    print(",".join(QUANT_COLS))
+    baseline = None
+    for precision in split:
+        t0 = time.perf_counter()
+        try:
+            model = stt.Model(args.model, rate=RATE, precision=precision)
+        except Exception as e:
+            print(f"[bench] {precision}: load failed: {e}", file=sys.stderr)
+            continue
+        load = time.perf_counter() - t0
+        size = sum(os.path.getsize(p) for p in stt._get_onnx_weights(
+            args.model.split("/")[-1], precision)) / 2**20
+        lat, hyps = [], []
+        for x in audio:
+            t0 = time.perf_counter()
+            hyps.append(model(x))
+            lat.append(time.perf_counter() - t0)
+        if precision == "float":
+            baseline = hyps
+        secs = sum(len(x) for x in audio) / RATE
+        row = {"precision": precision, "clips": len(clips), "audio_secs": secs, "load_secs": load,
+               "size_mb": size, "mean_ms": 1e3 * float(np.mean(lat)),
+               "p90_ms": 1e3 * float(np.percentile(lat, 90)), "rtf": sum(lat) / secs,
+               "wer_vs_float": wer(baseline, hyps) if baseline else float("nan"),
+               "wer_vs_ref": wer(refs, hyps)}
+        print(",".join(f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c])
+                       for c in QUANT_COLS), flush=True)
+        if args.verbose:
+            for path, h in zip(clips, hyps):
+                print(f"  {os.path.basename(path)}: {h}", file=sys.stderr)
+        del model
+
+# ---------- main ----------
+
+def main():
+    ap = argparse.ArgumentParser("STT service benchmarks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("ring", help="per-chunk cost of audio accumulation")
+    p.add_argument("--secs", type=float, default=120.0, help="simulated audio length")
+    p.add_argument("--speech-secs", type=float, default=12.0)
+    p.add_argument("--silence-secs", type=float, default=3.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(fn=cmd_ring)
+
+    p = sub.add_parser("decode", help="legacy vs IO-bound decoder loop (tokens/s, latency)")
+    p.add_argument("--model", default="moonshine/base")
+    p.add_argument("--wav", default=None, help="utterance to decode (default: noise)")
+    p.add_argument("--secs", type=float, default=5.0, help="noise length without --wav")
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--batch", type=int, default=4, help="segments per batched run (1 = skip)")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(fn=cmd_decode)
+
+    p = sub.add_parser("rtf", help="end-to-end RTF and caption latency over recorded clips")
+    p.add_argument("--input", required=True, help="WAV/raw file or directory of clips")
+    p.add_argument("--models", default="moonshine/tiny,moonshine/base")
+    p.add_argument("--precisions", default="float,quantized",
+                   help="float, fp16, quantized, int8 or auto")
+    p.add_argument("--streaming", default="0,1", help="STT_STREAMING values to try")
+    p.add_argument("--pace", choices=["fast", "realtime"], default="fast",
+                   help="fast measures throughput; realtime measures caption latency")
+    p.add_argument("--verbose", action="store_true", help="show the service output")
+    p.set_defaults(fn=cmd_rtf)
+
+    p = sub.add_parser("quant", help="latency and WER of weight variants against float")
+    p.add_argument("--input", required=True, help="WAV/raw file or directory of clips (+ NAME.txt)")
+    p.add_argument("--model", default="moonshine/base")
+    p.add_argument("--precisions", default="float,fp16,quantized,int8")
+    p.add_argument("--verbose", action="store_true", help="print each transcript")
+    p.set_defaults(fn=cmd_quant)
+
+    args = ap.parse_args()
+    args.fn(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,101 @@
 import os
 import sys
 import time
-import signal
 
-import numpy as np
+T_PROCESS = time.perf_counter()     # for the startup report
 
-from queue import Queue
+import json
+import platform
+import signal
+import threading
 
-from silero_vad import VADIterator, load_silero_vad
-from sounddevice import InputStream
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+
+import numpy as np
 
 from tokenizers import Tokenizer
 
+from audio import SlotRing, UtteranceBuffer, open_source
+
 CHUNK_SIZE = 512            # silero VAD : 512 at 16kHz
 LOOKBACK_CHUNKS = 5
 MAX_LINE_LENGTH = 80
 MAX_SPEECH_SECS = 15
 MIN_REFRESH_SECS = 0.2
+RING_SLOTS = 256            # ~8s of 512-sample blocks between callback and VAD thread
+FINAL_QUEUE = int(os.environ.get("STT_FINAL_QUEUE", "4"))   # finished utterances awaiting inference
+FINAL_BATCH = int(os.environ.get("STT_FINAL_BATCH", "4"))   # finals decoded per batched run
+STATS_SECS = float(os.environ.get("STT_STATS_SECS", "0"))   # periodic metrics (0 = only on stop)
+
+# input: "mic", or a WAV/raw file or directory of clips played "realtime" or "fast";
+# STT_METRICS_JSON writes the final metrics for bench_stt.py rtf
+INPUT = os.environ.get("STT_INPUT", "mic")
+INPUT_PACE = os.environ.get("STT_INPUT_PACE", "realtime")
+METRICS_JSON = os.environ.get("STT_METRICS_JSON", "")
+PRECISION = os.environ.get("STT_PRECISION", "float")
+
+# cold start: optimised sessions are serialised (ORT format) under
+# STT_ORT_CACHE and reloaded with graph optimisation off; warmup audio length
+MODELS_DIR = os.environ.get("MODELS_DIR", "/models")
+ORT_CACHE = os.environ.get("STT_ORT_CACHE", os.path.join(MODELS_DIR, "ort-cache"))
+WARMUP_SECS = float(os.environ.get("STT_WARMUP_SECS", "0.25"))
+
+class StartupTimer:
+    """Wall time per startup phase; phases may overlap (they run in parallel)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.first_caption = None
+
+    def run(self, phase, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.phases[phase] = time.perf_counter() - t0
+
+    def caption(self):
+        if self.first_caption is None:
+            self.first_caption = time.perf_counter() - T_PROCESS
+            print(f"\n[stt] first caption {self.first_caption:.2f}s after process start", flush=True)
+
+    def report(self) -> str:
+        parts = ", ".join(f"{k} {v * 1e3:.0f}ms" for k, v in self.phases.items())
+        return f"[stt] startup {time.perf_counter() - T_PROCESS:.2f}s: {parts}"
+
+STARTUP = StartupTimer()
+
+# streaming partials: cache encoder states for committed audio segments and
+# re-decode only from the previous hypothesis minus a few rollback tokens.
+# Longer segments / more rollback = better partials, more work per refresh.
+STREAMING = os.environ.get("STT_STREAMING", "0") == "1"
+SEGMENT_SECS = float(os.environ.get("STT_SEGMENT_SECS", "2.0"))
+ROLLBACK_TOKENS = int(os.environ.get("STT_ROLLBACK_TOKENS", "4"))
+FINAL_REDECODE = os.environ.get("STT_FINAL_REDECODE", "1") == "1"
+MIN_TAIL_SECS = 0.1
+
+# onnxruntime: IO-bound decode loop with preallocated KV buffers, and the
+# intra-op thread count (0 = onnxruntime default)
+IOBINDING = os.environ.get("STT_IOBINDING", "1") == "1"
+ORT_THREADS = int(os.environ.get("STT_ORT_THREADS", "0"))
 
 SUPPORTED_MODELS = ["moonshine/base", "moonshine/tiny"]
 
+# weight variants: float / quantized come from the hub, int8 (dynamic
+# quantization) and fp16 are derived from float once and kept under
+# MODELS_DIR. STT_PRECISION=auto measures STT_AUTO_PRECISIONS (most accurate
+# first) on this host and keeps the first whose RTF meets STT_RTF_TARGET,
+# timing STT_AUTO_CLIP if given, otherwise noise.
+PRECISIONS = ["float", "fp16", "quantized", "int8"]
+RTF_TARGET = float(os.environ.get("STT_RTF_TARGET", "0.3"))
+AUTO_PRECISIONS = os.environ.get("STT_AUTO_PRECISIONS", ",".join(PRECISIONS))
+AUTO_CLIP = os.environ.get("STT_AUTO_CLIP", "")
+ONNX_FILES = ("encoder_model", "decoder_model_merged")
+
 def load_tokenizer() -> Tokenizer:
     tokenizer_file = "tokenizer.json"
     return Tokenizer.from_file(str(tokenizer_file))
@@ -29,33 +105,216 @@ def _get_onnx_weights(model_name, precision="float"):
 
     if model_name not in ["tiny", "base"]:
         raise ValueError(f'Unknown model "{model_name}"')
+    if precision not in PRECISIONS:
+        raise ValueError(f'Unknown precision "{precision}" (expected one of {PRECISIONS} or auto)')
+    if precision in ("int8", "fp16"):
+        return _derived_weights(model_name, precision)
     repo = "UsefulSensors/moonshine"
     subfolder = f"onnx/merged/{model_name}/{precision}"
 
-    return (
-        hf_hub_download(repo, f"{x}.onnx", subfolder=subfolder)
-        for x in ("encoder_model", "decoder_model_merged")
-    )
-
+    return [
+        _hub_file(hf_hub_download, repo, f"{x}.onnx", subfolder)
+        for x in ONNX_FILES
+    ]
+
+def _hub_file(hf_hub_download, repo, filename, subfolder):
+    # a warm /models volume needs no network round trip
+    try:
+        return hf_hub_download(repo, filename, subfolder=subfolder, local_files_only=True)
+    except Exception:
+        return hf_hub_download(repo, filename, subfolder=subfolder)
+
+def _derived_weights(model_name, precision):
+    """int8 / fp16 copies of the float weights, converted on first use."""
+    out = os.path.join(MODELS_DIR, "variants", f"{model_name}-{precision}")
+    paths = [os.path.join(out, f"{x}.onnx") for x in ONNX_FILES]
+    if all(os.path.exists(p) for p in paths):
+        return paths
+    os.makedirs(out, exist_ok=True)
+    for src, dst in zip(_get_onnx_weights(model_name, "float"), paths):
+        if os.path.exists(dst):
+            continue
+        print(f"[stt] converting {os.path.basename(src)} to {precision}...", flush=True)
+        tmp = dst[:-len(".onnx")] + ".part.onnx"
+        if precision == "int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            # weights only; activations stay float and are quantized per run.
+            # EnableSubgraph reaches the merged decoder's if/else branches
+            quantize_dynamic(src, tmp, weight_type=QuantType.QInt8,
+                             extra_options={"EnableSubgraph": True})
+        else:
+            import onnx
+            from onnxconverter_common import float16
+
+            # float32 inputs/outputs keep the KV buffers and callers unchanged
+            onnx.save(float16.convert_float_to_float16(onnx.load(src), keep_io_types=True), tmp)
+        os.replace(tmp, dst)
+    return paths
+
+def select_precision(model_name, target=RTF_TARGET, candidates=None, rate=16000):
+    """Most accurate variant whose RTF on this host meets `target`.
+
+    Candidates are timed in order and the first that meets the target
+    wins; if none does, the fastest is used. The decision is cached next
+    to the session cache, keyed by host and thread setting, so restarts
+    skip the measurement.
+    """
+    candidates = candidates or [p for p in AUTO_PRECISIONS.split(",") if p]
+    key = (f"auto-{os.path.basename(model_name)}-{platform.machine()}-{os.cpu_count()}"
+           f"-t{ORT_THREADS}.json")
+    path = os.path.join(ORT_CACHE or MODELS_DIR, key)
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached["target"] == target and cached["candidates"] == candidates:
+            print(f"[stt] precision auto -> {cached['precision']} (cached)", flush=True)
+            return cached["precision"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if AUTO_CLIP:
+        from audio import read_audio
+        audio = read_audio(AUTO_CLIP, rate)
+    else:
+        audio = (np.random.default_rng(0).standard_normal(5 * rate) * 0.05).astype(np.float32)
+    x = audio[np.newaxis, :]
+    rtfs = {}
+    for precision in candidates:
+        try:
+            model = MoonshineOnnxModel(model_name=model_name, model_precision=precision)
+        except Exception as e:
+            print(f"[stt] precision {precision} unavailable: {e}", flush=True)
+            continue
+        model.generate(x)   # warm
+        t0 = time.perf_counter()
+        for _ in range(3):
+            model.generate(x)
+        rtfs[precision] = (time.perf_counter() - t0) / 3 / (len(audio) / rate)
+        print(f"[stt] precision {precision}: RTF {rtfs[precision]:.3f}", flush=True)
+        del model
+        if rtfs[precision] <= target:
+            break
+    if not rtfs:
+        raise RuntimeError(f"no usable precision among {candidates}")
+    meeting = [p for p in rtfs if rtfs[p] <= target]
+    chosen = meeting[0] if meeting else min(rtfs, key=rtfs.get)
+    if not meeting:
+        print(f"[stt] no precision meets RTF {target}; using fastest", flush=True)
+    print(f"[stt] precision auto -> {chosen}", flush=True)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"precision": chosen, "target": target, "candidates": candidates,
+                       "rtf": rtfs}, f, indent=2)
+    except OSError:
+        pass
+    return chosen
+
+def session_options(optimize=True):
+    import onnxruntime
+
+    opts = onnxruntime.SessionOptions()
+    opts.graph_optimization_level = (onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL if optimize
+                                     else onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL)
+    opts.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    opts.inter_op_num_threads = 1
+    if ORT_THREADS > 0:
+        opts.intra_op_num_threads = ORT_THREADS
+    return opts
+
+def _cache_path(path: str, key: str) -> str:
+    import onnxruntime
+
+    tag = f"{key}-ort{onnxruntime.__version__}-{platform.machine()}"
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(ORT_CACHE, tag, f"{name}.ort")
+
+def open_session(path: str, key: str):
+    """InferenceSession for `path`, via a serialised optimised copy when ORT_CACHE is set.
+
+    The first start optimises the graph and saves it in ORT format; later
+    starts load that file with optimisation disabled and let initializers
+    point straight into the loaded bytes instead of copying them.
+    """
+    import onnxruntime
+
+    if not ORT_CACHE:
+        return onnxruntime.InferenceSession(path, session_options())
+    cached = _cache_path(path, key)
+    if os.path.exists(cached):
+        try:
+            opts = session_options(optimize=False)
+            opts.add_session_config_entry("session.load_model_format", "ORT")
+            opts.add_session_config_entry("session.use_ort_model_bytes_directly", "1")
+            opts.add_session_config_entry("session.use_ort_model_bytes_for_initializers", "1")
+            with open(cached, "rb") as f:
+                data = f.read()
+            sess = onnxruntime.InferenceSession(data, opts)
+            sess._model_bytes_keepalive = data   # initializers alias this buffer
+            return sess
+        except Exception as e:
+            print(f"[stt] ignoring unusable session cache {cached}: {e}", flush=True)
+            os.unlink(cached)
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    opts = session_options()
+    opts.optimized_model_filepath = cached
+    opts.add_session_config_entry("session.save_model_format", "ORT")
+    return onnxruntime.InferenceSession(path, opts)
+
+_ORT_DTYPES = {"tensor(int64)": np.int64, "tensor(int32)": np.int32,
+               "tensor(float)": np.float32, "tensor(bool)": np.bool_}
+
+class KVBuffers:
+    """Ping-pong flat buffers for the decoder self-attention cache.
+
+    Step i reads past keys/values of length t from one side and ORT writes
+    the length t+1 present tensors straight into the other, so the loop
+    never allocates or copies the cache. Views are prefixes of a flat
+    buffer, hence contiguous; capacity doubles when a decode runs long.
+    """
+
+    def __init__(self, names, batch, heads, head_dim, capacity):
+        self.names = names
+        self.row = batch * heads * head_dim   # elements per cache position
+        self.shape = (batch, heads, head_dim)
+        self.capacity = 0
+        self.bufs = [{}, {}]
+        self.grow(capacity, side=0, t=0)
+
+    def grow(self, capacity, side, t):
+        old = self.bufs
+        self.bufs = [{k: np.empty(capacity * self.row, dtype=np.float32) for k in self.names}
+                     for _ in range(2)]
+        if t:
+            for k in self.names:
+                self.bufs[side][k][:t * self.row] = old[side][k][:t * self.row]
+        self.capacity = capacity
+
+    def view(self, side, name, t):
+        b, h, d = self.shape
+        return self.bufs[side][name][:t * self.row].reshape(b, h, t, d)
 
 class MoonshineOnnxModel(object):
     def __init__(self, models_dir=None, model_name=None, model_precision="float"):
-        import onnxruntime
-
         if models_dir is None:
             assert model_name is not None, (
                 "model_name should be specified if models_dir is not"
             )
-            encoder, decoder = self._load_weights_from_hf_hub(
-                model_name, model_precision
-            )
+            encoder, decoder = STARTUP.run("weights", lambda: list(
+                self._load_weights_from_hf_hub(model_name, model_precision)))
         else:
             encoder, decoder = [
                 f"{models_dir}/{x}.onnx"
                 for x in ("encoder_model", "decoder_model_merged")
             ]
-        self.encoder = onnxruntime.InferenceSession(encoder)
-        self.decoder = onnxruntime.InferenceSession(decoder)
+        key = f"{os.path.basename(model_name or models_dir)}-{model_precision}"
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            enc = ex.submit(STARTUP.run, "encoder_session", open_session, encoder, key)
+            dec = ex.submit(STARTUP.run, "decoder_session", open_session, decoder, key)
+            self.encoder, self.decoder = enc.result(), dec.result()
+        self.io_binding = IOBINDING
+        self._bind_meta()
 
         if "tiny" in model_name:
             self.num_layers = 6
@@ -71,19 +330,127 @@ class MoonshineOnnxModel(object):
         self.decoder_start_token_id = 1
         self.eos_token_id = 2
 
+    def _bind_meta(self):
+        ins = {i.name: i for i in self.decoder.get_inputs()}
+        self._ids_dtype = _ORT_DTYPES.get(ins["input_ids"].type, np.int64)
+        self._past_names = [n for n in ins if n.startswith("past_key_values.")]
+        # outputs are logits then present.* in the same order as the past inputs
+        outs = [o.name for o in self.decoder.get_outputs()]
+        self._logits_name = outs[0]
+        self._present_of = dict(zip(self._past_names, outs[1:]))
+
     def _load_weights_from_hf_hub(self, model_name, model_precision):
         model_name = model_name.split("/")[-1]
         return _get_onnx_weights(model_name, model_precision)
 
-    def generate(self, audio, max_len=None):
+    def encode(self, audio):
         "audio has to be a numpy array of shape [1, num_audio_samples]"
-        if max_len is None:
-            max_len = int((audio.shape[-1] / 16_000) * 6)
-
-        import numpy as np
-
-        last_hidden_state = self.encoder.run(None, dict(input_values=audio))[0]
+        return self.encoder.run(None, dict(input_values=audio))[0]
+
+    def decode(self, last_hidden_state, max_len, prefix=()):
+        """Greedy decode; `prefix` tokens are forced after the start token."""
+        if self.io_binding:
+            return self.decode_bound(last_hidden_state, max_len, prefix)[:1]
+        return self.decode_loop(last_hidden_state, max_len, prefix)
+
+    def _empty_past(self):
+        return {
+            k: np.zeros((0, self.num_key_value_heads, 1, self.head_dim), dtype=np.float32)
+            for k in self._past_names
+        }
 
+    def decode_bound(self, last_hidden_state, max_len, prefix=()):
+        """Batched greedy decode through IO binding; one token list per batch row."""
+        batch = last_hidden_state.shape[0]
+        start = [self.decoder_start_token_id, *prefix]
+        steps = max(1, max_len - len(prefix))
+
+        # first step: whole prefix at once through the no-cache branch
+        feeds = dict(
+            input_ids=np.array([start] * batch, dtype=self._ids_dtype),
+            encoder_hidden_states=last_hidden_state,
+            use_cache_branch=np.array([False]),
+            **self._empty_past(),
+        )
+        logits, *present = self.decoder.run(None, feeds)
+        present = dict(zip(self._past_names, present))
+
+        tokens = np.empty((batch, len(start) + steps), dtype=np.int64)
+        tokens[:, :len(start)] = start
+        n = len(start)
+        next_ids = logits[:, -1].argmax(axis=-1)
+        done = next_ids == self.eos_token_id
+        tokens[:, n] = next_ids
+        n += 1
+
+        dec_names = [k for k in self._past_names if ".decoder." in k]
+        enc_names = [k for k in self._past_names if ".encoder." in k]
+        t = len(start)
+        kv = KVBuffers(dec_names, batch, self.num_key_value_heads, self.head_dim,
+                       capacity=t + min(steps, 64))
+        side = 0
+        for k in dec_names:
+            kv.view(side, k, t)[...] = present[k]
+        enc_kv = {k: np.ascontiguousarray(present[k]) for k in enc_names}
+        enc_sink = {k: np.empty_like(v) for k, v in enc_kv.items()}
+
+        ids = np.empty((batch, 1), dtype=self._ids_dtype)
+        logits_buf = None
+        use_cache = np.array([True])
+        binding = self.decoder.io_binding()
+
+        for _ in range(steps - 1):
+            if done.all():
+                break
+            if t + 1 > kv.capacity:
+                kv.grow(2 * kv.capacity, side, t)
+            ids[:, 0] = next_ids
+
+            binding.clear_binding_inputs()
+            binding.clear_binding_outputs()
+            binding.bind_cpu_input("input_ids", ids)
+            binding.bind_cpu_input("encoder_hidden_states", last_hidden_state)
+            binding.bind_cpu_input("use_cache_branch", use_cache)
+            for k in dec_names:
+                binding.bind_cpu_input(k, kv.view(side, k, t))
+                out = kv.view(1 - side, k, t + 1)
+                binding.bind_output(self._present_of[k], "cpu", 0, np.float32, out.shape,
+                                    out.ctypes.data)
+            for k in enc_names:
+                binding.bind_cpu_input(k, enc_kv[k])
+                binding.bind_output(self._present_of[k], "cpu", 0, np.float32,
+                                    enc_sink[k].shape, enc_sink[k].ctypes.data)
+            if logits_buf is None:
+                binding.bind_output(self._logits_name, "cpu")
+            else:
+                binding.bind_output(self._logits_name, "cpu", 0, np.float32,
+                                    logits_buf.shape, logits_buf.ctypes.data)
+
+            self.decoder.run_with_iobinding(binding)
+            if logits_buf is None:
+                # vocabulary size is only known after the first bound run
+                logits_out = binding.copy_outputs_to_cpu()[-1]
+                logits_buf = np.empty_like(logits_out)
+            else:
+                logits_out = logits_buf
+
+            side = 1 - side
+            t += 1
+            next_ids = logits_out[:, -1].argmax(axis=-1)
+            next_ids[done] = self.eos_token_id
+            tokens[:, n] = next_ids
+            n += 1
+            done |= next_ids == self.eos_token_id
+
+        out = []
+        for row in tokens[:, :n].tolist():
+            if self.eos_token_id in row[len(start):]:
+                row = row[:row.index(self.eos_token_id, len(start)) + 1]
+            out.append(row)
+        return out
+
+    def decode_loop(self, last_hidden_state, max_len, prefix=()):
+        """Reference decode: plain session.run per token, cache passed as dicts."""
         past_key_values = {
             f"past_key_values.{i}.{a}.{b}": np.zeros(
                 (0, self.num_key_value_heads, 1, self.head_dim), dtype=np.float32
@@ -93,9 +460,9 @@ class MoonshineOnnxModel(object):
             for b in ("key", "value")
         }
 
-        tokens = [self.decoder_start_token_id]
+        tokens = [self.decoder_start_token_id, *prefix]
         input_ids = [tokens]
-        for i in range(max_len):
+        for i in range(max(1, max_len - len(prefix))):
             use_cache_branch = i > 0
             decoder_inputs = dict(
                 input_ids=input_ids,
@@ -115,7 +482,26 @@ class MoonshineOnnxModel(object):
                     past_key_values[k] = v
 
         return [tokens]
-    
+
+    def generate(self, audio, max_len=None):
+        "audio has to be a numpy array of shape [1, num_audio_samples]"
+        if max_len is None:
+            max_len = int((audio.shape[-1] / 16_000) * 6)
+        return self.decode(self.encode(audio), max_len)
+
+    def generate_batch(self, audios, max_len=None):
+        """Decode several segments in one encoder and one decoder run.
+
+        Shorter segments are zero-padded (silence) to the longest one.
+        """
+        longest = max(len(a) for a in audios)
+        if max_len is None:
+            max_len = int((longest / 16_000) * 6)
+        batch = np.zeros((len(audios), longest), dtype=np.float32)
+        for i, a in enumerate(audios):
+            batch[i, :len(a)] = a
+        return self.decode_bound(self.encode(batch), max_len)
+
 def set_cache_env(models_dir: str):
     os.makedirs(models_dir, exist_ok=True)
     os.environ.setdefault("HF_HOME", models_dir)  
@@ -136,135 +522,415 @@ def right_justified_line(text: str, cache, width=MAX_LINE_LENGTH):
     return text
 
 class Model:
-    def __init__(self, model_name: str):
-        self.model = MoonshineOnnxModel(model_name=model_name)
-        self.rate = 16000
-        self.tokenizer = load_tokenizer()
+    def __init__(self, model_name: str, rate: int = 16000, precision: str = PRECISION):
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            tok = ex.submit(STARTUP.run, "tokenizer", load_tokenizer)
+            if precision == "auto":
+                precision = STARTUP.run("select_precision", select_precision, model_name,
+                                        rate=rate)
+            self.model = MoonshineOnnxModel(model_name=model_name, model_precision=precision)
+            self.tokenizer = tok.result()
+        self.precision = precision
+        self.rate = rate
 
         self.inference_secs = 0.0
         self.number_inferences = 0
         self.speech_secs = 0.0
 
-        # warmup: 1s of zeros
-        _ = self(np.zeros(int(self.rate), dtype=np.float32))
+        # warmup: a short stretch of zeros, enough to touch every kernel once
+        if WARMUP_SECS > 0:
+            STARTUP.run("warmup", self, np.zeros(int(self.rate * WARMUP_SECS), dtype=np.float32))
+            self.inference_secs = self.speech_secs = 0.0
+            self.number_inferences = 0
 
     def __call__(self, speech: np.ndarray) -> str:
         self.number_inferences += 1
         self.speech_secs += len(speech) / self.rate
         start = time.time()
-        tokens = self.model.generate(speech[np.newaxis, :].astype(np.float32))
+        tokens = self.model.generate(speech[np.newaxis, :].astype(np.float32, copy=False))
         text = self.tokenizer.decode_batch(tokens)[0]
         self.inference_secs += time.time() - start
         return text
 
+    def batch(self, speeches) -> list:
+        """Transcribe several finished segments in one batched run."""
+        if len(speeches) == 1 or not self.model.io_binding:
+            return [self(x) for x in speeches]
+        self.number_inferences += 1
+        self.speech_secs += sum(len(x) for x in speeches) / self.rate
+        start = time.time()
+        tokens = self.model.generate_batch(speeches)
+        texts = self.tokenizer.decode_batch(tokens)
+        self.inference_secs += time.time() - start
+        return texts
+
+    def rtf(self, audio_secs: float) -> float:
+        """Inference time per second of audio heard (< 1 keeps up with real time)."""
+        return self.inference_secs / audio_secs if audio_secs > 0 else 0.0
+
+class StreamingSession:
+    """Incremental partial captions for one utterance.
+
+    Audio is committed in SEGMENT_SECS pieces whose encoder states are
+    cached; a refresh encodes only the uncommitted tail, concatenates the
+    hidden states and decodes with the previous hypothesis (minus
+    ROLLBACK_TOKENS) forced as a prefix, so work per refresh stays roughly
+    constant instead of growing with the utterance.
+    """
+
+    def __init__(self, model: Model, segment_secs=SEGMENT_SECS, rollback_tokens=ROLLBACK_TOKENS):
+        self.model = model
+        self.segment = int(segment_secs * model.rate)
+        self.rollback = rollback_tokens
+        self.min_tail = int(MIN_TAIL_SECS * model.rate)
+        self.reset()
+
+    def reset(self):
+        self.hidden = []        # cached encoder states, one per committed segment
+        self.committed = 0      # samples covered by self.hidden
+        self.tokens = []        # last hypothesis, without start/eos
+
+    def _encode(self, audio: np.ndarray):
+        return self.model.model.encode(audio[np.newaxis, :].astype(np.float32, copy=False))
+
+    def update(self, speech: np.ndarray) -> str:
+        m = self.model
+        start = time.time()
+        while len(speech) - self.committed >= self.segment + self.min_tail:
+            self.hidden.append(self._encode(speech[self.committed:self.committed + self.segment]))
+            self.committed += self.segment
+        states = list(self.hidden)
+        if len(speech) - self.committed >= self.min_tail or not states:
+            states.append(self._encode(speech[self.committed:]))
+        hidden = states[0] if len(states) == 1 else np.concatenate(states, axis=1)
+
+        prefix = self.tokens[:max(0, len(self.tokens) - self.rollback)]
+        max_len = int((len(speech) / m.rate) * 6)
+        tokens = m.model.decode(hidden, max_len, prefix=prefix)[0]
+        self.tokens = [t for t in tokens[1:] if t != m.model.eos_token_id]
+
+        m.number_inferences += 1
+        m.inference_secs += time.time() - start
+        return m.tokenizer.decode_batch([tokens])[0]
+
+class Metrics:
+    """Pipeline counters, printed on stop and every STATS_SECS."""
+
+    def __init__(self):
+        self.final_latency = deque(maxlen=1000)  # end of speech -> final caption (s)
+        self.first_partial = deque(maxlen=1000)  # start of speech -> first partial (s)
+        self.finals = 0
+        self.partials = 0
+        self.partials_coalesced = 0
+        self.partials_stale = 0
+        self.backpressure_secs = 0.0            # VAD thread blocked waiting for a free buffer
+        self.max_ring_depth = 0
+        self.max_final_depth = 0
+
+    @staticmethod
+    def _pct(xs, q):
+        xs = sorted(xs)
+        return xs[min(len(xs) - 1, int(q * len(xs)))] if xs else 0.0
+
+    def summary(self, audio_secs: float, model) -> dict:
+        return {
+            "precision": model.precision,
+            "audio_secs": audio_secs,
+            "speech_secs": model.speech_secs,
+            "inference_secs": model.inference_secs,
+            "inferences": model.number_inferences,
+            "rtf": model.rtf(audio_secs),
+            "inference_per_speech_sec": (model.inference_secs / model.speech_secs
+                                         if model.speech_secs > 0 else 0.0),
+            "finals": self.finals,
+            "partials": self.partials,
+            "partials_coalesced": self.partials_coalesced,
+            "final_p50_ms": 1e3 * self._pct(self.final_latency, 0.5),
+            "final_p95_ms": 1e3 * self._pct(self.final_latency, 0.95),
+            "first_partial_p50_ms": 1e3 * self._pct(self.first_partial, 0.5),
+            "first_partial_p95_ms": 1e3 * self._pct(self.first_partial, 0.95),
+            "backpressure_secs": self.backpressure_secs,
+        }
+
+    def report(self, audio_secs: float, model, ring_depth: int, final_depth: int) -> str:
+        m = self.summary(audio_secs, model)
+        return (f"[stt] audio {audio_secs:.1f}s, inference {model.inference_secs:.1f}s "
+                f"over {model.number_inferences} runs, RTF {m['rtf']:.3f}; "
+                f"finals {self.finals} (eos->caption p50 {m['final_p50_ms']:.0f}ms "
+                f"p95 {m['final_p95_ms']:.0f}ms, first partial p50 {m['first_partial_p50_ms']:.0f}ms), "
+                f"partials {self.partials} (+{self.partials_coalesced} coalesced, "
+                f"{self.partials_stale} stale); queue depth ring {ring_depth}/{self.max_ring_depth} "
+                f"finals {final_depth}/{self.max_final_depth}; backpressure {self.backpressure_secs:.2f}s")
+
 class Transcribe:
+    """Capture -> VAD -> inference pipeline.
+
+    The audio callback fills a SlotRing; a VAD thread turns blocks into
+    utterances in pooled UtteranceBuffers; an inference thread turns those
+    into captions. Finished utterances are queued and never dropped: when
+    inference lags, the VAD thread blocks on the buffer pool (and the ring
+    absorbs, then drops, capture blocks). Partial refreshes go through a
+    single mailbox, so a newer request replaces one not yet served.
+    """
+
     def __init__(self, model_name: str):
         self.model_name = model_name
 
         self.model = None
         self.rate = 16000
         self.vad_iterator = None
-        self.queue = Queue()
+        self.ring = SlotRing(RING_SLOTS, CHUNK_SIZE)
+        capacity = int(MAX_SPEECH_SECS * self.rate) + (LOOKBACK_CHUNKS + 1) * CHUNK_SIZE
+        self.pool = Queue()
+        for _ in range(FINAL_QUEUE + 1):
+            self.pool.put(UtteranceBuffer(capacity))
         self.caption_cache = []
-        self.stream = None
+        self.source = None
         self._running = False
-
-    def _input_callback(self, data, frames, time_info, status):
-        self.queue.put((data.copy().flatten(), status))
+        self.print_transcription = True
+        self.streaming = None
+        self.audio_secs = 0.0
+
+        self._cv = threading.Condition()
+        self._finals = deque()        # (utterance, buffer, end-of-speech time)
+        self._partial = None          # (utterance, buffer, end, start-of-speech time)
+        self._busy = False
+        self._last_final = 0
+        self._last_partial = 0
+        self._stream_utt = 0
+        self._threads = []
+        self.metrics = Metrics()
 
     def _soft_reset_vad(self):
         self.vad_iterator.triggered = False
         self.vad_iterator.temp_end = 0
         self.vad_iterator.current_sample = 0
 
-    def _end_recording(self, speech: np.ndarray, do_print=True):
-        text = self.model(speech)
-        if do_print and self.print_transcription:
+    def _show(self, text: str):
+        STARTUP.caption()
+        if self.print_transcription:
             line = right_justified_line(text, self.caption_cache)
             print("\r" + (" " * MAX_LINE_LENGTH) + "\r" + line, end="", flush=True)
-        self.caption_cache.append(text)
-        speech *= 0.0
+
+    # ---------- VAD thread ----------
+
+    def _submit_final(self, utt: int, buf: UtteranceBuffer) -> UtteranceBuffer:
+        with self._cv:
+            self._finals.append((utt, buf, time.time()))
+            self.metrics.max_final_depth = max(self.metrics.max_final_depth, len(self._finals))
+            self._cv.notify()
+        t0 = time.time()
+        nxt = self.pool.get()
+        self.metrics.backpressure_secs += time.time() - t0
+        return nxt
+
+    def _request_partial(self, utt: int, buf: UtteranceBuffer, t_start: float):
+        with self._cv:
+            if self._partial is not None:
+                self.metrics.partials_coalesced += 1
+            # the buffer was rebased at start of speech and a final is cut
+            # before it fills, so [0, end) stays put while recording; it is
+            # only reused after its final, which makes this job stale
+            self._partial = (utt, buf, buf.end, t_start)
+            self._cv.notify()
+
+    def _vad_loop(self):
+        lookback_size = LOOKBACK_CHUNKS * CHUNK_SIZE
+        buf = self.pool.get()
+        recording = False
+        utt = 0
+        last_refresh = t_start = 0.0
+
+        while self._running:
+            try:
+                slot = self.ring.get(timeout=0.1)
+            except Empty:
+                continue
+            chunk, status = self.ring.view(slot), self.ring.status[slot]
+            if status:
+                print(status, flush=True)
+            self.metrics.max_ring_depth = max(self.metrics.max_ring_depth,
+                                              self.ring.written - self.ring.consumed)
+
+            self.audio_secs += len(chunk) / self.rate
+            buf.append(chunk)
+            if not recording:
+                buf.keep_last(lookback_size)
+
+            speech_dict = self.vad_iterator(self._as_tensor(chunk))
+            self.ring.release()
+            if speech_dict:
+                if "start" in speech_dict and not recording:
+                    recording = True
+                    utt += 1
+                    buf.rebase()
+                    last_refresh = t_start = time.time()
+
+                if "end" in speech_dict and recording:
+                    recording = False
+                    buf = self._submit_final(utt, buf)
+            # checked on every chunk, so a recording buffer never fills
+            if recording and (len(buf) / self.rate) > MAX_SPEECH_SECS:
+                recording = False
+                buf = self._submit_final(utt, buf)
+                self._soft_reset_vad()
+            elif recording and not speech_dict and (time.time() - last_refresh) > MIN_REFRESH_SECS:
+                self._request_partial(utt, buf, t_start)
+                last_refresh = time.time()
+
+    # ---------- inference thread ----------
+
+    def _run_finals(self, jobs):
+        if self.streaming is not None and not FINAL_REDECODE and len(jobs) == 1:
+            utt, buf, _ = jobs[0]
+            if self._stream_utt != utt:
+                self.streaming.reset()
+            texts = [self.streaming.update(buf.view())]
+        else:
+            texts = self.model.batch([buf.view() for _, buf, _ in jobs])
+        for (utt, buf, t_end), text in zip(jobs, texts):
+            self._show(text)
+            self.caption_cache.append(text)
+            self.metrics.final_latency.append(time.time() - t_end)
+            self.metrics.finals += 1
+            self._last_final = utt
+            buf.clear()
+            self.pool.put(buf)
+        if self.streaming is not None:
+            self.streaming.reset()
+            self._stream_utt = 0
+
+    def _run_partial(self, job):
+        utt, buf, end, t_start = job
+        if utt <= self._last_final:
+            self.metrics.partials_stale += 1
+            return
+        speech = buf.buf[:end]
+        if self.streaming is not None:
+            if self._stream_utt != utt:
+                self.streaming.reset()
+                self._stream_utt = utt
+            text = self.streaming.update(speech)
+        else:
+            text = self.model(speech)
+        self.metrics.partials += 1
+        if self._last_partial != utt:
+            self.metrics.first_partial.append(time.time() - t_start)
+            self._last_partial = utt
+        self._show(text)
+
+    def _inference_loop(self):
+        last_stats = time.time()
+        while self._running:
+            with self._cv:
+                while self._running and not self._finals and self._partial is None:
+                    self._cv.wait(0.1)
+                if self._finals:
+                    jobs = [self._finals.popleft()
+                            for _ in range(min(FINAL_BATCH, len(self._finals)))]
+                    partial = None
+                else:
+                    jobs, partial, self._partial = [], self._partial, None
+                self._busy = bool(jobs) or partial is not None
+            if jobs:
+                self._run_finals(jobs)
+            elif partial is not None:
+                self._run_partial(partial)
+            self._busy = False
+
+            if STATS_SECS > 0 and time.time() - last_stats > STATS_SECS:
+                print("\n" + self.report(), flush=True)
+                last_stats = time.time()
+
+    def _drained(self) -> bool:
+        with self._cv:
+            return (self.ring.written == self.ring.consumed and not self._finals
+                    and self._partial is None and not self._busy)
+
+    def report(self) -> str:
+        return self.metrics.report(self.audio_secs, self.model,
+                                   self.ring.written - self.ring.consumed, len(self._finals))
+
+    def _load_vad(self):
+        # torch and silero are imported here so the import overlaps model loading
+        import torch
+        from silero_vad import VADIterator, load_silero_vad
+
+        vad_model = load_silero_vad(onnx=True)
+        self._as_tensor = torch.from_numpy
+        return VADIterator(
+            model=vad_model,
+            sampling_rate=self.rate,
+            threshold=0.5,
+            min_silence_duration_ms=300)
 
     def warmup(self):
-        if self.model is None:
-            print(f"[stt] Loading model '{self.model_name}' (ONNX)...", flush=True)
-            self.model = Model(self.model_name, rate=self.rate)
-
-        if self.vad_iterator is None:
-            vad_model = load_silero_vad(onnx=True)
-            self.vad_iterator = VADIterator(
-                model=vad_model,
-                sampling_rate=self.rate,
-                threshold=0.5,
-                min_silence_duration_ms=300)
-
-        if self.stream is None:
-            self.stream = InputStream(
-                samplerate=self.rate,
-                channels=1,
-                blocksize=CHUNK_SIZE,
-                dtype=np.float32,
-                callback=self._input_callback)
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            vad = None
+            if self.vad_iterator is None:
+                vad = ex.submit(STARTUP.run, "vad", self._load_vad)
+            if self.model is None:
+                print(f"[stt] Loading model '{self.model_name}' ({PRECISION}, ONNX)...", flush=True)
+                self.model = STARTUP.run("model", Model, self.model_name, rate=self.rate)
+                if STREAMING:
+                    self.streaming = StreamingSession(self.model)
+                    print(f"[stt] Streaming partials: segment={SEGMENT_SECS}s "
+                          f"rollback={ROLLBACK_TOKENS} final_redecode={FINAL_REDECODE}", flush=True)
+            if vad is not None:
+                self.vad_iterator = vad.result()
+
+        if self.source is None:
+            self.source = STARTUP.run("source", open_source, INPUT, self.rate, CHUNK_SIZE,
+                                      pace=INPUT_PACE)
+        print(STARTUP.report(), flush=True)
 
     def start(self):
-        if self.stream is None:
+        if self.source is None:
             self.warmup()
         self._running = True
-        self.stream.start()
-
-        lookback_size = LOOKBACK_CHUNKS * CHUNK_SIZE
-        speech = np.empty(0, dtype=np.float32)
-        recording = False
-        start_time = None
-
+        self._threads = [
+            threading.Thread(target=self._vad_loop, name="stt-vad", daemon=True),
+            threading.Thread(target=self._inference_loop, name="stt-infer", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+        self.source.start(self.ring)
         try:
-            with self.stream:
-                while self._running:
-                    chunk, status = self.queue.get()
-                    if status:
-                        print(status, flush=True)
-
-                    speech = np.concatenate((speech, chunk))
-                    if not recording:
-                        speech = speech[-lookback_size:]
-
-                    speech_dict = self.vad_iterator(chunk)
-                    if speech_dict:
-                        if "start" in speech_dict and not recording:
-                            recording = True
-                            start_time = time.time()
-
-                        if "end" in speech_dict and recording:
-                            recording = False
-                            self._end_recording(speech)
-                    elif recording:
-                        if (len(speech) / self.rate) > MAX_SPEECH_SECS:
-                            recording = False
-                            self._end_recording(speech)
-                            self._soft_reset_vad()
-
-                        if (time.time() - start_time) > MIN_REFRESH_SECS:
-                            text = self.model(speech)
-                            line = right_justified_line(text, self.caption_cache)
-                            print("\r" + (" " * MAX_LINE_LENGTH) + "\r" + line, end="", flush=True)
-                            start_time = time.time()
+            idle = 0
+            while self._running:
+                time.sleep(0.1)
+                # file input: stop once the clips are played and the pipeline is empty
+                idle = idle + 1 if self.source.finished.is_set() and self._drained() else 0
+                if idle >= 3:
+                    self.stop()
         except KeyboardInterrupt:
             self.stop()
 
     def stop(self):
         self._running = False
-        if self.stream:
-            try:
-                self.stream.stop()
-                self.stream.close()
-            except Exception:
-                pass
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join(timeout=2.0)
+        if self.source is not None:
+            self.source.stop()
+        if self.model is not None and self.audio_secs > 0:
+            print("\n" + self.report(), flush=True)
+            if METRICS_JSON:
+                summary = self.metrics.summary(self.audio_secs, self.model)
+                summary.update(model=self.model_name, streaming=self.streaming is not None,
+                               input=INPUT, pace=INPUT_PACE, overruns=self.ring.overruns,
+                               startup=STARTUP.phases, first_caption_secs=STARTUP.first_caption)
+                with open(METRICS_JSON, "w") as f:
+                    json.dump(summary, f, indent=2)
+        if self.ring.overruns:
+            print(f"[stt] dropped {self.ring.overruns} audio blocks (consumer behind)", flush=True)
         print("[stt] Done.", flush=True)
 
 def main():
-    set_cache_env("/models")
+    set_cache_env(MODELS_DIR)
 
-    svc = Transcribe(model_name="moonshine/base")
+    svc = Transcribe(model_name=os.environ.get("MODEL_NAME", "moonshine/base"))
 
     def _sigterm(sig, frame):
         svc.stop()
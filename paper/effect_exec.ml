@@ -0,0 +1,388 @@
+(* Asynchronous executor for engine side effects (docker, locally or over ssh).
+
+   Effects run on a small pool of worker threads, so the reaction loop only
+   enqueues them. Remote commands share one multiplexed ssh connection
+   (ControlMaster / ControlPersist, so it also outlives the engine process),
+   container and image state is cached for [ttl] seconds, and concurrent
+   starts of the same container share a single run. *)
+
+type ssh = {
+  host : string;
+  port : string;
+  key : string option;
+  strict : bool;
+  control_path : string;
+  persist : int; (* seconds the master outlives its last client *)
+}
+
+type target = Local | Remote of ssh
+type container = { image : string; name : string; run_args : string }
+type container_state = Running | Stopped | Absent
+
+let default_control_path host port =
+  Filename.concat
+    (Filename.get_temp_dir_name ())
+    (Printf.sprintf "bifrost-ssh-%s-%s.sock" host port)
+
+(* ---------- futures ---------- *)
+
+type 'a future = {
+  fm : Mutex.t;
+  fc : Condition.t;
+  mutable value : ('a, exn) result option;
+  mutable callbacks : (('a, exn) result -> unit) list;
+}
+
+let future () =
+  { fm = Mutex.create (); fc = Condition.create (); value = None; callbacks = [] }
+
+let resolve f r =
+  Mutex.lock f.fm;
+  f.value <- Some r;
+  let cbs = f.callbacks in
+  f.callbacks <- [];
+  Condition.broadcast f.fc;
+  Mutex.unlock f.fm;
+  List.iter (fun cb -> cb r) (List.rev cbs)
+
+let await f =
+  Mutex.lock f.fm;
+  while Option.is_none f.value do
+    Condition.wait f.fc f.fm
+  done;
+  let r = Option.get f.value in
+  Mutex.unlock f.fm;
+  match r with Ok v -> v | Error e -> raise e
+
+(* [cb] runs on the resolving worker, or immediately if [f] is already done *)
+let on_resolve f cb =
+  Mutex.lock f.fm;
+  match f.value with
+  | Some r ->
+      Mutex.unlock f.fm;
+      cb r
+  | None ->
+      f.callbacks <- cb :: f.callbacks;
+      Mutex.unlock f.fm
+
+(* ---------- executor ---------- *)
+
+type t = {
+  target : target;
+  ttl : float;
+  log : string -> unit;
+  m : Mutex.t;
+  nonempty : Condition.t;
+  idle : Condition.t;
+  jobs : (unit -> unit) Queue.t;
+  mutable busy : int;
+  mutable stopping : bool;
+  mutable workers : Thread.t list;
+  inflight : (string, bool future) Hashtbl.t;
+  mutable containers : (float * (string * container_state) list) option;
+  images : (string, float) Hashtbl.t; (* image -> time last seen present *)
+  ssh_m : Mutex.t;
+  mutable master_up : bool;
+  mutable master_at : float; (* last attempt to start the master *)
+}
+
+let with_lock m f =
+  Mutex.lock m;
+  Fun.protect ~finally:(fun () -> Mutex.unlock m) f
+
+let rec worker t =
+  Mutex.lock t.m;
+  while Queue.is_empty t.jobs && not t.stopping do
+    Condition.wait t.nonempty t.m
+  done;
+  if Queue.is_empty t.jobs then Mutex.unlock t.m
+  else
+    let job = Queue.pop t.jobs in
+    t.busy <- t.busy + 1;
+    Mutex.unlock t.m;
+    (try job ()
+     with e -> t.log ("effect callback failed: " ^ Printexc.to_string e));
+    Mutex.lock t.m;
+    t.busy <- t.busy - 1;
+    if t.busy = 0 && Queue.is_empty t.jobs then Condition.broadcast t.idle;
+    Mutex.unlock t.m;
+    worker t
+
+let create ?(workers = 2) ?(ttl = 5.0)
+    ?(log = fun s -> Printf.printf "[effects] %s\n%!" s) target =
+  let t =
+    {
+      target;
+      ttl;
+      log;
+      m = Mutex.create ();
+      nonempty = Condition.create ();
+      idle = Condition.create ();
+      jobs = Queue.create ();
+      busy = 0;
+      stopping = false;
+      workers = [];
+      inflight = Hashtbl.create 8;
+      containers = None;
+      images = Hashtbl.create 8;
+      ssh_m = Mutex.create ();
+      master_up = false;
+      master_at = neg_infinity;
+    }
+  in
+  t.workers <- List.init (max 1 workers) (fun _ -> Thread.create worker t);
+  t
+
+let enqueue t job =
+  with_lock t.m (fun () ->
+      if t.stopping then invalid_arg "Effect_exec: executor is shut down";
+      Queue.push job t.jobs;
+      Condition.signal t.nonempty)
+
+let run_job t f fut () =
+  let r =
+    try Ok (f ())
+    with e ->
+      t.log ("effect failed: " ^ Printexc.to_string e);
+      Error e
+  in
+  resolve fut r
+
+let submit t (f : unit -> 'a) : 'a future =
+  let fut = future () in
+  enqueue t (run_job t f fut);
+  fut
+
+(* Like [submit], but while an effect under [key] is queued or running,
+   further submissions return its future instead of running again. *)
+let submit_once t ~key (f : unit -> bool) : bool future =
+  let fut, fresh =
+    with_lock t.m (fun () ->
+        match Hashtbl.find_opt t.inflight key with
+        | Some fut -> (fut, false)
+        | None ->
+            let fut = future () in
+            Hashtbl.replace t.inflight key fut;
+            (fut, true))
+  in
+  if fresh then (
+    on_resolve fut (fun _ ->
+        with_lock t.m (fun () -> Hashtbl.remove t.inflight key));
+    enqueue t (run_job t f fut));
+  fut
+
+(* Block until every queued effect has finished. *)
+let drain t =
+  with_lock t.m (fun () ->
+      while t.busy > 0 || not (Queue.is_empty t.jobs) do
+        Condition.wait t.idle t.m
+      done)
+
+(* ---------- commands ---------- *)
+
+let ssh_command s ~master =
+  String.concat " "
+    (List.filter
+       (fun x -> x <> "")
+       [
+         "ssh -o BatchMode=yes -o IdentitiesOnly=yes";
+         (if s.strict then ""
+          else "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null");
+         (match s.key with
+         | Some k when k <> "" -> "-i " ^ Filename.quote k
+         | _ -> "");
+         Printf.sprintf "-o ControlPath=%s" (Filename.quote s.control_path);
+         (if master then
+            Printf.sprintf "-o ControlMaster=yes -o ControlPersist=%d -fN"
+              s.persist
+          else "-o ControlMaster=no");
+         "-p " ^ Filename.quote s.port;
+         s.host;
+       ])
+
+let run t cmd : int * string =
+  t.log ("$ " ^ cmd);
+  let ic = Unix.open_process_in cmd in
+  let out = In_channel.input_all ic in
+  match Unix.close_process_in ic with
+  | Unix.WEXITED n -> (n, out)
+  | Unix.WSIGNALED _ | Unix.WSTOPPED _ -> (255, out)
+
+let master_alive t s =
+  Sys.file_exists s.control_path
+  && fst
+       (run t
+          (Printf.sprintf "ssh -o ControlPath=%s -O check %s >/dev/null 2>&1"
+             (Filename.quote s.control_path)
+             s.host))
+     = 0
+
+(* Reuse a live master (possibly left by an earlier run), else start one
+   detached with its stdio on /dev/null. Clients that find no socket
+   connect directly; a failed start is retried after [ttl]. *)
+let ensure_master t s =
+  with_lock t.ssh_m (fun () ->
+      let now = Unix.gettimeofday () in
+      if t.master_up && Sys.file_exists s.control_path then ()
+      else if master_alive t s then t.master_up <- true
+      else if now -. t.master_at >= t.ttl then (
+        t.master_at <- now;
+        if Sys.file_exists s.control_path then Sys.remove s.control_path;
+        let code, _ =
+          run t (ssh_command s ~master:true ^ " </dev/null >/dev/null 2>&1")
+        in
+        t.master_up <- code = 0;
+        if code <> 0 then
+          t.log "ssh master unavailable; using one connection per command"))
+
+let docker_command t args =
+  match t.target with
+  | Local -> "docker " ^ args
+  | Remote s ->
+      ensure_master t s;
+      ssh_command s ~master:false ^ " " ^ Filename.quote ("docker " ^ args)
+
+let docker t args = fst (run t (docker_command t args))
+let docker_output t args = run t (docker_command t args)
+
+let close_master t =
+  match t.target with
+  | Remote s when Sys.file_exists s.control_path ->
+      ignore
+        (run t
+           (Printf.sprintf "ssh -o ControlPath=%s -O exit %s >/dev/null 2>&1"
+              (Filename.quote s.control_path)
+              s.host));
+      with_lock t.ssh_m (fun () -> t.master_up <- false)
+  | _ -> ()
+
+(* ---------- cached state ---------- *)
+
+let parse_states out =
+  String.split_on_char '\n' out
+  |> List.filter_map (fun line ->
+         match String.split_on_char '\t' (String.trim line) with
+         | [ name; state ] when name <> "" ->
+             Some (name, if state = "running" then Running else Stopped)
+         | _ -> None)
+
+(* One listing answers every container query for [ttl] seconds. *)
+let container_states t =
+  let now = Unix.gettimeofday () in
+  match with_lock t.m (fun () -> t.containers) with
+  | Some (at, states) when now -. at < t.ttl -> states
+  | _ ->
+      let code, out = docker_output t "ps -a --format '{{.Names}}\\t{{.State}}'" in
+      let states = if code = 0 then parse_states out else [] in
+      if code = 0 then with_lock t.m (fun () -> t.containers <- Some (now, states));
+      states
+
+let container_state t name =
+  match List.assoc_opt name (container_states t) with
+  | Some s -> s
+  | None -> Absent
+
+let set_state t name state =
+  with_lock t.m (fun () ->
+      match t.containers with
+      | Some (at, states) ->
+          t.containers <- Some (at, (name, state) :: List.remove_assoc name states)
+      | None -> ())
+
+let invalidate t =
+  with_lock t.m (fun () ->
+      t.containers <- None;
+      Hashtbl.reset t.images)
+
+let image_present t img =
+  let now = Unix.gettimeofday () in
+  match with_lock t.m (fun () -> Hashtbl.find_opt t.images img) with
+  | Some at when now -. at < t.ttl -> true
+  | _ ->
+      let ok =
+        docker t (Printf.sprintf "image inspect %s >/dev/null 2>&1" (Filename.quote img))
+        = 0
+      in
+      if ok then with_lock t.m (fun () -> Hashtbl.replace t.images img now);
+      ok
+
+(* Stream a local image to the remote host when the remote cannot pull it. *)
+let push_image t img =
+  match t.target with
+  | Local -> false
+  | Remote s ->
+      let local_ok =
+        fst (run t (Printf.sprintf "docker image inspect %s >/dev/null 2>&1"
+                      (Filename.quote img)))
+        = 0
+      in
+      local_ok
+      && (ensure_master t s;
+          fst
+            (run t
+               (Printf.sprintf "docker save %s | gzip | %s 'gunzip | docker load'"
+                  (Filename.quote img) (ssh_command s ~master:false)))
+          = 0)
+
+let remember_image t img =
+  with_lock t.m (fun () -> Hashtbl.replace t.images img (Unix.gettimeofday ()))
+
+let ensure_image ?(push_via_ssh = false) t img =
+  if image_present t img then true
+  else if docker t ("pull " ^ Filename.quote img) = 0 then (
+    remember_image t img;
+    true)
+  else if push_via_ssh then (
+    t.log "pull failed; streaming local image via ssh";
+    let ok = push_image t img in
+    if ok then remember_image t img;
+    ok)
+  else false
+
+(* ---------- effects ---------- *)
+
+(* Image available and container running; concurrent calls for the same
+   container name share one run. *)
+let ensure_running ?push_via_ssh t (c : container) : bool future =
+  submit_once t ~key:("start:" ^ c.name) (fun () ->
+      if not (ensure_image ?push_via_ssh t c.image) then (
+        t.log (Printf.sprintf "ERROR: image '%s' not available" c.image);
+        false)
+      else
+        match container_state t c.name with
+        | Running ->
+            t.log (Printf.sprintf "container '%s' already running" c.name);
+            true
+        | state ->
+            let cmd =
+              if state = Stopped then "start " ^ c.name
+              else Printf.sprintf "run -d --name %s %s %s" c.name c.run_args c.image
+            in
+            let ok = docker t cmd = 0 in
+            if ok then set_state t c.name Running
+            else with_lock t.m (fun () -> t.containers <- None);
+            ok)
+
+(* Container status and its last [tail_lines] log lines, through [t.log] *)
+let verify t ~container ~tail_lines =
+  let show args =
+    let _, out = docker_output t args in
+    String.split_on_char '\n' out
+    |> List.iter (fun line -> if line <> "" then t.log line)
+  in
+  submit t (fun () ->
+      show
+        (Printf.sprintf
+           "ps --format '{{.Names}}\\t{{.Status}}' | grep -E '^%s\\b' || true"
+           container);
+      show (Printf.sprintf "logs --tail %d %s 2>&1 || true" tail_lines container))
+
+(* Finish queued effects and stop the workers. The ssh master is left up
+   (ControlPersist) for the next engine run; see [close_master]. *)
+let shutdown t =
+  drain t;
+  with_lock t.m (fun () ->
+      t.stopping <- true;
+      Condition.broadcast t.nonempty);
+  List.iter Thread.join t.workers;
+  t.workers <- []
@@ -1,549 +1,316 @@
 open Bifrost
-open Bifrost.Utils
 open Bifrost.Bigraph
 open Bifrost.Matching
-module Api = Bigraph_capnp.Make (Capnp.BytesMessage)
-
-(* ---------- helpers ---------- *)
-
-let prop_of (nd : node) (k : string) : property_value option =
-  match nd.properties with Some ps -> List.assoc_opt k ps | None -> None
-
-let prop_bool (nd : node) (k : string) : bool option =
-  match prop_of nd k with
-  | Some (Bool b) -> Some b
-  | Some (Int n) -> Some (n <> 0)
-  | Some (String "true") -> Some true
-  | Some (String "false") -> Some false
-  | _ -> None
-
-let nodes_by_id (bg : bigraph) : (int, node) Hashtbl.t =
-  let tbl = Hashtbl.create 256 in
-  let roots = get_root_nodes bg in
-  let rec dfs nid =
-    match get_node bg nid with
-    | None -> ()
-    | Some nd ->
-        Hashtbl.replace tbl nid nd;
-        let kids = get_children bg nid in
-        NodeSet.iter dfs kids
-  in
-  NodeSet.iter dfs roots;
-  tbl
-
-(* ---------- capnp ---------- *)
-
-let propvalue_of_capnp (pv : Api.Reader.PropertyValue.t) : property_value =
-  match Api.Reader.PropertyValue.get pv with
-  | Api.Reader.PropertyValue.BoolVal b -> Bool b
-  | Api.Reader.PropertyValue.IntVal i -> Int (Int32.to_int i)
-  | Api.Reader.PropertyValue.FloatVal f -> Float f
-  | Api.Reader.PropertyValue.StringVal s -> String s
-  | Api.Reader.PropertyValue.ColorVal c ->
-      let r = Api.Reader.PropertyValue.ColorVal.r_get c in
-      let g = Api.Reader.PropertyValue.ColorVal.g_get c in
-      let b = Api.Reader.PropertyValue.ColorVal.b_get c in
-      Color (r, g, b)
-  | Api.Reader.PropertyValue.Undefined _ -> String ""
-
-let build_bigraph_with_interface (b : Api.Reader.Bigraph.t) :
-    bigraph_with_interface =
-  let nodes = Api.Reader.Bigraph.nodes_get_list b in
-  let sig_tbl : (string, control) Hashtbl.t =
-    Hashtbl.create (List.length nodes)
-  in
-  List.iter
-    (fun n ->
-      let cname = Api.Reader.Node.control_get n in
-      let arity = Api.Reader.Node.arity_get_int_exn n in
-      if not (Hashtbl.mem sig_tbl cname) then
-        Hashtbl.add sig_tbl cname (create_control cname arity))
-    nodes;
-  let signature = Hashtbl.to_seq_values sig_tbl |> List.of_seq in
-
-  let node_tbl : (int, node) Hashtbl.t = Hashtbl.create (List.length nodes) in
-  List.iter
-    (fun n ->
-      let id = Api.Reader.Node.id_get_int_exn n in
-      if Hashtbl.mem node_tbl id then
-        failwith (Printf.sprintf "Duplicate node id %d" id);
-      let cname = Api.Reader.Node.control_get n in
-      let control =
-        match Hashtbl.find_opt sig_tbl cname with
-        | Some c -> c
-        | None -> create_control cname (Api.Reader.Node.arity_get_int_exn n)
-      in
-      let name = Api.Reader.Node.name_get n in
-      let node_typ = Api.Reader.Node.type_get n in
-      let ports = List.map Int32.to_int (Api.Reader.Node.ports_get_list n) in
-      let props =
-        let pls = Api.Reader.Node.properties_get_list n in
-        if pls = [] then None
-        else
-          Some
-            (List.map
-               (fun p ->
-                 let k = Api.Reader.Property.key_get p in
-                 let v = propvalue_of_capnp (Api.Reader.Property.value_get p) in
-                 (k, v))
-               pls)
-      in
-      Hashtbl.add node_tbl id
-        { id; name; node_type = node_typ; control; ports; properties = props })
-    nodes;
-
-  let bg_ref = ref (empty_bigraph signature) in
-  List.iter
-    (fun n ->
-      let id = Api.Reader.Node.id_get_int_exn n in
-      let parent = Api.Reader.Node.parent_get_int_exn n in
-      let nd = Hashtbl.find node_tbl id in
-      if parent = -1 then bg_ref := add_node_to_root !bg_ref nd
-      else bg_ref := add_node_as_child !bg_ref parent nd)
-    nodes;
-
-  let site_count = Api.Reader.Bigraph.site_count_get_int_exn b in
-  let names = Api.Reader.Bigraph.names_get_list b in
-  {
-    bigraph = !bg_ref;
-    inner = { sites = site_count; names };
-    outer = { sites = 0; names = [] };
-  }
-
-let read_message_from_file filename =
-  let ic = open_in_bin filename in
-  let len = in_channel_length ic in
-  let raw = really_input_string ic len in
-  close_in ic;
-  let stream = Capnp.Codecs.FramedStream.of_string ~compression:`None raw in
-  match Capnp.Codecs.FramedStream.get_next_frame stream with
-  | Ok msg -> msg
-  | Error _ -> failwith ("Failed to decode Cap'n Proto from " ^ filename)
-
-let load_rule_from_file file =
-  let msg = read_message_from_file file in
-  let rr = Api.Reader.Rule.of_message msg in
-  let red = build_bigraph_with_interface (Api.Reader.Rule.redex_get rr) in
-  let rct = build_bigraph_with_interface (Api.Reader.Rule.reactum_get rr) in
-  let nm = Api.Reader.Rule.name_get rr in
-  create_rule nm red rct
-
-let load_bigraph_from_file file =
-  let msg = read_message_from_file file in
-  let r = Api.Reader.Bigraph.of_message msg in
-  build_bigraph_with_interface r
-
-let flatten_nodes_with_parents (bg : bigraph) : (int * int * node) list =
-  let roots = get_root_nodes bg in
-  let rec dfs acc parent_id nid =
-    match get_node bg nid with
-    | None -> acc
-    | Some nd ->
-        let acc' = (nid, parent_id, nd) :: acc in
-        let kids = get_children bg nid in
-        NodeSet.fold (fun cid a -> dfs a nid cid) kids acc'
-  in
-  NodeSet.fold (fun rid a -> dfs a (-1) rid) roots [] |> List.rev
-
-let write_bigraph_to_file (gwi : bigraph_with_interface) (out_path : string) :
-    unit =
-  let flat = flatten_nodes_with_parents gwi.bigraph in
-  let root = Api.Builder.Bigraph.init_root ~message_size:4096 () in
-  Api.Builder.Bigraph.site_count_set root (Int32.of_int gwi.inner.sites);
-  ignore (Api.Builder.Bigraph.names_set_list root gwi.inner.names);
-  let nodes_arr = Api.Builder.Bigraph.nodes_init root (List.length flat) in
-  List.iteri
-    (fun i (id, parent, nd) ->
-      let cn = Capnp.Array.get nodes_arr i in
-      Api.Builder.Node.id_set_int_exn cn id;
-      Api.Builder.Node.control_set cn nd.control.name;
-      Api.Builder.Node.arity_set_int_exn cn nd.control.arity;
-      Api.Builder.Node.parent_set_int_exn cn parent;
-      Api.Builder.Node.name_set cn nd.name;
-      Api.Builder.Node.type_set cn nd.node_type;
-      ignore
-        (Api.Builder.Node.ports_set_list cn (List.map Int32.of_int nd.ports));
-      let props = match nd.properties with None -> [] | Some ps -> ps in
-      let props_arr = Api.Builder.Node.properties_init cn (List.length props) in
-      List.iteri
-        (fun j (k, v) ->
-          let p = Capnp.Array.get props_arr j in
-          Api.Builder.Property.key_set p k;
-          let pv = Api.Builder.Property.value_init p in
-          match v with
-          | Bool b -> Api.Builder.PropertyValue.bool_val_set pv b
-          | Int n -> Api.Builder.PropertyValue.int_val_set_int_exn pv n
-          | Float f -> Api.Builder.PropertyValue.float_val_set pv f
-          | String s -> Api.Builder.PropertyValue.string_val_set pv s
-          | Color (r, g, b) ->
-              let c = Api.Builder.PropertyValue.color_val_init pv in
-              Api.Builder.PropertyValue.ColorVal.r_set_exn c r;
-              Api.Builder.PropertyValue.ColorVal.g_set_exn c g;
-              Api.Builder.PropertyValue.ColorVal.b_set_exn c b)
-        props)
-    flat;
-  let bytes =
-    Capnp.Codecs.serialize ~compression:`None
-      (Api.Builder.Bigraph.to_message root)
-  in
-  let oc = open_out_bin out_path in
-  output_string oc bytes;
-  close_out oc
 
 (* ---------- Docker (local or remote over SSH) ---------- *)
 
-type effect_cfg = { image : string; cname : string; run_args : string }
+(* Effects go through Effect_exec: they run on worker threads, remote
+   commands share one multiplexed ssh connection, and container/image
+   state is cached for STT_STATE_TTL seconds. *)
 
 let env_default k d =
   match Sys.getenv_opt k with Some v when v <> "" -> v | _ -> d
 
-let stt_cfg () : effect_cfg =
+let stt_cfg () : Effect_exec.container =
   {
-    image = env_default "STT_IMAGE" "j0shm/stt-service:latest";
-    cname = env_default "STT_CONTAINER" "stt";
+    Effect_exec.image = env_default "STT_IMAGE" "j0shm/stt-service:latest";
+    name = env_default "STT_CONTAINER" "stt";
     run_args =
       env_default "STT_RUN_ARGS"
         "--device /dev/snd --group-add audio -v stt_models:/models -e \
          MODEL_NAME=moonshine/base";
   }
 
-let sh_escape_single_quotes s =
-  "'" ^ String.concat "'\\''" (String.split_on_char '\'' s) ^ "'"
-
-let run_cmd (cmd : string) : int =
-  Printf.printf "[engine] $ %s\n%!" cmd;
-  Sys.command cmd
-
-let env_default k d =
-  match Sys.getenv_opt k with Some v when v <> "" -> v | _ -> d
-
-let ssh_prefix () : string option =
+let effect_target () : Effect_exec.target =
   match Sys.getenv_opt "STT_REMOTE_HOST" with
-  | None -> None
+  | None -> Effect_exec.Local
   | Some host ->
       let port = env_default "STT_REMOTE_PORT" "22" in
-      let strict =
-        match String.lowercase_ascii (env_default "STT_REMOTE_STRICT" "no") with
-        | "no" | "0" | "false" ->
-            "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
-        | _ -> ""
-      in
-      let key_opt =
-        match Sys.getenv_opt "STT_SSH_KEY" with
-        | Some k when k <> "" -> Printf.sprintf "-i %s" (Filename.quote k)
-        | _ -> ""
-      in
-      Some
-        (Printf.sprintf
-           "ssh -o BatchMode=yes -o IdentitiesOnly=yes %s %s -p %s %s" strict
-           key_opt (Filename.quote port) host)
-
-let docker_exec (docker_args : string) : int =
+      Effect_exec.Remote
+        {
+          Effect_exec.host;
+          port;
+          key = Sys.getenv_opt "STT_SSH_KEY";
+          strict =
+            (match
+               String.lowercase_ascii (env_default "STT_REMOTE_STRICT" "no")
+             with
+            | "no" | "0" | "false" -> false
+            | _ -> true);
+          control_path =
+            env_default "STT_SSH_CONTROL_PATH"
+              (Effect_exec.default_control_path host port);
+          persist = int_of_string (env_default "STT_SSH_PERSIST" "600");
+        }
+
+let create_effects () : Effect_exec.t =
   (match Sys.getenv_opt "STT_DOCKER_HOST" with
   | Some v when v <> "" -> Unix.putenv "DOCKER_HOST" v
   | _ -> ());
-  match ssh_prefix () with
-  | Some ssh ->
-      let remote =
-        Printf.sprintf "%s %s" ssh
-          (sh_escape_single_quotes ("docker " ^ docker_args))
-      in
-      run_cmd remote
-  | None -> run_cmd (Printf.sprintf "docker %s" docker_args)
-
-let docker_exec_local (docker_args : string) : int =
-  run_cmd (Printf.sprintf "docker %s" docker_args)
-
-let image_present_remote img =
-  docker_exec (Printf.sprintf "image inspect %s >/dev/null 2>&1" img) = 0
-
-let image_present_local img =
-  docker_exec_local (Printf.sprintf "image inspect %s >/dev/null 2>&1" img) = 0
-
-let pull_remote img : bool = docker_exec (Printf.sprintf "pull %s" img) = 0
-
-(* Optional fallback: stream local image to remote via ssh *)
-let push_image_via_ssh img : bool =
-  match ssh_prefix () with
-  | None -> false
-  | Some ssh ->
-      if not (image_present_local img) then false
-      else
-        let cmd =
-          Printf.sprintf "docker save %s | gzip | %s 'gunzip | docker load'"
-            (Filename.quote img) ssh
-        in
-        run_cmd cmd = 0
-
-let ensure_image_remote (img : string) : bool =
-  if image_present_remote img then (
-    Printf.printf "[engine] Image present (remote): %s\n%!" img;
-    true)
-  else if
-    (* try pull; if denied and STT_PUSH_VIA_SSH=1, stream local image *)
-    pull_remote img
-  then true
-  else
+  Effect_exec.create
+    ~workers:(int_of_string (env_default "STT_EFFECT_WORKERS" "2"))
+    ~ttl:(float_of_string (env_default "STT_STATE_TTL" "5"))
+    ~log:(fun s -> Printf.printf "[engine] %s\n%!" s)
+    (effect_target ())
+
+let start_stt ~(effects : Effect_exec.t) (f : Triggers.firing) =
+  let cfg = stt_cfg () in
+  Printf.printf "[engine] STT active (node %d)\n%!" f.Triggers.node;
+  let push_via_ssh =
     match Sys.getenv_opt "STT_PUSH_VIA_SSH" with
-    | Some ("1" | "true" | "TRUE") ->
-        Printf.printf
-          "[engine] Remote pull failed; streaming local image via SSH...\n%!";
-        push_image_via_ssh img
+    | Some ("1" | "true" | "TRUE") -> true
     | _ -> false
+  in
+  let where =
+    match Sys.getenv_opt "STT_REMOTE_HOST" with
+    | Some h -> h
+    | None -> "local"
+  in
+  (* queued; the reaction loop carries on while docker/ssh run *)
+  Effect_exec.on_resolve
+    (Effect_exec.ensure_running ~push_via_ssh effects cfg)
+    (function
+      | Ok true ->
+          (match Sys.getenv_opt "STT_VERIFY" with
+          | Some _ ->
+              ignore
+                (Effect_exec.verify effects ~container:cfg.Effect_exec.name
+                   ~tail_lines:50)
+          | None -> ());
+          Printf.printf "[engine] STT started on %s (container=%s)\n%!" where
+            cfg.Effect_exec.name
+      | Ok false | Error _ ->
+          Printf.printf "[engine] ERROR: failed to start container '%s'\n%!"
+            cfg.Effect_exec.name)
+
+(* An "active" value as the engine reads it: true, any nonzero int or "true" *)
+let truthy = function
+  | Some (Bool b) -> b
+  | Some (Int n) -> n <> 0
+  | Some (String "true") -> true
+  | _ -> false
+
+(* Effects keyed by (node_type, property, transition); evaluated on the
+   nodes each application touched rather than by diffing whole graphs.
+   An STT starts when its "active" becomes truthy from anything falsy or
+   unset, so 1 -> true on an already active node does not start it again. *)
+let effect_triggers ~effects : Triggers.t =
+  let reg = Triggers.create () in
+  Triggers.register reg ~name:"stt-start" ~node_type:"STT" ~property:"active"
+    Triggers.Changed (fun f ->
+      if truthy f.Triggers.after && not (truthy f.Triggers.before) then
+        start_stt ~effects f);
+  reg
 
-let container_running name =
-  docker_exec
-    (Printf.sprintf "ps --format '{{.Names}}' | grep -x %s >/dev/null 2>&1" name)
-  = 0
-
-let container_exists name =
-  docker_exec
-    (Printf.sprintf "ps -a --format '{{.Names}}' | grep -x %s >/dev/null 2>&1"
-       name)
-  = 0
-
-let ensure_container_running cfg : bool =
-  if container_running cfg.cname then (
-    Printf.printf "[engine] Container '%s' already running.\n%!" cfg.cname;
-    true)
-  else if container_exists cfg.cname then
-    docker_exec (Printf.sprintf "start %s" cfg.cname) = 0
-  else
-    docker_exec
-      (Printf.sprintf "run -d --name %s %s %s" cfg.cname cfg.run_args cfg.image)
-    = 0
-
-let docker_verify ~container ~tail_lines =
-  ignore
-    (docker_exec
-       (Printf.sprintf
-          "ps --format '{{.Names}}\\t{{.Status}}' | grep -E '^%s\\b' || true"
-          container));
-  ignore
-    (docker_exec
-       (Printf.sprintf "logs --tail %d %s || true" tail_lines container))
-
-let maybe_start_stt ~(before : bigraph_with_interface)
-    ~(after : bigraph_with_interface) =
-  (* fire iff any STT went from inactive->active *)
-  let b = nodes_by_id before.bigraph in
-  let a = nodes_by_id after.bigraph in
-  let activated = ref false in
-  Hashtbl.iter
-    (fun id nd_after ->
-      if nd_after.node_type = "STT" then
-        let now =
-          match prop_bool nd_after "active" with Some v -> v | None -> false
-        in
-        let was =
-          match Hashtbl.find_opt b id with
-          | None -> false
-          | Some nd_before -> (
-              match prop_bool nd_before "active" with
-              | Some v -> v
-              | None -> false)
-        in
-        if (not was) && now then activated := true)
-    a;
-  if !activated then (
-    let cfg = stt_cfg () in
-    Printf.printf "[engine] STT active\n%!";
-    let ok_img =
-      match Sys.getenv_opt "STT_REMOTE_HOST" with
-      | None ->
-          image_present_local cfg.image
-          || docker_exec_local (Printf.sprintf "pull %s" cfg.image) = 0
-      | Some _ -> ensure_image_remote cfg.image
-    in
-    if not ok_img then
-      Printf.printf
-        "[engine] ERROR: image '%s' not available remotely and pull/stream \
-         failed.\n\
-         %!"
-        cfg.image
-    else
-      let started = ensure_container_running cfg in
-      if started then (
-        (match Sys.getenv_opt "STT_VERIFY" with
-        | Some _ -> docker_verify ~container:cfg.cname ~tail_lines:50
-        | None -> ());
-        let where =
-          match Sys.getenv_opt "STT_REMOTE_HOST" with
-          | Some h -> h
-          | None -> "local"
-        in
-        Printf.printf "[engine] STT started on %s (container=%s)\n%!" where
-          cfg.cname)
-      else
-        Printf.printf "[engine] ERROR: failed to start container '%s'\n%!"
-          cfg.cname)
-
-(* --------------------------------------------------------------- *)
-(* REPAIR: re-parent reactum-only nodes under their intended parent *)
-(* --------------------------------------------------------------- *)
-
-let props_subset (a : (string * property_value) list option)
-    (b : (string * property_value) list option) : bool =
-  match a with
-  | None -> true
-  | Some al ->
-      let bl = match b with None -> [] | Some bl -> bl in
-      List.for_all
-        (fun (k, v) ->
-          match List.assoc_opt k bl with Some v' -> v = v' | None -> false)
-        al
+(* ---------- main ---------- *)
 
-let node_sig_match (needle : node) (hay : node) : bool =
-  needle.node_type = hay.node_type
-  && needle.control.name = hay.control.name
-  && props_subset needle.properties hay.properties
+(* Besides rule files, the argument list may hold history steps:
+     tag:NAME        name the current state
+     revert:V|NAME   make version V (0 = as loaded) or tagged state current
+   The last ENGINE_HISTORY (default 64) states and all tagged ones are kept
+   in a State_store for the run. *)
+let history_step store arg =
+  match String.index_opt arg ':' with
+  | Some i when not (Sys.file_exists arg) -> (
+      let key = String.sub arg (i + 1) (String.length arg - i - 1) in
+      match String.sub arg 0 i with
+      | "tag" ->
+          State_store.tag store key;
+          Printf.printf "[engine] tagged version %d as %s\n%!"
+            (State_store.head store) key;
+          true
+      | "revert" ->
+          let v =
+            match State_store.resolve store key with
+            | Some v -> Some v
+            | None -> int_of_string_opt key
+          in
+          (match Option.bind v (State_store.revert store) with
+          | Some _ ->
+              Printf.printf "[engine] reverted to %s (now version %d)\n%!" key
+                (State_store.head store)
+          | None ->
+              Printf.printf "[engine] cannot revert to %s: not retained\n%!" key);
+          true
+      | _ -> false)
+  | _ -> false
+
+(* ENGINE_JSON_FEED=path appends one JSON line per state change for UIs:
+   first {"version":V,"document":...}, the flat export (Bigraph_json) of the
+   state as loaded, then {"version":V,"patch":[...]} with the RFC 6902
+   operations from the previous line's state to version V. *)
+let open_feed store =
+  match Sys.getenv_opt "ENGINE_JSON_FEED" with
+  | Some path when path <> "" ->
+      let oc = open_out_gen [ Open_wronly; Open_creat; Open_append ] 0o644 path in
+      Printf.fprintf oc "{\"version\":%d,\"document\":" (State_store.head store);
+      Bigraph_json.to_channel oc (State_store.current store);
+      output_string oc "}\n";
+      flush oc;
+      Some oc
+  | _ -> None
 
-let parent_map_of (bg : bigraph) : (int, int) Hashtbl.t =
-  let pm = Hashtbl.create 256 in
-  let rec dfs parent nid =
-    Hashtbl.replace pm nid parent;
-    get_children bg nid |> NodeSet.iter (dfs nid)
+let feed_patch feed store ~(before : bigraph_with_interface) events =
+  match feed with
+  | None -> ()
+  | Some oc ->
+      let after = State_store.current store in
+      Yojson.Safe.to_channel oc
+        (`Assoc
+          [
+            ("version", `Int (State_store.head store));
+            ( "patch",
+              `List
+                (Bigraph_json.patch ~before:before.bigraph ~after:after.bigraph
+                   events) );
+          ]);
+      output_char oc '\n';
+      flush oc
+
+(* A rule argument may carry a priority, rule.capnp@N (default 0). With
+   --fixpoint or --max-steps N, each run of consecutive rule arguments is
+   one rule set that Scheduler applies until nothing changes, or for at
+   most N steps (1000 for --fixpoint alone); history steps between sets
+   act on the state reached so far. Without them every rule file is
+   applied once, in order, and priorities are ignored. *)
+let rule_arg arg =
+  match String.rindex_opt arg '@' with
+  | Some i when not (Sys.file_exists arg) -> (
+      match int_of_string_opt (String.sub arg (i + 1) (String.length arg - i - 1)) with
+      | Some prio -> (String.sub arg 0 i, prio)
+      | None -> (arg, 0))
+  | _ -> (arg, 0)
+
+let is_history arg =
+  match String.index_opt arg ':' with
+  | Some i when not (Sys.file_exists arg) ->
+      List.mem (String.sub arg 0 i) [ "tag"; "revert" ]
+  | _ -> false
+
+let parse_flags args =
+  let rec go fixpoint max_steps acc = function
+    | "--fixpoint" :: rest -> go true max_steps acc rest
+    | "--max-steps" :: n :: rest -> go fixpoint (int_of_string_opt n) acc rest
+    | a :: rest -> go fixpoint max_steps (a :: acc) rest
+    | [] -> (fixpoint, max_steps, List.rev acc)
   in
-  get_root_nodes bg |> NodeSet.iter (dfs (-1));
-  pm
-
-let signature_from_nodes (all : node list) : control list =
-  let tbl = Hashtbl.create 64 in
-  List.iter
-    (fun nd ->
-      if not (Hashtbl.mem tbl nd.control.name) then
-        Hashtbl.add tbl nd.control.name nd.control)
-    all;
-  Hashtbl.to_seq_values tbl |> List.of_seq
+  go false None [] args
 
-let rebuild_with_parents (nodes : (int, node) Hashtbl.t)
-    (parents : (int, int) Hashtbl.t) : bigraph =
-  let all_nodes = Hashtbl.to_seq_values nodes |> List.of_seq in
-  let signature = signature_from_nodes all_nodes in
-  let bg_ref = ref (empty_bigraph signature) in
-  let added = Hashtbl.create (Hashtbl.length nodes) in
-  let rec pass () =
-    let progressed = ref false in
-    Hashtbl.iter
-      (fun id nd ->
-        if not (Hashtbl.mem added id) then
-          let parent = Hashtbl.find parents id in
-          if parent = -1 || Hashtbl.mem added parent then (
-            if parent = -1 then bg_ref := add_node_to_root !bg_ref nd
-            else bg_ref := add_node_as_child !bg_ref parent nd;
-            Hashtbl.add added id true;
-            progressed := true))
-      nodes;
-    if !progressed && Hashtbl.length added < Hashtbl.length nodes then pass ()
+let () =
+  let fixpoint, max_steps, args = parse_flags (List.tl (Array.to_list Sys.argv)) in
+  if List.length args < 2 then (
+    prerr_endline
+      "Usage: engine.exe [--fixpoint] [--max-steps N] <target.capnp> \
+       <rule1.capnp[@prio]|tag:NAME|revert:V> ...";
+    exit 2);
+  let target_path = List.hd args in
+  let rule_files = List.tl args in
+
+  let initial, osm_index = Bigraph_codec.load_bigraph_indexed target_path in
+  let store =
+    State_store.create
+      ~keep:(int_of_string (env_default "ENGINE_HISTORY" "64"))
+      initial
   in
-  pass ();
-  !bg_ref
-
-let repair_parenting_of_new_nodes ~(rule : reaction_rule)
-    ~(result : bigraph_with_interface) : bigraph_with_interface =
-  let redex_pm = parent_map_of rule.redex.bigraph in
-  let react_pm = parent_map_of rule.reactum.bigraph in
+  (* keep a saved osm_id index in step with the rewritten graph, as
+     bin/bridge does; a file saved without one stays without one *)
+  let osm_index = ref osm_index in
+  let save (s : bigraph_with_interface) =
+    if Osm_index.cardinal !osm_index > 0 then
+      osm_index := Osm_index.of_bigraph s.bigraph;
+    Bigraph_codec.write_bigraph ~osm_index:!osm_index s target_path
+  in
+  let effects = create_effects () in
+  let triggers = effect_triggers ~effects in
+  let feed = open_feed store in
+  Printf.printf "[engine] target: %s\n%!" target_path;
 
-  let redex_id_set =
-    let s = Hashtbl.create 128 in
-    Hashtbl.iter (fun k _ -> Hashtbl.replace s k true) redex_pm;
-    s
+  (* a history step that moved the head is fed as the diff it made *)
+  let history rf =
+    let before = State_store.current store and head = State_store.head store in
+    let handled = history_step store rf in
+    (if handled && State_store.head store <> head then
+       match State_store.diff store head (State_store.head store) with
+       | Some events -> feed_patch feed store ~before events
+       | None -> ());
+    handled
   in
-  let is_redex_id i = Hashtbl.mem redex_id_set i in
 
-  let new_ids =
-    Hashtbl.to_seq_keys react_pm
-    |> List.of_seq
-    |> List.filter (fun i -> not (is_redex_id i))
+  let apply_file rf =
+    Printf.printf "[engine] applying rule file: %s\n%!" rf;
+    let state = State_store.current store in
+    let rule = Bigraph_codec.load_rule (fst (rule_arg rf)) in
+    Printf.printf "[engine]   can_apply(%s)? %b\n%!" rule.name
+      (can_apply rule state);
+    match apply_rule_with_events rule state with
+    | Some (s, events) ->
+        Printf.printf "[engine] Applied rule: %s\n%!" rule.name;
+        ignore
+          (Triggers.fire triggers ~before:state.bigraph ~after:s.bigraph events);
+        ignore (State_store.commit ~events store s);
+        feed_patch feed store ~before:state events;
+        save s
+    | None ->
+        Printf.printf "[engine] Rule NOT applicable: %s (skipping)\n%!" rule.name
   in
-  if new_ids = [] then result
-  else
-    let res_nodes = nodes_by_id result.bigraph in
-    let res_parents = parent_map_of result.bigraph in
 
-    let rec depth_of i =
-      let p = Hashtbl.find react_pm i in
-      if p = -1 then 0 else 1 + depth_of p
+  let run_set rfs =
+    let rules =
+      List.map
+        (fun rf ->
+          let path, prio = rule_arg rf in
+          (prio, Bigraph_codec.load_rule path))
+        rfs
     in
-    let new_ids_sorted =
-      List.sort (fun a b -> compare (depth_of a) (depth_of b)) new_ids
+    let on_step (st : Scheduler.step) s =
+      let before = State_store.current store in
+      ignore
+        (Triggers.fire triggers ~before:before.bigraph ~after:s.bigraph
+           st.Scheduler.events);
+      ignore (State_store.commit ~events:st.events store s);
+      feed_patch feed store ~before st.events;
+      Printf.printf "[engine] step %d: %d application(s) at priority %d in %.3f ms\n%!"
+        st.index st.applied st.level (st.step_s *. 1000.0)
     in
-
-    let find_matching_in_result (red_nd : node) : int option =
-      let candidate = ref None in
-      Hashtbl.iter
-        (fun id nd ->
-          if !candidate = None && node_sig_match red_nd nd then
-            candidate := Some id)
-        res_nodes;
-      !candidate
+    let report =
+      Scheduler.run
+        ~max_steps:(Option.value max_steps ~default:1000)
+        ~on_step rules (State_store.current store)
     in
+    Printf.printf
+      "[engine] %s after %d step(s), %d application(s) [%s] in %.3f s\n%!"
+      (if report.Scheduler.converged then "fixpoint" else "step bound reached")
+      report.steps report.applications
+      (String.concat " " (List.map string_of_int report.per_step))
+      report.elapsed_s;
+    save report.final
+  in
 
-    let resolved_parent : (int, int) Hashtbl.t = Hashtbl.create 64 in
-    let resolve_parent_id (rp : int) : int option =
-      if rp = -1 then None
-      else if Hashtbl.mem resolved_parent rp then
-        Some (Hashtbl.find resolved_parent rp)
-      else if not (Hashtbl.mem redex_id_set rp) then (
-        Hashtbl.add resolved_parent rp rp;
-        Some rp)
-      else
-        match get_node rule.redex.bigraph rp with
-        | None -> None
-        | Some redex_parent -> (
-            match find_matching_in_result redex_parent with
-            | Some id ->
-                Hashtbl.add resolved_parent rp id;
-                Some id
-            | None -> None)
+  if fixpoint || Option.is_some max_steps then (
+    let pending = ref [] in
+    let flush () =
+      if !pending <> [] then (
+        run_set (List.rev !pending);
+        pending := [])
     in
-
     List.iter
-      (fun nid ->
-        match Hashtbl.find_opt react_pm nid with
-        | None -> ()
-        | Some rp -> (
-            match resolve_parent_id rp with
-            | None -> ()
-            | Some target_parent_id ->
-                Hashtbl.replace res_parents nid target_parent_id))
-      new_ids_sorted;
-
-    let repaired_bigraph = rebuild_with_parents res_nodes res_parents in
-    { result with bigraph = repaired_bigraph }
-
-(* ---------- main ---------- *)
-
-let () =
-  if Array.length Sys.argv < 3 then (
-    prerr_endline
-      "Usage: engine.exe <target.capnp> <rule1.capnp> [rule2.capnp ...]";
-    exit 2);
-  let target_path = Sys.argv.(1) in
-  let rule_files =
-    Array.to_list (Array.sub Sys.argv 2 (Array.length Sys.argv - 2))
-  in
-
-  let state = ref (load_bigraph_from_file target_path) in
-  Printf.printf "[engine] target: %s\n%!" target_path;
-
-  List.iter
-    (fun rf ->
-      Printf.printf "[engine] applying rule file: %s\n%!" rf;
-      let rule = load_rule_from_file rf in
-      Printf.printf "[engine]   can_apply(%s)? %b\n%!" rule.name
-        (can_apply rule !state);
-      match apply_rule rule !state with
-      | Some s0 ->
-          let s = repair_parenting_of_new_nodes ~rule ~result:s0 in
-          Printf.printf "[engine] Applied rule: %s\n%!" rule.name;
-          maybe_start_stt ~before:!state ~after:s;
-          state := s;
-          write_bigraph_to_file !state target_path
-      | None ->
-          Printf.printf "[engine] Rule NOT applicable: %s (skipping)\n%!"
-            rule.name)
-    rule_files;
-
-  write_bigraph_to_file !state target_path;
+      (fun rf ->
+        if is_history rf then (
+          flush ();
+          ignore (history rf);
+          save (State_store.current store))
+        else pending := rf :: !pending)
+      rule_files;
+    flush ())
+  else
+    List.iter
+      (fun rf ->
+        if history rf then
+          save (State_store.current store)
+        else apply_file rf)
+      rule_files;
+
+  save (State_store.current store);
+  Option.iter close_out feed;
+  Effect_exec.shutdown effects;
   Printf.printf "[engine] Done. Wrote updated graph to %s\n%!" target_path
@@ -212,25 +212,32 @@ def make_second():
     return Level(next_id(), 2, "S",
                  children=specials + toilets + zones)
 
-master = Bigraph([
-    Node("Building",
-         id=9_999_999,
-         name="William Gates Building",
-         node_type="Building",
-         properties={
-            "name": "William Gates Building",
-            "addr:city": "Cambridge",
-            "addr:street": "JJ Thomson Avenue",
-            "addr:housenumber": "15",
-            "addr:postcode": "CB3 0FD",
-         },
-         children=[
-            make_ground(),
-            make_first(),
-            make_second(),
-         ]),
-])
-
-# persist
-master.save("william_gates_building.capnp")
-print("Saved to william_gates_building.capnp")
+BUILDING_ID = 9_999_999
+
+def build_building():
+    """The William Gates Building as a single-root Bigraph."""
+    return Bigraph([
+        Node("Building",
+             id=BUILDING_ID,
+             name="William Gates Building",
+             node_type="Building",
+             properties={
+                "name": "William Gates Building",
+                "addr:city": "Cambridge",
+                "addr:street": "JJ Thomson Avenue",
+                "addr:housenumber": "15",
+                "addr:postcode": "CB3 0FD",
+             },
+             children=[
+                make_ground(),
+                make_first(),
+                make_second(),
+             ]),
+    ])
+
+if __name__ == "__main__":
+    master = build_building()
+
+    # persist
+    master.save("william_gates_building.capnp")
+    print("Saved to william_gates_building.capnp")
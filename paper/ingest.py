@@ -0,0 +1,349 @@
+"""Batched OwnTracks location ingestion for the bigraph engine.
+
+Replaces owntracks.sh, which ran one Nominatim curl per MQTT message,
+serially. Location messages are read from MQTT (through mosquitto_sub) or a
+replay file. They are coalesced per device over --window seconds, and fixes
+worse than --max-acc metres are dropped. Each fix is resolved to a node of
+the target graph locally: an OwnTracks region name, else the footprint from
+a GeoJSON extract (lib/spatial_index.py) joined on the node's osm_id. Every
+flush turns the devices that changed place into spawn/move rules
+(path_rules, as in trace_gen.py) and applies them in one engine run. Updates
+that arrive while the engine runs fold into the next batch.
+
+  python paper/ingest.py --target paper/william_gates_building.capnp \
+      --geojson cambridge.geojson --mqtt-host elephant.vpn.freumh.org
+  python paper/ingest.py --target t.capnp --geojson g.geojson \
+      --replay owntracks.log --speed 0 --dry-run --metrics ingest.json
+
+Replay files hold one message per line: either mosquitto_sub -v output
+("owntracks/<user>/<device> {json}"), so a capture replays as recorded, or
+bare JSON payloads, where the device is the payload's "tid".
+"""
+import argparse, asyncio, json, pathlib, shlex, sys, time
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / "lib"))
+from bigraph_dsl import Bigraph, Node, Rule
+from path_rules import index_parents, ancestor_path, path_bigraph
+from spatial_index import SpatialIndex
+
+# ---------- args ----------
+
+def parse_args():
+    ap = argparse.ArgumentParser("Batched OwnTracks ingestion into the bigraph engine")
+    ap.add_argument("--target", required=True, help="target .capnp the engine rewrites")
+    ap.add_argument("--geojson", default=None, help="building/area footprints with OSM ids")
+    ap.add_argument("--cell", type=float, default=0.001, help="spatial grid cell in degrees")
+    ap.add_argument("--max-m", type=float, default=50.0,
+                    help="resolve to the nearest footprint within this many metres")
+    ap.add_argument("--mqtt-host", default=None)
+    ap.add_argument("--mqtt-port", type=int, default=1883)
+    ap.add_argument("--topic", default="owntracks/#")
+    ap.add_argument("--replay", default=None, help="read messages from this file instead of MQTT")
+    ap.add_argument("--speed", type=float, default=1.0,
+                    help="replay speed-up over the messages' tst times; 0 = as fast as possible")
+    ap.add_argument("--window", type=float, default=1.0, help="coalescing window in seconds")
+    ap.add_argument("--max-acc", type=float, default=100.0,
+                    help="drop fixes whose reported accuracy is worse than this (metres)")
+    ap.add_argument("--engine", default="dune exec paper/engine.exe --",
+                    help="command run as: <engine> <target> <rule files...>")
+    ap.add_argument("--spool", default="ingest-rules", help="directory for generated rule files")
+    ap.add_argument("--dry-run", action="store_true", help="write rules but do not run the engine")
+    ap.add_argument("--report", type=float, default=10.0, help="seconds between metric lines")
+    ap.add_argument("--metrics", default=None, help="write final metrics JSON here")
+    return ap.parse_args()
+
+# ---------- metrics ----------
+
+class Metrics:
+    COUNTERS = ("received", "locations", "dropped_type", "dropped_accuracy", "coalesced",
+                "unresolved", "unchanged", "rules", "applied", "not_applied", "batches")
+
+    def __init__(self):
+        self.t0 = time.monotonic()
+        self.c = dict.fromkeys(self.COUNTERS, 0)
+        self.latency = []      # seconds from receipt to the engine finishing its batch
+        self.batch_sizes = []
+        self.engine_s = 0.0
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.t0
+        lat = sorted(self.latency)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 2) if lat else None
+        return {
+            **self.c,
+            "elapsed_s": round(elapsed, 3),
+            "msgs_per_s": round(self.c["received"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "rules_per_s": round(self.c["rules"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "mean_batch": round(sum(self.batch_sizes) / len(self.batch_sizes), 2)
+                          if self.batch_sizes else 0.0,
+            "engine_s": round(self.engine_s, 3),
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p95": pct(0.95),
+            "latency_ms_p99": pct(0.99),
+        }
+
+    def line(self):
+        s = self.snapshot()
+        return (f"[ingest] {s['received']} msgs ({s['msgs_per_s']}/s), {s['rules']} rules "
+                f"in {s['batches']} batches, dropped acc={s['dropped_accuracy']} "
+                f"coalesced={s['coalesced']} unresolved={s['unresolved']}, "
+                f"latency p50={s['latency_ms_p50']}ms p99={s['latency_ms_p99']}ms")
+
+# ---------- resolution ----------
+
+def walk(nodes):
+    stack = list(nodes)
+    while stack:
+        n = stack.pop()
+        yield n
+        stack.extend(n.children)
+
+class Resolver:
+    """Fix -> target node: OwnTracks region name first, then the footprint at the point."""
+
+    def __init__(self, bg: Bigraph, index, max_m):
+        self.index, self.max_m = index, max_m
+        self.by_osm, self.by_name = {}, {}
+        for n in walk(bg.nodes):
+            osm_id = (n.properties or {}).get("osm_id")
+            if isinstance(osm_id, str):
+                self.by_osm[osm_id] = n
+            self.by_name.setdefault(n.name, n)
+
+    def resolve(self, msg):
+        for region in msg.get("inregions") or ():
+            if region in self.by_name:
+                return self.by_name[region]
+        if self.index is None:
+            return None
+        fp = self.index.locate(msg["lat"], msg["lon"], max_m=self.max_m)
+        return self.by_osm.get(fp.osm_id) if fp is not None else None
+
+# ---------- rules ----------
+
+class World:
+    """Where each device's Person node is, as far as applied rules say."""
+
+    def __init__(self, bg: Bigraph, spool: pathlib.Path):
+        self.parents = index_parents(bg)
+        self.spool = spool
+        self.top = max((n.id for n in walk(bg.nodes)), default=0)
+        self.people = {}   # device -> Person Node
+        self.where = {}    # device -> location Node
+        self.written = {}  # rule key -> rule file
+
+    def person(self, device):
+        p = self.people.get(device)
+        if p is None:
+            self.top += 1
+            user = device.split("/")[0]
+            p = self.people[device] = Node("Person", id=self.top, name=f"person_{self.top}",
+                                           node_type="Person",
+                                           properties={"name": user, "device": device})
+        return p
+
+    def rule_for(self, device, dst):
+        """(rule file, previous location) moving the device to dst, or None if it is there."""
+        src = self.where.get(device)
+        if src is not None and src.id == dst.id:
+            return None
+        p = self.person(device)
+        dpath = ancestor_path(self.parents, dst)
+        if src is None:
+            kind, key = "spawn", ("spawn", p.id, dst.id)
+            redex, reactum = path_bigraph([dpath]), path_bigraph([dpath + [p]])
+        else:
+            spath = ancestor_path(self.parents, src)
+            kind, key = "move", ("move", p.id, src.id, dst.id)
+            redex = path_bigraph([spath + [p], dpath])
+            reactum = path_bigraph([spath, dpath + [p]])
+        path = self.written.get(key)
+        if path is None:
+            path = self.spool / f"{len(self.written):06d}_{kind}.capnp"
+            with open(path, "wb") as fp:
+                Rule(kind, redex, reactum).to_capnp().write(fp)
+            self.written[key] = path
+        self.where[device] = dst
+        return path, src
+
+# ---------- sources ----------
+
+def parse_line(line):
+    """(device, payload) from a mosquitto_sub -v line or a bare JSON payload."""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        msg = json.loads(line)
+        return msg.get("tid", "unknown"), msg
+    topic, _, payload = line.partition(" ")
+    parts = topic.split("/")
+    device = "/".join(parts[1:3]) if len(parts) >= 3 else topic
+    return device, json.loads(payload)
+
+async def replay_lines(path, speed):
+    t_first = wall0 = None
+    with open(path) as f:
+        for n, line in enumerate(f):
+            if speed > 0:
+                try:
+                    tst = float(json.loads(line[line.index("{"):]).get("tst"))
+                except (ValueError, TypeError):
+                    tst = None
+                if tst is not None:
+                    if t_first is None:
+                        t_first, wall0 = tst, time.monotonic()
+                    delay = wall0 + (tst - t_first) / speed - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+            elif n % 256 == 0:
+                await asyncio.sleep(0)  # let the flusher run
+            yield line
+
+async def mqtt_lines(host, port, topic):
+    proc = await asyncio.create_subprocess_exec(
+        "mosquitto_sub", "-h", host, "-p", str(port), "-t", topic, "-v",
+        stdout=asyncio.subprocess.PIPE)
+    try:
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            yield line.decode("utf-8", "replace")
+    finally:
+        if proc.returncode is None:
+            proc.terminate()
+
+# ---------- service ----------
+
+class Ingest:
+    def __init__(self, args, resolver, world, metrics):
+        self.args, self.resolver, self.world, self.m = args, resolver, world, metrics
+        self.pending = {}  # device -> (t_recv, payload), latest fix only
+        self.done = False
+
+    def offer(self, line):
+        m = self.m
+        m.c["received"] += 1
+        try:
+            parsed = parse_line(line)
+        except (ValueError, json.JSONDecodeError):
+            parsed = None
+        if parsed is None:
+            m.c["dropped_type"] += 1
+            return
+        device, msg = parsed
+        if msg.get("_type") != "location" or "lat" not in msg or "lon" not in msg:
+            m.c["dropped_type"] += 1
+            return
+        m.c["locations"] += 1
+        acc = msg.get("acc")
+        if acc is not None and acc > self.args.max_acc:
+            m.c["dropped_accuracy"] += 1
+            return
+        if device in self.pending:
+            m.c["coalesced"] += 1
+        self.pending[device] = (time.monotonic(), msg)
+
+    async def consume(self, lines):
+        async for line in lines:
+            self.offer(line)
+        self.done = True
+
+    async def run_engine(self, rule_paths):
+        """Map rule file -> applied, from the engine's per-rule log lines."""
+        if self.args.dry_run:
+            return {str(p): True for p in rule_paths}
+        cmd = shlex.split(self.args.engine) + [self.args.target] + [str(p) for p in rule_paths]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        out, _ = await proc.communicate()
+        applied, current = {}, None
+        for line in out.decode("utf-8", "replace").splitlines():
+            if "applying rule file: " in line:
+                current = line.split("applying rule file: ", 1)[1].strip()
+            elif current is not None and "Applied rule:" in line:
+                applied[current] = True
+            elif current is not None and "Rule NOT applicable" in line:
+                applied[current] = False
+        if proc.returncode != 0:
+            print(f"[ingest] engine exited {proc.returncode}", file=sys.stderr)
+        return applied
+
+    async def flush(self):
+        batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        m, rules = self.m, []
+        for device, (t_recv, msg) in batch.items():
+            dst = self.resolver.resolve(msg)
+            if dst is None:
+                m.c["unresolved"] += 1
+                continue
+            r = self.world.rule_for(device, dst)
+            if r is None:
+                m.c["unchanged"] += 1
+                continue
+            rules.append((device, t_recv, *r))
+        if not rules:
+            return
+        t0 = time.monotonic()
+        applied = await self.run_engine([path for _, _, path, _ in rules])
+        done = time.monotonic()
+        m.engine_s += done - t0
+        m.c["batches"] += 1
+        m.c["rules"] += len(rules)
+        m.batch_sizes.append(len(rules))
+        for device, t_recv, path, src in rules:
+            if applied.get(str(path), False):
+                m.c["applied"] += 1
+                m.latency.append(done - t_recv)
+            else:
+                # the graph did not move; keep our view in step with it
+                m.c["not_applied"] += 1
+                if src is None:
+                    self.world.where.pop(device, None)
+                else:
+                    self.world.where[device] = src
+
+    async def flusher(self):
+        next_report = time.monotonic() + self.args.report
+        while True:
+            await asyncio.sleep(self.args.window)
+            await self.flush()
+            if time.monotonic() >= next_report:
+                print(self.m.line(), flush=True)
+                next_report += self.args.report
+            if self.done and not self.pending:
+                return
+
+async def main_async(args):
+    bg = Bigraph.load(args.target)
+    index = SpatialIndex.from_geojson(args.geojson, cell=args.cell) if args.geojson else None
+    spool = pathlib.Path(args.spool)
+    spool.mkdir(parents=True, exist_ok=True)
+    metrics = Metrics()
+    ingest = Ingest(args, Resolver(bg, index, args.max_m), World(bg, spool), metrics)
+
+    if args.replay:
+        lines = replay_lines(args.replay, args.speed)
+    elif args.mqtt_host:
+        lines = mqtt_lines(args.mqtt_host, args.mqtt_port, args.topic)
+    else:
+        sys.exit("ingest: give --replay FILE or --mqtt-host HOST")
+    await asyncio.gather(ingest.consume(lines), ingest.flusher())
+
+    print(metrics.line(), flush=True)
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            json.dump(metrics.snapshot(), f, indent=2)
+
+def main():
+    args = parse_args()
+    try:
+        asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
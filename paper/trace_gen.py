@@ -0,0 +1,200 @@
+"""Generate timed event traces against a building model for replay benchmarks.
+
+Writes <outdir>/target.capnp, one rule file per distinct event under
+<outdir>/rules/ and <outdir>/trace.csv (seq,t_ms,kind,rule_path), where
+rule_path is relative to outdir. Events follow the paper rules: people
+spawn at and despawn from a building root (spawn_rule.py/despawn_rule.py),
+move between rooms of their building, and devices flip properties (lights,
+PIR sensors, STT activation). The generator simulates the state, so every
+event in the trace applies to the state left by the previous ones.
+
+  python paper/trace_gen.py --outdir traces/wgb --events 20000 --seed 0
+  dune exec eval/bench_replay.exe -- --trace traces/wgb/trace.csv
+"""
+import argparse, csv, os, pathlib, random, sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / "lib"))
+from bigraph_dsl import Bigraph, Node, Rule
+from path_rules import index_parents, ancestor_path, path_bigraph
+
+import graph as wgb
+
+# (node_type, property) pairs flipped by the trace, with the kind label used in trace.csv
+FLIPS = {
+    ("Light", "on"): "flip_light",
+    ("PIR", "motion"): "flip_pir",
+    ("STT", "active"): "stt",
+}
+
+DEFAULT_MIX = "move=6,flip_light=2,flip_pir=3,stt=1,spawn=1,despawn=1"
+
+# ---------- args ----------
+
+def parse_args():
+    ap = argparse.ArgumentParser("Generate a timed rule trace for bench_replay")
+    ap.add_argument("--outdir",  type=str, default="traces/wgb")
+    ap.add_argument("--target",  type=str, default=None,
+                    help="existing target .capnp (default: build paper/graph.py's building)")
+    ap.add_argument("--events",  type=int, default=10000)
+    ap.add_argument("--people",  type=int, default=40, help="size of the occupant identity pool")
+    ap.add_argument("--rate",    type=float, default=20.0, help="mean events per second (Poisson)")
+    ap.add_argument("--mix",     type=str, default=DEFAULT_MIX, help="relative event weights")
+    ap.add_argument("--seed",    type=int, default=0)
+    ap.add_argument("--no-furnish", action="store_true",
+                    help="do not add lights/PIR/STT devices to rooms")
+    ap.add_argument("--light-p", type=float, default=0.6)
+    ap.add_argument("--pir-p",   type=float, default=0.4)
+    ap.add_argument("--stt-p",   type=float, default=0.05)
+    return ap.parse_args()
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        k, _, w = part.partition("=")
+        mix[k.strip()] = float(w or 1)
+    return mix
+
+# ---------- model ----------
+
+def walk(nodes):
+    stack = list(nodes)
+    while stack:
+        n = stack.pop()
+        yield n
+        stack.extend(n.children)
+
+def furnish(bg: Bigraph, rng: random.Random, next_id, light_p, pir_p, stt_p):
+    for room in bg.find_nodes_by_type("Room"):
+        kinds = {c.node_type for c in room.children}
+        if "Light" not in kinds and rng.random() < light_p:
+            nid = next_id()
+            room.children.append(Node("Light", id=nid, name=f"Light_{nid}", node_type="Light",
+                                      properties={"on": False, "brightness": 0}))
+        if "PIR" not in kinds and rng.random() < pir_p:
+            nid = next_id()
+            room.children.append(Node("PIR", id=nid, name=f"PIR_{nid}", node_type="PIR",
+                                      properties={"motion": False}))
+        if "STT" not in kinds and rng.random() < stt_p:
+            nid = next_id()
+            room.children.append(Node("STT", id=nid, name=f"stt_{nid}", node_type="STT",
+                                      properties={"active": False, "lang": "en"}))
+
+class Sim:
+    def __init__(self, bg: Bigraph, rng: random.Random, people: int, next_id):
+        self.rng = rng
+        self.parents = index_parents(bg)
+        self.roots = list(bg.nodes)
+        self.rooms_by_root = {r.id: [n for n in walk([r]) if n.node_type == "Room"] for r in self.roots}
+        self.devices = {kind: [n for n in walk(self.roots)
+                               if n.node_type == t and p in (n.properties or {})]
+                        for (t, p), kind in FLIPS.items()}
+        self.pool = []
+        for i in range(people):
+            pid = next_id()
+            self.pool.append(Node("Person", id=pid, name=f"person_{i}", node_type="Person",
+                                  properties={"name": f"Person {i}", "email": f"person{i}@example.org"}))
+        self.where = {}  # person id -> location Node (a root or a room)
+
+    def path(self, node):
+        return ancestor_path(self.parents, node)
+
+    def root_of(self, node):
+        return self.path(node)[0]
+
+    def possible(self, kind):
+        if kind == "spawn":
+            return len(self.where) < len(self.pool)
+        if kind == "despawn":
+            return any(loc.id in self.rooms_by_root for loc in self.where.values())
+        if kind == "move":
+            return bool(self.where)
+        return bool(self.devices.get(kind))
+
+    # each step returns (kind, cache key, redex, reactum) and advances the state
+    def step(self, kind):
+        rng = self.rng
+        if kind == "spawn":
+            p = rng.choice([p for p in self.pool if p.id not in self.where])
+            root = rng.choice(self.roots)
+            self.where[p.id] = root
+            return kind, ("spawn", p.id, root.id), \
+                path_bigraph([[root]]), path_bigraph([[root], [root, p]])
+        if kind == "despawn":
+            pid = rng.choice([pid for pid, loc in self.where.items() if loc.id in self.rooms_by_root])
+            p = next(q for q in self.pool if q.id == pid)
+            root = self.where.pop(pid)
+            return kind, ("despawn", pid, root.id), \
+                path_bigraph([[root, p]]), path_bigraph([[root]])
+        if kind == "move":
+            pid = rng.choice(sorted(self.where))
+            p = next(q for q in self.pool if q.id == pid)
+            src = self.where[pid]
+            root = self.root_of(src)
+            rooms = self.rooms_by_root[root.id]
+            if src.id != root.id and (rng.random() < 0.15 or len(rooms) < 2):
+                dst = root
+            else:
+                dst = rng.choice([r for r in rooms if r.id != src.id] or rooms)
+            self.where[pid] = dst
+            return kind, ("move", pid, src.id, dst.id), \
+                path_bigraph([self.path(src) + [p], self.path(dst)]), \
+                path_bigraph([self.path(src), self.path(dst) + [p]])
+        # property flips
+        (ntype, prop), = [tp for tp, k in FLIPS.items() if k == kind]
+        dev = rng.choice(self.devices[kind])
+        cur = bool(dev.properties.get(prop))
+        redex = path_bigraph([self.path(dev)])
+        reactum = path_bigraph([self.path(dev)], overrides={dev.id: {prop: not cur}})
+        dev.properties[prop] = not cur
+        return kind, ("flip", dev.id, prop, not cur), redex, reactum
+
+# ---------- main ----------
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    outdir = pathlib.Path(args.outdir)
+    (outdir / "rules").mkdir(parents=True, exist_ok=True)
+
+    if args.target:
+        bg = Bigraph.load(args.target)
+    else:
+        bg = wgb.build_building()
+
+    # fresh ids above everything in the target
+    top = [max(n.id for n in walk(bg.nodes))]
+    def next_id():
+        top[0] += 1
+        return top[0]
+
+    if not args.no_furnish:
+        furnish(bg, rng, next_id, args.light_p, args.pir_p, args.stt_p)
+    bg.save(str(outdir / "target.capnp"))
+
+    sim = Sim(bg, rng, args.people, next_id)
+    mix = {k: w for k, w in parse_mix(args.mix).items() if w > 0}
+    written = {}
+    t = 0.0
+
+    with open(outdir / "trace.csv", "w", newline="") as f:
+        wr = csv.writer(f)
+        wr.writerow(["seq", "t_ms", "kind", "rule_path"])
+        for seq in range(args.events):
+            kinds = [k for k in mix if sim.possible(k)]
+            if not kinds:
+                kinds = ["spawn"]
+            kind = rng.choices(kinds, weights=[mix[k] for k in kinds])[0]
+            kind, key, redex, reactum = sim.step(kind)
+            rel = written.get(key)
+            if rel is None:
+                rel = os.path.join("rules", f"{len(written):06d}_{kind}.capnp")
+                with open(outdir / rel, "wb") as fp:
+                    Rule(kind, redex, reactum).to_capnp().write(fp)
+                written[key] = rel
+            t += rng.expovariate(args.rate)
+            wr.writerow([seq, f"{t * 1000:.3f}", kind, rel])
+
+    print(f"Wrote {args.events} events ({len(written)} distinct rules) → {outdir / 'trace.csv'}")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from pathlib import Path
 import warnings
 import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 import matplotlib.pyplot as plt
 
 plt.rcParams.update({
@@ -16,26 +17,85 @@ plt.rcParams.update({
 
 # ---------------- utilities ----------------
 
+NUM_COLS = [
+    "graph_size","trial","latency_us","matched",
+    "search_us","apply_us",
+    "load_bg_us","load_redex_us","load_react_us","load_meta_us","create_rule_us",
+    "bg_bytes","redex_bytes","react_bytes","meta_bytes",
+    "read_bg_us","decode_bg_us","read_redex_us","decode_redex_us","read_react_us","decode_react_us",
+    "save_bg_us","bg_save_us","serialize_bg_us","encode_bg_us",
+    "bg_heap_words","index_heap_words","match_all_heap_words","match_all_alloc_words","top_heap_words",
+]
+CAT_COLS = ["rule", "workload"]
+PARQUET_SUFFIXES = (".parquet", ".pq")
+CHUNK_ROWS = 500_000
+
 def to_num(df, cols):
     for c in cols:
         if c in df.columns:
             df[c] = pd.to_numeric(df[c], errors="coerce")
 
-def ci95(a: np.ndarray):
-    a = a[~np.isnan(a)]
-    if a.size == 0:
-        return (np.nan, np.nan, np.nan)
-    m = float(np.mean(a))
-    s = float(np.std(a, ddof=1)) if a.size > 1 else 0.0
-    ci = 1.96 * s / (np.sqrt(a.size) if a.size > 0 else 1.0)
-    return (m, m - ci, m + ci)
-
-def agg_ci(df, xcol, ycol):
-    g = df.groupby(xcol, dropna=True)[ycol].apply(
-        lambda s: pd.Series(ci95(s.to_numpy()), index=["mean","lo","hi"])
-    )
-    out = g.unstack().reset_index()
-    return out.sort_values(by=xcol).reset_index(drop=True)
+def _compact(df):
+    # float32 keeps µs timings (to 0.1 µs below ~1.6 s) and halves their
+    # footprint; sizes and heap/Gc word counts pass 2^24 and stay float64
+    for c in df.columns:
+        if c in CAT_COLS:
+            df[c] = df[c].astype("category")
+        else:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+            if c.endswith("_us"):
+                df[c] = df[c].astype("float32")
+    return df
+
+def available_columns(path):
+    path = Path(path)
+    if path.suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+def load_results(path, cols=None):
+    """Load only the wanted columns of a bench_apply results file.
+
+    Parquet/Arrow files are read column-wise; CSVs are streamed in chunks
+    that are compacted (float32 timings / categorical) before concatenation, so peak
+    memory tracks the compact frame rather than the parsed text.
+    """
+    path = Path(path)
+    wanted = cols if cols is not None else NUM_COLS + CAT_COLS
+    use = [c for c in available_columns(path) if c in wanted]
+    if path.suffix in PARQUET_SUFFIXES:
+        return _compact(pd.read_parquet(path, columns=use))
+
+    dtypes = {c: "string" for c in use if c in CAT_COLS}
+    parts = [_compact(chunk) for chunk in
+             pd.read_csv(path, usecols=use, dtype=dtypes, chunksize=CHUNK_ROWS)]
+    if not parts:
+        return pd.DataFrame(columns=use)
+    cats = {c: union_categoricals([p[c] for p in parts]) for c in use if c in CAT_COLS}
+    df = pd.concat([p.drop(columns=list(cats)) for p in parts], ignore_index=True)
+    for c, values in cats.items():
+        df[c] = values
+    return df
+
+def agg_ci(df, xcol, ycol, by=None):
+    """Mean and 95% CI of ycol per xcol (and per `by`), in one groupby pass."""
+    keys = ([by] if by else []) + [xcol]
+    g = df.groupby(keys, observed=True, dropna=True)[ycol].agg(["mean", "std", "count"])
+    g = g[g["count"] > 0]
+    half = 1.96 * g["std"].fillna(0.0) / np.sqrt(g["count"])
+    out = pd.DataFrame({
+        "mean": g["mean"],
+        "lo": g["mean"] - half,
+        "hi": g["mean"] + half,
+        "n": g["count"],
+    }).reset_index()
+    return out.sort_values(by=keys).reset_index(drop=True)
+
+def per_rule(agg):
+    for rule, sub in agg.groupby("rule", observed=True, sort=True):
+        if rule and not sub.empty:
+            yield rule, sub
 
 def linear_fit(x, y):
     x = np.asarray(x, dtype=float)
@@ -62,16 +122,12 @@ def plot_rule_latency(df, outpdf):
     require(df, ["graph_size","rule","latency_us"])
     fig, ax = plt.subplots(figsize=(6.4, 4.2))
 
-    rules = sorted([r for r in df["rule"].dropna().unique().tolist() if r])
-    for rule in rules:
-        sub = df[df["rule"] == rule]
-        if sub.empty: 
-            continue
-        agg = agg_ci(sub, "graph_size", "latency_us")
-        if agg.empty:
-            continue
-        ax.plot(agg["graph_size"], agg["mean"], marker="o", linewidth=1.4, label=rule)
-        ax.fill_between(agg["graph_size"], agg["lo"], agg["hi"], alpha=0.20)
+    agg = agg_ci(df, "graph_size", "latency_us", by="rule")
+    rules = []
+    for rule, sub in per_rule(agg):
+        rules.append(rule)
+        ax.plot(sub["graph_size"], sub["mean"], marker="o", linewidth=1.4, label=rule)
+        ax.fill_between(sub["graph_size"], sub["lo"], sub["hi"], alpha=0.20)
 
     ax.set_title("Rule App. Latency vs Graph Size")
     ax.set_xlabel("Graph Size (nodes)")
@@ -82,6 +138,98 @@ def plot_rule_latency(df, outpdf):
     fig.savefig(outpdf, bbox_inches="tight")
     plt.close(fig)
 
+def plot_search_apply_breakdown(df, outpdf):
+    require(df, ["graph_size","rule","search_us","apply_us"])
+    search = agg_ci(df, "graph_size", "search_us", by="rule")
+    apply_ = agg_ci(df, "graph_size", "apply_us", by="rule")
+    both = search.merge(apply_, on=["rule","graph_size"], suffixes=("_search","_apply"))
+    rules = list(per_rule(both))
+    if not rules:
+        warnings.warn("no search/apply rows; skipping breakdown figure")
+        return
+    fig, axes = plt.subplots(1, len(rules), figsize=(4.2 * len(rules), 4.0), squeeze=False)
+    for ax, (rule, sub) in zip(axes[0], rules):
+        ax.stackplot(sub["graph_size"], sub["mean_search"], sub["mean_apply"],
+                     labels=["search", "apply"], alpha=0.8)
+        ax.set_title(rule)
+        ax.set_xlabel("Graph size (nodes)")
+    axes[0][0].set_ylabel("Mean latency (µs)")
+    axes[0][0].legend(loc="upper left")
+    fig.suptitle("Search vs apply breakdown")
+    fig.tight_layout()
+    fig.savefig(outpdf, bbox_inches="tight")
+    plt.close(fig)
+
+def plot_loglog_scaling(df, outpdf):
+    require(df, ["graph_size","rule","latency_us"])
+    fig, ax = plt.subplots(figsize=(6.4, 4.2))
+    pos = df[(df["latency_us"] > 0) & (df["graph_size"] > 0)]
+    agg = agg_ci(pos, "graph_size", "latency_us", by="rule")
+    for rule, sub in per_rule(agg):
+        lx, ly = np.log10(sub["graph_size"].to_numpy(float)), np.log10(sub["mean"].to_numpy(float))
+        k, c, r2 = linear_fit(lx, ly)
+        line, = ax.plot(sub["graph_size"], sub["mean"], marker="o", linestyle="none",
+                        label=f"{rule} (k={k:.2f}, R²={r2:.2f})")
+        if np.isfinite(k):
+            xs = np.array([lx.min(), lx.max()])
+            ax.plot(10 ** xs, 10 ** (k * xs + c), color=line.get_color(), linewidth=1.0)
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_title("Latency scaling (log-log, fitted exponent k)")
+    ax.set_xlabel("Graph size (nodes)")
+    ax.set_ylabel("Latency (µs)")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(outpdf, bbox_inches="tight")
+    plt.close(fig)
+
+def plot_throughput(df, outpdf):
+    require(df, ["graph_size","rule","latency_us"])
+    fig, ax = plt.subplots(figsize=(6.4, 4.2))
+    pos = df.loc[df["latency_us"] > 0, ["graph_size","rule","latency_us"]]
+    pos = pos.assign(rules_per_s=1e6 / pos["latency_us"].astype("float64"))
+    agg = agg_ci(pos, "graph_size", "rules_per_s", by="rule")
+    for rule, sub in per_rule(agg):
+        ax.plot(sub["graph_size"], sub["mean"], marker="o", linewidth=1.4, label=rule)
+        ax.fill_between(sub["graph_size"], sub["lo"], sub["hi"], alpha=0.20)
+    ax.set_yscale("log")
+    ax.set_title("Rule throughput vs graph size")
+    ax.set_xlabel("Graph size (nodes)")
+    ax.set_ylabel("Rules / s")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(outpdf, bbox_inches="tight")
+    plt.close(fig)
+
+def plot_regression(base, cand, outpdf, base_label="baseline", cand_label="candidate"):
+    require(base, ["graph_size","rule","latency_us"])
+    require(cand, ["graph_size","rule","latency_us"])
+    b = agg_ci(base, "graph_size", "latency_us", by="rule")
+    c = agg_ci(cand, "graph_size", "latency_us", by="rule")
+    for a in (b, c):
+        a["rule"] = a["rule"].astype(str)
+    both = b.merge(c, on=["rule","graph_size"], suffixes=("_b","_c"))
+    if both.empty:
+        warnings.warn("no overlapping (rule, graph_size) series; skipping regression figure")
+        return
+    both["ratio"] = both["mean_c"] / both["mean_b"]
+    # propagate the CI half-widths as a relative error on the ratio
+    rel = np.hypot((both["hi_b"] - both["mean_b"]) / both["mean_b"],
+                   (both["hi_c"] - both["mean_c"]) / both["mean_c"])
+    fig, ax = plt.subplots(figsize=(6.4, 4.2))
+    for rule, sub in both.groupby("rule", sort=True):
+        ax.plot(sub["graph_size"], sub["ratio"], marker="o", linewidth=1.4, label=rule)
+        r = rel.loc[sub.index]
+        ax.fill_between(sub["graph_size"], sub["ratio"] * (1 - r), sub["ratio"] * (1 + r), alpha=0.20)
+    ax.axhline(1.0, color="black", linewidth=0.8, linestyle="--")
+    ax.set_title(f"{cand_label} / {base_label} latency (>1 is slower)")
+    ax.set_xlabel("Graph size (nodes)")
+    ax.set_ylabel("Latency ratio")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(outpdf, bbox_inches="tight")
+    plt.close(fig)
+
 def plot_serdes_vs_nodes(df, outpdf):
     require(df, ["graph_size","read_bg_us","decode_bg_us","load_bg_us"])
     fig, ax = plt.subplots(figsize=(6.4, 4.2))
@@ -116,33 +264,109 @@ def plot_serdes_vs_nodes(df, outpdf):
     fig.savefig(outpdf, bbox_inches="tight")
     plt.close(fig)
 
+WORD_BYTES = 8  # OCaml heap words on 64-bit hosts
+
+def plot_heap_vs_nodes(df, outpdf):
+    require(df, ["graph_size","bg_heap_words","index_heap_words","match_all_heap_words"])
+    series = [
+        ("bg_heap_words",        "decoded bigraph"),
+        ("index_heap_words",     "matcher indexes"),
+        ("match_all_heap_words", "match_all result"),
+    ]
+    fig, (ax, ax_pn) = plt.subplots(1, 2, figsize=(10.4, 4.2))
+    for col, label in series:
+        sub = df[["graph_size", col]].dropna()
+        if sub.empty:
+            continue
+        sub = sub.assign(_mib=sub[col] * WORD_BYTES / 2**20,
+                         _bpn=sub[col] * WORD_BYTES / sub["graph_size"])
+        agg = agg_ci(sub, "graph_size", "_mib")
+        ax.plot(agg["graph_size"], agg["mean"], marker="o", linewidth=1.4, label=label)
+        ax.fill_between(agg["graph_size"], agg["lo"], agg["hi"], alpha=0.20)
+        agg = agg_ci(sub, "graph_size", "_bpn")
+        ax_pn.plot(agg["graph_size"], agg["mean"], marker="o", linewidth=1.4, label=label)
+
+    ax.set_title("OCaml heap vs graph size")
+    ax.set_xlabel("Graph size (nodes)")
+    ax.set_ylabel("Live heap (MiB)")
+    ax.legend()
+    ax_pn.set_title("OCaml heap per node")
+    ax_pn.set_xlabel("Graph size (nodes)")
+    ax_pn.set_ylabel("Bytes / node")
+    fig.tight_layout()
+    fig.savefig(outpdf, bbox_inches="tight")
+    plt.close(fig)
+
+def plot_py_memory_vs_nodes(df, outpdf):
+    require(df, ["graph_size","gen_bytes_per_node","load_bytes_per_node","peak_rss_kb"])
+    fig, (ax, ax_rss) = plt.subplots(1, 2, figsize=(10.4, 4.2))
+    for col, label in [("gen_bytes_per_node", "generated (bench_make)"),
+                       ("load_bytes_per_node", "Bigraph.load")]:
+        agg = agg_ci(df, "graph_size", col)
+        if agg.empty:
+            continue
+        ax.plot(agg["graph_size"], agg["mean"], marker="o", linewidth=1.4, label=label)
+        ax.fill_between(agg["graph_size"], agg["lo"], agg["hi"], alpha=0.20)
+    for col, label in [("peak_rss_kb", "peak"), ("base_rss_kb", "interpreter baseline")]:
+        if col not in df.columns:
+            continue
+        agg = agg_ci(df, "graph_size", col)
+        ax_rss.plot(agg["graph_size"], agg["mean"] / 1024, marker="o", linewidth=1.4, label=label)
+
+    ax.set_title("Python Bigraph bytes per node")
+    ax.set_xlabel("Graph size (nodes)")
+    ax.set_ylabel("Bytes / node (tracemalloc)")
+    ax.legend()
+    ax_rss.set_title("Peak RSS, fresh process per graph")
+    ax_rss.set_xlabel("Graph size (nodes)")
+    ax_rss.set_ylabel("RSS (MiB)")
+    ax_rss.legend()
+    fig.tight_layout()
+    fig.savefig(outpdf, bbox_inches="tight")
+    plt.close(fig)
+
 # ---------------- main ----------------
 
 def main():
     ap = argparse.ArgumentParser("Plot benchmark suite from results_general.csv")
-    ap.add_argument("--csv", required=True, help="Path to results_general.csv (bench_apply output)")
+    ap.add_argument("--csv", required=True,
+                    help="Path to results_general.csv or .parquet (bench_apply output)")
     ap.add_argument("--outdir", default="figs", help="Directory to write PDFs")
+    ap.add_argument("--mem-csv", default=None, help="Path to mem_metrics.csv (bench_make --mem output)")
+    ap.add_argument("--baseline", default=None,
+                    help="Results file to compare --csv against (regression figure)")
     args = ap.parse_args()
 
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    df = pd.read_csv(args.csv)
-
-    num_cols = [
-        "graph_size","trial","latency_us","matched",
-        "search_us","apply_us",
-        "load_bg_us","load_redex_us","load_react_us","load_meta_us","create_rule_us",
-        "bg_bytes","redex_bytes","react_bytes","meta_bytes",
-        "read_bg_us","decode_bg_us","read_redex_us","decode_redex_us","read_react_us","decode_react_us",
-        "save_bg_us","bg_save_us","serialize_bg_us","encode_bg_us",
-    ]
-    to_num(df, num_cols)
+    df = load_results(args.csv)
 
     plot_rule_latency(df, outdir / "fig_rule_latency_vs_graph_size.pdf")
 
     plot_serdes_vs_nodes(df, outdir / "fig_serdes_vs_graph_size.pdf")
 
+    if {"search_us", "apply_us"} <= set(df.columns):
+        plot_search_apply_breakdown(df, outdir / "fig_search_apply_breakdown.pdf")
+
+    plot_loglog_scaling(df, outdir / "fig_latency_loglog.pdf")
+
+    plot_throughput(df, outdir / "fig_throughput_vs_graph_size.pdf")
+
+    if "bg_heap_words" in df.columns and df["bg_heap_words"].notna().any():
+        plot_heap_vs_nodes(df, outdir / "fig_heap_vs_graph_size.pdf")
+
+    if args.mem_csv:
+        mem = pd.read_csv(args.mem_csv)
+        to_num(mem, ["graph_size","nodes","gen_bytes_per_node","load_bytes_per_node","peak_rss_kb",
+                     "base_rss_kb"])
+        plot_py_memory_vs_nodes(mem, outdir / "fig_py_memory_vs_graph_size.pdf")
+
+    if args.baseline:
+        base = load_results(args.baseline, ["graph_size","rule","latency_us"])
+        plot_regression(base, df, outdir / "fig_regression_vs_baseline.pdf",
+                        base_label=Path(args.baseline).stem, cand_label=Path(args.csv).stem)
+
     print(f"[ok] wrote PDFs → {outdir.resolve()}")
 
 if __name__ == "__main__":
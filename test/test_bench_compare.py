@@ -0,0 +1,43 @@
+"""Tests for eval/bench_compare.py: the regression gate fails on a real
+slowdown at the quick preset's sample count (python -m pytest test/)."""
+import csv, random, subprocess, sys
+from pathlib import Path
+
+EVAL = Path(__file__).resolve().parent.parent / "eval"
+sys.path.insert(0, str(EVAL))
+import bench_compare
+
+TRIALS = bench_compare.PRESETS["quick"]["trials"]
+
+def write_results(path, scale, seed):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        wr = csv.writer(f)
+        wr.writerow(["graph_size", "rule", "trial", "latency_us"])
+        for n in (500, 1000, 1500, 2000):
+            for rule in ("toggle", "remove", "reparent"):
+                for t in range(1, TRIALS + 1):
+                    wr.writerow([n, rule, t, f"{scale * n * rng.uniform(0.9, 1.1):.1f}"])
+
+def gate(tmp_path, scale):
+    base, cand = tmp_path / "base.csv", tmp_path / "cand.csv"
+    write_results(base, 1.0, 1)
+    write_results(cand, scale, 2)
+    return subprocess.run([sys.executable, str(EVAL / "bench_compare.py"), str(base), str(cand)],
+                          capture_output=True, text=True)
+
+def test_min_p_below_default_alpha():
+    assert bench_compare.min_p_value(TRIALS, TRIALS) < 0.01
+
+def test_exact_p_value():
+    # 5 vs 5, fully separated: 2 orderings out of C(10, 5) = 252
+    assert abs(bench_compare.mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]) - 2 / 252) < 1e-12
+
+def test_gate_fails_on_slowdown(tmp_path):
+    r = gate(tmp_path, 10.0)
+    assert r.returncode == 1, r.stderr
+    assert "SLOWER" in r.stdout
+
+def test_gate_passes_on_noise(tmp_path):
+    r = gate(tmp_path, 1.0)
+    assert r.returncode == 0, r.stdout + r.stderr
@@ -0,0 +1,119 @@
+(** Tests for Bigraph_diff: diffs from candidates or a journal agree with a
+    full comparison, and replaying them gives the target *)
+
+open Bifrost.Bigraph
+open Bifrost.Bigraph_events
+module D = Bifrost.Bigraph_diff
+open Test_util
+
+(* rooms 0..n-1, room i a child of room i / 2 *)
+let tree n =
+  List.fold_left
+    (fun bg id -> add_node_as_child bg (id / 2) (room id))
+    (add_node_to_root (empty_bigraph [ room_ctrl ]) (room 0))
+    (List.init (n - 1) succ)
+
+let keys m = NodeMap.fold (fun id _ acc -> NodeSet.add id acc) m NodeSet.empty
+
+let full a b =
+  D.diff ~ids:(NodeSet.union (keys a.place.nodes) (keys b.place.nodes)) a b
+
+(* [a] after [events], taking the parents of added nodes from [b] *)
+let replay (a : bigraph) (b : bigraph) events =
+  let set_parent id p m =
+    match p with Some p -> NodeMap.add id p m | None -> NodeMap.remove id m
+  in
+  let nodes, parents =
+    List.fold_left
+      (fun (m, pm) -> function
+        | NodeAdded n ->
+            let p = NodeMap.find_opt n.id b.place.parent_map in
+            (NodeMap.add n.id n m, set_parent n.id p pm)
+        | NodeRemoved id -> (NodeMap.remove id m, NodeMap.remove id pm)
+        | NodeMoved (id, p) -> (m, set_parent id p pm)
+        | PropertyChanged (id, k, v) ->
+            (NodeMap.add id (set_node_property (NodeMap.find id m) k v) m, pm)
+        | PropertyRemoved (id, k) ->
+            let nd = NodeMap.find id m in
+            let properties = Option.map (List.remove_assoc k) nd.properties in
+            (NodeMap.add id { nd with properties } m, pm)
+        | RuleApplied _ -> (m, pm))
+      (a.place.nodes, a.place.parent_map)
+      events
+  in
+  with_place a nodes parents
+
+let same (x : bigraph) (y : bigraph) =
+  NodeMap.equal ( = ) x.place.nodes y.place.nodes
+  && NodeMap.equal ( = ) x.place.parent_map y.place.parent_map
+
+let () =
+  let a = tree 1000 in
+  check "same state" (D.diff a a = []);
+  check "equal maps built separately" (D.diff a (tree 1000) = []);
+
+  let b = set_power (set_power a 17 true) 900 true in
+  check "property changes"
+    (D.diff a b
+    = [ PropertyChanged (17, "power", Bool true); PropertyChanged (900, "power", Bool true) ]);
+  check "shared records are not compared"
+    (NodeSet.cardinal (D.candidates a b) = 2);
+  check "journal ids give the same diff"
+    (D.diff ~ids:(NodeSet.of_list [ 17; 900 ]) a b = D.diff a b);
+
+  (* move 600 under 3, remove leaf 999, add 1000 under 5 *)
+  let c =
+    with_place b
+      (NodeMap.remove 999 b.place.nodes |> NodeMap.add 1000 (room 1000))
+      (NodeMap.remove 999 b.place.parent_map
+      |> NodeMap.add 600 3 |> NodeMap.add 1000 5)
+  in
+  let events = D.diff b c in
+  check "move is a move" (List.filter (function
+      | NodeMoved (600, _) | NodeRemoved 600 | NodeAdded { id = 600; _ } -> true
+      | _ -> false) events = [ NodeMoved (600, Some 3) ]);
+  check "removal and addition"
+    (List.mem (NodeRemoved 999) events
+    && List.exists (function NodeAdded n -> n.id = 1000 | _ -> false) events);
+  check "candidates agree with a full comparison" (events = full b c);
+
+  (* room 40 loses "power", room 41 gains "lux" *)
+  let d =
+    let nodes = c.place.nodes in
+    let r40 = NodeMap.find 40 nodes and r41 = NodeMap.find 41 nodes in
+    with_place c
+      (NodeMap.add 40 { r40 with properties = Some [] } nodes
+      |> NodeMap.add 41 (set_node_property r41 "lux" (Int 300)))
+      c.place.parent_map
+  in
+  let events = D.diff c d in
+  check "lost property is removed" (List.filter (function
+      | PropertyRemoved (40, _) | NodeRemoved 40 | NodeAdded { id = 40; _ } -> true
+      | _ -> false) events = [ PropertyRemoved (40, "power") ]);
+  check "new property is a change" (List.mem (PropertyChanged (41, "lux", Int 300)) events);
+  check "replaying the diff gives the target"
+    (same (replay c d events) d && same (replay a d (D.diff a d)) d);
+
+  (* room 7 renamed and moved to the root *)
+  let e =
+    with_place d
+      (NodeMap.add 7 { (NodeMap.find 7 d.place.nodes) with name = "hall" } d.place.nodes)
+      (NodeMap.remove 7 d.place.parent_map)
+  in
+  check "renamed node is re-added, then moved"
+    (List.filter (function
+       | NodeMoved (7, _) | NodeRemoved 7 | NodeAdded { id = 7; _ } -> true
+       | _ -> false) (D.diff d e)
+    = [ NodeRemoved 7; NodeAdded (NodeMap.find 7 e.place.nodes); NodeMoved (7, None) ]);
+  check "events round-trip through JSON"
+    (List.for_all
+       (fun ev -> deserialize_graph_event (serialize_graph_event ev) = Some ev)
+       (D.diff a e));
+
+  check "many changes agree with a full comparison"
+    (let e = ref a in
+     for i = 0 to 199 do
+       e := set_power !e (i * 5) true
+     done;
+     D.diff a !e = full a !e && List.length (D.diff a !e) = 200);
+  finish ()
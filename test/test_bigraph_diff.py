@@ -0,0 +1,39 @@
+"""Tests for lib/bigraph_diff.py: moves and dropped properties have events of
+their own (python -m pytest test/)."""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("capnp")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lib"))
+import bigraph_diff
+from bigraph_dsl import Bigraph, Node
+
+def campus(light_in=1, light_props=None, light_name="l1"):
+    light = Node("Light", id=3, name=light_name,
+                 properties={"power": True, "level": 3} if light_props is None else light_props)
+    rooms = [Node("Room", id=i, name=f"r{i}") for i in (1, 2)]
+    if light_in is None:
+        return Bigraph(rooms + [light])
+    rooms[light_in - 1].children.append(light)
+    return Bigraph(rooms)
+
+def test_same_state():
+    assert bigraph_diff.diff(campus(), campus(), hashes={}) == []
+
+def test_move():
+    assert bigraph_diff.diff(campus(), campus(light_in=2)) == [
+        {"type": "NodeMoved", "node_id": 3, "parent": 2}]
+    assert bigraph_diff.diff(campus(), campus(light_in=None)) == [
+        {"type": "NodeMoved", "node_id": 3, "parent": None}]
+
+def test_property_removed():
+    assert bigraph_diff.diff(campus(), campus(light_props={"level": 4})) == [
+        {"type": "PropertyChanged", "node_id": 3, "key": "level", "value": 4},
+        {"type": "PropertyRemoved", "node_id": 3, "key": "power"}]
+
+def test_renamed_node_is_added_again_then_moved():
+    events = bigraph_diff.diff(campus(), campus(light_in=2, light_name="l2"))
+    assert [e["type"] for e in events] == ["NodeRemoved", "NodeAdded", "NodeMoved"]
+    assert events[1]["name"] == "l2" and events[2]["parent"] == 2
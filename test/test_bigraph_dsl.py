@@ -0,0 +1,24 @@
+"""Tests for lib/bigraph_dsl.py: node records survive capnp encoding
+(python -m pytest test/)."""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("capnp")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lib"))
+from bigraph_dsl import Bigraph, Node, save_records
+
+def campus():
+    light = Node("Light", id=2, name="l1", node_type="Light",
+                 properties={"power": True, "color": (255, 128, 0), "level": 3, "lux": 0.5})
+    room = Node("Room", id=1, name="GE03", node_type="Room",
+                properties={"label": "GE03"}, children=[light])
+    return Bigraph([Node("Building", id=0, name="A", children=[room])])
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_records_round_trip(tmp_path, version):
+    bg = campus()
+    path = tmp_path / "campus.capnp"
+    save_records(str(path), bg.records(), version=version)
+    assert Bigraph.load(str(path)).records() == bg.records()
@@ -0,0 +1,176 @@
+(** Test for the engine's effect executor, against stub docker/ssh on PATH *)
+
+let stub_docker =
+  {|#!/bin/sh
+echo "docker $*" >> "$STUB_LOG"
+case "$1" in
+  ps) cat "$STUB_STATE/containers" 2>/dev/null; exit 0 ;;
+  image) [ -f "$STUB_STATE/image" ]; exit $? ;;
+  pull) touch "$STUB_STATE/image"; exit 0 ;;
+  run) sleep 0.3; printf 'stt\trunning\n' >> "$STUB_STATE/containers"; exit 0 ;;
+  logs) echo "stt ready"; echo "stt warning" >&2; exit 0 ;;
+  start) exit 0 ;;
+esac
+exit 1
+|}
+
+(* Understands just enough ssh: -o/-O/-i/-p, a master start (-fN) that
+   creates the control socket, -O check/exit, and a remote command. *)
+let stub_ssh =
+  {|#!/bin/sh
+echo "ssh $*" >> "$STUB_LOG"
+ctl=""; master=no; op=""
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -o) case "$2" in
+          ControlPath=*) ctl="${2#ControlPath=}" ;;
+          ControlMaster=yes) master=yes ;;
+        esac; shift 2 ;;
+    -O) op="$2"; shift 2 ;;
+    -i|-p) shift 2 ;;
+    -fN) shift ;;
+    *) break ;;
+  esac
+done
+shift
+if [ "$master" = yes ]; then touch "$ctl"; exit 0; fi
+case "$op" in
+  check) [ -e "$ctl" ]; exit $? ;;
+  exit) rm -f "$ctl"; exit 0 ;;
+esac
+exec sh -c "$*"
+|}
+
+let failures = ref 0
+
+let check ~name ok =
+  if ok then Printf.printf "✓ %s\n" name
+  else (
+    incr failures;
+    Printf.printf "✗ %s\n" name)
+
+let assert_equal ~name actual expected =
+  if actual = expected then Printf.printf "✓ %s\n" name
+  else (
+    incr failures;
+    Printf.printf "✗ %s: expected %d, got %d\n" name expected actual)
+
+let write_file path contents =
+  let oc = open_out path in
+  output_string oc contents;
+  close_out oc
+
+let contains s sub =
+  let n = String.length sub in
+  let rec go i =
+    i + n <= String.length s && (String.sub s i n = sub || go (i + 1))
+  in
+  go 0
+
+(* Calls whose log line starts with [prefix] ("docker ..." / "ssh ...") and
+   contains [sub] *)
+let calls ?(sub = "") path prefix =
+  if not (Sys.file_exists path) then 0
+  else
+    In_channel.with_open_text path In_channel.input_all
+    |> String.split_on_char '\n'
+    |> List.filter (fun l -> String.starts_with ~prefix l && contains l sub)
+    |> List.length
+
+let () =
+  let dir = Filename.temp_dir "effect_exec" "" in
+  let bin = Filename.concat dir "bin" in
+  let state = Filename.concat dir "state" in
+  let log = Filename.concat dir "calls.log" in
+  Unix.mkdir bin 0o755;
+  Unix.mkdir state 0o755;
+  List.iter
+    (fun (name, body) ->
+      let p = Filename.concat bin name in
+      write_file p body;
+      Unix.chmod p 0o755)
+    [ ("docker", stub_docker); ("ssh", stub_ssh) ];
+  Unix.putenv "PATH" (bin ^ ":" ^ Sys.getenv "PATH");
+  Unix.putenv "STUB_LOG" log;
+  Unix.putenv "STUB_STATE" state;
+
+  Printf.printf "Effect executor Tests\n";
+  Printf.printf "=====================\n\n";
+
+  let ssh : Effect_exec.ssh =
+    {
+      Effect_exec.host = "edge";
+      port = "22";
+      key = None;
+      strict = false;
+      control_path = Filename.concat dir "ctl.sock";
+      persist = 60;
+    }
+  in
+  let ex =
+    Effect_exec.create ~workers:4 ~ttl:60.0 ~log:ignore (Effect_exec.Remote ssh)
+  in
+  let c : Effect_exec.container =
+    { Effect_exec.image = "stt:test"; name = "stt"; run_args = "--rm" }
+  in
+
+  (* Test 1: submitting does not block on docker *)
+  let t0 = Unix.gettimeofday () in
+  let futures = List.init 8 (fun _ -> Effect_exec.ensure_running ex c) in
+  check ~name:"Submit returns before the effect runs"
+    (Unix.gettimeofday () -. t0 < 0.2);
+
+  (* Test 2: concurrent starts of one container share a run *)
+  check ~name:"All starts succeed" (List.for_all Effect_exec.await futures);
+  assert_equal ~name:"docker run invocations" (calls log "docker run") 1;
+  assert_equal ~name:"docker pull invocations" (calls log "docker pull") 1;
+
+  (* Test 3: one multiplexed ssh master, clients reuse it *)
+  assert_equal ~name:"ssh masters started" (calls log "ssh" ~sub:"ControlMaster=yes") 1;
+  check ~name:"Clients use the control socket"
+    (calls log "ssh" ~sub:"ControlMaster=no" >= 3);
+
+  (* Test 4: state is cached within the TTL *)
+  let ps_before = calls log "docker ps -a" in
+  for _ = 1 to 5 do
+    check ~name:"Container reported running"
+      (Effect_exec.container_state ex "stt" = Effect_exec.Running)
+  done;
+  assert_equal ~name:"Cached container listing"
+    (calls log "docker ps -a") ps_before;
+  Effect_exec.await (Effect_exec.ensure_running ex c) |> ignore;
+  assert_equal ~name:"Restart of running container skips docker"
+    (calls log "docker ps -a" + calls log "docker run")
+    (ps_before + 1);
+  Effect_exec.invalidate ex;
+  ignore (Effect_exec.container_state ex "stt");
+  assert_equal ~name:"Invalidate forces a listing"
+    (calls log "docker ps -a") (ps_before + 1);
+
+  (* Test 5: failures resolve the future instead of hanging *)
+  let bad = Effect_exec.submit ex (fun () -> failwith "boom") in
+  check ~name:"Failed effect re-raises on await"
+    (match Effect_exec.await bad with () -> false | exception Failure _ -> true);
+
+  (* Test 6: verify shows status and log tail through the log *)
+  let lines = ref [] in
+  let vx =
+    Effect_exec.create ~workers:1 ~log:(fun l -> lines := l :: !lines)
+      Effect_exec.Local
+  in
+  Effect_exec.await (Effect_exec.verify vx ~container:"stt" ~tail_lines:5);
+  Effect_exec.shutdown vx;
+  check ~name:"Verify logs the container status"
+    (List.exists (fun l -> contains l "running" && not (contains l "$ ")) !lines);
+  check ~name:"Verify logs the log tail"
+    (List.mem "stt ready" !lines && List.mem "stt warning" !lines);
+
+  Effect_exec.shutdown ex;
+  Effect_exec.close_master ex;
+  check ~name:"Master closed" (not (Sys.file_exists ssh.Effect_exec.control_path));
+  Printf.printf "\n";
+
+  if !failures > 0 then (
+    Printf.printf "%d test(s) failed\n" !failures;
+    exit 1);
+  Printf.printf "All tests passed!\n"
@@ -13,7 +13,7 @@ let () =
   let json_file = "bigraph-of-the-world/output/8-295355-Cambridge.json" in
 
   try
-    let bigraph = parse_osm_json json_file in
+    let bigraph, index = parse_osm_json_indexed json_file in
 
     Printf.printf "OSM Parser Tests\n";
     Printf.printf "================\n\n";
@@ -46,6 +46,42 @@ let () =
     assert_equal ~name:"Street nodes" (List.length streets) 1612;
     Printf.printf "\n";
 
+    (* Test 4: osm_id index *)
+    let scanned = find_by_osm_id bigraph "way 993981175" in
+    if find_by_osm_id ~index bigraph "way 993981175" = scanned then
+      Printf.printf "✓ Index lookup matches scan\n"
+    else Printf.printf "✗ Index lookup differs from scan\n";
+    let keys, ids = Bifrost.Osm_index.to_arrays index in
+    assert_equal ~name:"Index round trip"
+      (Bifrost.Osm_index.cardinal (Bifrost.Osm_index.of_arrays keys ids))
+      (Bifrost.Osm_index.cardinal (Bifrost.Osm_index.of_bigraph bigraph));
+    Printf.printf "\n";
+
+    (* Test 5: capnp codec round trip *)
+    let gwi =
+      {
+        bigraph;
+        inner = { sites = 0; names = [] };
+        outer = { sites = 0; names = [] };
+      }
+    in
+    List.iter
+      (fun version ->
+        let back =
+          Bifrost.Bigraph_codec.of_string
+            (Bifrost.Bigraph_codec.to_string ~version ~osm_index:index gwi)
+        in
+        if
+          NodeMap.equal ( = ) back.bigraph.place.nodes bigraph.place.nodes
+          && NodeMap.equal ( = ) back.bigraph.place.parent_map
+               bigraph.place.parent_map
+        then
+          Printf.printf "✓ Codec v%d round trip preserves nodes and parents\n"
+            version
+        else Printf.printf "✗ Codec v%d round trip changed the place graph\n" version)
+      [ 1; 2 ];
+    Printf.printf "\n";
+
     Printf.printf "All tests passed!\n"
   with e ->
     Printf.printf "Error: %s\n" (Printexc.to_string e);
@@ -0,0 +1,67 @@
+(** Tests for Scheduler *)
+
+open Bifrost.Bigraph
+module M = Bifrost.Matching
+module S = Bifrost.Scheduler
+open Test_util
+
+let room = create_control "Room" 0
+let light = create_control "Light" 0
+
+(* a Room holding a Light; empty name and type match any node *)
+let lit id props =
+  let r = create_node ~name:"" ~node_type:"" id room in
+  let l = create_node ~name:"" ~node_type:"" ~props (id + 1) light in
+  add_node_as_child (add_node_to_root (empty_bigraph [ room; light ]) r) id l
+
+let rule name a b = M.create_rule name (wrap (lit 0 a)) (wrap (lit 0 b))
+
+let switch_on = rule "switch_on" [ ("on", Bool false) ] [ ("on", Bool true) ]
+
+let brighten =
+  rule "brighten" [ ("on", Bool true) ] [ ("on", Bool true); ("bright", Bool true) ]
+
+(* three rooms as roots, so their matches are disjoint *)
+let rooms =
+  let one i =
+    [
+      ( create_node ~name:(Printf.sprintf "r%d" i) ~node_type:"Room" (10 * i) room,
+        create_node ~name:"" ~node_type:"Light" ~props:[ ("on", Bool false) ]
+          ((10 * i) + 1) light );
+    ]
+  in
+  wrap
+    (List.fold_left
+       (fun bg (r, l) -> add_node_as_child (add_node_to_root bg r) r.id l)
+       (empty_bigraph [ room; light ])
+       (List.concat_map one [ 1; 2; 3 ]))
+
+let lights (s : bigraph_with_interface) k v =
+  NodeMap.for_all
+    (fun _ (n : node) ->
+      n.control.name <> "Light"
+      || List.assoc_opt k (Option.value n.properties ~default:[]) = Some v)
+    s.bigraph.place.nodes
+
+let () =
+  let r = S.run [ (1, switch_on); (0, brighten) ] rooms in
+  check "converges" r.converged;
+  check "higher priority first, disjoint matches batched"
+    (r.per_step = [ 3; 3 ]);
+  check "all lights on and bright"
+    (lights r.final "on" (Bool true) && lights r.final "bright" (Bool true));
+  let bounded = S.run ~max_steps:1 [ (1, switch_on); (0, brighten) ] rooms in
+  check "step bound stops unconverged"
+    ((not bounded.converged) && bounded.steps = 1
+    && lights bounded.final "on" (Bool true));
+  let seq =
+    List.fold_left
+      (fun st _ -> Option.value (M.apply_rule switch_on st) ~default:st)
+      rooms [ 1; 2; 3 ]
+  in
+  let batch = S.run [ (0, switch_on) ] rooms in
+  check "batch rewrite matches one-at-a-time application"
+    (NodeMap.equal ( = ) batch.final.bigraph.place.nodes seq.bigraph.place.nodes
+    && NodeMap.equal ( = ) batch.final.bigraph.place.parent_map
+         seq.bigraph.place.parent_map);
+  finish ()
@@ -0,0 +1,70 @@
+(** Tests for Shard: sharded application matches applying in one process *)
+
+open Bifrost.Bigraph
+module M = Bifrost.Matching
+module Shard = Bifrost.Shard
+open Test_util
+
+let building = create_control "Building" 0
+let person = create_control "Person" 0
+
+let b_node name id = create_node ~name ~node_type:"Building" id building
+
+let p_node id = create_node ~name:"ada" ~node_type:"Person" id person
+let sg = [ building; room_ctrl; person ]
+
+(* buildings A (0), B (10), C (20), each with rooms id+1 and id+2 *)
+let campus =
+  wrap
+    (List.fold_left
+       (fun bg (name, b) ->
+         let bg = add_node_to_root bg (b_node name b) in
+         add_node_as_child (add_node_as_child bg b (room (b + 1))) b (room (b + 2)))
+       (empty_bigraph sg)
+       [ ("A", 0); ("B", 10); ("C", 20) ])
+
+let rule name redex reactum = M.create_rule name (wrap redex) (wrap reactum)
+let root n = add_node_to_root (empty_bigraph sg) n
+
+let power_on =
+  rule "power_on"
+    (add_node_as_child (root (b_node "A" 0)) 0 (room 1))
+    (add_node_as_child (root (b_node "A" 0)) 0 (room ~power:true 1))
+
+let spawn_b =
+  rule "spawn_b" (root (b_node "B" 10))
+    (add_node_as_child (root (b_node "B" 10)) 10 (p_node 100))
+
+(* redex roots in two buildings *)
+let move_b_to_a =
+  rule "move_b_to_a"
+    (add_node_to_root (add_node_as_child (root (b_node "B" 10)) 10 (p_node 100)) (b_node "A" 0))
+    (add_node_as_child (add_node_to_root (root (b_node "B" 10)) (b_node "A" 0)) 0 (p_node 100))
+
+let () =
+  let rules = [ power_on; spawn_b; move_b_to_a; power_on ] in
+  let expected =
+    List.fold_left
+      (fun st r -> Option.value (M.apply_rule r st) ~default:st)
+      campus rules
+  in
+  let results = ref [] in
+  let sh =
+    Shard.create ~workers:2 ~on_result:(fun seq res -> results := (seq, res) :: !results)
+      campus
+  in
+  check "cut at buildings" (Shard.depth sh = 0);
+  List.iter (fun r -> ignore (Shard.submit sh r)) rules;
+  Shard.sync sh;
+  let got = Shard.state sh in
+  Shard.close sh;
+  check "move across buildings takes the slow path" (Shard.spanning sh = 1);
+  check "building-local rules go to a worker"
+    (Array.fold_left ( + ) 0 (Shard.local_counts sh) = 3);
+  check "second power_on does not apply"
+    (match List.assoc_opt 3 !results with Some None -> true | _ -> false);
+  check "sharded state matches sequential state"
+    (NodeMap.equal ( = ) got.bigraph.place.nodes expected.bigraph.place.nodes
+    && NodeMap.equal ( = ) got.bigraph.place.parent_map
+         expected.bigraph.place.parent_map);
+  finish ()
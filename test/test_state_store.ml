@@ -0,0 +1,55 @@
+(** Tests for State_store *)
+
+open Bifrost.Bigraph
+open Bifrost.Bigraph_events
+module S = Bifrost.State_store
+open Test_util
+
+(* [set_power] as a rule application: the new state and its events *)
+let apply_power (s : bigraph_with_interface) id v =
+  ( { s with bigraph = set_power s.bigraph id v },
+    [ RuleApplied ("power", [ (id, id) ]); PropertyChanged (id, "power", Bool v) ] )
+
+let () =
+  let base =
+    wrap
+      (List.fold_left
+         (fun bg id -> add_node_as_child bg 0 (room id))
+         (add_node_to_root (empty_bigraph [ room_ctrl ]) (room 0))
+         [ 1; 2; 3 ])
+  in
+  let store = S.create ~keep:3 base in
+  let s1, e1 = apply_power base 1 true in
+  let v1 = S.commit ~events:e1 store s1 in
+  S.tag store "lit";
+  let s2, e2 = apply_power s1 2 true in
+  let v2 = S.commit ~events:e2 store s2 in
+
+  check "diff via journal"
+    (S.diff store 0 v2
+    = Some [ PropertyChanged (1, "power", Bool true); PropertyChanged (2, "power", Bool true) ]);
+  check "journal diff matches full diff"
+    (S.diff store 0 v2 = Some (S.diff_states base.bigraph s2.bigraph));
+  check "diff backwards"
+    (S.diff store v2 v1 = Some [ PropertyChanged (2, "power", Bool false) ]);
+
+  (* push version 0 and v1 out of the last 3; the tag keeps v1 *)
+  let s = ref s2 in
+  for i = 1 to 3 do
+    let s', e = apply_power !s 3 (i mod 2 = 1) in
+    ignore (S.commit ~events:e store s');
+    s := s'
+  done;
+  check "untagged old version evicted" (Option.is_none (S.find store 0));
+  check "tagged version retained"
+    (match S.find store v1 with Some st -> st == s1 | None -> false);
+  check "diff across a gap compares whole graphs"
+    (S.diff store v1 (S.head store) = Some (S.diff_states s1.bigraph !s.bigraph));
+
+  (match S.revert store v1 with
+  | Some st -> check "revert makes the old state current" (S.current store == st)
+  | None -> check "revert makes the old state current" false);
+  S.untag store "lit";
+  check "snapshots share unchanged nodes"
+    (NodeMap.find 0 s1.bigraph.place.nodes == NodeMap.find 0 s2.bigraph.place.nodes);
+  finish ()
@@ -0,0 +1,37 @@
+(** Helpers shared by the OCaml tests *)
+
+open Bifrost.Bigraph
+
+let failures = ref 0
+
+let check name ok =
+  if ok then Printf.printf "✓ %s\n" name
+  else (
+    incr failures;
+    Printf.printf "✗ %s\n" name)
+
+(* Call last: a failed [check] makes the test exit non-zero *)
+let finish () =
+  if !failures > 0 then (
+    Printf.printf "%d check(s) failed\n" !failures;
+    exit 1)
+
+let wrap bg =
+  { bigraph = bg; inner = { sites = 0; names = [] }; outer = { sites = 0; names = [] } }
+
+(* --------- rooms with a "power" property --------- *)
+
+let room_ctrl = create_control "Room" 0
+
+let room ?(power = false) id =
+  create_node ~name:(Printf.sprintf "r%d" id) ~node_type:"Room"
+    ~props:[ ("power", Bool power) ] id room_ctrl
+
+let with_place (bg : bigraph) nodes parent_map =
+  { bg with place = { bg.place with nodes; parent_map } }
+
+(* [bg] with the "power" of node [id] set to [v], sharing every other record *)
+let set_power (bg : bigraph) id v =
+  let nd = NodeMap.find id bg.place.nodes in
+  with_place bg (NodeMap.add id (set_node_property nd "power" (Bool v)) bg.place.nodes)
+    bg.place.parent_map